@@ -1,19 +1,358 @@
-from web3 import Web3
-from typing import Dict
+import asyncio
+import json
+import time
+import aiohttp
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from web3 import AsyncWeb3, Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
 
-def make_w3(rpc_url: str) -> Web3:
-    """Create Web3 instance with timeout configuration."""
-    w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 30}))
+# A JSON-RPC call as (method, params)
+RpcCall = Tuple[str, Any]
+
+class Endpoint:
+    """One RPC URL with its latency (EWMA) and error counters."""
+
+    def __init__(self, url: str, alpha: float = 0.2):
+        self.url = url
+        self.alpha = alpha
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0  # times it was raced against a slower endpoint
+        self.wins = 0    # times its answer was the one used
+        self.ewma_ms: Optional[float] = None
+        self.last_error = ""
+        self.cooldown_until = 0.0
+        self.lock = Lock()
+
+    def record(self, elapsed_ms: float):
+        with self.lock:
+            self.requests += 1
+            self.ewma_ms = elapsed_ms if self.ewma_ms is None else \
+                self.alpha * elapsed_ms + (1 - self.alpha) * self.ewma_ms
+
+    def fail(self, error: Exception, cooldown_s: float):
+        with self.lock:
+            self.requests += 1
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            self.cooldown_until = time.monotonic() + cooldown_s
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+            "cooling": self.cooldown_until > time.monotonic(),
+            "last_error": self.last_error,
+        }
+
+class EndpointSet:
+    """A chain's RPC endpoints, fastest first.
+
+    Endpoints are ordered by latency EWMA; one that has not answered yet
+    ranks as 0 ms so it gets measured. A failed endpoint is moved behind
+    the healthy ones for ``cooldown_s``. The sync and async providers of a
+    chain share one set, so both learn from every request.
+    """
+
+    def __init__(self, urls: Sequence[str], cooldown_s: float = 5.0):
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            raise ValueError("No RPC endpoint configured")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.cooldown_s = cooldown_s
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def ranked(self) -> List[Endpoint]:
+        now = time.monotonic()
+        return sorted(self.endpoints, key=lambda e: (e.cooldown_until > now, e.ewma_ms or 0.0))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {endpoint.url: endpoint.stats() for endpoint in self.endpoints}
+
+def _payload(request_ids, method: str, params: Any) -> Dict:
+    return {"jsonrpc": "2.0", "method": method, "params": params or [], "id": next(request_ids)}
+
+def _batch_order(payloads: List[Dict], responses) -> List[RPCResponse]:
+    """Batch responses in request order (servers may answer in any order)."""
+    if not isinstance(responses, list):
+        # A node rejecting the whole batch answers with a single error object
+        return [responses for _ in payloads]
+    by_id = {response.get("id"): response for response in responses}
+    missing = {"jsonrpc": "2.0", "error": {"code": -32603, "message": "missing from batch response"}}
+    return [by_id.get(payload["id"], dict(missing, id=payload["id"])) for payload in payloads]
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """web3 HTTP provider over keep-alive sessions with failover, hedging and batching.
+
+    Each request goes to the fastest endpoint. If it has not answered after
+    ``hedge_after_ms`` (0 disables hedging), the same request is also sent
+    to the next endpoint and the first answer wins. Transport errors and
+    HTTP error statuses fail over to the next endpoint; JSON-RPC error
+    responses (e.g. a revert) are answers and are returned as such.
+    """
+
+    def __init__(self, endpoints: EndpointSet, timeout: float = 10.0, pool_size: int = 16,
+                 hedge_after_ms: float = 0.0, batch_size: int = 100):
+        super().__init__()
+        self.endpoints = endpoints
+        self.timeout = timeout
+        self.hedge_after = hedge_after_ms / 1000
+        self.batch_size = batch_size
+        self.sessions: Dict[str, requests.Session] = {}
+        for endpoint in endpoints.endpoints:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            self.sessions[endpoint.url] = session
+        self.hedger = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="rpc-hedge") \
+            if self.hedge_after > 0 and len(endpoints) > 1 else None
+
+    def __str__(self) -> str:
+        return f"PooledHTTPProvider({[e.url for e in self.endpoints.endpoints]})"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self._send(_payload(self.request_counter, method, params))
+
+    def batch(self, calls: Sequence[RpcCall]) -> List[RPCResponse]:
+        """Send calls as JSON-RPC batches of ``batch_size``; responses in call order."""
+        responses: List[RPCResponse] = []
+        for start in range(0, len(calls), self.batch_size):
+            payloads = [_payload(self.request_counter, method, params)
+                        for method, params in calls[start:start + self.batch_size]]
+            responses.extend(_batch_order(payloads, self._send(payloads)))
+        return responses
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.endpoints.stats()
+
+    def close(self):
+        """Stop the hedging threads (losing requests are abandoned) and close the sessions."""
+        if self.hedger is not None:
+            self.hedger.shutdown(wait=False, cancel_futures=True)
+            self.hedger = None
+        for session in self.sessions.values():
+            session.close()
+
+    def _post(self, endpoint: Endpoint, payload: Union[Dict, List[Dict]]):
+        start = time.perf_counter()
+        try:
+            response = self.sessions[endpoint.url].post(
+                endpoint.url, data=json.dumps(payload, cls=Web3JsonEncoder), timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            endpoint.fail(e, self.endpoints.cooldown_s)
+            raise
+        endpoint.record((time.perf_counter() - start) * 1000)
+        return body
+
+    def _send(self, payload: Union[Dict, List[Dict]]):
+        ranked = self.endpoints.ranked()
+        if self.hedger is not None:
+            return self._hedged(payload, ranked)
+        error: Optional[Exception] = None
+        for endpoint in ranked:
+            try:
+                body = self._post(endpoint, payload)
+            except Exception as e:
+                error = e
+                continue
+            endpoint.wins += 1
+            return body
+        raise error
+
+    def _hedged(self, payload: Union[Dict, List[Dict]], ranked: List[Endpoint]):
+        pending = {}
+        hedged = False
+        error: Optional[Exception] = None
+
+        def launch():
+            endpoint = ranked.pop(0)
+            pending[self.hedger.submit(self._post, endpoint, payload)] = endpoint
+            return endpoint
+
+        launch()
+        while pending:
+            # Until the one hedge is spent, wait only hedge_after for the leader
+            timeout = self.hedge_after if ranked and not hedged else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch().hedges += 1
+                hedged = True
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    body = future.result()
+                except Exception as e:
+                    error = e
+                    if ranked and not pending:
+                        launch()
+                    continue
+                endpoint.wins += 1
+                return body  # a slower duplicate still finishes and is timed
+        raise error
+
+class AsyncPooledHTTPProvider(AsyncJSONBaseProvider):
+    """Async counterpart of PooledHTTPProvider on one aiohttp session.
+
+    The session (and its keep-alive connection pool) is created on first
+    use inside the running event loop. Losing hedged requests are cancelled.
+    """
+
+    def __init__(self, endpoints: EndpointSet, timeout: float = 10.0, pool_size: int = 16,
+                 hedge_after_ms: float = 0.0, batch_size: int = 100):
+        super().__init__()
+        self.endpoints = endpoints
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.hedge_after = hedge_after_ms / 1000
+        self.batch_size = batch_size
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def __str__(self) -> str:
+        return f"AsyncPooledHTTPProvider({[e.url for e in self.endpoints.endpoints]})"
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return await self._send(_payload(self.request_counter, method, params))
+
+    async def batch(self, calls: Sequence[RpcCall]) -> List[RPCResponse]:
+        """Send calls as JSON-RPC batches of ``batch_size`` (concurrently); responses in call order."""
+        chunks = [
+            [_payload(self.request_counter, method, params) for method, params in calls[start:start + self.batch_size]]
+            for start in range(0, len(calls), self.batch_size)
+        ]
+        bodies = await asyncio.gather(*(self._send(payloads) for payloads in chunks))
+        return [response for payloads, body in zip(chunks, bodies) for response in _batch_order(payloads, body)]
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.endpoints.stats()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self.session
+
+    async def _post(self, endpoint: Endpoint, payload: Union[Dict, List[Dict]]):
+        start = time.perf_counter()
+        try:
+            async with self._session().post(endpoint.url, data=json.dumps(payload, cls=Web3JsonEncoder)) as response:
+                response.raise_for_status()
+                body = await response.json(content_type=None)
+        except asyncio.CancelledError:
+            raise  # lost a hedge race; not the endpoint's fault
+        except Exception as e:
+            endpoint.fail(e, self.endpoints.cooldown_s)
+            raise
+        endpoint.record((time.perf_counter() - start) * 1000)
+        return body
+
+    async def _send(self, payload: Union[Dict, List[Dict]]):
+        ranked = self.endpoints.ranked()
+        hedging = self.hedge_after > 0 and len(ranked) > 1
+        pending: Dict[asyncio.Task, Endpoint] = {}
+        hedged = False
+        error: Optional[Exception] = None
+
+        def launch():
+            endpoint = ranked.pop(0)
+            pending[asyncio.ensure_future(self._post(endpoint, payload))] = endpoint
+            return endpoint
+
+        launch()
+        try:
+            while pending:
+                timeout = self.hedge_after if hedging and ranked and not hedged else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch().hedges += 1
+                    hedged = True
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        if ranked and not pending:
+                            launch()
+                        continue
+                    endpoint.wins += 1
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+def rpc_urls(chain_cfg: Dict) -> List[str]:
+    """The chain's primary ``rpc`` followed by any ``rpc_fallbacks`` (empty entries dropped)."""
+    return [url for url in [chain_cfg.get("rpc")] + list(chain_cfg.get("rpc_fallbacks") or []) if url]
+
+def make_w3(rpc_url: Union[str, Sequence[str]], rpc_cfg: Optional[Dict] = None,
+            endpoints: Optional[EndpointSet] = None) -> Web3:
+    """Create a Web3 instance over pooled sessions to one or more RPC URLs."""
+    rpc_cfg = rpc_cfg or {}
+    if endpoints is None:
+        endpoints = EndpointSet([rpc_url] if isinstance(rpc_url, str) else rpc_url,
+                                rpc_cfg.get("cooldown_s", 5.0))
+    w3 = Web3(PooledHTTPProvider(
+        endpoints,
+        timeout=rpc_cfg.get("timeout_s", 30),
+        pool_size=rpc_cfg.get("pool_size", 16),
+        hedge_after_ms=rpc_cfg.get("hedge_after_ms", 0),
+        batch_size=rpc_cfg.get("batch_size", 100),
+    ))
     if not w3.is_connected():
-        raise RuntimeError(f"Cannot connect RPC {rpc_url}")
+        raise RuntimeError(f"Cannot connect RPC {[e.url for e in endpoints.endpoints]}")
     return w3
 
-def make_clients(cfg_chains: Dict):
-    """Create Web3 clients for all configured chains."""
+def make_async_w3(endpoints: EndpointSet, rpc_cfg: Optional[Dict] = None) -> AsyncWeb3:
+    """AsyncWeb3 over the same endpoints (and latency/error counters) as the sync client."""
+    rpc_cfg = rpc_cfg or {}
+    return AsyncWeb3(AsyncPooledHTTPProvider(
+        endpoints,
+        timeout=rpc_cfg.get("timeout_s", 30),
+        pool_size=rpc_cfg.get("pool_size", 16),
+        hedge_after_ms=rpc_cfg.get("hedge_after_ms", 0),
+        batch_size=rpc_cfg.get("batch_size", 100),
+    ))
+
+def make_clients(cfg_chains: Dict, rpc_cfg: Optional[Dict] = None):
+    """Create sync and async Web3 clients for all configured chains.
+
+    Each chain's clients share an EndpointSet, exposed as ``endpoints`` for
+    per-endpoint latency and error counters.
+    """
+    rpc_cfg = rpc_cfg or {}
     clients = {}
     for name, data in cfg_chains.items():
+        endpoints = EndpointSet(rpc_urls(data), rpc_cfg.get("cooldown_s", 5.0))
         clients[name] = {
-            "w3": make_w3(data["rpc"]),
+            "w3": make_w3(rpc_urls(data), rpc_cfg, endpoints),
+            "async_w3": make_async_w3(endpoints, rpc_cfg),
+            "endpoints": endpoints,
             "cfg": data
         }
     return clients
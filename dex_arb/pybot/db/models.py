@@ -1,48 +1,107 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import BigInteger, String, Float, JSON, TIMESTAMP, text
+from sqlalchemy import BigInteger, Boolean, Integer, LargeBinary, Numeric, String, TIMESTAMP, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+# Mirrors sql/schema.sql, which owns the DDL: partitions, retention, rollup
+# triggers and indexes live there. Time-series tables are range-partitioned by
+# ts, so their primary key is (id, ts).
+PARTITIONED_BY_TS = {"postgresql_partition_by": "RANGE (ts)"}
 
 class Base(DeclarativeBase):
     pass
 
+class Pool(Base):
+    """Pool information cache."""
+    __tablename__ = "pools"
+    __table_args__ = (UniqueConstraint("chain", "dex", "address"),)  # upsert key
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chain: Mapped[str] = mapped_column(String)
+    dex: Mapped[str] = mapped_column(String)
+    address: Mapped[bytes] = mapped_column(LargeBinary)
+    token0: Mapped[bytes] = mapped_column(LargeBinary)
+    token1: Mapped[bytes] = mapped_column(LargeBinary)
+    fee_bps: Mapped[Optional[int]] = mapped_column(Integer)  # None for Curve
+    tvl_usd: Mapped[Optional[Decimal]] = mapped_column(Numeric)
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
+
 class Quote(Base):
     """Quote record for arbitrage opportunities."""
     __tablename__ = "quotes"
-    
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    __table_args__ = PARTITIONED_BY_TS
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True, server_default=text("now()"))
     chain: Mapped[str] = mapped_column(String)
-    amount_in_usd: Mapped[float] = mapped_column(Float)
-    amount_out_usd: Mapped[float] = mapped_column(Float)
-    gas_estimate_usd: Mapped[float] = mapped_column(Float)
-    flash_fee_usd: Mapped[float] = mapped_column(Float)
-    profit_usd: Mapped[float] = mapped_column(Float)
-    legs: Mapped[dict] = mapped_column(JSON)
-    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
-
-class Transaction(Base):
+    route_hash: Mapped[bytes] = mapped_column(LargeBinary)
+    amount_in_usd: Mapped[Decimal] = mapped_column(Numeric)
+    amount_out_usd: Mapped[Decimal] = mapped_column(Numeric)
+    gas_estimate_usd: Mapped[Decimal] = mapped_column(Numeric)
+    flash_fee_usd: Mapped[Decimal] = mapped_column(Numeric)
+    profit_usd: Mapped[Decimal] = mapped_column(Numeric)
+    legs: Mapped[list] = mapped_column(JSONB)
+
+class Execution(Base):
     """Transaction execution record."""
-    __tablename__ = "transactions"
-    
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    __tablename__ = "executions"
+    __table_args__ = PARTITIONED_BY_TS
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True, server_default=text("now()"))
     chain: Mapped[str] = mapped_column(String)
-    tx_hash: Mapped[str] = mapped_column(String, unique=True)
-    status: Mapped[str] = mapped_column(String)  # pending, success, failed
-    gas_used: Mapped[int] = mapped_column(BigInteger)
-    gas_price: Mapped[int] = mapped_column(BigInteger)
-    profit_usd: Mapped[float] = mapped_column(Float)
-    legs: Mapped[dict] = mapped_column(JSON)
-    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    tx_hash: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    private_sent: Mapped[Optional[bool]] = mapped_column(Boolean)
+    status: Mapped[Optional[str]] = mapped_column(String)  # success, reverted, missed
+    gas_used: Mapped[Optional[Decimal]] = mapped_column(Numeric)
+    gas_price_gwei: Mapped[Optional[Decimal]] = mapped_column(Numeric)
+    profit_usd: Mapped[Optional[Decimal]] = mapped_column(Numeric)
+    reason: Mapped[Optional[str]] = mapped_column(String)
 
-class Pool(Base):
-    """Pool information cache."""
-    __tablename__ = "pools"
-    
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+class GasPrice(Base):
+    """Fees of one block head."""
+    __tablename__ = "gas_prices"
+    __table_args__ = PARTITIONED_BY_TS
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True, server_default=text("now()"))
     chain: Mapped[str] = mapped_column(String)
-    dex: Mapped[str] = mapped_column(String)
-    address: Mapped[str] = mapped_column(String)
-    token0: Mapped[str] = mapped_column(String)
-    token1: Mapped[str] = mapped_column(String)
-    tvl_usd: Mapped[float] = mapped_column(Float)
-    fee_tier: Mapped[int] = mapped_column(BigInteger)
-    last_updated: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    base_fee_gwei: Mapped[Decimal] = mapped_column(Numeric)
+    priority_fee_gwei: Mapped[Decimal] = mapped_column(Numeric)
+    gas_price_gwei: Mapped[Decimal] = mapped_column(Numeric)
+
+class Metric(Base):
+    """Performance metric sample."""
+    __tablename__ = "metrics"
+    __table_args__ = PARTITIONED_BY_TS
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True, server_default=text("now()"))
+    chain: Mapped[str] = mapped_column(String)
+    metric_name: Mapped[str] = mapped_column(String)
+    metric_value: Mapped[Decimal] = mapped_column(Numeric)
+    labels: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+class QuoteMinute(Base):
+    """Best quote per route and minute (filled by a trigger on quotes; read-only here)."""
+    __tablename__ = "quotes_1m"
+    __table_args__ = PARTITIONED_BY_TS
+
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
+    chain: Mapped[str] = mapped_column(String, primary_key=True)
+    route_hash: Mapped[bytes] = mapped_column(LargeBinary, primary_key=True)
+    best_profit_usd: Mapped[Decimal] = mapped_column(Numeric)
+    quotes: Mapped[int] = mapped_column(BigInteger)
+
+class ExecutionMinute(Base):
+    """Execution outcomes per chain and minute (filled by a trigger on executions; read-only here)."""
+    __tablename__ = "executions_1m"
+    __table_args__ = PARTITIONED_BY_TS
+
+    ts: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
+    chain: Mapped[str] = mapped_column(String, primary_key=True)
+    executions: Mapped[int] = mapped_column(BigInteger)
+    failed: Mapped[int] = mapped_column(BigInteger)
+    fail_rate: Mapped[Decimal] = mapped_column(Numeric)
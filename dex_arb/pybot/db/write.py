@@ -1,52 +1,372 @@
 import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from threading import Lock
+from eth_utils import keccak
+from sqlalchemy import JSON, Float, LargeBinary, Numeric, Table, bindparam, func, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from typing import List, Dict, Any
-from .models import Base, Quote, Transaction, Pool
+from typing import List, Dict, Any, Optional, Tuple
+from .models import Base, Quote, Execution, GasPrice, Metric, Pool
+
+POOL_KEY = ("chain", "dex", "address")
+MAX_BIND_PARAMS = 30_000  # asyncpg allows 32767 per statement
+
+class TableBuffer:
+    """Rows waiting to be written to one table, bounded to ``max_rows``.
+
+    When full, ``policy`` decides: ``drop`` discards the new row, ``sample``
+    keeps a uniform random sample of every row offered since the last flush
+    (reservoir sampling), so a burst thins out instead of losing its tail.
+    """
+
+    def __init__(self, max_rows: int, policy: str = "drop"):
+        self.max_rows = max_rows
+        self.policy = policy
+        self.rows: List[Dict[str, Any]] = []
+        self.offered = 0  # rows offered since the last flush
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        self.offered += 1
+        if len(self.rows) < self.max_rows:
+            self.rows.append(row)
+            return True
+        self.dropped += 1
+        if self.policy == "sample":
+            slot = random.randrange(self.offered)
+            if slot < self.max_rows:
+                self.rows[slot] = row
+                return True
+        return False
+
+    def take(self) -> List[Dict[str, Any]]:
+        rows, self.rows, self.offered = self.rows, [], 0
+        return rows
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": len(self.rows), "written": self.written, "dropped": self.dropped, "errors": self.errors}
 
 class DatabaseWriter:
-    """Async database writer for arbitrage data."""
-    
-    def __init__(self, database_url: str):
+    """Write-behind database writer for arbitrage data.
+
+    ``write_*`` calls only append to an in-memory buffer per table (thread
+    safe, never awaiting the database), so the trading loop is never held up
+    by it. A background task flushes every ``flush_interval_s`` or as soon
+    as a table has ``batch_rows`` rows: append-only tables go in with
+    PostgreSQL COPY (multi-row INSERT on other drivers), pools as one
+    multi-row upsert on (chain, dex, address), and TVL updates as one
+    executemany UPDATE. Each buffer holds at most ``max_rows``; what happens
+    beyond that is the table's overflow policy (see TableBuffer). Rows that
+    fail to write are dropped and counted, not retried.
+
+    Every ``maintenance_interval_s`` the same task runs the schema's
+    run_partition_maintenance() (creates upcoming ts partitions, drops
+    expired ones); None or 0 leaves that to pg_cron.
+    """
+
+    def __init__(self, database_url: str, batch_rows: int = 2000, flush_interval_s: float = 1.0,
+                 max_rows: int = 50_000, overflow: Optional[Dict[str, str]] = None,
+                 maintenance_interval_s: Optional[float] = 3600.0):
         self.engine = create_async_engine(database_url)
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
-    
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval_s
+        self.max_rows = max_rows
+        self.overflow = overflow or {}
+        self.buffers: Dict[str, TableBuffer] = {}
+        self.pools: Dict[Tuple[str, str, str], Dict[str, Any]] = {}  # latest row per pool key
+        self.pool_tvl: Dict[Tuple[str, str], float] = {}  # (chain, address) -> latest TVL
+        self.pool_stats = {"written": 0, "dropped": 0, "errors": 0}
+        self.lock = Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wake: Optional[asyncio.Event] = None
+        self.wake_pending = False
+        self.task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.maintenance_interval = maintenance_interval_s
+        self.last_maintenance = 0.0
+        self.partitions = {"created": 0, "dropped": 0}
+
     async def create_tables(self):
-        """Create all database tables."""
+        """Create all database tables (sql/schema.sql also sets up partitions, retention and rollups)."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
-    
-    async def write_quote(self, quote_data: Dict[str, Any]):
-        """Write a quote record."""
-        async with self.async_session() as session:
-            quote = Quote(**quote_data)
-            session.add(quote)
-            await session.commit()
-    
-    async def write_transaction(self, tx_data: Dict[str, Any]):
-        """Write a transaction record."""
-        async with self.async_session() as session:
-            tx = Transaction(**tx_data)
-            session.add(tx)
-            await session.commit()
-    
-    async def write_pools(self, pools_data: List[Dict[str, Any]]):
-        """Write multiple pool records."""
-        async with self.async_session() as session:
-            pools = [Pool(**pool_data) for pool_data in pools_data]
-            session.add_all(pools)
-            await session.commit()
-    
-    async def update_pool_tvl(self, pool_address: str, chain: str, tvl_usd: float):
-        """Update pool TVL."""
-        async with self.async_session() as session:
-            pool = await session.get(Pool, {"address": pool_address, "chain": chain})
-            if pool:
-                pool.tvl_usd = tvl_usd
-                await session.commit()
-    
+            # Without a partition nothing can be inserted into a partitioned table
+            for table in Base.metadata.sorted_tables:
+                if table.dialect_options["postgresql"].get("partition_by"):
+                    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table.name}_default "
+                                            f"PARTITION OF {table.name} DEFAULT"))
+
+    def start(self):
+        """Start the background flusher on the running event loop."""
+        if self.task is None:
+            self.loop = asyncio.get_running_loop()
+            self.wake = asyncio.Event()
+            self.task = self.loop.create_task(self._run())
+
+    def write(self, table: str, row: Dict[str, Any]) -> bool:
+        """Queue one row for ``table``; False if the overflow policy discarded it."""
+        if "ts" in Base.metadata.tables[table].c and row.get("ts") is None:
+            row = {**row, "ts": datetime.now(timezone.utc)}  # event time, not flush time
+        with self.lock:
+            buffer = self.buffers.get(table)
+            if buffer is None:
+                buffer = self.buffers[table] = TableBuffer(self.max_rows, self.overflow.get(table, "drop"))
+            accepted = buffer.add(row)
+            full = len(buffer) >= self.batch_rows
+        if full:
+            self._signal()
+        return accepted
+
+    def write_quote(self, quote_data: Dict[str, Any]) -> bool:
+        """Queue a quote record."""
+        return self.write(Quote.__tablename__, quote_data)
+
+    def write_execution(self, execution_data: Dict[str, Any]) -> bool:
+        """Queue an execution record."""
+        return self.write(Execution.__tablename__, execution_data)
+
+    def write_gas_price(self, gas_data: Dict[str, Any]) -> bool:
+        """Queue a gas price record."""
+        return self.write(GasPrice.__tablename__, gas_data)
+
+    def write_metric(self, chain: str, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue a metric sample."""
+        return self.write(Metric.__tablename__, {"chain": chain, "metric_name": name, "metric_value": value,
+                                                  "labels": labels})
+
+    def write_pools(self, pools_data: List[Dict[str, Any]]) -> int:
+        """Queue pool records for upsert (the latest row per pool wins); returns how many were kept."""
+        kept = 0
+        with self.lock:
+            for pool_data in pools_data:
+                key = tuple(pool_data[column] for column in POOL_KEY)
+                if key in self.pools or len(self.pools) < self.max_rows:
+                    self.pools[key] = pool_data
+                    kept += 1
+                else:
+                    self.pool_stats["dropped"] += 1
+            full = len(self.pools) >= self.batch_rows
+        if full:
+            self._signal()
+        return kept
+
+    def update_pool_tvl(self, pool_address: str, chain: str, tvl_usd: float):
+        """Queue a TVL update of an existing pool (the latest value per pool wins)."""
+        with self.lock:
+            self.pool_tvl[(chain, pool_address)] = tvl_usd
+
+    async def flush(self):
+        """Write everything queued so far."""
+        with self.lock:
+            batches = [(name, buffer, buffer.take()) for name, buffer in self.buffers.items() if len(buffer)]
+            pools, self.pools = list(self.pools.values()), {}
+            tvl, self.pool_tvl = self.pool_tvl, {}
+            self.wake_pending = False
+        if not batches and not pools and not tvl:
+            return
+        start = time.perf_counter()
+        for name, buffer, rows in batches:
+            try:
+                await self._copy(Base.metadata.tables[name], rows)
+                buffer.written += len(rows)
+            except Exception as e:
+                buffer.errors += len(rows)
+                print(f"Writing {len(rows)} rows to {name} failed: {e}")
+        if pools:
+            try:
+                await self._upsert_pools(pools)
+                self.pool_stats["written"] += len(pools)
+            except Exception as e:
+                self.pool_stats["errors"] += len(pools)
+                print(f"Upserting {len(pools)} pools failed: {e}")
+        if tvl:
+            try:
+                await self._update_tvl(tvl)
+            except Exception as e:
+                print(f"Updating TVL of {len(tvl)} pools failed: {e}")
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            tables = {name: buffer.stats() for name, buffer in self.buffers.items()}
+            tables[Pool.__tablename__] = {"queued": len(self.pools), **self.pool_stats}
+        return {"flushes": self.flushes, "last_flush_ms": round(self.last_flush_ms, 1), "tables": tables,
+                "partitions": dict(self.partitions)}
+
+    async def maintain_partitions(self):
+        """Run the schema's partition maintenance once and log what changed."""
+        self.last_maintenance = time.monotonic()
+        async with self.engine.begin() as conn:
+            result = await conn.execute(text("SELECT partition_name, action FROM run_partition_maintenance()"))
+            for partition, action in result:
+                self.partitions[action] = self.partitions.get(action, 0) + 1
+                print(f"Partition {partition} {action}")
+
     async def close(self):
-        """Close database connection."""
+        """Flush what is queued, then close database connection."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
         await self.engine.dispose()
+
+    def _signal(self):
+        """Wake the flusher early (callable from any thread)."""
+        if self.loop is None or self.wake_pending:
+            return
+        self.wake_pending = True
+        self.loop.call_soon_threadsafe(self.wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Database flush failed: {e}")
+            if self.maintenance_interval and time.monotonic() - self.last_maintenance >= self.maintenance_interval:
+                try:
+                    await self.maintain_partitions()
+                except Exception as e:
+                    # e.g. a database created by create_tables only, without sql/schema.sql
+                    print(f"Partition maintenance failed, not retrying: {e}")
+                    self.maintenance_interval = None
+
+    async def _copy(self, table: Table, rows: List[Dict[str, Any]]):
+        """Append rows with COPY when the driver is asyncpg, else one multi-row INSERT per column set."""
+        by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_columns.setdefault(tuple(name for name in table.c.keys() if name in row), []).append(row)
+        async with self.engine.connect() as conn:
+            driver = getattr(await conn.get_raw_connection(), "driver_connection", None)
+            for columns, group in by_columns.items():
+                if hasattr(driver, "copy_records_to_table"):
+                    records = [tuple(_copy_value(table.c[name], row[name]) for name in columns) for row in group]
+                    await driver.copy_records_to_table(table.name, records=records, columns=list(columns))
+                else:
+                    for chunk in _chunks(group, len(columns)):
+                        await conn.execute(insert(table).values(chunk))
+                    await conn.commit()
+
+    async def _upsert_pools(self, pools: List[Dict[str, Any]]):
+        table = Pool.__table__
+        async with self.engine.begin() as conn:
+            for chunk in _chunks(pools, len(table.c)):
+                stmt = pg_insert(table).values(chunk)
+                updated = {name: stmt.excluded[name] for name in chunk[0] if name not in POOL_KEY}
+                updated["updated_at"] = func.now()
+                await conn.execute(stmt.on_conflict_do_update(index_elements=list(POOL_KEY), set_=updated)
+                                   if updated else stmt.on_conflict_do_nothing(index_elements=list(POOL_KEY)))
+
+    async def _update_tvl(self, tvl: Dict[Tuple[str, str], float]):
+        table = Pool.__table__
+        stmt = update(table).where(
+            table.c.chain == bindparam("b_chain"), table.c.address == bindparam("b_address")
+        ).values(tvl_usd=bindparam("b_tvl"), updated_at=func.now())
+        async with self.engine.begin() as conn:
+            await conn.execute(stmt, [{"b_chain": chain, "b_address": address_bytes(address), "b_tvl": tvl_usd}
+                                      for (chain, address), tvl_usd in tvl.items()])
+
+def _chunks(rows: List[Dict[str, Any]], columns: int) -> List[List[Dict[str, Any]]]:
+    """Split rows so each multi-row statement stays under the bind parameter limit."""
+    size = max(1, MAX_BIND_PARAMS // max(1, columns))
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+def _copy_value(column, value):
+    """A Python value as asyncpg's binary COPY expects it for ``column``."""
+    if value is None:
+        return None
+    if isinstance(column.type, JSON):
+        return json.dumps(value)
+    if isinstance(column.type, Float):
+        return float(value)
+    if isinstance(column.type, Numeric):
+        return value if isinstance(value, Decimal) else Decimal(str(value))
+    if isinstance(column.type, LargeBinary) and isinstance(value, str):
+        return address_bytes(value)
+    return value
+
+def address_bytes(value: str) -> bytes:
+    """A 0x-hex address or hash as the BYTEA the schema stores."""
+    return bytes.fromhex(value[2:] if value[:2] in ("0x", "0X") else value)
+
+def route_hash(route: List[Dict[str, Any]]) -> bytes:
+    """Stable id of a route: keccak of its legs' dex:pool, in order."""
+    return keccak(text="|".join(f"{leg['dex']}:{leg['pool'].lower()}" for leg in route))
+
+def quote_row(chain: str, opportunity: Dict[str, Any]) -> Dict[str, Any]:
+    """A quotes row for a scored opportunity (see main.profitable_entries)."""
+    gas_usd = opportunity["gas_cost_usd"]
+    return {
+        "chain": chain,
+        "route_hash": route_hash(opportunity["route"]),
+        "amount_in_usd": opportunity["amount_in_usd"],
+        "amount_out_usd": opportunity["amount_out_usd"],
+        "gas_estimate_usd": gas_usd,
+        # profit = out - in - gas - flash fee
+        "flash_fee_usd": opportunity["amount_out_usd"] - opportunity["amount_in_usd"] - gas_usd
+                         - opportunity["profit_usd"],
+        "profit_usd": opportunity["profit_usd"],
+        "legs": [{"dex": leg["dex"], "pool": leg["pool"], "token_in": leg["token_in"],
+                  "token_out": leg["token_out"]} for leg in opportunity["route"]],
+    }
+
+def execution_row(chain: str, tx_hash: Optional[str], status: str,
+                  gas_used: Optional[int] = None, gas_price: Optional[int] = None,
+                  profit_usd: Optional[float] = None, reason: Optional[str] = None,
+                  private_sent: Optional[bool] = None) -> Dict[str, Any]:
+    """An executions row; ``gas_price`` in wei. status is success, reverted or missed."""
+    return {
+        "chain": chain,
+        "tx_hash": address_bytes(tx_hash) if tx_hash else None,
+        "private_sent": private_sent,
+        "status": status,
+        "gas_used": gas_used,
+        "gas_price_gwei": gas_price / 1e9 if gas_price is not None else None,
+        "profit_usd": profit_usd,
+        "reason": reason,
+    }
+
+def gas_price_row(chain: str, base_fee: int, tip: int) -> Dict[str, Any]:
+    """A gas_prices row from a head's next base fee and priority fee (wei)."""
+    return {"chain": chain, "base_fee_gwei": base_fee / 1e9, "priority_fee_gwei": tip / 1e9,
+            "gas_price_gwei": (base_fee + tip) / 1e9}
+
+def pool_rows(chain: str, chain_pools: Dict[str, List[Dict]]) -> List[Dict[str, Any]]:
+    """pools rows for discovered pools (Curve pools list their first two coins)."""
+    rows = []
+    for pool in chain_pools.get("uni_v3", []):
+        rows.append({"chain": chain, "dex": "uni_v3", "address": address_bytes(pool["id"]),
+                     "token0": address_bytes(pool["token0"]["id"]), "token1": address_bytes(pool["token1"]["id"]),
+                     "tvl_usd": float(pool["totalValueLockedUSD"]),
+                     "fee_bps": int(pool["feeTier"]) // 100})  # feeTier is in 1/100 bps
+    for pool in chain_pools.get("curve", []):
+        coins = pool.get("coins") or []
+        if len(coins) >= 2:
+            rows.append({"chain": chain, "dex": "curve", "address": address_bytes(pool["id"]),
+                         "token0": address_bytes(coins[0]["address"]), "token1": address_bytes(coins[1]["address"]),
+                         "tvl_usd": float(pool["totalValueLockedUSD"]), "fee_bps": None})
+    return rows
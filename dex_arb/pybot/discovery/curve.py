@@ -1,27 +1,29 @@
-import requests
 from typing import List, Dict
+from pybot.discovery.subgraph import paginate
 
-def top_pools(subgraph_url: str, min_tvl_usd: float = 100_000) -> List[Dict]:
-    """Fetch top Curve pools by TVL from subgraph."""
-    query = """
-    { 
-        pools(first: 200, orderBy: totalValueLockedUSD, orderDirection: desc) {
-            id 
-            totalValueLockedUSD 
-            coins { 
-                address 
-                symbol 
-                decimals 
-                index 
-            }
-        }
-    }"""
+POOL_FIELDS = """
+    id
+    totalValueLockedUSD
+    coins {
+        address
+        symbol
+        decimals
+        index
+    }
+"""
+
+def top_pools(subgraph_url: str, min_tvl_usd: float = 100_000,
+              page_size: int = 1000, shards: int = 16) -> List[Dict]:
+    """Fetch all Curve pools above ``min_tvl_usd``, highest TVL first.
+
+    Pages through the subgraph in parallel (see subgraph.paginate).
+    """
+    where = {"totalValueLockedUSD_gte": str(min_tvl_usd)}
     
     try:
-        response = requests.post(subgraph_url, json={"query": query}, timeout=20)
-        response.raise_for_status()
-        pools = response.json()["data"]["pools"]
-        return [p for p in pools if float(p["totalValueLockedUSD"]) >= min_tvl_usd]
+        pools = paginate(subgraph_url, "pools", POOL_FIELDS, where, page_size, shards)
+        pools = [p for p in pools if float(p["totalValueLockedUSD"]) >= min_tvl_usd]
+        return sorted(pools, key=lambda p: float(p["totalValueLockedUSD"]), reverse=True)
     except Exception as e:
         print(f"Error fetching Curve pools: {e}")
         return []
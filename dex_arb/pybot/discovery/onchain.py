@@ -0,0 +1,312 @@
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+from typing import Dict, List, Tuple
+from web3 import Web3
+from pybot.discovery.snapshot import PoolSnapshot
+from pybot.quotes.multicall import aggregate3, decode_uint
+from pybot.utils.token_service import fetch_tokens, pool_price_edges, propagate_prices, stablecoin_prices
+
+# Subgraph-free discovery: Uni v3 pools from factory PoolCreated logs, Curve pools
+# by enumerating the registries behind the Curve address provider. Pools come out
+# in the same dict shape as discovery.*.top_pools, with TVL estimated on-chain.
+
+POOL_CREATED_TOPIC = "0x" + keccak(text="PoolCreated(address,address,uint24,int24,address)").hex()
+
+def _sel(signature: str) -> bytes:
+    return function_signature_to_4byte_selector(signature)
+
+SLOT0 = _sel("slot0()")
+LIQUIDITY = _sel("liquidity()")
+BALANCE_OF = _sel("balanceOf(address)")
+
+# Curve address provider / registry / factory interface
+MAX_ID = _sel("max_id()")
+GET_ADDRESS = _sel("get_address(uint256)")
+POOL_COUNT = _sel("pool_count()")
+POOL_LIST = _sel("pool_list(uint256)")
+GET_COINS = _sel("get_coins(address)")
+GET_DECIMALS = _sel("get_decimals(address)")
+GET_BALANCES = _sel("get_balances(address)")
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+# Number of scans that retry a pool whose tokens or coins could not be read
+# before giving up on it (a transient RPC error must not lose it behind the checkpoint)
+UNRESOLVED_RETRIES = 5
+
+def load_dex_config(path: str) -> Dict:
+    """Load a config/dex.<chain>.yaml file."""
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+def get_logs_chunked(w3: Web3, address: str, topics: List, from_block: int, to_block: int,
+                     chunk_blocks: int = 50_000, workers: int = 8) -> List[Dict]:
+    """eth_getLogs over a block range, split into chunks fetched in parallel.
+
+    A chunk the node rejects (result or range limits) is split in half and
+    retried, so ``chunk_blocks`` can be set optimistically. Logs come back
+    in block order.
+    """
+    if to_block < from_block:
+        return []
+
+    def fetch(bounds: Tuple[int, int]) -> List[Dict]:
+        lo, hi = bounds
+        try:
+            return list(w3.eth.get_logs({
+                "address": to_checksum_address(address),
+                "topics": topics,
+                "fromBlock": lo,
+                "toBlock": hi,
+            }))
+        except Exception:
+            if lo == hi:
+                raise
+            mid = (lo + hi) // 2
+            return fetch((lo, mid)) + fetch((mid + 1, hi))
+
+    ranges = [(start, min(start + chunk_blocks - 1, to_block))
+              for start in range(from_block, to_block + 1, chunk_blocks)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [log for logs in pool.map(fetch, ranges) for log in logs]
+
+def _address_word(data: bytes) -> str:
+    return "0x" + bytes(data)[12:32].hex()
+
+def _words(data: bytes) -> List[int]:
+    return [int.from_bytes(data[n:n + 32], "big") for n in range(0, len(data) - len(data) % 32, 32)]
+
+def token_prices_usd(chain: str, uni_pools: List[Dict], passes: int = 3) -> Dict[str, float]:
+    """USD prices propagated from the chain's stablecoins through Uni v3 spot prices.
+
+    Each pass prices tokens paired with an already priced token, using the
+    pool with the most in-range liquidity (virtual reserves) on the priced side.
+    """
+    return propagate_prices(pool_price_edges(uni_pools), stablecoin_prices(chain), passes)
+
+def _value_usd(balances: List[int], tokens: List[Dict], prices: Dict[str, float]) -> float:
+    return sum(balance / 10 ** int(token["decimals"]) * prices[token["id"]]
+               for balance, token in zip(balances, tokens) if token["id"] in prices)
+
+def scan_uni_v3(w3: Web3, chain: str, factory: str, snapshot: PoolSnapshot, to_block: int,
+                start_block: int = 0, full_refresh: bool = False, chunk_blocks: int = 50_000,
+                workers: int = 8) -> int:
+    """Add pools created since the checkpoint to ``snapshot`` and refresh their state.
+
+    Only new pools are read unless ``full_refresh``, in which case slot0,
+    liquidity and TVL of every known pool are refreshed. Pools whose tokens
+    cannot be read are kept in ``meta["unresolved"]`` and retried by the next
+    UNRESOLVED_RETRIES scans, so the checkpoint can still advance. Returns the
+    number of new pools.
+    """
+    from_block = snapshot.meta.get("last_block", start_block - 1) + 1
+    logs = get_logs_chunked(w3, factory, [POOL_CREATED_TOPIC], from_block, to_block,
+                            chunk_blocks, workers)
+
+    # [address, token0, token1, fee, failed scans] of pools created before the checkpoint
+    retry = snapshot.meta.get("unresolved", [])
+    attempts = {entry[0]: entry[4] for entry in retry}
+    created = [tuple(entry[:4]) for entry in retry]
+    for log in logs:
+        topics = log["topics"]
+        _, pool = decode(["int24", "address"], bytes(log["data"]))
+        created.append((pool.lower(), _address_word(topics[1]), _address_word(topics[2]),
+                        int.from_bytes(bytes(topics[3]), "big")))
+
+    known_tokens = {}
+    for pool in snapshot.pools.values():
+        known_tokens[pool["token0"]["id"]] = pool["token0"]
+        known_tokens[pool["token1"]["id"]] = pool["token1"]
+    new_tokens = sorted({t for _, t0, t1, _ in created for t in (t0, t1)} - set(known_tokens))
+    known_tokens.update(fetch_tokens(w3, new_tokens, to_block))
+
+    new_pools, unresolved, seen = [], [], set()
+    for address, token0, token1, fee in created:
+        if address in snapshot.pools or address in seen:
+            continue
+        seen.add(address)
+        if token0 in known_tokens and token1 in known_tokens:
+            new_pools.append({
+                "id": address, "feeTier": str(fee), "liquidity": "0", "sqrtPrice": "0", "tick": "0",
+                "totalValueLockedUSD": "0", "createdAtTimestamp": None,
+                "token0": known_tokens[token0], "token1": known_tokens[token1],
+            })
+        elif attempts.get(address, 0) + 1 < UNRESOLVED_RETRIES:
+            unresolved.append([address, token0, token1, fee, attempts.get(address, 0) + 1])
+        else:
+            print(f"Giving up on Uni v3 pool {address}: tokens unreadable")
+
+    refresh = list(snapshot.pools.values()) + new_pools if full_refresh else new_pools
+    calls = []
+    for pool in refresh:
+        calls.append((pool["id"], SLOT0))
+        calls.append((pool["id"], LIQUIDITY))
+        for token in (pool["token0"], pool["token1"]):
+            calls.append((token["id"], BALANCE_OF + encode(["address"], [to_checksum_address(pool["id"])])))
+    results = aggregate3(w3, calls, to_block, batch_size=500)
+
+    balances = {}
+    for n, pool in enumerate(refresh):
+        slot0, liquidity, balance0, balance1 = results[4 * n:4 * n + 4]
+        if slot0[0] and len(slot0[1]) >= 64:
+            sqrt_price, tick = decode(["uint160", "int24"], slot0[1][:64])
+            pool["sqrtPrice"], pool["tick"] = str(sqrt_price), str(tick)
+        pool["liquidity"] = str(decode_uint(liquidity)[1])
+        balances[pool["id"]] = [decode_uint(balance0)[1], decode_uint(balance1)[1]]
+
+    snapshot.merge(new_pools)
+    prices = token_prices_usd(chain, list(snapshot.pools.values()))
+    for pool in refresh:
+        tvl = _value_usd(balances[pool["id"]], [pool["token0"], pool["token1"]], prices)
+        pool["totalValueLockedUSD"] = str(tvl)
+
+    snapshot.meta["last_block"] = to_block
+    snapshot.meta["unresolved"] = unresolved
+    return len(new_pools)
+
+def curve_registries(w3: Web3, registry: str, block_identifier) -> List[str]:
+    """Pool-listing contracts behind a Curve address provider (or the registry itself)."""
+    ok, max_id = decode_uint(aggregate3(w3, [(registry, MAX_ID)], block_identifier)[0])
+    candidates = [registry]
+    if ok:
+        results = aggregate3(w3, [(registry, GET_ADDRESS + encode(["uint256"], [n]))
+                                  for n in range(max_id + 1)], block_identifier)
+        candidates = [_address_word(data) for ok, data in results if ok and len(data) >= 32]
+        candidates = [c for c in candidates if c != ZERO_ADDRESS]
+    counts = aggregate3(w3, [(c, POOL_COUNT) for c in candidates], block_identifier)
+    return [c for c, result in zip(candidates, counts) if decode_uint(result)[0]]
+
+def scan_curve(w3: Web3, chain: str, registry: str, snapshot: PoolSnapshot, to_block: int,
+               prices: Dict[str, float], full_refresh: bool = False) -> int:
+    """Add pools listed since the checkpoint to ``snapshot`` and refresh their TVL.
+
+    Curve registries and factories do not emit a uniform creation event, so
+    pools are enumerated with pool_count()/pool_list(i); the checkpoint is the
+    pool count already read from each registry, up to the first pool_list(i)
+    that failed. Pools whose coins cannot be read are kept in
+    ``meta["unresolved"]`` and retried by the next UNRESOLVED_RETRIES scans.
+    Returns the number of new pools.
+    """
+    registries = curve_registries(w3, registry, to_block)
+    checkpoints = snapshot.meta.setdefault("pool_counts", {})
+    counts = aggregate3(w3, [(r, POOL_COUNT) for r in registries], to_block)
+
+    calls, listed_at = [], []
+    for source, result in zip(registries, counts):
+        _, count = decode_uint(result)
+        for n in range(checkpoints.get(source, 0), count):
+            calls.append((source, POOL_LIST + encode(["uint256"], [n])))
+            listed_at.append((source, n))
+        checkpoints[source] = count
+    # address -> [registry, failed scans] of pools listed before the checkpoint
+    retry = snapshot.meta.get("unresolved", {})
+    listed = {address: source for address, (source, _) in retry.items() if address not in snapshot.pools}
+    for (source, n), (ok, data) in zip(listed_at, aggregate3(w3, calls, to_block, batch_size=500)):
+        if ok and len(data) >= 32:
+            address = _address_word(data)
+            if address not in snapshot.pools:
+                listed.setdefault(address, source)
+        else:
+            # Re-list from the first index that failed
+            checkpoints[source] = min(checkpoints[source], n)
+
+    calls = []
+    for address, source in listed.items():
+        calls.append((source, GET_COINS + encode(["address"], [to_checksum_address(address)])))
+        calls.append((source, GET_DECIMALS + encode(["address"], [to_checksum_address(address)])))
+    results = aggregate3(w3, calls, to_block, batch_size=500)
+
+    coin_lists, failed = {}, []
+    for n, address in enumerate(listed):
+        (ok_coins, coins), (ok_decimals, decimals) = results[2 * n], results[2 * n + 1]
+        if not ok_coins:
+            failed.append(address)
+            continue
+        coin_addresses = ["0x" + format(word, "040x") for word in _words(coins)]
+        coin_addresses = [c for c in coin_addresses if c != ZERO_ADDRESS]
+        coin_decimals = _words(decimals) if ok_decimals else []
+        if len(coin_addresses) >= 2:
+            coin_lists[address] = (coin_addresses, coin_decimals)
+
+    registry_of = snapshot.meta.setdefault("registry_of", {})
+    symbols = fetch_tokens(w3, sorted({c for coins, _ in coin_lists.values() for c in coins}), to_block)
+    new_pools = []
+    for address, (coin_addresses, coin_decimals) in coin_lists.items():
+        coins = []
+        for index, coin in enumerate(coin_addresses):
+            token = symbols.get(coin)
+            decimals = coin_decimals[index] if index < len(coin_decimals) and coin_decimals[index] else None
+            if token is None and decimals is None:
+                failed.append(address)
+                break
+            coins.append({"address": coin, "symbol": token["symbol"] if token else "",
+                          "decimals": str(decimals if decimals is not None else token["decimals"]),
+                          "index": str(index)})
+        else:
+            new_pools.append({"id": address, "totalValueLockedUSD": "0", "coins": coins})
+            registry_of[address] = listed[address]
+    snapshot.merge(new_pools)
+    unresolved = {}
+    for address in failed:
+        tries = retry.get(address, [None, 0])[1] + 1
+        if tries < UNRESOLVED_RETRIES:
+            unresolved[address] = [listed[address], tries]
+        else:
+            print(f"Giving up on Curve pool {address}: coins unreadable")
+    snapshot.meta["unresolved"] = unresolved
+
+    refresh = list(snapshot.pools.values()) if full_refresh else new_pools
+    calls = [(registry_of.get(p["id"], registry), GET_BALANCES + encode(["address"], [to_checksum_address(p["id"])]))
+             for p in refresh]
+    for pool, (ok, data) in zip(refresh, aggregate3(w3, calls, to_block, batch_size=500)):
+        if ok:
+            balances = _words(data)[:len(pool["coins"])]
+            tokens = [{"id": c["address"], "decimals": c["decimals"]} for c in pool["coins"]]
+            pool["totalValueLockedUSD"] = str(_value_usd(balances, tokens, prices))
+
+    return len(new_pools)
+
+def onchain_top_pools(w3: Web3, chain: str, dex_cfg: Dict, uni_path: str, curve_path: str,
+                      min_tvl_usd: float, full_refresh: bool = False, confirmations: int = 12,
+                      chunk_blocks: int = 50_000, workers: int = 8) -> Dict[str, List[Dict]]:
+    """Discover Uni v3 and Curve pools on-chain; returns {"uni_v3": [...], "curve": [...]}.
+
+    Both lists have the shape of the corresponding top_pools and are filtered
+    by ``min_tvl_usd``. Checkpoints live in the snapshots at ``uni_path`` and
+    ``curve_path``; scanning stops ``confirmations`` blocks behind the head so
+    a checkpoint never covers a block that can still be reorged out.
+    """
+    to_block = w3.eth.block_number - confirmations
+    dexes = dex_cfg.get("dexes", {})
+    result = {"uni_v3": [], "curve": []}
+
+    uni_snapshot = PoolSnapshot(uni_path, "uni_v3")
+    uni_snapshot.load()
+    uni_cfg = dexes.get("uniswap_v3")
+    if uni_cfg and uni_cfg.get("factory"):
+        try:
+            new = scan_uni_v3(w3, chain, uni_cfg["factory"], uni_snapshot, to_block,
+                              uni_cfg.get("deploy_block", 0), full_refresh, chunk_blocks, workers)
+            uni_snapshot.save()
+            print(f"On-chain Uni v3 scan on {chain}: {new} new pools, "
+                  f"{len(uni_snapshot.pools)} known, checkpoint {to_block}")
+        except Exception as e:
+            print(f"Error scanning Uni v3 factory on {chain}: {e}")
+    result["uni_v3"] = uni_snapshot.top_pools(min_tvl_usd)
+
+    curve_cfg = dexes.get("curve")
+    if curve_cfg and curve_cfg.get("registry"):
+        curve_snapshot = PoolSnapshot(curve_path, "curve")
+        curve_snapshot.load()
+        try:
+            prices = token_prices_usd(chain, list(uni_snapshot.pools.values()))
+            new = scan_curve(w3, chain, curve_cfg["registry"], curve_snapshot, to_block, prices, full_refresh)
+            curve_snapshot.save()
+            print(f"On-chain Curve scan on {chain}: {new} new pools, {len(curve_snapshot.pools)} known")
+        except Exception as e:
+            print(f"Error scanning Curve registry on {chain}: {e}")
+        result["curve"] = curve_snapshot.top_pools(min_tvl_usd)
+
+    return result
@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import time
+from typing import Dict, List
+from pybot.discovery import uni_v3, curve
+
+SNAPSHOT_VERSION = 1
+
+def snapshot_path(directory: str, chain: str, dex: str, backend: str = "subgraph") -> str:
+    suffix = "" if backend == "subgraph" else f"_{backend}"
+    return os.path.join(directory, f"{chain}_{dex}{suffix}.json.gz")
+
+class PoolSnapshot:
+    """Subgraph pools of one (chain, dex), persisted on disk between runs.
+
+    Tokens (address, symbol, decimals) are stored once in a table and pools
+    refer to them by index, so a snapshot of a few thousand pools is a few
+    hundred KB and loads in milliseconds. ``pools`` are always in the same
+    dict shape top_pools returns. ``meta`` holds backend-specific checkpoints
+    (e.g. the last block scanned for on-chain discovery).
+    """
+
+    def __init__(self, path: str, dex: str):
+        self.path = path
+        self.dex = dex
+        self.pools: Dict[str, Dict] = {}
+        self.meta: Dict = {}
+        self.saved_at = 0
+
+    def load(self) -> bool:
+        """Load the snapshot from disk; False if it is missing or unreadable."""
+        try:
+            with gzip.open(self.path, "rt") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != SNAPSHOT_VERSION or data.get("dex") != self.dex:
+            return False
+        tokens = data["tokens"]
+        decode = self._decode_uni if self.dex == "uni_v3" else self._decode_curve
+        self.pools = {row[0]: decode(row, tokens) for row in data["pools"]}
+        self.meta = data.get("meta", {})
+        self.saved_at = data["saved_at"]
+        return True
+
+    def save(self):
+        """Write the snapshot atomically (readers never see a half-written file)."""
+        tokens: List[List] = []
+        token_index: Dict[str, int] = {}
+
+        def token_ref(address: str, symbol: str, decimals) -> int:
+            if address not in token_index:
+                token_index[address] = len(tokens)
+                tokens.append([address, symbol, int(decimals)])
+            return token_index[address]
+
+        encode = self._encode_uni if self.dex == "uni_v3" else self._encode_curve
+        rows = [encode(pool, token_ref) for pool in self.pools.values()]
+        self.saved_at = int(time.time())
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "dex": self.dex, "saved_at": self.saved_at,
+                       "meta": self.meta, "tokens": tokens, "pools": rows}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def replace(self, pools: List[Dict]):
+        self.pools = {p["id"]: p for p in pools}
+
+    def merge(self, pools: List[Dict]):
+        for pool in pools:
+            self.pools[pool["id"]] = pool
+
+    def latest_created(self) -> int:
+        return max((int(p.get("createdAtTimestamp") or 0) for p in self.pools.values()), default=0)
+
+    def top_pools(self, min_tvl_usd: float) -> List[Dict]:
+        pools = [p for p in self.pools.values() if float(p["totalValueLockedUSD"]) >= min_tvl_usd]
+        return sorted(pools, key=lambda p: float(p["totalValueLockedUSD"]), reverse=True)
+
+    @staticmethod
+    def _encode_uni(pool: Dict, token_ref) -> List:
+        t0, t1 = pool["token0"], pool["token1"]
+        return [pool["id"], int(pool["feeTier"]), pool["totalValueLockedUSD"], pool.get("liquidity"),
+                pool.get("sqrtPrice"), pool.get("tick"), pool.get("createdAtTimestamp"),
+                token_ref(t0["id"], t0["symbol"], t0["decimals"]),
+                token_ref(t1["id"], t1["symbol"], t1["decimals"])]
+
+    @staticmethod
+    def _decode_uni(row: List, tokens: List[List]) -> Dict:
+        pool_id, fee, tvl, liquidity, sqrt_price, tick, created, t0, t1 = row
+        return {
+            "id": pool_id, "feeTier": str(fee), "totalValueLockedUSD": tvl, "liquidity": liquidity,
+            "sqrtPrice": sqrt_price, "tick": tick, "createdAtTimestamp": created,
+            "token0": {"id": tokens[t0][0], "symbol": tokens[t0][1], "decimals": str(tokens[t0][2])},
+            "token1": {"id": tokens[t1][0], "symbol": tokens[t1][1], "decimals": str(tokens[t1][2])},
+        }
+
+    @staticmethod
+    def _encode_curve(pool: Dict, token_ref) -> List:
+        coins = [[token_ref(c["address"], c["symbol"], c["decimals"]), int(c["index"])]
+                 for c in pool["coins"]]
+        return [pool["id"], pool["totalValueLockedUSD"], coins]
+
+    @staticmethod
+    def _decode_curve(row: List, tokens: List[List]) -> Dict:
+        pool_id, tvl, coins = row
+        return {
+            "id": pool_id, "totalValueLockedUSD": tvl,
+            "coins": [{"address": tokens[t][0], "symbol": tokens[t][1],
+                       "decimals": str(tokens[t][2]), "index": str(index)} for t, index in coins],
+        }
+
+def cached_top_pools(dex: str, subgraph_url: str, min_tvl_usd: float, path: str,
+                     full_refresh: bool = False, page_size: int = 1000, shards: int = 16) -> List[Dict]:
+    """top_pools backed by an on-disk snapshot.
+
+    Without ``full_refresh`` a saved snapshot is returned right away. For Uni
+    v3, pools created since the newest one in the snapshot are fetched first
+    and merged in. Curve pools have no creation time in the subgraph, so they
+    only change on a full refresh. A full refresh (or a missing snapshot)
+    pages through the whole subgraph and rewrites the snapshot. A failed or
+    empty fetch never overwrites the snapshot.
+    """
+    snapshot = PoolSnapshot(path, dex)
+    if not full_refresh and snapshot.load():
+        if dex == "uni_v3":
+            delta = uni_v3.top_pools(subgraph_url, min_tvl_usd, created_after=snapshot.latest_created(),
+                                     page_size=page_size, shards=shards)
+            if delta:
+                snapshot.merge(delta)
+                snapshot.save()
+        return snapshot.top_pools(min_tvl_usd)
+
+    if dex == "uni_v3":
+        pools = uni_v3.top_pools(subgraph_url, min_tvl_usd, page_size=page_size, shards=shards)
+    else:
+        pools = curve.top_pools(subgraph_url, min_tvl_usd, page_size=page_size, shards=shards)
+    if pools:
+        snapshot.replace(pools)
+        snapshot.save()
+        return pools
+    # Subgraph down: an old snapshot still beats no pools at all
+    return snapshot.top_pools(min_tvl_usd) if snapshot.load() else []
@@ -0,0 +1,51 @@
+import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+def run_query(subgraph_url: str, query: str, timeout: int = 20) -> Dict:
+    """POST a GraphQL query and return its data, raising on HTTP or GraphQL errors."""
+    response = requests.post(subgraph_url, json={"query": query}, timeout=timeout)
+    response.raise_for_status()
+    body = response.json()
+    if body.get("errors"):
+        raise RuntimeError(f"Subgraph error: {body['errors']}")
+    return body["data"]
+
+def format_where(where: Dict[str, Any]) -> str:
+    """Render a filter dict as a GraphQL input object literal."""
+    return "{" + ", ".join(f"{key}: {json.dumps(value)}" for key, value in where.items()) + "}"
+
+def id_shards(shards: int) -> List[tuple]:
+    """Split the hex id space into (lower, upper) prefix bounds; upper is None for the last."""
+    width = max(1, ((shards - 1).bit_length() + 3) // 4)  # hex digits needed for ``shards`` prefixes
+    bounds = [f"0x{(n * 16 ** width) // shards:0{width}x}" for n in range(shards)]
+    return [(bounds[n], bounds[n + 1] if n + 1 < shards else None) for n in range(shards)]
+
+def paginate(subgraph_url: str, entity: str, fields: str, where: Optional[Dict[str, Any]] = None,
+             page_size: int = 1000, shards: int = 16, timeout: int = 20) -> List[Dict]:
+    """Fetch every ``entity`` matching ``where``, paging by id and sharding the id space.
+
+    Each shard walks its slice of ids with an ``id_gt`` cursor (skip-free, so
+    deep pages cost the same as the first), and shards are fetched in
+    parallel. Any failed page raises, so callers never see a partial result.
+    """
+    def fetch_shard(bounds) -> List[Dict]:
+        lower, upper = bounds
+        rows: List[Dict] = []
+        cursor = lower
+        while True:
+            shard_where = dict(where or {}, id_gt=cursor)
+            if upper is not None:
+                shard_where["id_lt"] = upper
+            query = (f"{{ {entity}(first: {page_size}, orderBy: id, orderDirection: asc, "
+                     f"where: {format_where(shard_where)}) {{ {fields} }} }}")
+            page = run_query(subgraph_url, query, timeout)[entity]
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            cursor = page[-1]["id"]
+
+    ranges = id_shards(shards)
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        return [row for rows in pool.map(fetch_shard, ranges) for row in rows]
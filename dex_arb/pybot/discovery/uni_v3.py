@@ -1,33 +1,42 @@
-import requests
 from typing import List, Dict
+from pybot.discovery.subgraph import paginate
 
-def top_pools(subgraph_url: str, min_tvl_usd: float = 100_000) -> List[Dict]:
-    """Fetch top Uniswap v3 pools by TVL from subgraph."""
-    query = """
-    { 
-        pools(first: 200, orderBy: totalValueLockedUSD, orderDirection: desc) {
-            id 
-            feeTier 
-            liquidity 
-            totalValueLockedUSD
-            token0 { 
-                id 
-                symbol 
-                decimals 
-            } 
-            token1 { 
-                id 
-                symbol 
-                decimals 
-            }
-        }
-    }"""
+POOL_FIELDS = """
+    id
+    feeTier
+    liquidity
+    sqrtPrice
+    tick
+    totalValueLockedUSD
+    createdAtTimestamp
+    token0 {
+        id
+        symbol
+        decimals
+    }
+    token1 {
+        id
+        symbol
+        decimals
+    }
+"""
+
+def top_pools(subgraph_url: str, min_tvl_usd: float = 100_000, created_after: int = 0,
+              page_size: int = 1000, shards: int = 16) -> List[Dict]:
+    """Fetch all Uniswap v3 pools above ``min_tvl_usd``, highest TVL first.
+
+    Pages through the subgraph in parallel (see subgraph.paginate).
+    ``created_after`` (unix seconds) limits the fetch to pools created after
+    that time, which is how a loaded snapshot catches up.
+    """
+    where = {"totalValueLockedUSD_gte": str(min_tvl_usd)}
+    if created_after:
+        where["createdAtTimestamp_gt"] = str(created_after)
     
     try:
-        response = requests.post(subgraph_url, json={"query": query}, timeout=20)
-        response.raise_for_status()
-        pools = response.json()["data"]["pools"]
-        return [p for p in pools if float(p["totalValueLockedUSD"]) >= min_tvl_usd]
+        pools = paginate(subgraph_url, "pools", POOL_FIELDS, where, page_size, shards)
+        pools = [p for p in pools if float(p["totalValueLockedUSD"]) >= min_tvl_usd]
+        return sorted(pools, key=lambda p: float(p["totalValueLockedUSD"]), reverse=True)
     except Exception as e:
         print(f"Error fetching Uni v3 pools: {e}")
         return []
@@ -0,0 +1,484 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Set
+from pybot.cfg import load_config
+from pybot.chains import make_clients
+from pybot.db.write import DatabaseWriter, execution_row, gas_price_row, pool_rows, quote_row
+from pybot.main import (ARB_EXECUTOR, discover, generate_candidates, load_tokens, make_signer,
+                        make_submitter, prepare_executions, quotable_routes, quote_and_score,
+                        requote_affected, submit_executions)
+from pybot.routing.index import RouteIndex
+from pybot.exec.calldata import CalldataBuilder
+from pybot.exec.fees import FeeOracle
+from pybot.exec.private_tx import (block_builder_async, included_hash, included_hash_async,
+                                   receipt_gas_used, receipt_gas_used_async)
+from pybot.exec.simulate import GasModel, gas_model_path
+from pybot.state.cache import QuoteCache
+from pybot.state.events import LogStream
+from pybot.state.store import PoolStateStore, fetch_pool_logs
+from pybot.utils.token_service import TokenService, token_cache_path
+
+class StageStats:
+    """Latency of one pipeline stage: totals plus a window of recent samples."""
+
+    def __init__(self, window: int = 256):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent.append(elapsed_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 1),
+            "p90_ms": round(self.percentile(90), 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+def put_latest(queue: asyncio.Queue, item) -> int:
+    """Put without blocking, evicting the oldest items if the queue is full.
+
+    Returns the number of items dropped. Stages never wait on a slow consumer;
+    the consumer just sees the freshest work when it catches up.
+    """
+    dropped = 0
+    while True:
+        try:
+            queue.put_nowait(item)
+            return dropped
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            dropped += 1
+
+class ChainPipeline:
+    """Head-driven discover -> quote -> execute pipeline for one chain.
+
+    Stages are connected by bounded queues, so quoting block N overlaps with
+    executing the opportunities of block N-1. Blocking web3 calls run on the
+    pipeline's own thread pool, so a slow RPC on one chain cannot starve the
+    other chains' pipelines.
+
+    With local quoting, each head re-quotes only the candidate routes that
+    touch a pool whose state changed since the last head (see RouteIndex),
+    and the running top opportunities are read off the index.
+
+    With a ``ws`` endpoint for the chain, pool logs are
+    pushed by a single LogStream subscription instead of being polled with
+    eth_getLogs at every head.
+
+    Heads are polled with eth_feeHistory, which also feeds the chain's
+    FeeOracle: quoting prices gas from it, the signer takes its base fee,
+    and execution pauses while a ``kills`` condition holds.
+
+    With a DatabaseWriter, discovered pools, every scored opportunity, each
+    head's fees, every execution outcome and the stage latencies of each
+    report are queued to it; its writes never block a stage.
+    """
+
+    def __init__(self, cfg, chain_name: str, chain_client: Dict, db: Optional[DatabaseWriter] = None):
+        engine_cfg = cfg.strategy.get("engine", {})
+        quotes_cfg = cfg.strategy.get("quotes", {})
+        self.cfg = cfg
+        self.chain_name = chain_name
+        self.client = chain_client
+        self.db = db
+        self.w3 = chain_client["w3"]
+        self.async_w3 = chain_client.get("async_w3")
+        self.poll_interval = engine_cfg.get("poll_interval_ms", 250) / 1000
+        self.max_age_blocks = engine_cfg.get("max_opportunity_age_blocks", 1)
+        self.top_n = engine_cfg.get("top_opportunities", 20)
+        self.rediscover_interval = engine_cfg.get("rediscover_interval_s", 300)
+        self.report_interval = cfg.strategy.get("monitoring", {}).get("metrics_interval", 60)
+
+        # Only the newest head matters; older unquoted heads are superseded
+        self.heads: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.opportunities: asyncio.Queue = asyncio.Queue(maxsize=engine_cfg.get("opportunity_queue", 4))
+        self.executor = ThreadPoolExecutor(
+            max_workers=engine_cfg.get("rpc_workers", 4),
+            thread_name_prefix=f"rpc-{chain_name}"
+        )
+
+        self.quote_cache = QuoteCache(max_entries=quotes_cfg.get("cache_entries", 100_000))
+        # Token metadata (persisted next to the pool snapshots) and per-block USD prices
+        snapshot_dir = cfg.strategy.get("discovery", {}).get("snapshot_dir", "data/snapshots")
+        self.tokens = TokenService(chain_name, token_cache_path(snapshot_dir, chain_name))
+        # Gas per route shape, learned from pre-flight simulation and receipts
+        self.gas_model = GasModel(gas_model_path(snapshot_dir, chain_name))
+        # Fee percentiles and fail rates from heads and executions (kill switches)
+        self.fees = FeeOracle(cfg.strategy.get("kills", {}))
+        # Live pool state, advanced from pool logs at every head (local quoting only)
+        self.store = None
+        self.stream = None
+        if quotes_cfg.get("local_v3"):
+            self.store = PoolStateStore(journal_blocks=engine_cfg.get("reorg_journal_blocks", 64))
+            self.store.subscribe(self.quote_cache.invalidate_pools)
+            self.store.subscribe(self.mark_changed)
+            ws_url = chain_client["cfg"].get("ws")
+            if ws_url:
+                self.stream = LogStream(ws_url)
+        self.chain_pools: Dict[str, List[Dict]] = {}
+        self.candidates: List[List[Dict]] = []
+        # Pre-encoded ArbExecutor route tuples of the current candidates
+        self.calldata = CalldataBuilder(ARB_EXECUTOR)
+        self.signer = None  # created by execute_loop (chain id and nonce need RPC)
+        self.submitter = make_submitter(cfg, chain_name)
+        self.inclusion_timeout = cfg.strategy.get("execution", {}).get("inclusion_timeout_s", 12.0)
+        self.index: Optional[RouteIndex] = None
+        # Pools changed since the last quote; None means re-quote every route
+        self.changed_pools: Optional[Set[str]] = None
+        self.changed_lock = Lock()
+        self.ready = asyncio.Event()
+        self.head_block = 0
+        self.stats = {stage: StageStats() for stage in
+                      ("head", "discover", "sync", "quote", "execute", "head_to_execute")}
+        self.dropped = {"heads": 0, "opportunities": 0, "stale": 0, "paused": 0}
+
+    async def call(self, stage: str, fn: Callable, *args) -> Any:
+        """Run a blocking function on this chain's thread pool and time it as ``stage``."""
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        except Exception:
+            self.stats[stage].errors += 1
+            raise
+        finally:
+            self.stats[stage].record((time.perf_counter() - start) * 1000)
+
+    async def discover_loop(self):
+        """Discover pools and regenerate candidates now and every rediscover_interval.
+
+        The first pass starts from the on-disk pool snapshot; later passes
+        re-page the subgraphs in the background and refresh the snapshot.
+        """
+        full_refresh = False
+        while True:
+            try:
+                legs, chain_pools = await self.call(
+                    "discover", discover, self.cfg, self.chain_name, self.client, full_refresh
+                )
+                candidates = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, generate_candidates, self.cfg, legs, [self.chain_name]
+                )
+                await self.call("discover", load_tokens, self.cfg, self.chain_name, self.w3,
+                                chain_pools, legs, self.tokens)
+                routes = quotable_routes(self.cfg, self.chain_name, candidates)
+                calldata = CalldataBuilder(ARB_EXECUTOR)
+                await asyncio.get_running_loop().run_in_executor(self.executor, calldata.prepare, routes)
+                index = None
+                if self.store is not None:
+                    await self.call("discover", self.store.load, self.w3, chain_pools)
+                    if self.stream is not None:
+                        self.route_pools()
+                    index = RouteIndex(routes)
+                # Swapped in one step; a quote already running keeps its own snapshot
+                self.chain_pools, self.candidates, self.calldata = chain_pools, candidates, calldata
+                if index is not None:
+                    with self.changed_lock:
+                        self.index, self.changed_pools = index, None
+                self.ready.set()
+                if self.db is not None:
+                    self.db.write_pools(pool_rows(self.chain_name, chain_pools))
+                print(f"[{self.chain_name}] {len(legs)} legs, {len(candidates)} candidate routes")
+            except Exception as e:
+                print(f"[{self.chain_name}] Discovery failed: {e}")
+            full_refresh = True
+            await asyncio.sleep(self.rediscover_interval)
+
+    def route_pools(self):
+        """Point the log stream at exactly the pools the store now tracks."""
+        tracked = set(self.store.addresses())
+        self.stream.unroute(set(self.stream.routes) - tracked)
+        self.stream.route(tracked, self.store.topics(), self.store.apply_logs)
+
+    async def stream_loop(self):
+        """Keep the pool log subscription open once the store has been loaded."""
+        if self.stream is None:
+            return
+        await self.ready.wait()
+        await self.stream.run(on_connect=self.catch_up)
+
+    async def catch_up(self):
+        """Backfill logs missed while the stream was down.
+
+        Starts at the store's last block (inclusive): a block may have been
+        cut off mid-delivery, and already-applied logs are skipped anyway.
+        """
+        def backfill():
+            store = self.store
+            head = self.w3.eth.block_number
+            if store.block_number is not None and store.block_number <= head:
+                store.apply_logs(fetch_pool_logs(self.w3, store.addresses(), store.topics(),
+                                                 store.block_number, head))
+        await self.call("sync", backfill)
+
+    def mark_changed(self, pools: Set[str]):
+        """PoolStateStore listener: remember pools to re-quote at the next head."""
+        with self.changed_lock:
+            if self.changed_pools is not None:
+                self.changed_pools |= pools
+
+    def take_changed(self):
+        """The current index and the pools changed since the previous call."""
+        with self.changed_lock:
+            changed, self.changed_pools = self.changed_pools, set()
+            return self.index, changed
+
+    async def latest_fees(self):
+        """eth_feeHistory of the latest block: its number, base fees and median tip in one call."""
+        if self.async_w3 is None:
+            return await self.call("head", self.w3.eth.fee_history, 1, "latest", [50])
+        start = time.perf_counter()
+        try:
+            return await self.async_w3.eth.fee_history(1, "latest", [50])
+        except Exception:
+            self.stats["head"].errors += 1
+            raise
+        finally:
+            self.stats["head"].record((time.perf_counter() - start) * 1000)
+
+    async def head_loop(self):
+        """Poll for new block heads, feed their fees to the oracle and hand the latest one to the quote stage."""
+        while True:
+            try:
+                block_number = self.fees.on_fee_history(await self.latest_fees())
+                if block_number > self.head_block:
+                    self.head_block = block_number
+                    if self.signer is not None:
+                        self.signer.update_base_fee(self.fees.next_base_fee)
+                    if self.db is not None:
+                        self.db.write_gas_price(gas_price_row(self.chain_name, self.fees.next_base_fee,
+                                                              self.fees.tip or 0))
+                    self.dropped["heads"] += put_latest(self.heads, (block_number, time.perf_counter()))
+            except Exception as e:
+                print(f"[{self.chain_name}] Head poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def quote_loop(self):
+        """Quote and score the candidates at each new head (only the affected ones with a store)."""
+        await self.ready.wait()
+        while True:
+            block_number, seen_at = await self.heads.get()
+            chain_pools, candidates = self.chain_pools, self.candidates
+            if self.store is None:
+                # Nothing tracks per-pool changes, so cached quotes live for one block only
+                self.quote_cache.clear()
+            else:
+                try:
+                    await self.call("sync", self.sync_state, block_number)
+                except Exception as e:
+                    print(f"[{self.chain_name}] State sync to block {block_number} failed: {e}")
+                    continue
+            try:
+                if self.store is None:
+                    profitable = await self.call(
+                        "quote", quote_and_score, self.cfg, self.chain_name, self.w3,
+                        candidates, chain_pools, self.quote_cache, block_number, None, self.tokens,
+                        self.gas_model, self.fees.gas_price()
+                    )
+                else:
+                    index, changed = self.take_changed()
+                    profitable = await self.call(
+                        "quote", requote_affected, self.cfg, self.chain_name, self.w3, index, changed,
+                        chain_pools, self.quote_cache, block_number, self.store, self.tokens, self.top_n,
+                        self.gas_model, self.fees.gas_price()
+                    )
+            except Exception as e:
+                print(f"[{self.chain_name}] Quoting block {block_number} failed: {e}")
+                if self.store is not None:
+                    # The changed pools were consumed; start over from a full re-quote
+                    with self.changed_lock:
+                        self.changed_pools = None
+                continue
+            if profitable and self.db is not None:
+                for opportunity in profitable:
+                    self.db.write_quote(quote_row(self.chain_name, opportunity))
+            if profitable:
+                self.dropped["opportunities"] += put_latest(
+                    self.opportunities, (block_number, seen_at, profitable)
+                )
+
+    def sync_state(self, block_number: int):
+        """Advance the pool state store to ``block_number`` from the pools' own logs."""
+        store = self.store
+        if self.stream is not None and self.stream.connected.is_set():
+            # Logs are pushed; only reload pools their logs could not update, at the
+            # last block actually applied so later pushed logs still fit on top
+            if store.block_number is not None:
+                store.refresh_stale(self.w3, store.block_number)
+            return
+        if store.block_number is None or store.block_number >= block_number:
+            return
+        logs = fetch_pool_logs(self.w3, store.addresses(), store.topics(),
+                               store.block_number + 1, block_number)
+        store.apply_logs(logs)
+        store.refresh_stale(self.w3, block_number)
+        store.block_number = block_number
+
+    async def execute_loop(self):
+        """Execute opportunities unless the chain has moved on since they were quoted or a kill switch holds."""
+        while self.signer is None:
+            try:
+                self.signer = await self.call("execute", make_signer, self.cfg, self.w3)
+                if self.signer is not None and self.fees.next_base_fee is not None:
+                    self.signer.update_base_fee(self.fees.next_base_fee)
+                break
+            except Exception as e:
+                print(f"[{self.chain_name}] Signer setup failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+        paused_logged = 0
+        while True:
+            block_number, seen_at, profitable = await self.opportunities.get()
+            if self.head_block - block_number > self.max_age_blocks:
+                self.dropped["stale"] += 1
+                continue
+            reason = self.fees.pause_reason()
+            if reason is not None:
+                self.dropped["paused"] += 1
+                if self.fees.pauses > paused_logged:
+                    paused_logged = self.fees.pauses
+                    print(f"[{self.chain_name}] Execution paused: {reason}")
+                continue
+            self.stats["head_to_execute"].record((time.perf_counter() - seen_at) * 1000)
+            try:
+                prepared = await self.call("execute", prepare_executions, self.cfg, self.w3, profitable,
+                                           3, self.calldata, self.signer, self.gas_model, block_number, self.fees)
+                await submit_executions(self.chain_name, prepared, self.submitter, self.included,
+                                        self.reset_nonce, self.inclusion_timeout, self.block_builder,
+                                        self.gas_used, self.gas_model, self.fees, self.record_outcome)
+            except Exception as e:
+                print(f"[{self.chain_name}] Execution for block {block_number} failed: {e}")
+
+    async def included(self, tx_hashes: List[str]) -> Optional[str]:
+        """The landed hash among ``tx_hashes``, checked on the async client when there is one."""
+        if self.async_w3 is None:
+            return await self.call("execute", included_hash, self.w3, tx_hashes)
+        return await included_hash_async(self.async_w3, tx_hashes)
+
+    async def block_builder(self, tx_hash: str) -> Optional[str]:
+        if self.async_w3 is None:
+            return None
+        return await block_builder_async(self.async_w3, tx_hash)
+
+    async def gas_used(self, tx_hash: str) -> Optional[int]:
+        if self.async_w3 is None:
+            return await self.call("execute", receipt_gas_used, self.w3, tx_hash)
+        return await receipt_gas_used_async(self.async_w3, tx_hash)
+
+    def record_outcome(self, route_data: Dict, ladder, landed: Optional[str], status: str,
+                       gas_used: Optional[int]):
+        if self.db is None:
+            return
+        rung = next((rung for rung in ladder.rungs if rung["hash"] == landed), ladder.rungs[max(ladder.sent, 0)])
+        gas_price = None
+        if self.fees.next_base_fee is not None:
+            gas_price = min(rung["max_fee"], self.fees.next_base_fee + rung["tip"])
+        self.db.write_execution(execution_row(
+            self.chain_name, landed or rung["hash"], status, gas_used, gas_price,
+            route_data["profit_usd"] if status == "success" else None,
+            {"reverted": "receipt status 0", "missed": f"not included in {self.inclusion_timeout}s"}.get(status),
+            bool(self.submitter.ranked()),
+        ))
+
+    async def reset_nonce(self):
+        await self.call("execute", self.signer.nonces.reset, self.w3)
+
+    async def report_loop(self):
+        """Print per-stage latency and drop counters periodically."""
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(f"[{self.chain_name}] head={self.head_block} dropped={self.dropped} "
+                  f"queues=(heads {self.heads.qsize()}, opportunities {self.opportunities.qsize()})")
+            for stage, stats in self.stats.items():
+                print(f"[{self.chain_name}]   {stage}: {stats.summary()}")
+            print(f"[{self.chain_name}]   quote cache: {self.quote_cache.stats()}")
+            if self.index is not None:
+                print(f"[{self.chain_name}]   route index: {self.index.stats()}")
+            if self.stream is not None:
+                print(f"[{self.chain_name}]   log stream: {self.stream.stats()}")
+            print(f"[{self.chain_name}]   relays: {self.submitter.stats()}")
+            print(f"[{self.chain_name}]   fees: {self.fees.stats()}")
+            print(f"[{self.chain_name}]   gas model: {self.gas_model.stats()}")
+            if self.db is not None:
+                print(f"[{self.chain_name}]   database: {self.db.stats()}")
+                for stage, stats in self.stats.items():
+                    for name, value in stats.summary().items():
+                        self.db.write_metric(self.chain_name, f"stage_{name}", value, {"stage": stage})
+            self.gas_model.save()
+            if self.client.get("endpoints") is not None:
+                for url, stats in self.client["endpoints"].stats().items():
+                    print(f"[{self.chain_name}]   rpc {url}: {stats}")
+
+    async def run(self):
+        try:
+            await asyncio.gather(
+                self.discover_loop(),
+                self.head_loop(),
+                self.quote_loop(),
+                self.execute_loop(),
+                self.report_loop(),
+                self.stream_loop(),
+            )
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            await self.submitter.close()
+            if hasattr(self.w3.provider, "close"):
+                self.w3.provider.close()
+            if self.async_w3 is not None and hasattr(self.async_w3.provider, "close"):
+                await self.async_w3.provider.close()
+
+def make_db(cfg) -> Optional[DatabaseWriter]:
+    """Write-behind database writer (strategy.database) when DATABASE_URL is set."""
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        return None
+    db_cfg = cfg.strategy.get("database", {})
+    return DatabaseWriter(database_url,
+                          batch_rows=db_cfg.get("batch_rows", 2000),
+                          flush_interval_s=db_cfg.get("flush_interval_ms", 1000) / 1000,
+                          max_rows=db_cfg.get("max_rows", 50_000),
+                          overflow=db_cfg.get("overflow"),
+                          maintenance_interval_s=db_cfg.get("maintenance_interval_s", 3600))
+
+async def run_engine(cfg, clients: Optional[Dict] = None):
+    """Run one independent pipeline per configured chain until cancelled."""
+    if clients is None:
+        clients = make_clients(cfg.chains, cfg.strategy.get("rpc"))
+    db = make_db(cfg)
+    if db is not None:
+        db.start()
+    pipelines = [ChainPipeline(cfg, chain_name, client, db) for chain_name, client in clients.items()]
+    print(f"Starting engine on chains: {[p.chain_name for p in pipelines]}")
+    try:
+        await asyncio.gather(*(pipeline.run() for pipeline in pipelines))
+    finally:
+        if db is not None:
+            await db.close()
+
+def main():
+    """Long-running arbitrage engine driven by new block heads."""
+    try:
+        asyncio.run(run_engine(load_config()))
+    except KeyboardInterrupt:
+        print("Engine stopped")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,88 @@
 from eth_abi import encode
-from eth_utils import to_checksum_address
-from typing import List, Dict
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 # Mirror Solidity structs
 # Hop: (uint8 dex, address routerOrPool, bytes data, address tokenIn, address tokenOut)
 # Route: (Hop[] hops, address inputToken, address outputToken)
+HOP_TYPE = "(uint8,address,bytes,address,address)"
+ROUTE_TYPE = f"({HOP_TYPE}[],address,address)"
 
-def encode_hop(hop: Dict) -> tuple:
-    """Encode a single hop for ArbExecutor."""
-    dex_id = 1 if hop["dex"] == "uni_v3" else 2  # 1=UniV3, 2=Curve
+# ArbExecutor entry points (contracts/ArbExecutor.sol)
+EXECUTE_SIGNATURE = f"execute({ROUTE_TYPE},uint256,uint256,uint256)"
+FLASHLOAN_SIGNATURE = f"executeWithFlashloan({ROUTE_TYPE},uint256,uint256,uint256,uint256)"
+EXECUTE_SELECTOR = function_signature_to_4byte_selector(EXECUTE_SIGNATURE)
+FLASHLOAN_SELECTOR = function_signature_to_4byte_selector(FLASHLOAN_SIGNATURE)
+
+DEX_IDS = {"uni_v3": 1, "curve": 2}
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+# Hop payloads: the call ArbExecutor forwards to the hop's router or pool.
+# Uni v3 swaps go through the router's exactInputSingle; SwapRouter02 (Base)
+# dropped the deadline that the original SwapRouter (Arbitrum) takes.
+# (tokenIn, tokenOut, fee, recipient, amountIn, amountOutMinimum, sqrtPriceLimitX96)
+V3_SINGLE_TYPE = "(address,address,uint24,address,uint256,uint256,uint160)"
+# (tokenIn, tokenOut, fee, recipient, deadline, amountIn, amountOutMinimum, sqrtPriceLimitX96)
+V3_SINGLE_DEADLINE_TYPE = "(address,address,uint24,address,uint256,uint256,uint256,uint160)"
+V3_SINGLE_SELECTOR = function_signature_to_4byte_selector(f"exactInputSingle({V3_SINGLE_TYPE})")
+V3_SINGLE_DEADLINE_SELECTOR = function_signature_to_4byte_selector(f"exactInputSingle({V3_SINGLE_DEADLINE_TYPE})")
+CURVE_EXCHANGE_SELECTOR = function_signature_to_4byte_selector("exchange(int128,int128,uint256,uint256)")
+CURVE_EXCHANGE_UNDERLYING_SELECTOR = function_signature_to_4byte_selector(
+    "exchange_underlying(int128,int128,uint256,uint256)"
+)
+
+def _word(value: int) -> bytes:
+    """uint256 as one ABI word (OverflowError outside [0, 2**256))."""
+    return value.to_bytes(32, "big")
+
+def _address_word(address: str) -> bytes:
+    raw = bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+    if len(raw) != 20:
+        raise ValueError(f"Invalid address {address}")
+    return b"\0" * 12 + raw
+
+def _bytes_tail(data: bytes) -> bytes:
+    return _word(len(data)) + data + b"\0" * (-len(data) % 32)
+
+def encode_swap(leg: Dict, recipient: str, amount_in: int, min_out: int, deadline: int) -> bytes:
+    """Encode a leg's swap call (the hop's ``data``) for ArbExecutor to forward.
+
+    Uni v3 legs with ``router_deadline`` use the original SwapRouter's
+    exactInputSingle, others SwapRouter02's; Curve legs call ``exchange``
+    (``exchange_underlying`` for underlying legs) on the pool. Curve and
+    SwapRouter02 ignore ``deadline``.
+    """
+    if leg["dex"] == "uni_v3":
+        head = [to_checksum_address(leg["token_in"]), to_checksum_address(leg["token_out"]),
+                int(leg["fee_tier"]), to_checksum_address(recipient)]
+        if leg.get("router_deadline"):
+            return V3_SINGLE_DEADLINE_SELECTOR + encode(
+                [V3_SINGLE_DEADLINE_TYPE], [(*head, deadline, amount_in, min_out, 0)]
+            )
+        return V3_SINGLE_SELECTOR + encode([V3_SINGLE_TYPE], [(*head, amount_in, min_out, 0)])
+    if leg["dex"] == "curve":
+        selector = CURVE_EXCHANGE_UNDERLYING_SELECTOR if leg.get("underlying") else CURVE_EXCHANGE_SELECTOR
+        return selector + encode(["int128", "int128", "uint256", "uint256"],
+                                 [leg["i"], leg["j"], amount_in, min_out])
+    raise ValueError(f"Unsupported dex {leg['dex']}")
+
+def encode_hop(hop: Dict, data: bytes) -> tuple:
+    """Encode a single hop for ArbExecutor, ``data`` being its swap call (see encode_swap)."""
+    dex_id = DEX_IDS.get(hop["dex"], 2)  # 1=UniV3, 2=Curve
     return (
         dex_id,
         to_checksum_address(hop["addr"]),
-        hop["data"],
+        data,
         to_checksum_address(hop["token_in"]),
         to_checksum_address(hop["token_out"])
     )
 
-def encode_route(route_legs: List[Dict], input_token: str, output_token: str) -> bytes:
-    """Encode complete route for ArbExecutor.execute."""
-    hops = [encode_hop(hop) for hop in route_legs]
-    
+def encode_route(route_legs: List[Dict], input_token: str, output_token: str,
+                 datas: Sequence[bytes]) -> bytes:
+    """Encode complete route for ArbExecutor.execute, one swap call per leg in ``datas``."""
+    hops = [encode_hop(hop, data) for hop, data in zip(route_legs, datas)]
+
     # ABI: ( (uint8,address,bytes,address,address)[], address, address )
     return encode(
         ["(uint8,address,bytes,address,address)[]", "address", "address"],
@@ -28,22 +90,146 @@ def encode_route(route_legs: List[Dict], input_token: str, output_token: str) ->
     )
 
 def encode_execute_call(route_bytes: bytes, amount_in: int, min_return: int, deadline: int) -> bytes:
-    """Encode ArbExecutor.execute call."""
-    # Function selector for execute((Hop[],address,address),uint256,uint256,uint256)
-    function_selector = b'\x12\x34\x56\x78'  # Replace with actual selector
-    
-    return function_selector + encode(
-        ["bytes", "uint256", "uint256", "uint256"],
-        [route_bytes, amount_in, min_return, deadline]
-    )
+    """Encode ArbExecutor.execute call from an encode_route() result."""
+    # The Route tuple is dynamic: the head holds its offset, its encoding follows the uint256 words
+    return EXECUTE_SELECTOR + _word(4 * 32) + _word(amount_in) + _word(min_return) + _word(deadline) + route_bytes
 
-def encode_flashloan_call(route_bytes: bytes, amount_in: int, min_return: int, 
+def encode_flashloan_call(route_bytes: bytes, amount_in: int, min_return: int,
                          deadline: int, flashloan_amount: int) -> bytes:
-    """Encode ArbExecutor.executeWithFlashloan call."""
-    # Function selector for executeWithFlashloan((Hop[],address,address),uint256,uint256,uint256,uint256)
-    function_selector = b'\x87\x65\x43\x21'  # Replace with actual selector
-    
-    return function_selector + encode(
-        ["bytes", "uint256", "uint256", "uint256", "uint256"],
-        [route_bytes, amount_in, min_return, deadline, flashloan_amount]
-    )
+    """Encode ArbExecutor.executeWithFlashloan call from an encode_route() result."""
+    return (FLASHLOAN_SELECTOR + _word(5 * 32) + _word(amount_in) + _word(min_return) + _word(deadline)
+            + _word(flashloan_amount) + route_bytes)
+
+class RouteTemplate:
+    """A route's pre-encoded Route tuple; submit time only adds the amounts.
+
+    Every hop's swap call is encoded with zero amounts; ``amount_slots``
+    holds, per hop, the byte offsets in ``route_bytes`` of its amount in,
+    minimum out and (SwapRouter only, else None) deadline words. ``route``
+    fills them in, so it equals encode_route over encode_swap calls with
+    the same amounts, and ``execute_call``/``flashloan_call`` equal
+    encode_execute_call and encode_flashloan_call (and eth_abi's encoding
+    of the full signature).
+    """
+
+    __slots__ = ("route_bytes", "input_token", "output_token", "amount_slots")
+
+    def __init__(self, route_bytes: bytes, input_token: str, output_token: str,
+                 amount_slots: List[Tuple[int, int, Optional[int]]]):
+        self.route_bytes = route_bytes
+        self.input_token = input_token
+        self.output_token = output_token
+        self.amount_slots = amount_slots
+
+    def route(self, amount_in: int, hop_min_outs: Sequence[int], deadline: int) -> bytes:
+        """The Route tuple for one trade.
+
+        Hop ``k`` swaps ``hop_min_outs[k - 1]`` (the first hop ``amount_in``)
+        for at least ``hop_min_outs[k]``: a hop's minimum output is what the
+        next hop spends, so each swap is covered by the tokens the previous
+        one delivered and anything above the minimum stays in the executor.
+        """
+        if len(hop_min_outs) != len(self.amount_slots):
+            raise ValueError(f"{len(hop_min_outs)} hop amounts for {len(self.amount_slots)} hops")
+        route = bytearray(self.route_bytes)
+        amount = amount_in
+        for (in_pos, out_pos, deadline_pos), min_out in zip(self.amount_slots, hop_min_outs):
+            route[in_pos:in_pos + 32] = _word(amount)
+            route[out_pos:out_pos + 32] = _word(min_out)
+            if deadline_pos is not None:
+                route[deadline_pos:deadline_pos + 32] = _word(deadline)
+            amount = min_out
+        return bytes(route)
+
+    def execute_call(self, amount_in: int, min_return: int, deadline: int,
+                     hop_min_outs: Sequence[int]) -> bytes:
+        return encode_execute_call(self.route(amount_in, hop_min_outs, deadline), amount_in, min_return, deadline)
+
+    def flashloan_call(self, amount_in: int, min_return: int, deadline: int, flashloan_amount: int,
+                       hop_min_outs: Sequence[int]) -> bytes:
+        return encode_flashloan_call(self.route(amount_in, hop_min_outs, deadline), amount_in, min_return,
+                                     deadline, flashloan_amount)
+
+class CalldataBuilder:
+    """Route templates for a set of candidate routes, built once per generation.
+
+    Each leg's hop tuple, swap call included, is encoded once and shared by
+    every route using it (a hop's encoding does not depend on its position,
+    and its amounts are filled in per trade), so a route template is just
+    its offsets and the concatenated hops. Swap outputs go to ``recipient``
+    (the ArbExecutor; None, as in a dry run, encodes the zero address).
+    Routes and legs are the dicts candidate generation returned, keyed by
+    identity.
+    """
+
+    def __init__(self, recipient: Optional[str] = None):
+        self.recipient = recipient or ZERO_ADDRESS
+        # id(leg) -> (leg, encoded hop, its (amount in, min out, deadline) offsets)
+        self.hops: Dict[int, Tuple[Dict, bytes, Tuple[int, int, Optional[int]]]] = {}
+        self.templates: Dict[Tuple[int, ...], Tuple[List[Dict], RouteTemplate]] = {}
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def prepare(self, routes: Iterable[List[Dict]]) -> int:
+        """Build templates for ``routes``; returns how many were new."""
+        before = len(self.templates)
+        for route in routes:
+            self.template(route)
+        return len(self.templates) - before
+
+    def template(self, route: List[Dict], input_token: Optional[str] = None,
+                 output_token: Optional[str] = None) -> RouteTemplate:
+        """The route's template (built on first use)."""
+        input_token = input_token or route[0]["token_in"]
+        output_token = output_token or route[-1]["token_out"]
+        key = tuple(id(leg) for leg in route)
+        cached = self.templates.get(key)
+        if cached is not None and cached[1].input_token == input_token \
+                and cached[1].output_token == output_token:
+            return cached[1]
+        template = RouteTemplate(*self._encode_route(route, input_token, output_token))
+        self.templates[key] = (route, template)  # the route ref keeps its leg ids unique
+        return template
+
+    def _swap(self, leg: Dict) -> Tuple[bytes, Tuple[int, int, Optional[int]]]:
+        """A leg's swap call with zero amounts, and the offsets of its amount words in it."""
+        if leg["dex"] == "uni_v3":
+            head = (_address_word(leg["token_in"]) + _address_word(leg["token_out"])
+                    + _word(int(leg["fee_tier"])) + _address_word(self.recipient))
+            if leg.get("router_deadline"):
+                # (.., recipient, deadline, amountIn, amountOutMinimum, sqrtPriceLimitX96)
+                return V3_SINGLE_DEADLINE_SELECTOR + head + _word(0) * 4, (4 + 5 * 32, 4 + 6 * 32, 4 + 4 * 32)
+            return V3_SINGLE_SELECTOR + head + _word(0) * 3, (4 + 4 * 32, 4 + 5 * 32, None)
+        if leg["dex"] == "curve":
+            selector = CURVE_EXCHANGE_UNDERLYING_SELECTOR if leg.get("underlying") else CURVE_EXCHANGE_SELECTOR
+            # (i, j, dx, min_dy); coin indices are non-negative, so int128 encodes like uint256
+            return selector + _word(leg["i"]) + _word(leg["j"]) + _word(0) * 2, (4 + 2 * 32, 4 + 3 * 32, None)
+        raise ValueError(f"Unsupported dex {leg['dex']}")
+
+    def _hop(self, leg: Dict) -> Tuple[bytes, Tuple[int, int, Optional[int]]]:
+        cached = self.hops.get(id(leg))
+        if cached is None:
+            data, slots = self._swap(leg)
+            # Tuple (uint8,address,bytes,address,address): five head words, then the bytes
+            encoded = (_word(DEX_IDS.get(leg["dex"], 2)) + _address_word(leg["addr"]) + _word(5 * 32)
+                       + _address_word(leg["token_in"]) + _address_word(leg["token_out"])
+                       + _bytes_tail(data))
+            # The swap call starts after the head and its length word
+            slots = tuple(None if pos is None else 6 * 32 + pos for pos in slots)
+            cached = self.hops[id(leg)] = (leg, encoded, slots)
+        return cached[1], cached[2]
+
+    def _encode_route(self, route: Sequence[Dict], input_token: str, output_token: str
+                      ) -> Tuple[bytes, str, str, List[Tuple[int, int, Optional[int]]]]:
+        hops = [self._hop(leg) for leg in route]
+        # Hops follow the Route head, the array length and the array's offsets
+        offsets, offset, amount_slots = [], 32 * len(hops), []
+        for hop, slots in hops:
+            offsets.append(_word(offset))
+            start = 4 * 32 + offset
+            amount_slots.append(tuple(None if pos is None else start + pos for pos in slots))
+            offset += len(hop)
+        route_bytes = b"".join([_word(3 * 32), _address_word(input_token), _address_word(output_token),
+                                _word(len(hops))] + offsets + [hop for hop, _ in hops])
+        return route_bytes, input_token, output_token, amount_slots
@@ -1,8 +1,10 @@
 import json
 import time
 import requests
-from web3 import Web3
-from typing import Optional
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import TransactionNotFound
+from typing import List, Optional
+from pybot.exec.signer import ReplacementLadder
 
 def send_private_or_public(w3: Web3, raw_tx: bytes, private_rpc: Optional[str]) -> str:
     """Send transaction via private mempool first, fallback to public."""
@@ -26,18 +28,55 @@ def send_private_or_public(w3: Web3, raw_tx: bytes, private_rpc: Optional[str])
     # Fallback to public mempool
     return w3.eth.send_raw_transaction(raw_tx).hex()
 
-def bump_gas_price(w3: Web3, tx_hash: str, new_gas_price: int) -> Optional[str]:
-    """Replace transaction with higher gas price."""
+def bump_gas_price(w3: Web3, ladder: ReplacementLadder, private_rpc: Optional[str]) -> Optional[str]:
+    """Replace the transaction with the next pre-signed rung of its tip ladder (a send, no signing)."""
+    raw_tx = ladder.next_raw()
+    if raw_tx is None:
+        return None
     try:
-        # Get current transaction
-        tx = w3.eth.get_transaction(tx_hash)
-        
-        # Create replacement transaction
-        replacement_tx = tx.copy()
-        replacement_tx['gasPrice'] = new_gas_price
-        
-        # Sign and send replacement
-        return w3.eth.send_raw_transaction(replacement_tx).hex()
+        return send_private_or_public(w3, raw_tx, private_rpc)
     except Exception as e:
         print(f"Gas bump failed: {e}")
         return None
+
+def included_hash(w3: Web3, tx_hashes: List[str]) -> Optional[str]:
+    """The hash among ``tx_hashes`` (same nonce) that has a receipt, if any."""
+    for tx_hash in tx_hashes:
+        try:
+            if w3.eth.get_transaction_receipt(tx_hash) is not None:
+                return tx_hash
+        except TransactionNotFound:
+            continue
+    return None
+
+async def included_hash_async(w3: AsyncWeb3, tx_hashes: List[str]) -> Optional[str]:
+    """included_hash on an AsyncWeb3 client."""
+    for tx_hash in tx_hashes:
+        try:
+            if await w3.eth.get_transaction_receipt(tx_hash) is not None:
+                return tx_hash
+        except TransactionNotFound:
+            continue
+    return None
+
+async def block_builder_async(w3: AsyncWeb3, tx_hash: str) -> Optional[str]:
+    """Fee recipient of the block that included ``tx_hash`` (credits relays by coinbase)."""
+    receipt = await w3.eth.get_transaction_receipt(tx_hash)
+    block = await w3.eth.get_block(receipt["blockNumber"])
+    return block["miner"]
+
+def receipt_gas_used(w3: Web3, tx_hash: str) -> Optional[int]:
+    """gasUsed of a successful transaction (None if it reverted or has no receipt)."""
+    try:
+        receipt = w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    return int(receipt["gasUsed"]) if receipt.get("status") == 1 else None
+
+async def receipt_gas_used_async(w3: AsyncWeb3, tx_hash: str) -> Optional[int]:
+    """receipt_gas_used on an AsyncWeb3 client."""
+    try:
+        receipt = await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    return int(receipt["gasUsed"]) if receipt.get("status") == 1 else None
@@ -0,0 +1,238 @@
+import asyncio
+import time
+import aiohttp
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+from pybot.exec.signer import ReplacementLadder
+
+# Returns the hash among the given ones that has been included, if any
+InclusionCheck = Callable[[List[str]], Awaitable[Optional[str]]]
+# Returns the fee recipient (block builder) of the block that included a hash
+BuilderLookup = Callable[[str], Awaitable[Optional[str]]]
+
+class Relay:
+    """One submission endpoint (private relay, builder or public RPC) and its stats.
+
+    ``method`` is the JSON-RPC method taking the raw transaction:
+    eth_sendRawTransaction for builders and public RPCs,
+    eth_sendPrivateTransaction (``[{"tx": raw}]``) for Flashbots-style relays.
+    ``coinbase`` is the fee recipient of the blocks it builds, if known.
+    """
+
+    def __init__(self, url: str, method: str = "eth_sendRawTransaction", public: bool = False,
+                 coinbase: Optional[str] = None, alpha: float = 0.2):
+        self.url = url
+        self.method = method
+        self.public = public
+        self.coinbase = coinbase.lower() if coinbase else None
+        self.alpha = alpha
+        self.sent = 0
+        self.accepted = 0
+        self.errors = 0
+        self.included = 0  # inclusions credited to this relay
+        self.ewma_ms: Optional[float] = None
+        self.last_error = ""
+
+    @property
+    def inclusion_rate(self) -> float:
+        """Share of submissions that landed (errors count as misses), smoothed so new relays start at 1/2."""
+        return (self.included + 1) / (self.sent + 2)
+
+    def params(self, raw_hex: str) -> list:
+        return [{"tx": raw_hex}] if self.method == "eth_sendPrivateTransaction" else [raw_hex]
+
+    def record(self, elapsed_ms: float, error: Optional[str] = None):
+        self.sent += 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = error[:200]
+            return
+        self.accepted += 1
+        self.ewma_ms = elapsed_ms if self.ewma_ms is None else \
+            self.alpha * elapsed_ms + (1 - self.alpha) * self.ewma_ms
+
+    def stats(self) -> Dict:
+        return {
+            "sent": self.sent,
+            "accepted": self.accepted,
+            "errors": self.errors,
+            "included": self.included,
+            "inclusion_rate": round(self.inclusion_rate, 3),
+            "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+            "last_error": self.last_error,
+        }
+
+def chain_relays(chain_cfg: Dict, public_urls: Sequence[str] = ()) -> List[Relay]:
+    """Relays of one chain: ``private_tx_rpc``, then ``relays`` entries, then the public RPCs.
+
+    A ``relays`` entry is a URL (eth_sendRawTransaction) or {url, method, coinbase}.
+    """
+    relays = []
+    if chain_cfg.get("private_tx_rpc"):
+        relays.append(Relay(chain_cfg["private_tx_rpc"], "eth_sendPrivateTransaction"))
+    for entry in chain_cfg.get("relays") or []:
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        if entry.get("url"):
+            relays.append(Relay(entry["url"], entry.get("method", "eth_sendRawTransaction"),
+                                coinbase=entry.get("coinbase")))
+    relays.extend(Relay(url, public=True) for url in public_urls if url)
+    return relays
+
+class RelaySubmitter:
+    """Sends each signed transaction to many relays at once and tracks who lands it.
+
+    Private relays (the top ``fanout`` by inclusion rate, then ack latency;
+    0 means all) get every send concurrently over one pooled aiohttp
+    session. Public RPCs are only used when no private relay accepted the
+    send (or none is configured). When a rung lands, in-flight sends are
+    cancelled, and relays that accepted another rung get
+    eth_cancelPrivateTransaction where they speak that protocol. On a miss
+    every accepted rung is cancelled the same way.
+
+    The inclusion is credited to the relay whose ``coinbase`` built the
+    block, when ``builder_of`` can tell; otherwise to the relay that acked
+    the landed hash first.
+    """
+
+    def __init__(self, relays: List[Relay], fanout: int = 0, timeout_s: float = 2.0, pool_size: int = 8):
+        self.relays = relays
+        self.fanout = fanout
+        self.timeout = timeout_s
+        self.pool_size = pool_size
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.ids = 0
+        self.landed = 0
+        self.missed = 0
+
+    def ranked(self) -> List[Relay]:
+        def latency(relay: Relay) -> float:
+            # Untried relays go first to get measured; ones that never accepted go last
+            if relay.ewma_ms is None:
+                return 0.0 if relay.sent == 0 else float("inf")
+            return relay.ewma_ms
+        private = sorted((r for r in self.relays if not r.public), key=lambda r: (-r.inclusion_rate, latency(r)))
+        return private[:self.fanout] if self.fanout else private
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def _rpc(self, url: str, method: str, params: list) -> Dict:
+        self.ids += 1
+        async with self._session().post(url, json={"jsonrpc": "2.0", "id": self.ids, "method": method,
+                                                   "params": params}) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def _send_one(self, relay: Relay, raw_hex: str) -> Optional[float]:
+        """Submit to one relay; the ack time (monotonic) on success."""
+        start = time.perf_counter()
+        try:
+            body = await self._rpc(relay.url, relay.method, relay.params(raw_hex))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            relay.record(0.0, f"{type(e).__name__}: {e}")
+            return None
+        if "error" in body:
+            relay.record(0.0, str(body["error"]))
+            return None
+        relay.record((time.perf_counter() - start) * 1000)
+        return time.monotonic()
+
+    async def send(self, raw: bytes, tx_hash: str, acks: Dict[str, List]) -> int:
+        """Fan ``raw`` out; records (ack time, relay) per hash in ``acks``. Returns how many accepted."""
+        raw_hex = "0x" + raw.hex()
+
+        async def send_one(relay: Relay) -> bool:
+            # Record each ack as it arrives: the rung may land (and this send be
+            # cancelled) before the slowest relay answers
+            acked_at = await self._send_one(relay, raw_hex)
+            if acked_at is not None:
+                acks.setdefault(tx_hash, []).append((acked_at, relay))
+            return acked_at is not None
+
+        accepted = 0
+        for relays in (self.ranked(), [r for r in self.relays if r.public]):
+            if not relays:
+                continue
+            accepted = sum(await asyncio.gather(*(send_one(relay) for relay in relays)))
+            if accepted:
+                break  # public RPCs are the fallback only
+        return accepted
+
+    async def submit_ladder(self, ladder: ReplacementLadder, included: InclusionCheck,
+                            timeout_s: float = 12.0, builder_of: Optional[BuilderLookup] = None) -> Optional[str]:
+        """Send the ladder's rungs to every relay until one is included; the landed hash.
+
+        A rung's sends run in the background, so a slow relay never holds
+        up a bump. Returns None if nothing landed within ``timeout_s``, after
+        asking the private relays to drop every rung they accepted.
+        """
+        acks: Dict[str, List] = {}
+        sends: List[asyncio.Task] = []
+
+        def bump():
+            raw = ladder.next_raw()
+            if raw is not None:
+                sends.append(asyncio.ensure_future(self.send(raw, ladder.rungs[ladder.sent]["hash"], acks)))
+
+        bump()
+        deadline = time.monotonic() + timeout_s
+        landed = None
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(min(ladder.replace_every, max(0.0, deadline - time.monotonic())))
+                landed = await included(ladder.hashes)
+                if landed:
+                    break
+                if ladder.bump_due():
+                    bump()
+        finally:
+            for task in sends:
+                task.cancel()
+        if landed is None:
+            self.missed += 1
+            # A rung still held by a private relay could land after the caller reuses the nonce
+            await self._cancel_others(None, acks)
+            return None
+        self.landed += 1
+        await asyncio.gather(self._credit(landed, acks.get(landed, []), builder_of), self._cancel_others(landed, acks))
+        return landed
+
+    async def _credit(self, landed: str, landed_acks: List, builder_of: Optional[BuilderLookup]):
+        if not landed_acks:
+            return
+        relay = None
+        if builder_of is not None and any(r.coinbase for _, r in landed_acks):
+            try:
+                coinbase = await builder_of(landed)
+            except Exception:
+                coinbase = None
+            relay = next((r for _, r in landed_acks if coinbase and r.coinbase == coinbase.lower()), None)
+        if relay is None:
+            relay = min(landed_acks, key=lambda ack: ack[0])[1]
+        relay.included += 1
+
+    async def _cancel_others(self, landed: Optional[str], acks: Dict[str, List]):
+        """Ask private relays holding a rung other than ``landed`` (every rung if None) to drop it (best effort)."""
+        cancels = [
+            self._rpc(relay.url, "eth_cancelPrivateTransaction", [{"txHash": tx_hash}])
+            for tx_hash, tx_acks in acks.items() if tx_hash != landed
+            for _, relay in tx_acks if relay.method == "eth_sendPrivateTransaction"
+        ]
+        if cancels:
+            await asyncio.gather(*cancels, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {"landed": self.landed, "missed": self.missed,
+                "relays": {relay.url: relay.stats() for relay in self.relays}}
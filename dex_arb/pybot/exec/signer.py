@@ -0,0 +1,158 @@
+import time
+from eth_account import Account
+from eth_utils import to_checksum_address
+from threading import Lock
+from typing import Dict, List, Optional
+from web3 import Web3
+
+GWEI = 10 ** 9
+
+def min_replacement(fee: int) -> int:
+    """Lowest fee a node accepts for a replacement: 10% more, rounded up (integer wei)."""
+    return fee + -(-fee // 10)
+
+def tip_ladder(min_gwei: float, max_gwei: float, max_bumps: int) -> List[int]:
+    """Priority fees (wei) of the first send and up to ``max_bumps`` replacements.
+
+    Rungs are spread evenly from ``min_gwei`` to ``max_gwei`` but each is at
+    least a valid replacement of the previous one; rungs that would have to
+    exceed ``max_gwei`` for that are dropped.
+    """
+    low, high = int(min_gwei * GWEI), int(max_gwei * GWEI)
+    tips = [low]
+    for n in range(1, max_bumps + 1):
+        target = low + (high - low) * n // max_bumps
+        tip = max(target, min_replacement(tips[-1]), tips[-1] + 1)
+        if tip > high:
+            break
+        tips.append(tip)
+    return tips
+
+class NonceManager:
+    """Next nonce of one account on one chain, tracked locally.
+
+    Synced from the node's pending count once; after that reserving a
+    nonce is a counter increment. ``resync`` re-reads the node (e.g. after
+    a "nonce too low" rejection) and never moves backwards past nonces
+    handed out since.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self.next_nonce: Optional[int] = None
+        self.lock = Lock()
+
+    def resync(self, w3: Web3) -> int:
+        pending = w3.eth.get_transaction_count(self.address, "pending")
+        with self.lock:
+            self.next_nonce = pending if self.next_nonce is None else max(self.next_nonce, pending)
+            return self.next_nonce
+
+    def reset(self, w3: Web3) -> int:
+        """Take the node's pending count as is, e.g. after a transaction was dropped."""
+        pending = w3.eth.get_transaction_count(self.address, "pending")
+        with self.lock:
+            self.next_nonce = pending
+            return pending
+
+    def reserve(self, w3: Optional[Web3] = None) -> int:
+        if self.next_nonce is None:
+            if w3 is None:
+                raise RuntimeError("NonceManager used before its first sync")
+            self.resync(w3)
+        with self.lock:
+            nonce, self.next_nonce = self.next_nonce, self.next_nonce + 1
+            return nonce
+
+    def release(self, nonce: int) -> bool:
+        """Give back a reserved nonce that was never sent; only the latest one can be reused."""
+        with self.lock:
+            if self.next_nonce == nonce + 1:
+                self.next_nonce = nonce
+                return True
+            return False
+
+class ReplacementLadder:
+    """One transaction signed at every rung of the tip ladder (same nonce).
+
+    Rung 0 is the first send; each later rung replaces the one before.
+    Everything is signed up front, so a bump is a lookup plus a send.
+    """
+
+    def __init__(self, nonce: int, rungs: List[Dict], replace_every_ms: float):
+        self.nonce = nonce
+        self.rungs = rungs  # {"tip", "max_fee", "raw", "hash"} per rung
+        self.replace_every = replace_every_ms / 1000
+        self.sent = -1
+        self.sent_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.rungs)
+
+    @property
+    def hashes(self) -> List[str]:
+        """Hashes of the rungs sent so far (any of them may be the one included)."""
+        return [rung["hash"] for rung in self.rungs[:self.sent + 1]]
+
+    def next_raw(self) -> Optional[bytes]:
+        """Raw bytes of the next rung to send, None when the ladder is exhausted."""
+        if self.sent + 1 >= len(self.rungs):
+            return None
+        self.sent += 1
+        self.sent_at = time.monotonic()
+        return self.rungs[self.sent]["raw"]
+
+    def bump_due(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return 0 <= self.sent < len(self.rungs) - 1 and now - self.sent_at >= self.replace_every
+
+class SearcherSigner:
+    """Signs the searcher's transactions for one chain with a local nonce.
+
+    ``prepare`` reserves a nonce and signs an EIP-1559 transaction at every
+    rung of the ``strategy.tips`` ladder, with max fee = 2 x base fee + tip
+    (raised where needed to stay a valid replacement).
+    """
+
+    def __init__(self, private_key: str, chain_id: int, tips_cfg: Dict):
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.chain_id = chain_id
+        self.tips = tip_ladder(tips_cfg.get("min_gwei", 0.0), tips_cfg.get("max_gwei", 0.05),
+                               tips_cfg.get("max_bumps", 3))
+        self.replace_every_ms = tips_cfg.get("replace_every_ms", 200)
+        self.nonces = NonceManager(self.address)
+        self.base_fee: Optional[int] = None
+
+    def update_base_fee(self, base_fee: int):
+        """Latest base fee (wei), fed from block heads."""
+        self.base_fee = base_fee
+
+    def fetch_base_fee(self, w3: Web3) -> int:
+        self.base_fee = int(w3.eth.get_block("latest")["baseFeePerGas"])
+        return self.base_fee
+
+    def prepare(self, w3: Web3, to: str, data: bytes, gas_limit: int, value: int = 0) -> ReplacementLadder:
+        """Reserve a nonce and pre-sign the whole replacement ladder."""
+        base_fee = self.base_fee if self.base_fee is not None else self.fetch_base_fee(w3)
+        nonce = self.nonces.reserve(w3)
+        rungs, previous = [], None
+        for tip in self.tips:
+            max_fee = 2 * base_fee + tip
+            if previous is not None:
+                max_fee = max(max_fee, min_replacement(previous["max_fee"]))
+            signed = self.account.sign_transaction({
+                "type": 2,
+                "chainId": self.chain_id,
+                "nonce": nonce,
+                "to": to_checksum_address(to),
+                "value": value,
+                "data": data,
+                "gas": gas_limit,
+                "maxPriorityFeePerGas": tip,
+                "maxFeePerGas": max_fee,
+            })
+            previous = {"tip": tip, "max_fee": max_fee, "raw": bytes(signed.rawTransaction),
+                        "hash": signed.hash.hex()}
+            rungs.append(previous)
+        return ReplacementLadder(nonce, rungs, self.replace_every_ms)
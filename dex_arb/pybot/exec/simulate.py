@@ -1,21 +1,29 @@
+import json
+import os
+from threading import Lock
 from web3 import Web3
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Sequence, Tuple
+
+DEFAULT_ROUTE_GAS = 200_000  # prior for a route shape never simulated or executed
+
+# (hop count, dex of every leg); routes of one shape cost about the same gas
+RouteShape = Tuple[int, Tuple[str, ...]]
 
 def call_static(w3: Web3, to: str, data: bytes, from_addr: Optional[str] = None) -> bytes:
     """Simulate transaction execution."""
     tx = {"to": to, "data": data}
     if from_addr:
         tx["from"] = from_addr
-    
+
     return w3.eth.call(tx)
 
-def estimate_gas(w3: Web3, tx: Dict[str, Any]) -> int:
-    """Estimate gas for transaction."""
+def estimate_gas(w3: Web3, tx: Dict[str, Any]) -> Optional[int]:
+    """Estimate gas for transaction (None if it reverts or the node refuses)."""
     try:
         return w3.eth.estimate_gas(tx)
     except Exception as e:
         print(f"Gas estimation failed: {e}")
-        return 0
+        return None
 
 def get_gas_price(w3: Web3) -> int:
     """Get current gas price."""
@@ -30,3 +38,154 @@ def calculate_gas_cost_usd(gas_limit: int, gas_price: int, eth_price_usd: float)
     gas_cost_wei = gas_limit * gas_price
     gas_cost_eth = gas_cost_wei / 1e18
     return gas_cost_eth * eth_price_usd
+
+def route_shape(route: Sequence[Dict]) -> RouteShape:
+    return len(route), tuple(leg["dex"] for leg in route)
+
+def _shape_key(shape: RouteShape) -> str:
+    return f"{shape[0]}:" + ",".join(shape[1])
+
+class GasModel:
+    """Learned gas use of ArbExecutor calls per route shape (hop count and dex sequence).
+
+    Observations come from pre-flight eth_estimateGas and from the gasUsed
+    of landed receipts, smoothed per shape with an EWMA. A shape never seen
+    borrows the mean of learned shapes with the same hop count, else the
+    ``default`` prior, so scoring a route never needs an RPC call. Kept in
+    a JSON file next to the pool snapshots.
+    """
+
+    def __init__(self, path: Optional[str] = None, default: int = DEFAULT_ROUTE_GAS, alpha: float = 0.3):
+        self.path = path
+        self.default = default
+        self.alpha = alpha
+        self.gas: Dict[RouteShape, float] = {}
+        self.samples: Dict[RouteShape, int] = {}
+        self.by_hops: Dict[int, float] = {}  # mean learned gas per hop count
+        self.lock = Lock()
+        self.dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.gas)
+
+    def observe(self, route: Sequence[Dict], gas_used: int):
+        if not gas_used or gas_used <= 0:
+            return
+        shape = route_shape(route)
+        with self.lock:
+            previous = self.gas.get(shape)
+            self.gas[shape] = gas_used if previous is None else \
+                self.alpha * gas_used + (1 - self.alpha) * previous
+            self.samples[shape] = self.samples.get(shape, 0) + 1
+            self._update_hops(shape[0])
+            self.dirty = True
+
+    def estimate(self, route: Sequence[Dict]) -> int:
+        shape = route_shape(route)
+        gas = self.gas.get(shape)
+        if gas is None:
+            gas = self.by_hops.get(shape[0], self.default)
+        return int(gas)
+
+    def estimates(self, routes: Iterable[Sequence[Dict]]) -> List[int]:
+        return [self.estimate(route) for route in routes]
+
+    def min_estimate(self) -> int:
+        """Lowest gas any route can be charged (a bound for pruning by edge)."""
+        return int(min([self.default, *self.gas.values()]))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {_shape_key(shape): {"gas": int(gas), "samples": self.samples.get(shape, 0)}
+                for shape, gas in sorted(self.gas.items())}
+
+    def save(self):
+        """Write the learned shapes atomically (only if something changed)."""
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            shapes, self.dirty = [[shape[0], list(shape[1]), gas, self.samples.get(shape, 0)]
+                                  for shape, gas in self.gas.items()], False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"shapes": shapes}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def _update_hops(self, hops: int):
+        learned = [gas for shape, gas in self.gas.items() if shape[0] == hops]
+        self.by_hops[hops] = sum(learned) / len(learned)
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for hops, dexes, gas, samples in data.get("shapes", []):
+            shape = (int(hops), tuple(dexes))
+            self.gas[shape], self.samples[shape] = float(gas), int(samples)
+        for hops in {shape[0] for shape in self.gas}:
+            self._update_hops(hops)
+
+def gas_model_path(directory: str, chain: str) -> str:
+    return os.path.join(directory, f"{chain}_gas.json")
+
+def _rpc_tx(tx: Dict[str, Any]) -> Dict[str, str]:
+    """A transaction as raw JSON-RPC params (the provider is called below web3's formatters)."""
+    out = {}
+    for key, value in tx.items():
+        if value is None:
+            continue
+        if isinstance(value, (bytes, bytearray)):
+            out[key] = "0x" + bytes(value).hex()
+        elif isinstance(value, int):
+            out[key] = hex(value)
+        else:
+            out[key] = value
+    return out
+
+def _error_message(response: Dict) -> str:
+    error = response.get("error") if isinstance(response, dict) else None
+    if error is None:
+        return "no result"
+    return str(error.get("message", error)) if isinstance(error, dict) else str(error)
+
+def simulate_calls(w3: Web3, txs: List[Dict[str, Any]], block_identifier,
+                   state_overrides: Optional[Dict[str, Dict]] = None,
+                   estimate_overrides: bool = False) -> List[Dict[str, Any]]:
+    """eth_call and eth_estimateGas of every tx at one block, in a single JSON-RPC batch.
+
+    ``state_overrides`` (address -> {balance, code, state, stateDiff}) go
+    with every eth_call, and with eth_estimateGas too when
+    ``estimate_overrides`` is set (not every node accepts them there).
+    Returns per tx {"ok", "gas", "error"}: ok is False when the call
+    reverted; gas is None when the estimate failed. Without a batching
+    provider (chains.PooledHTTPProvider) the calls go one by one.
+    """
+    if not txs:
+        return []
+    block = hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+    calls = []
+    for tx in txs:
+        params = [_rpc_tx(tx), block]
+        calls.append(("eth_call", params + [state_overrides] if state_overrides else params))
+        calls.append(("eth_estimateGas", params + [state_overrides] if state_overrides and estimate_overrides
+                      else params))
+    batch = getattr(w3.provider, "batch", None)
+    try:
+        responses = batch(calls) if batch is not None else \
+            [w3.provider.make_request(method, params) for method, params in calls]
+    except Exception as e:
+        return [{"ok": False, "gas": None, "error": f"{type(e).__name__}: {e}"} for _ in txs]
+    results = []
+    for n in range(len(txs)):
+        call, estimate = responses[2 * n], responses[2 * n + 1]
+        ok = isinstance(call, dict) and "result" in call
+        gas = None
+        if isinstance(estimate, dict) and estimate.get("result"):
+            gas = int(estimate["result"], 16)
+        results.append({"ok": ok, "gas": gas, "error": "" if ok else _error_message(call)})
+    return results
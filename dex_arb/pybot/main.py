@@ -1,198 +1,780 @@
+import asyncio
 import os
 import time
 import math
-from decimal import Decimal
+import numpy as np
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from web3 import Web3
 from pybot.cfg import load_config
-from pybot.chains import make_clients
-from pybot.discovery import uni_v3 as d_uni, curve as d_curve
+from pybot.chains import make_clients, rpc_urls
+from pybot.discovery.snapshot import cached_top_pools, snapshot_path
+from pybot.discovery.onchain import load_dex_config, onchain_top_pools
 from pybot.quotes import uni_v3 as q_uni, curve as q_curve
-from pybot.routing.generate import gen_two_three_legs
-from pybot.routing.score import allowed, required_profit_usd, calculate_profit_usd
-from pybot.exec.calldata import encode_route, encode_execute_call, encode_flashloan_call
-from pybot.exec.private_tx import send_private_or_public
-from pybot.exec.simulate import estimate_gas, get_gas_price, calculate_gas_cost_usd
-from pybot.utils.tokens import get_token_decimals, is_stablecoin
+from pybot.quotes.uni_v3_local import load_pools, verify_against_quoter
+from pybot.quotes.curve_local import load_pools as load_curve_pools
+from pybot.quotes.route import quote_route, quote_route_amounts, quote_routes_batch
+from pybot.state.cache import QuoteCache
+from pybot.state.store import PoolStateStore
+from pybot.routing.compact import LegTable, RouteTable, allowed_mask, gen_two_three_routes
+from pybot.routing.index import RouteIndex
+from pybot.routing.cycles import find_negative_cycles
+from pybot.routing.score import required_profit_usd, score_batch
+from pybot.routing.sizing import is_cyclic, optimize_size
+from pybot.exec.calldata import CalldataBuilder
+from pybot.exec.fees import FeeOracle
+from pybot.exec.private_tx import included_hash, receipt_gas_used
+from pybot.exec.relays import BuilderLookup, InclusionCheck, RelaySubmitter, chain_relays
+from pybot.exec.signer import ReplacementLadder, SearcherSigner
+from pybot.exec.simulate import GasModel, gas_model_path, get_gas_price, simulate_calls
+from pybot.utils.tokens import get_token_address, is_stablecoin
 from pybot.utils.math import calculate_min_return
+from pybot.utils.fixed import usd_to_units, usd_to_units_batch
+from pybot.utils.token_service import TokenService, pool_price_edges, token_cache_path
 from eth_abi import encode as abi_encode
 
 # Environment variables
 ARB_EXECUTOR = os.environ.get("EXECUTOR_CONTRACT")  # deployed ArbExecutor address
 SEARCHER_PK = os.environ.get("SEARCHER_PK")
 
+EXECUTION_GAS_LIMIT = 500_000  # per execution tx; only the gas actually used is paid
+
 def usd_to_amount(decimals: int, usd: float, price_usd: float = 1.0) -> int:
-    """Convert USD amount to token amount."""
-    return int(Decimal(usd) / Decimal(price_usd) * (10 ** decimals))
+    """Convert USD amount to token amount (exact, rounded toward zero)."""
+    return usd_to_units(decimals, usd, price_usd)
+
+def fetch_pools(cfg, chain_name: str, chain: Dict, full_refresh: bool = False) -> Dict[str, List[Dict]]:
+    """Pools above min_tvl_usd per dex from the configured discovery backend.
+
+    ``subgraph`` pages the hosted subgraphs; ``onchain`` scans factory logs
+    and Curve registries (addresses from the chain's dex_config file). Both
+    keep an on-disk snapshot, and ``full_refresh`` re-reads everything.
+    """
+    discovery_cfg = cfg.strategy.get("discovery", {})
+    snapshot_dir = discovery_cfg.get("snapshot_dir", "data/snapshots")
+    min_tvl_usd = cfg.strategy["limits"]["min_tvl_usd"]
+    
+    if discovery_cfg.get("backend", "subgraph") == "onchain":
+        return onchain_top_pools(
+            chain["w3"], chain_name,
+            load_dex_config(cfg.chains[chain_name]["dex_config"]),
+            snapshot_path(snapshot_dir, chain_name, "uni_v3", "onchain"),
+            snapshot_path(snapshot_dir, chain_name, "curve", "onchain"),
+            min_tvl_usd, full_refresh,
+            confirmations=discovery_cfg.get("confirmations", 12),
+            chunk_blocks=discovery_cfg.get("log_chunk_blocks", 50_000),
+            workers=discovery_cfg.get("log_workers", 8)
+        )
+    
+    paging = {"page_size": discovery_cfg.get("page_size", 1000), "shards": discovery_cfg.get("shards", 16)}
+    return {
+        dex: cached_top_pools(
+            dex, cfg.chains[chain_name][cfg_key]["subgraph"], min_tvl_usd,
+            snapshot_path(snapshot_dir, chain_name, dex), full_refresh, **paging
+        )
+        for dex, cfg_key in (("uni_v3", "univ3"), ("curve", "curve"))
+    }
+
+def discover(cfg, chain_name: str, chain: Dict,
+             full_refresh: bool = False) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """Discover pools on one chain and build their legs. Returns (legs, pools by dex).
+
+    Pools come from the on-disk snapshot when one exists (plus a delta fetch);
+    ``full_refresh`` re-reads the discovery backend and rewrites the snapshot.
+    """
+    legs = []
+    chain_pools = {}
+    print(f"Discovering pools on {chain_name}...")
+    pools = fetch_pools(cfg, chain_name, chain, full_refresh)
+    
+    # Uniswap v3 pools
+    try:
+        uni_pools = pools["uni_v3"]
+        print(f"Found {len(uni_pools)} Uni v3 pools on {chain_name}")
+        chain_pools["uni_v3"] = uni_pools
+        
+        for pool in uni_pools:
+            # Build 1-hop legs template
+            legs.append({
+                "chain": chain_name,
+                "dex": "uni_v3",
+                "addr": cfg.chains[chain_name]["univ3"]["router"],
+                "pool": pool["id"],
+                # The original SwapRouter's exactInputSingle takes a deadline, SwapRouter02's does not
+                "router_deadline": cfg.chains[chain_name]["univ3"].get("router_deadline", False),
+                "token_in": pool["token0"]["id"],
+                "token_out": pool["token1"]["id"],
+                "tvl_usd": float(pool["totalValueLockedUSD"]),
+                "fee_tier": int(pool["feeTier"]),
+                "sqrt_price_x96": int(pool.get("sqrtPrice") or 0),
+                "zero_for_one": True
+            })
+            legs.append({
+                "chain": chain_name,
+                "dex": "uni_v3",
+                "addr": cfg.chains[chain_name]["univ3"]["router"],
+                "pool": pool["id"],
+                "router_deadline": cfg.chains[chain_name]["univ3"].get("router_deadline", False),
+                "token_in": pool["token1"]["id"],
+                "token_out": pool["token0"]["id"],
+                "tvl_usd": float(pool["totalValueLockedUSD"]),
+                "fee_tier": int(pool["feeTier"]),
+                "sqrt_price_x96": int(pool.get("sqrtPrice") or 0),
+                "zero_for_one": False
+            })
+    except Exception as e:
+        print(f"Error discovering Uni v3 pools on {chain_name}: {e}")
+    
+    # Curve pools
+    try:
+        curve_pools = pools["curve"]
+        print(f"Found {len(curve_pools)} Curve pools on {chain_name}")
+        chain_pools["curve"] = curve_pools
+        
+        if cfg.strategy.get("quotes", {}).get("local_curve"):
+            # Coin indices (incl. metapool underlying coins) come from the local engine
+            engine = load_curve_pools(chain["w3"], curve_pools)
+            tvl_by_pool = {p["id"].lower(): float(p["totalValueLockedUSD"]) for p in curve_pools}
+            curve_legs = engine.legs(chain_name, tvl_by_pool)
+            legs.extend(curve_legs)
+            print(f"Built {len(curve_legs)} Curve legs from {len(engine.pools)} pools on {chain_name}")
+    except Exception as e:
+        print(f"Error discovering Curve pools on {chain_name}: {e}")
+    
+    return legs, chain_pools
+
+def generate_route_table(cfg, legs: List[Dict], chain_names: List[str]) -> Tuple[LegTable, RouteTable]:
+    """Generate, de-duplicate and filter candidate routes as rows of leg ids."""
+    routing_cfg = cfg.strategy.get("routing", {})
+    sources = routing_cfg.get("sources", ["two_three"])
+    table = LegTable.from_dicts(legs)
+    max_hops = cfg.strategy["limits"]["max_hops"]
+    
+    parts = []
+    if "two_three" in sources:
+        parts.append(gen_two_three_routes(table))
+    if "negative_cycle" in sources:
+        # Cycle search runs per chain, seeded from flashloanable tokens; it has its
+        # own depth bound, since longer cycles are what it adds over two_three
+        cycle_max_hops = routing_cfg.get("cycle_max_hops", max_hops)
+        max_hops = max(max_hops, cycle_max_hops)
+        for chain_name in chain_names:
+            base_tokens = [
+                get_token_address(chain_name, symbol).lower()
+                for symbol in routing_cfg.get("base_tokens", [])
+                if get_token_address(chain_name, symbol)
+            ]
+            chain_legs = [leg for leg in legs if leg["chain"] == chain_name]
+            cycles = find_negative_cycles(
+                chain_legs, base_tokens,
+                max_hops=cycle_max_hops
+            )
+            parts.append(RouteTable.from_tuples(table.route_ids(route) for route in cycles))
+    if not parts:
+        return table, RouteTable.from_tuples([])
+    
+    routes = RouteTable.concat(parts).unique()
+    mask = allowed_mask(table, routes,
+                        min_tvl_usd=cfg.strategy["limits"]["min_tvl_usd"],
+                        max_hops=max_hops,
+                        deny_exotic=cfg.strategy["limits"]["deny_fee_on_transfer"])
+    return table, routes.select(mask)
+
+def generate_candidates(cfg, legs: List[Dict], chain_names: List[str]) -> List[List[Dict]]:
+    """Generate, de-duplicate and filter candidate routes from all configured sources."""
+    table, routes = generate_route_table(cfg, legs, chain_names)
+    return routes.to_dicts(table)
+
+def load_tokens(cfg, chain_name: str, w3: Web3, chain_pools: Dict[str, List[Dict]], legs: List[Dict],
+                tokens: Optional[TokenService] = None) -> TokenService:
+    """Token metadata for one chain's legs.
+
+    Known tokens come from the static table, the on-disk cache and the
+    discovered pools; the rest are fetched in one batched multicall.
+    """
+    if tokens is None:
+        snapshot_dir = cfg.strategy.get("discovery", {}).get("snapshot_dir", "data/snapshots")
+        tokens = TokenService(chain_name, token_cache_path(snapshot_dir, chain_name))
+    tokens.learn_pools(chain_pools)
+    chain_legs = [leg for leg in legs if leg["chain"] == chain_name]
+    try:
+        tokens.resolve(w3, {leg["token_in"] for leg in chain_legs} | {leg["token_out"] for leg in chain_legs})
+    except Exception as e:
+        print(f"Error fetching token metadata on {chain_name}: {e}")
+    return tokens
+
+def price_tokens(tokens: TokenService, chain_pools: Dict[str, List[Dict]], block_number: Optional[int],
+                 state: Optional[PoolStateStore] = None) -> Dict[str, float]:
+    """USD prices at ``block_number``, from the live store or else the discovered pool snapshot."""
+    if state is not None:
+        edges = tokens.v3_edges(state.v3_sim.by_address.values())
+    else:
+        edges = pool_price_edges(chain_pools.get("uni_v3", []))
+    return tokens.update_prices(block_number, edges)
+
+def gas_unit_usd(w3: Web3, native_price_usd: float, gas_price: Optional[int] = None) -> float:
+    """USD cost of one unit of gas (times GasModel.estimate per route).
+
+    ``gas_price`` (wei) is normally FeeOracle.gas_price(); without it the
+    node's eth_gasPrice is asked.
+    """
+    if gas_price is None:
+        gas_price = get_gas_price(w3)
+    return gas_price / 1e18 * native_price_usd
+
+def quotable_routes(cfg, chain_name: str, candidates: List[List[Dict]]) -> List[List[Dict]]:
+    """The candidates of ``chain_name`` the configured quoting mode can price."""
+    quotes_cfg = cfg.strategy.get("quotes", {})
+    # Without local state only Uni v3-only routes can be quoted (as one multi-hop path)
+    return [
+        route for route in candidates
+        if route[0]["chain"] == chain_name and (
+            quotes_cfg.get("local_v3") or all(leg["dex"] == "uni_v3" for leg in route)
+        )
+    ]
+
+def quote_candidates(cfg, chain_name: str, w3: Web3, chain_routes: List[List[Dict]],
+                     chain_pools: Dict[str, List[Dict]], quote_cache: QuoteCache,
+                     block_number: int, gas_price_usd: float, tokens: TokenService,
+                     state: Optional[PoolStateStore] = None,
+                     gas_model: Optional[GasModel] = None) -> List[Dict]:
+    """Quote routes at a pinned block; one entry per successful (route, size) quote.
+
+    Entries carry the route's position in ``chain_routes`` as ``route_id``,
+    the USD amounts and the flash fee, but no gas: see profitable_entries.
+    Local quotes with a positive gross edge also carry every leg's output
+    as ``hop_amounts`` (the swap calls need them; see build_calldata).
+    Sizes are converted with the input token's own decimals and price at
+    ``block_number``; routes starting in an unpriced token are skipped.
+    Optimized sizing nets out each route's gas (``gas_model`` estimate
+    times ``gas_price_usd`` per unit).
+    """
+    sizes_usd = cfg.strategy["sizes_usd"]
+    quotes_cfg = cfg.strategy.get("quotes", {})
+    sizing_cfg = cfg.strategy.get("sizing", {})
+    quoter = cfg.chains[chain_name]["univ3"]["quoter_v2"]
+    if not chain_routes:
+        return []
+    if gas_model is None:
+        gas_model = GasModel()
+    
+    # Every route is quoted at the same USD ladder, in units of its input token
+    ladders: Dict[str, Optional[List[int]]] = {}
+    for route in chain_routes:
+        token_in = route[0]["token_in"]
+        if token_in not in ladders:
+            decimals, price = tokens.decimals(token_in), tokens.price_usd(token_in, block_number)
+            ladders[token_in] = None if decimals is None or not price else \
+                usd_to_units_batch(decimals, np.asarray(sizes_usd, dtype=np.float64), price).tolist()
+    routable = [route_id for route_id, route in enumerate(chain_routes) if ladders[route[0]["token_in"]]]
+    if len(routable) < len(chain_routes):
+        print(f"Skipping {len(chain_routes) - len(routable)} routes with unpriced input tokens on {chain_name}")
+    items = []
+    for route_id in routable:
+        for size_usd, amount_in in zip(sizes_usd, ladders[chain_routes[route_id][0]["token_in"]]):
+            items.append((route_id, size_usd, amount_in))
+    
+    if quotes_cfg.get("local_v3"):
+        if state is not None:
+            # One consistent view of the live store for the whole pass (cache keys included)
+            sim, engine, versions = state.snapshot()
+            if not quotes_cfg.get("local_curve"):
+                engine = None
+        else:
+            # Simulate swaps in-process from pool state pinned to this block
+            versions = None
+            sim = load_pools(w3, chain_pools.get("uni_v3", []), block_number)
+            engine = None
+            if quotes_cfg.get("local_curve") and chain_pools.get("curve"):
+                engine = load_curve_pools(w3, chain_pools["curve"], block_number)
+        if sizing_cfg.get("mode") == "optimize":
+            # One concave search per cyclic route replaces the sizes_usd ladder; routes
+            # ending in another token have no profit in input units to search, so they
+            # keep the ladder
+            ladder_items = [item for item in items if not is_cyclic(chain_routes[item[0]])]
+            items, results = [], []
+            for route_id in routable:
+                route = chain_routes[route_id]
+                if not is_cyclic(route):
+                    continue
+                token_in = route[0]["token_in"]
+                sized = optimize_size(
+                    route,
+                    lambda amount_in, route=route: quote_route(route, amount_in, sim, engine, quote_cache,
+                                                                      versions),
+                    tokens.decimals(token_in), tokens.price_usd(token_in, block_number),
+                    gas_model.estimate(route) * gas_price_usd, cfg.strategy["flashloan"]["fee_pct"],
+                    min_usd=sizing_cfg.get("min_usd", sizes_usd[0]),
+                    max_usd=cfg.strategy["risk"]["max_position_size_usd"],
+                    v3_sim=sim
+                )
+                if sized:
+                    items.append((route_id, sized["amount_in_usd"], sized["amount_in"]))
+                    results.append((sized["amount_out"] > 0, sized["amount_out"]))
+            items += ladder_items
+            results += quote_routes_batch(
+                [(chain_routes[route_id], amount_in) for route_id, _, amount_in in ladder_items],
+                sim, engine, quote_cache, versions
+            )
+        else:
+            results = quote_routes_batch(
+                [(chain_routes[route_id], amount_in) for route_id, _, amount_in in items],
+                sim, engine, quote_cache, versions
+            )
+        print(f"Quote cache on {chain_name}: {quote_cache.stats()}")
+    
+        # Uni v3 routes the simulator cannot answer (e.g. beyond loaded ticks) go to QuoterV2
+        fallback = [
+            n for n, (success, _) in enumerate(results)
+            if not success and all(leg["dex"] == "uni_v3" for leg in chain_routes[items[n][0]])
+        ]
+        if fallback:
+            remote = q_uni.quote_exact_in_batch(
+                w3, quoter,
+                [(q_uni.route_path(chain_routes[items[n][0]]), items[n][2]) for n in fallback],
+                block_identifier=block_number
+            )
+            for n, result in zip(fallback, remote):
+                results[n] = result
+    
+        if quotes_cfg.get("verify_local"):
+            uni_items = [
+                (q_uni.route_path(chain_routes[route_id]), amount_in) for route_id, _, amount_in in items
+                if all(leg["dex"] == "uni_v3" for leg in chain_routes[route_id])
+            ]
+            mismatches = verify_against_quoter(w3, quoter, sim, uni_items)
+            print(f"Local v3 verification on {chain_name}: {len(mismatches)} mismatches")
+            for mismatch in mismatches[:5]:
+                print(f"  {mismatch}")
+    else:
+        results = q_uni.quote_exact_in_batch(
+            w3, quoter,
+            [(q_uni.route_path(chain_routes[route_id]), amount_in) for route_id, _, amount_in in items],
+            block_identifier=block_number
+        )
+    print(f"Quoted {len(items)} route/size pairs on {chain_name} at block {block_number}")
+    
+    entries = []
+    for (route_id, size_usd, amount_in), (success, amount_out) in zip(items, results):
+        if not success:
+            continue
+        amount_out_usd = tokens.amount_to_usd(chain_routes[route_id][-1]["token_out"], amount_out, block_number)
+        if amount_out_usd is None:
+            continue
+        route = chain_routes[route_id]
+        hop_amounts = [amount_out] if len(route) == 1 else None
+        if hop_amounts is None and quotes_cfg.get("local_v3") and amount_out_usd > size_usd:
+            # Leg quotes the route was just priced with (cache hits); QuoterV2 fallbacks fail here
+            try:
+                hop_amounts = quote_route_amounts(route, amount_in, sim, engine, quote_cache, versions)
+            except Exception:
+                pass
+        entries.append({
+            "route_id": route_id,
+            "route": route,
+            "amount_in_usd": size_usd,
+            "amount_out_usd": amount_out_usd,
+            "amount_in": amount_in,
+            "amount_out": amount_out,
+            "hop_amounts": hop_amounts,
+            # Flash loan fee
+            "flash_fee_usd": size_usd * cfg.strategy["flashloan"]["fee_pct"],
+        })
+    return entries
+
+def profitable_entries(cfg, entries: List[Dict], gas_price_usd: float, gas_model: GasModel,
+                       best_per_route: bool = False) -> List[Dict]:
+    """Price quote entries at the current gas price; the profitable ones, best first.
+
+    Each entry pays its route's learned gas (``gas_model``) at
+    ``gas_price_usd`` per unit.
+    """
+    if not entries:
+        return []
+    gas_cost_usd = np.fromiter((gas_model.estimate(e["route"]) for e in entries),
+                               dtype=np.float64, count=len(entries)) * gas_price_usd
+    scored = score_batch(
+        np.fromiter((e["route_id"] for e in entries), dtype=np.int64, count=len(entries)),
+        np.fromiter((e["amount_in_usd"] for e in entries), dtype=np.float64, count=len(entries)),
+        np.fromiter((e["amount_out_usd"] for e in entries), dtype=np.float64, count=len(entries)),
+        gas_cost_usd,
+        np.fromiter((e["flash_fee_usd"] for e in entries), dtype=np.float64, count=len(entries)),
+        cfg.strategy["profit"]["profit_floor_usd"],
+        best_per_route
+    )
+    profit_usd = scored["profit_usd"]
+    return [
+        {
+            "route": entries[n]["route"],
+            "profit_usd": float(profit_usd[n]),
+            "amount_in_usd": entries[n]["amount_in_usd"],
+            "amount_out_usd": entries[n]["amount_out_usd"],
+            "amount_in": entries[n]["amount_in"],
+            "amount_out": entries[n]["amount_out"],
+            "hop_amounts": entries[n].get("hop_amounts"),
+            "gas_cost_usd": float(gas_cost_usd[n])
+        }
+        for n in scored["ranked"].tolist()
+    ]
+
+def quote_and_score(cfg, chain_name: str, w3: Web3, candidates: List[List[Dict]],
+                    chain_pools: Dict[str, List[Dict]], quote_cache: QuoteCache,
+                    block_number: Optional[int] = None,
+                    state: Optional[PoolStateStore] = None,
+                    tokens: Optional[TokenService] = None,
+                    gas_model: Optional[GasModel] = None,
+                    gas_price: Optional[int] = None) -> List[Dict]:
+    """Quote one chain's candidates at a pinned block and keep the profitable ones.
+
+    With a ``state`` store, local quotes use its live pool state instead of
+    reloading every pool at ``block_number``. Without ``tokens``, metadata
+    comes from the static table and the discovered pools only. Returns the
+    profitable routes sorted by profit, most profitable first, each at its best
+    size only (so execution never signs the same route twice).
+    """
+    chain_routes = quotable_routes(cfg, chain_name, candidates)
+    if not chain_routes:
+        return []
+    if tokens is None:
+        tokens = TokenService(chain_name)
+        tokens.learn_pools(chain_pools)
+    if gas_model is None:
+        gas_model = GasModel()
+    try:
+        if block_number is None:
+            block_number = w3.eth.block_number
+        price_tokens(tokens, chain_pools, block_number, state)
+        native_price_usd = tokens.native_price_usd(block_number)
+        if native_price_usd is None:
+            print(f"No native token price on {chain_name} at block {block_number}; skipping")
+            return []
+        gas_price_usd = gas_unit_usd(w3, native_price_usd, gas_price)
+        entries = quote_candidates(cfg, chain_name, w3, chain_routes, chain_pools, quote_cache,
+                                   block_number, gas_price_usd, tokens, state, gas_model)
+    except Exception as e:
+        print(f"Error quoting routes on {chain_name}: {e}")
+        return []
+    return profitable_entries(cfg, entries, gas_price_usd, gas_model, best_per_route=True)
+
+def requote_affected(cfg, chain_name: str, w3: Web3, index: RouteIndex, changed_pools: Optional[Set[str]],
+                     chain_pools: Dict[str, List[Dict]], quote_cache: QuoteCache, block_number: int,
+                     state: PoolStateStore, tokens: TokenService, top_n: int = 20,
+                     gas_model: Optional[GasModel] = None, gas_price: Optional[int] = None) -> List[Dict]:
+    """Re-quote only the indexed routes touching ``changed_pools``; the running top-N.
+
+    ``changed_pools`` of None re-quotes every route (e.g. right after the
+    index is built). Quotes of untouched routes are still exact for their
+    pools' unchanged state, so only the gas cost is re-applied to them (their
+    USD amounts stay at the token prices they were quoted at).
+    """
+    price_tokens(tokens, chain_pools, block_number, state)
+    native_price_usd = tokens.native_price_usd(block_number)
+    if native_price_usd is None:
+        print(f"No native token price on {chain_name} at block {block_number}; skipping")
+        return []
+    if gas_model is None:
+        gas_model = GasModel()
+    gas_price_usd = gas_unit_usd(w3, native_price_usd, gas_price)
+    route_ids = sorted(range(len(index.routes)) if changed_pools is None else index.routes_for(changed_pools))
+    if route_ids:
+        entries = quote_candidates(cfg, chain_name, w3, [index.routes[n] for n in route_ids], chain_pools,
+                                   quote_cache, block_number, gas_price_usd, tokens, state, gas_model)
+        for entry in entries:
+            entry["route_id"] = route_ids[entry["route_id"]]
+        index.update(route_ids, entries)
+    floor_usd = cfg.strategy["profit"]["profit_floor_usd"]
+    # No route's gas is below the cheapest learned shape, so that bounds every edge
+    min_gas_usd = gas_model.min_estimate() * gas_price_usd
+    return index.top(
+        top_n, lambda route_entries: profitable_entries(cfg, route_entries, gas_price_usd, gas_model, True),
+        min_gas_usd, required_profit_usd(min_gas_usd, 0.0, floor_usd)
+    )
+
+def build_calldata(cfg, route_data: Dict, calldata: CalldataBuilder, deadline_s: int = 300) -> bytes:
+    """ArbExecutor calldata for a scored opportunity from its route's pre-encoded template.
+
+    Each hop's swap call spends the previous hop's minimum output, which is
+    its quoted ``hop_amounts`` output less the slippage allowance so far.
+    """
+    route = route_data["route"]
+    template = calldata.template(route)
+    # Slippage allowance grows with the number of hops
+    slippage_bps = cfg.strategy["profit"]["slippage_bps_per_leg"]
+    hop_min_outs = [calculate_min_return(amount, slippage_bps * (n + 1))
+                    for n, amount in enumerate(route_data["hop_amounts"])]
+    min_return = hop_min_outs[-1]
+    deadline = int(time.time()) + deadline_s
+    amount_in = route_data["amount_in"]
+    if cfg.strategy["flashloan"]["enabled"]:
+        return template.flashloan_call(amount_in, min_return, deadline, amount_in, hop_min_outs)
+    return template.execute_call(amount_in, min_return, deadline, hop_min_outs)
+
+def with_hop_amounts(cfg, w3: Web3, routes_data: List[Dict], block_identifier) -> List[Dict]:
+    """``routes_data`` with every opportunity's ``hop_amounts``, the ones lacking them quoted now.
+
+    Routes quoted end to end through QuoterV2 only know their final output;
+    each leg's output is the quote of the path up to it, batched at
+    ``block_identifier``. Opportunities whose leg outputs cannot be quoted
+    (failed prefix quotes, non-Uni v3 legs) are dropped.
+    """
+    missing = [
+        route_data for route_data in routes_data
+        if route_data.get("hop_amounts") is None and all(leg["dex"] == "uni_v3" for leg in route_data["route"])
+    ]
+    quoted: Dict[int, List[int]] = {}
+    if missing:
+        quoter = cfg.chains[missing[0]["route"][0]["chain"]]["univ3"]["quoter_v2"]
+        results = iter(q_uni.quote_exact_in_batch(
+            w3, quoter,
+            [(q_uni.route_path(route_data["route"][:n]), route_data["amount_in"])
+             for route_data in missing for n in range(1, len(route_data["route"]))],
+            block_identifier=block_identifier
+        ))
+        for route_data in missing:
+            prefixes = [next(results) for _ in range(len(route_data["route"]) - 1)]
+            if all(success for success, _ in prefixes):
+                quoted[id(route_data)] = [amount for _, amount in prefixes] + [route_data["amount_out"]]
+    complete = []
+    for route_data in routes_data:
+        if route_data.get("hop_amounts") is not None:
+            complete.append(route_data)
+        elif id(route_data) in quoted:
+            complete.append(dict(route_data, hop_amounts=quoted[id(route_data)]))
+        else:
+            print(f"Dropping route with profit ${route_data['profit_usd']:.4f}: no per-hop quotes")
+    return complete
+
+def make_signer(cfg, w3: Web3) -> Optional[SearcherSigner]:
+    """The searcher key's signer for one chain (nonce synced), or None without SEARCHER_PK."""
+    if not SEARCHER_PK:
+        return None
+    signer = SearcherSigner(SEARCHER_PK, w3.eth.chain_id, cfg.strategy.get("tips", {}))
+    signer.nonces.resync(w3)
+    return signer
+
+def make_submitter(cfg, chain_name: str) -> RelaySubmitter:
+    """Fan-out submitter over the chain's private relays (public RPCs as fallback)."""
+    exec_cfg = cfg.strategy.get("execution", {})
+    chain_cfg = cfg.chains[chain_name]
+    public_urls = rpc_urls(chain_cfg) if exec_cfg.get("public_fallback", True) else []
+    return RelaySubmitter(chain_relays(chain_cfg, public_urls),
+                          fanout=exec_cfg.get("relay_fanout", 0),
+                          timeout_s=exec_cfg.get("relay_timeout_s", 2.0))
+
+def preflight(cfg, w3: Web3, datas: List[bytes], block_identifier, from_addr: Optional[str] = None
+              ) -> List[Dict]:
+    """Simulate encoded ArbExecutor calls in one batch at ``block_identifier`` (see simulate_calls).
+
+    The sender gets a large native balance through state overrides, plus
+    any configured ``simulation.state_overrides`` (e.g. token balances for
+    execute without a flash loan).
+    """
+    sim_cfg = cfg.strategy.get("simulation", {})
+    overrides = {address: dict(override) for address, override in (sim_cfg.get("state_overrides") or {}).items()}
+    if from_addr:
+        overrides.setdefault(from_addr, {}).setdefault("balance", hex(10 ** 30))
+    txs = [{"from": from_addr, "to": ARB_EXECUTOR, "data": data} for data in datas]
+    return simulate_calls(w3, txs, block_identifier, overrides or None, sim_cfg.get("estimate_overrides", False))
+
+def prepare_executions(cfg, w3: Web3, profitable_routes: List[Dict], limit: int = 3,
+                       calldata: Optional[CalldataBuilder] = None,
+                       signer: Optional[SearcherSigner] = None,
+                       gas_model: Optional[GasModel] = None,
+                       block_number: Optional[int] = None,
+                       fees: Optional[FeeOracle] = None) -> List[Tuple[Dict, Optional[ReplacementLadder]]]:
+    """Calldata for the best routes, simulated and signed at every rung of the tip ladder.
+
+    The top ``simulation.top_k`` calls are simulated in one batch at
+    ``block_number`` (the block they were quoted at); reverting ones are
+    dropped, the others feed ``gas_model`` and are signed with their
+    estimate times ``simulation.gas_headroom`` as the gas limit. Without
+    a signer or EXECUTOR_CONTRACT this is a dry run: the calldata is built
+    (and simulated, given EXECUTOR_CONTRACT) but no ladder is signed.
+    Pre-flight outcomes go to ``fees``; a signer whose base fee is fed
+    from heads is not asked to fetch it.
+    """
+    if calldata is None:
+        calldata = CalldataBuilder(ARB_EXECUTOR)
+    sim_cfg = cfg.strategy.get("simulation", {})
+    simulate = bool(ARB_EXECUTOR) and sim_cfg.get("enabled", True)
+    live = signer is not None and bool(ARB_EXECUTOR)
+    candidates = profitable_routes[:max(limit, sim_cfg.get("top_k", limit))] if simulate else profitable_routes[:limit]
+    candidates = with_hop_amounts(cfg, w3, candidates, block_number if block_number is not None else "latest")
+    datas = [build_calldata(cfg, route_data, calldata) for route_data in candidates]
+    gas_limits: List[Optional[int]] = [EXECUTION_GAS_LIMIT] * len(candidates)
+    if simulate and candidates:
+        block = block_number if block_number is not None else "latest"
+        results = preflight(cfg, w3, datas, block, signer.address if signer is not None else None)
+        headroom = sim_cfg.get("gas_headroom", 1.2)
+        for n, (route_data, result) in enumerate(zip(candidates, results)):
+            if fees is not None:
+                fees.record_simulation(result["ok"])
+            if not result["ok"]:
+                gas_limits[n] = None
+                print(f"Pre-flight revert (profit ${route_data['profit_usd']:.4f}): {result['error'][:120]}")
+            elif result["gas"]:
+                if gas_model is not None:
+                    gas_model.observe(route_data["route"], result["gas"])
+                gas_limits[n] = math.ceil(result["gas"] * headroom)
+    if live and candidates and signer.base_fee is None:
+        signer.fetch_base_fee(w3)
+    prepared = []
+    for route_data, data, gas_limit in zip(candidates, datas, gas_limits):
+        if gas_limit is None:
+            continue
+        if len(prepared) == limit:
+            break
+        print(f"Executing route with profit: ${route_data['profit_usd']:.4f}")
+        ladder = signer.prepare(w3, ARB_EXECUTOR, data, gas_limit) if live else None
+        prepared.append((route_data, ladder))
+    return prepared
+
+async def submit_executions(chain_name: str, prepared: List[Tuple[Dict, Optional[ReplacementLadder]]],
+                            submitter: RelaySubmitter, included: InclusionCheck,
+                            reset_nonce: Callable[[], Awaitable], timeout_s: float = 12.0,
+                            builder_of: Optional[BuilderLookup] = None,
+                            gas_used: Optional[Callable[[str], Awaitable[Optional[int]]]] = None,
+                            gas_model: Optional[GasModel] = None,
+                            fees: Optional[FeeOracle] = None,
+                            on_outcome: Optional[Callable[[Dict, ReplacementLadder, Optional[str], str, Optional[int]], Any]] = None) -> List[Optional[str]]:
+    """Submit each signed ladder through the relays; the landed hash per ladder (None if missed).
+
+    With ``gas_used`` (receipt gasUsed of a hash), landed routes feed
+    ``gas_model``, and a landed transaction that reverted counts as failed
+    in ``fees`` like one that never landed. ``on_outcome(route_data, ladder,
+    landed, status, gas_used)`` hears of every ladder sent, with status
+    success, reverted or missed.
+
+    Ladders hold consecutive nonces, so once one misses (and the nonce is
+    taken back from the node) the later ones could only land after that
+    nonce is reused: they are never sent and count as not landed.
+    """
+    landed_hashes = []
+    for n, (route_data, ladder) in enumerate(prepared):
+        if ladder is None:
+            continue
+        try:
+            landed = await submitter.submit_ladder(ladder, included, timeout_s, builder_of)
+        except Exception as e:
+            print(f"Sending route on {chain_name} failed: {e}")
+            landed = None
+        ok = landed is not None
+        used = None
+        if landed:
+            print(f"Included {landed} (nonce {ladder.nonce}, {ladder.sent + 1} of {len(ladder)} rungs sent)")
+            if gas_used is not None:
+                try:
+                    used = await gas_used(landed)
+                    ok = used is not None
+                    if gas_model is not None and used is not None:
+                        gas_model.observe(route_data["route"], used)
+                except Exception as e:
+                    print(f"Receipt of {landed} on {chain_name} unavailable: {e}")
+        else:
+            # Dropped or rejected: take the node's nonce again so no gap is left behind
+            await reset_nonce()
+            print(f"Route on {chain_name} not included (nonce {ladder.nonce})")
+        if fees is not None:
+            fees.record_execution(ok)
+        if on_outcome is not None:
+            on_outcome(route_data, ladder, landed, "success" if ok else "reverted" if landed else "missed", used)
+        landed_hashes.append(landed)
+        if landed is None:
+            dropped = sum(1 for _, later in prepared[n + 1:] if later is not None)
+            if dropped:
+                print(f"Dropping {dropped} later routes on {chain_name} signed past nonce {ladder.nonce}")
+            landed_hashes.extend([None] * dropped)
+            break
+    return landed_hashes
+
+def execute_routes(cfg, chain_name: str, w3: Web3, profitable_routes: List[Dict], limit: int = 3,
+                   calldata: Optional[CalldataBuilder] = None, signer: Optional[SearcherSigner] = None,
+                   gas_model: Optional[GasModel] = None, block_number: Optional[int] = None):
+    """Execute the best profitable routes on one chain (blocking; see the engine for the async path)."""
+    prepared = prepare_executions(cfg, w3, profitable_routes, limit, calldata, signer, gas_model, block_number)
+    if not any(ladder is not None for _, ladder in prepared):
+        return
+
+    async def included(hashes: List[str]) -> Optional[str]:
+        return await asyncio.to_thread(included_hash, w3, hashes)
+
+    async def reset_nonce():
+        await asyncio.to_thread(signer.nonces.reset, w3)
+
+    async def gas_used(tx_hash: str) -> Optional[int]:
+        return await asyncio.to_thread(receipt_gas_used, w3, tx_hash)
+
+    async def run():
+        submitter = make_submitter(cfg, chain_name)
+        try:
+            await submit_executions(chain_name, prepared, submitter, included, reset_nonce,
+                                    cfg.strategy.get("execution", {}).get("inclusion_timeout_s", 12.0),
+                                    gas_used=gas_used, gas_model=gas_model)
+        finally:
+            await submitter.close()
+        print(f"Relays on {chain_name}: {submitter.stats()}")
+
+    asyncio.run(run())
 
 def main():
-    """Main arbitrage bot orchestrator."""
+    """Main arbitrage bot orchestrator (one pass). See pybot.engine for the long-running loop."""
     cfg = load_config()
-    clients = make_clients(cfg.chains)
+    clients = make_clients(cfg.chains, cfg.strategy.get("rpc"))
 
     print("Starting arbitrage bot...")
     print(f"Configured chains: {list(cfg.chains.keys())}")
 
     # 1) DISCOVERY (Base + Arbitrum)
     legs = []
+    pools_by_chain = {}
     for chain_name in ["base", "arbitrum"]:
         if chain_name not in clients:
             continue
-            
-        chain = clients[chain_name]
-        print(f"Discovering pools on {chain_name}...")
-        
-        # Uniswap v3 pools
-        try:
-            uni_pools = d_uni.top_pools(
-                cfg.chains[chain_name]["univ3"]["subgraph"], 
-                cfg.strategy["limits"]["min_tvl_usd"]
-            )
-            print(f"Found {len(uni_pools)} Uni v3 pools on {chain_name}")
-            
-            for pool in uni_pools:
-                # Build 1-hop legs template
-                legs.append({
-                    "chain": chain_name,
-                    "dex": "uni_v3",
-                    "addr": cfg.chains[chain_name]["univ3"]["router"],
-                    "data": b"",  # filled at quote time
-                    "token_in": pool["token0"]["id"],
-                    "token_out": pool["token1"]["id"],
-                    "tvl_usd": float(pool["totalValueLockedUSD"]),
-                    "fee_tier": int(pool["feeTier"])
-                })
-                legs.append({
-                    "chain": chain_name,
-                    "dex": "uni_v3",
-                    "addr": cfg.chains[chain_name]["univ3"]["router"],
-                    "data": b"",
-                    "token_in": pool["token1"]["id"],
-                    "token_out": pool["token0"]["id"],
-                    "tvl_usd": float(pool["totalValueLockedUSD"]),
-                    "fee_tier": int(pool["feeTier"])
-                })
-        except Exception as e:
-            print(f"Error discovering Uni v3 pools on {chain_name}: {e}")
-        
-        # Curve pools
-        try:
-            curve_pools = d_curve.top_pools(
-                cfg.chains[chain_name]["curve"]["subgraph"], 
-                cfg.strategy["limits"]["min_tvl_usd"]
-            )
-            print(f"Found {len(curve_pools)} Curve pools on {chain_name}")
-            
-            for pool in curve_pools:
-                # Placeholder for Curve legs (would need coin index mapping)
-                pass
-        except Exception as e:
-            print(f"Error discovering Curve pools on {chain_name}: {e}")
+        chain_legs, pools_by_chain[chain_name] = discover(cfg, chain_name, clients[chain_name])
+        legs.extend(chain_legs)
 
     print(f"Total legs discovered: {len(legs)}")
 
     # 2) GENERATE CANDIDATE ROUTES
-    candidates = []
-    for route in gen_two_three_legs(legs):
-        if not allowed(route,
-                      min_tvl_usd=cfg.strategy["limits"]["min_tvl_usd"],
-                      max_hops=cfg.strategy["limits"]["max_hops"],
-                      deny_exotic=cfg.strategy["limits"]["deny_fee_on_transfer"]):
-            continue
-        candidates.append(route)
-
+    candidates = generate_candidates(cfg, legs, list(pools_by_chain))
     print(f"Generated {len(candidates)} candidate routes")
 
-    # 3) QUOTE + SCORE (simplified demo)
-    profitable_routes = []
-    
-    for route in candidates[:10]:  # Limit to first 10 for demo
-        try:
-            # Get chain for this route
-            chain_name = route[0]["chain"]
-            chain_client = clients[chain_name]
-            w3 = chain_client["w3"]
-            
-            # Test with first size from config
-            test_size_usd = cfg.strategy["sizes_usd"][0]
-            
-            # Convert to token amount (simplified - assume USDC)
-            input_token = route[0]["token_in"]
-            input_decimals = get_token_decimals("USDC")  # Simplified
-            amount_in = usd_to_amount(input_decimals, test_size_usd)
-            
-            # Build path and quote
-            if route[0]["dex"] == "uni_v3":
-                # Encode path for Uni v3
-                tokens = [route[0]["token_in"], route[0]["token_out"]]
-                fees = [route[0]["fee_tier"]]
-                path = q_uni.encode_path(tokens, fees)
-                
-                # Quote
-                quoter = cfg.chains[chain_name]["univ3"]["quoter_v2"]
-                amount_out = q_uni.quote_exact_in(w3, quoter, path, amount_in)
-                
-                # Calculate profit
-                amount_in_usd = test_size_usd
-                amount_out_usd = amount_out / (10 ** get_token_decimals("USDC"))
-                
-                # Estimate gas
-                gas_price = get_gas_price(w3)
-                gas_limit = 200000  # Simplified estimate
-                gas_cost_usd = calculate_gas_cost_usd(gas_limit, gas_price, 1.0)  # Assume $1 ETH
-                
-                # Flash loan fee
-                flash_fee_usd = test_size_usd * cfg.strategy["flashloan"]["fee_pct"]
-                
-                # Calculate profit
-                profit_usd = calculate_profit_usd(
-                    amount_in_usd, amount_out_usd, gas_cost_usd, flash_fee_usd
-                )
-                
-                required_profit = required_profit_usd(
-                    gas_cost_usd, flash_fee_usd, cfg.strategy["profit"]["profit_floor_usd"]
-                )
-                
-                if profit_usd > required_profit:
-                    profitable_routes.append({
-                        "route": route,
-                        "profit_usd": profit_usd,
-                        "amount_in_usd": amount_in_usd,
-                        "amount_out_usd": amount_out_usd,
-                        "gas_cost_usd": gas_cost_usd
-                    })
-                    
-        except Exception as e:
-            print(f"Error quoting route: {e}")
-            continue
+    # Token decimals and symbols, cached on disk after the first run
+    tokens_by_chain = {
+        chain_name: load_tokens(cfg, chain_name, clients[chain_name]["w3"], chain_pools, legs)
+        for chain_name, chain_pools in pools_by_chain.items()
+    }
+    # Learned gas per route shape, kept next to the pool snapshots
+    snapshot_dir = cfg.strategy.get("discovery", {}).get("snapshot_dir", "data/snapshots")
+    gas_models = {chain_name: GasModel(gas_model_path(snapshot_dir, chain_name)) for chain_name in clients}
+
+    # 3) QUOTE + SCORE (batched through Multicall3, one pinned block per chain)
+    quotes_cfg = cfg.strategy.get("quotes", {})
+    # Routes sharing a pool reuse each other's leg quotes
+    quote_cache = QuoteCache(max_entries=quotes_cfg.get("cache_entries", 100_000))
+    profitable_by_chain = {}
+    quote_blocks = {}
+    for chain_name, chain_client in clients.items():
+        quote_blocks[chain_name] = chain_client["w3"].eth.block_number
+        profitable_by_chain[chain_name] = quote_and_score(
+            cfg, chain_name, chain_client["w3"], candidates,
+            pools_by_chain.get(chain_name, {}), quote_cache, quote_blocks[chain_name],
+            tokens=tokens_by_chain.get(chain_name), gas_model=gas_models[chain_name]
+        )
+
+    print(f"Found {sum(len(r) for r in profitable_by_chain.values())} profitable routes")
 
-    print(f"Found {len(profitable_routes)} profitable routes")
-    
     # 4) EXECUTE PROFITABLE ROUTES (simplified demo)
-    for route_data in profitable_routes[:3]:  # Limit to first 3 for demo
-        route = route_data["route"]
-        profit_usd = route_data["profit_usd"]
-        
-        print(f"Executing route with profit: ${profit_usd:.4f}")
-        
-        # In a real implementation, you would:
-        # 1. Build the complete calldata
-        # 2. Sign the transaction
-        # 3. Send via private mempool
-        # 4. Monitor for success/failure
-        
-        # Example calldata building (commented out for demo)
-        # route_bytes = encode_route(route, route[0]["token_in"], route[-1]["token_out"])
-        # amount_in = usd_to_amount(input_decimals, test_size_usd)
-        # min_return = calculate_min_return(amount_out, cfg.strategy["profit"]["slippage_bps_per_leg"])
-        # deadline = int(time.time()) + 300  # 5 minutes
-        # 
-        # if cfg.strategy["flashloan"]["enabled"]:
-        #     calldata = encode_flashloan_call(route_bytes, amount_in, min_return, deadline, amount_in)
-        # else:
-        #     calldata = encode_execute_call(route_bytes, amount_in, min_return, deadline)
-        # 
-        # # Sign and send transaction
-        # # tx_hash = send_private_or_public(w3, signed_tx, cfg.chains[chain_name]["private_tx_rpc"])
+    calldata = CalldataBuilder(ARB_EXECUTOR)
+    calldata.prepare(candidates)
+    for chain_name, profitable_routes in profitable_by_chain.items():
+        w3 = clients[chain_name]["w3"]
+        signer = make_signer(cfg, w3) if profitable_routes else None
+        execute_routes(cfg, chain_name, w3, profitable_routes, calldata=calldata, signer=signer,
+                       gas_model=gas_models[chain_name], block_number=quote_blocks[chain_name])
+        gas_models[chain_name].save()
+
+    for chain_client in clients.values():
+        chain_client["w3"].provider.close()
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,8 @@
 from web3 import Web3
-from typing import Union
+from eth_abi import encode
+from eth_utils import function_signature_to_4byte_selector
+from typing import List, Optional, Tuple, Union
+from pybot.quotes.multicall import aggregate3, decode_uint
 
 # Curve get_dy ABI
 GET_DY_ABI = [{
@@ -38,3 +41,20 @@ def get_dy(w3: Web3, pool: str, i: int, j: int, dx: int, underlying: bool = Fals
         return contract.functions.get_dy_underlying(i, j, dx).call()
     else:
         return contract.functions.get_dy(i, j, dx).call()
+
+GET_DY_SELECTOR = function_signature_to_4byte_selector("get_dy(int128,int128,uint256)")
+GET_DY_UNDERLYING_SELECTOR = function_signature_to_4byte_selector("get_dy_underlying(int128,int128,uint256)")
+
+def get_dy_batch(w3: Web3, items: List[Tuple[str, int, int, int]], underlying: bool = False,
+                 block_identifier: Optional[Union[int, str]] = None) -> List[Tuple[bool, int]]:
+    """Quote many (pool, i, j, dx) swaps through Multicall3 at one block.
+
+    Returns (success, dy) per item, in input order. A reverting quote only marks
+    its own item as failed.
+    """
+    selector = GET_DY_UNDERLYING_SELECTOR if underlying else GET_DY_SELECTOR
+    calls = [
+        (pool, selector + encode(["int128", "int128", "uint256"], [i, j, dx]))
+        for pool, i, j, dx in items
+    ]
+    return [decode_uint(result) for result in aggregate3(w3, calls, block_identifier)]
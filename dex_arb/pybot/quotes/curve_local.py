@@ -0,0 +1,514 @@
+from web3 import Web3
+from eth_abi import encode, decode
+from eth_utils import function_signature_to_4byte_selector
+from typing import Dict, List, Optional, Tuple, Union
+from pybot.quotes.multicall import aggregate3
+
+PRECISION = 10 ** 18
+FEE_DENOMINATOR = 10 ** 10
+A_MULTIPLIER = 10000  # CryptoSwap A precision
+
+def _sel(signature: str) -> bytes:
+    return function_signature_to_4byte_selector(signature)
+
+# --- StableSwap math (integer Newton iterations as in the Vyper pools) ---
+
+def get_D(xp: List[int], amp: int, a_precision: int = 1) -> int:
+    """StableSwap invariant D for normalized balances ``xp``."""
+    n = len(xp)
+    S = sum(xp)
+    if S == 0:
+        return 0
+
+    D = S
+    Ann = amp * n
+    for _ in range(255):
+        D_P = D
+        for x in xp:
+            D_P = D_P * D // (x * n)
+        D_prev = D
+        D = ((Ann * S // a_precision + D_P * n) * D //
+             ((Ann - a_precision) * D // a_precision + (n + 1) * D_P))
+        if abs(D - D_prev) <= 1:
+            return D
+    raise ArithmeticError("get_D did not converge")
+
+def get_y_D(amp: int, i: int, xp: List[int], D: int, a_precision: int = 1,
+            j: Optional[int] = None, x: Optional[int] = None) -> int:
+    """Solve the invariant for xp[j] (or xp[i] when ``j`` is None) at a given D.
+
+    With ``j`` set, xp[i] is replaced by ``x`` (the get_y case); otherwise coin
+    ``i`` is the unknown (the get_y_D case used by withdraw_one_coin).
+    """
+    n = len(xp)
+    Ann = amp * n
+    target = i if j is None else j
+    c = D
+    S_ = 0
+    for k in range(n):
+        if j is not None and k == i:
+            _x = x
+        elif k != target:
+            _x = xp[k]
+        else:
+            continue
+        S_ += _x
+        c = c * D // (_x * n)
+    c = c * D * a_precision // (Ann * n)
+    b = S_ + D * a_precision // Ann
+
+    y = D
+    for _ in range(255):
+        y_prev = y
+        y = (y * y + c) // (2 * y + b - D)
+        if abs(y - y_prev) <= 1:
+            return y
+    raise ArithmeticError("get_y did not converge")
+
+# --- CryptoSwap (2-coin) math ---
+
+def newton_y_crypto(ANN: int, gamma: int, x: List[int], D: int, i: int) -> int:
+    """CryptoSwap newton_y for a two-coin pool: solve for x[i] given x[1 - i] and D."""
+    n = 2
+    x_j = x[1 - i]
+    y = D ** 2 // (x_j * n ** 2)
+    K0_i = (10 ** 18 * n) * x_j // D
+    convergence_limit = max(max(x_j // 10 ** 14, D // 10 ** 14), 100)
+
+    for _ in range(255):
+        y_prev = y
+        K0 = K0_i * y * n // D
+        S = x_j + y
+
+        _g1k0 = gamma + 10 ** 18
+        if _g1k0 > K0:
+            _g1k0 = _g1k0 - K0 + 1
+        else:
+            _g1k0 = K0 - _g1k0 + 1
+
+        mul1 = 10 ** 18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+        mul2 = 10 ** 18 + (2 * 10 ** 18) * K0 // _g1k0
+
+        yfprime = 10 ** 18 * y + S * mul2 + mul1
+        _dyfprime = D * mul2
+        if yfprime < _dyfprime:
+            y = y_prev // 2
+            continue
+        yfprime -= _dyfprime
+        fprime = yfprime // y
+
+        y_minus = mul1 // fprime
+        y_plus = (yfprime + 10 ** 18 * D) // fprime + y_minus * 10 ** 18 // K0
+        y_minus += 10 ** 18 * S // fprime
+
+        if y_plus < y_minus:
+            y = y_prev // 2
+        else:
+            y = y_plus - y_minus
+
+        if abs(y - y_prev) < max(convergence_limit, y // 10 ** 14):
+            frac = y * 10 ** 18 // D
+            if not 10 ** 16 - 1 < frac < 10 ** 20 + 1:
+                raise ArithmeticError("newton_y result out of safe range")
+            return y
+    raise ArithmeticError("newton_y did not converge")
+
+class StableSwapPool:
+    """Cached state of a Curve StableSwap (plain or meta) pool.
+
+    Mirrors the factory plain pool get_dy: fee is taken in normalized units
+    before converting back with the output coin's rate.
+    """
+
+    def __init__(self, address: str, coins: List[str], balances: List[int], rates: List[int],
+                 amp: int, fee: int, a_precision: int = 1, total_supply: int = 0,
+                 base_pool: Optional["StableSwapPool"] = None,
+                 block_number: Optional[int] = None, base_address: Optional[str] = None):
+        self.address = address.lower()
+        self.coins = [c.lower() for c in coins]
+        self.balances = balances
+        self.rates = rates  # 10**(36 - decimals) per coin, like RATES / rate_multipliers
+        self.amp = amp
+        self.fee = fee
+        self.a_precision = a_precision
+        self.total_supply = total_supply
+        self.base_pool = base_pool
+        # Kept even when the base pool is not loaded, so it can be linked later
+        self.base_address = base_address.lower() if base_address else (base_pool.address if base_pool else None)
+        self.block_number = block_number
+
+    @property
+    def n_coins(self) -> int:
+        return len(self.coins)
+
+    def coin_index(self, token: str) -> int:
+        return self.coins.index(token.lower())
+
+    def underlying_coins(self) -> List[str]:
+        """Meta coin followed by the base pool coins (empty for plain pools)."""
+        if self.base_pool is None:
+            return []
+        return self.coins[:-1] + self.base_pool.coins
+
+    def _rates(self) -> List[int]:
+        rates = list(self.rates)
+        if self.base_pool is not None:
+            # Metapools price the base LP token at its virtual price
+            rates[-1] = self.base_pool.get_virtual_price()
+        return rates
+
+    def _xp(self, rates: List[int]) -> List[int]:
+        return [rate * balance // PRECISION for rate, balance in zip(rates, self.balances)]
+
+    def get_virtual_price(self) -> int:
+        D = get_D(self._xp(self._rates()), self.amp, self.a_precision)
+        return D * PRECISION // self.total_supply
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        rates = self._rates()
+        xp = self._xp(rates)
+        x = xp[i] + dx * rates[i] // PRECISION
+        D = get_D(xp, self.amp, self.a_precision)
+        y = get_y_D(self.amp, i, xp, D, self.a_precision, j=j, x=x)
+        dy = xp[j] - y - 1
+        fee = self.fee * dy // FEE_DENOMINATOR
+        return (dy - fee) * PRECISION // rates[j]
+
+    def calc_token_amount(self, amounts: List[int], is_deposit: bool) -> int:
+        """LP tokens minted/burned for a balanced change, ignoring fees (as on-chain)."""
+        rates = self._rates()
+        D0 = get_D(self._xp(rates), self.amp, self.a_precision)
+        new_balances = [b + a if is_deposit else b - a for b, a in zip(self.balances, amounts)]
+        xp1 = [rate * balance // PRECISION for rate, balance in zip(rates, new_balances)]
+        D1 = get_D(xp1, self.amp, self.a_precision)
+        diff = D1 - D0 if is_deposit else D0 - D1
+        return diff * self.total_supply // D0
+
+    def calc_withdraw_one_coin(self, token_amount: int, i: int) -> int:
+        rates = self._rates()
+        xp = self._xp(rates)
+        D0 = get_D(xp, self.amp, self.a_precision)
+        D1 = D0 - token_amount * D0 // self.total_supply
+        new_y = get_y_D(self.amp, i, xp, D1, self.a_precision)
+
+        n = self.n_coins
+        fee = self.fee * n // (4 * (n - 1))
+        xp_reduced = list(xp)
+        for k in range(n):
+            if k == i:
+                dx_expected = xp[k] * D1 // D0 - new_y
+            else:
+                dx_expected = xp[k] - xp[k] * D1 // D0
+            xp_reduced[k] -= fee * dx_expected // FEE_DENOMINATOR
+
+        dy = xp_reduced[i] - get_y_D(self.amp, i, xp_reduced, D1, self.a_precision)
+        return (dy - 1) * PRECISION // rates[i]
+
+    def get_dy_underlying(self, i: int, j: int, dx: int) -> int:
+        """Metapool swap between the meta coin and base pool coins."""
+        if self.base_pool is None:
+            return self.get_dy(i, j, dx)
+
+        max_coin = self.n_coins - 1
+        rates = self._rates()
+        xp = self._xp(rates)
+        base_i, base_j = i - max_coin, j - max_coin
+        meta_i = i if base_i < 0 else max_coin
+        meta_j = j if base_j < 0 else max_coin
+
+        if base_i >= 0 and base_j >= 0:
+            return self.base_pool.get_dy(base_i, base_j, dx)
+
+        if base_i < 0:
+            x = xp[i] + dx * rates[i] // PRECISION
+        else:
+            base_inputs = [0] * self.base_pool.n_coins
+            base_inputs[base_i] = dx
+            x = self.base_pool.calc_token_amount(base_inputs, True) * rates[max_coin] // PRECISION
+            # Adding one coin to the base pool costs about half the base fee
+            x -= x * self.base_pool.fee // (2 * FEE_DENOMINATOR)
+            x += xp[max_coin]
+
+        D = get_D(xp, self.amp, self.a_precision)
+        y = get_y_D(self.amp, meta_i, xp, D, self.a_precision, j=meta_j, x=x)
+        dy = xp[meta_j] - y - 1
+        dy = dy - self.fee * dy // FEE_DENOMINATOR
+
+        if base_j < 0:
+            return dy * PRECISION // rates[meta_j]
+        return self.base_pool.calc_withdraw_one_coin(dy * PRECISION // rates[max_coin], base_j)
+
+class CryptoSwapPool:
+    """Cached state of a two-coin Curve CryptoSwap (v2) pool.
+
+    Uses the stored D, so pools in the middle of an A/gamma ramp are not
+    supported (the loader skips them).
+    """
+
+    def __init__(self, address: str, coins: List[str], balances: List[int], decimals: List[int],
+                 A: int, gamma: int, D: int, price_scale: int,
+                 mid_fee: int, out_fee: int, fee_gamma: int,
+                 block_number: Optional[int] = None):
+        self.address = address.lower()
+        self.coins = [c.lower() for c in coins]
+        self.balances = balances
+        self.precisions = [10 ** (18 - d) for d in decimals]
+        self.A = A
+        self.gamma = gamma
+        self.D = D
+        self.price_scale = price_scale
+        self.mid_fee = mid_fee
+        self.out_fee = out_fee
+        self.fee_gamma = fee_gamma
+        self.block_number = block_number
+
+    @property
+    def n_coins(self) -> int:
+        return 2
+
+    def coin_index(self, token: str) -> int:
+        return self.coins.index(token.lower())
+
+    def underlying_coins(self) -> List[str]:
+        return []
+
+    def _fee(self, xp: List[int]) -> int:
+        f = xp[0] + xp[1]
+        f = self.fee_gamma * 10 ** 18 // (
+            self.fee_gamma + 10 ** 18 - (10 ** 18 * 4) * xp[0] // f * xp[1] // f
+        )
+        return (self.mid_fee * f + self.out_fee * (10 ** 18 - f)) // 10 ** 18
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        price_scale = self.price_scale * self.precisions[1]
+        xp = list(self.balances)
+        xp[i] += dx
+        xp = [xp[0] * self.precisions[0], xp[1] * price_scale // PRECISION]
+
+        y = newton_y_crypto(self.A, self.gamma, xp, self.D, j)
+        dy = xp[j] - y - 1
+        xp[j] = y
+        if j > 0:
+            dy = dy * PRECISION // price_scale
+        else:
+            dy //= self.precisions[0]
+        return dy - self._fee(xp) * dy // 10 ** 10
+
+    def get_dy_underlying(self, i: int, j: int, dx: int) -> int:
+        return self.get_dy(i, j, dx)
+
+CurvePool = Union[StableSwapPool, CryptoSwapPool]
+
+class CurveEngine:
+    """Off-chain Curve quoting over cached pool state, keyed by pool address."""
+
+    def __init__(self, pools: Optional[List[CurvePool]] = None, block_number: Optional[int] = None):
+        self.block_number = block_number
+        self.pools: Dict[str, CurvePool] = {}
+        for pool in pools or []:
+            self.add_pool(pool)
+
+    def add_pool(self, pool: CurvePool):
+        self.pools[pool.address] = pool
+
+    def get_dy(self, pool: str, i: int, j: int, dx: int, underlying: bool = False) -> int:
+        """Local equivalent of quotes.curve.get_dy."""
+        p = self.pools[pool.lower()]
+        if underlying:
+            return p.get_dy_underlying(i, j, dx)
+        return p.get_dy(i, j, dx)
+
+    def get_dy_batch(self, items: List[Tuple[str, int, int, int]],
+                     underlying: bool = False) -> List[Tuple[bool, int]]:
+        """Same contract as quotes.curve.get_dy_batch, answered locally."""
+        results = []
+        for pool, i, j, dx in items:
+            try:
+                results.append((True, self.get_dy(pool, i, j, dx, underlying)))
+            except Exception:
+                results.append((False, 0))
+        return results
+
+    def legs(self, chain: str, tvl_by_pool: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Directed legs for every coin pair, with coin indices for calldata.
+
+        Underlying (metapool) pairs are emitted with ``underlying: True`` when
+        the meta coin is swapped against a base pool coin.
+        """
+        tvl_by_pool = tvl_by_pool or {}
+        legs = []
+        for address, pool in self.pools.items():
+            tvl = tvl_by_pool.get(address, 0.0)
+            for underlying, coins in ((False, pool.coins), (True, pool.underlying_coins())):
+                for i, token_in in enumerate(coins):
+                    for j, token_out in enumerate(coins):
+                        if i == j or token_in == token_out:
+                            continue
+                        # Underlying pairs inside the base pool belong to the base pool
+                        if underlying and i >= pool.n_coins - 1 and j >= pool.n_coins - 1:
+                            continue
+                        leg = {
+                            "chain": chain,
+                            "dex": "curve",
+                            "addr": address,
+                            "pool": address,
+                            "token_in": token_in,
+                            "token_out": token_out,
+                            "i": i,
+                            "j": j,
+                            "underlying": underlying,
+                            "tvl_usd": tvl,
+                            "fee_tier": 0,  # fee is already inside get_dy
+                        }
+                        if not underlying:
+                            leg["rate"] = self.spot_rate(pool, i, j)
+                        legs.append(leg)
+        return legs
+
+    def spot_rate(self, pool: CurvePool, i: int, j: int) -> Optional[float]:
+        """Marginal raw-unit rate i -> j after fee, probed with 0.01% of the i balance."""
+        probe = pool.balances[i] // 10_000
+        if probe == 0:
+            return None
+        try:
+            return pool.get_dy(i, j, probe) / probe
+        except Exception:
+            return None
+
+# --- Loading from chain ---
+
+STABLE_CALLS = {
+    "A": _sel("A()"),
+    "A_precise": _sel("A_precise()"),
+    "fee": _sel("fee()"),
+    "base_pool": _sel("base_pool()"),
+    "lp_token": _sel("lp_token()"),
+    "totalSupply": _sel("totalSupply()"),
+}
+CRYPTO_CALLS = {
+    "A": _sel("A()"),
+    "gamma": _sel("gamma()"),
+    "D": _sel("D()"),
+    "price_scale": _sel("price_scale()"),
+    "mid_fee": _sel("mid_fee()"),
+    "out_fee": _sel("out_fee()"),
+    "fee_gamma": _sel("fee_gamma()"),
+    "future_A_gamma_time": _sel("future_A_gamma_time()"),
+}
+BALANCES_INT128 = _sel("balances(int128)")
+BALANCES_UINT256 = _sel("balances(uint256)")
+
+def _word(result) -> Optional[int]:
+    ok, data = result
+    if not ok or len(data) < 32:
+        return None
+    return int.from_bytes(data[:32], "big")
+
+def load_pools(w3: Web3, pools: List[Dict], block_identifier: Optional[Union[int, str]] = None) -> CurveEngine:
+    """Load A, fee, balances, rates and coin indices for subgraph Curve pools.
+
+    ``pools`` are entries as returned by discovery.curve.top_pools. Pools that
+    expose gamma() are treated as two-coin CryptoSwap pools (crypto pools with
+    more coins, e.g. tricrypto, are skipped); everything else as StableSwap. Metapools whose base pool is in the same set get
+    ``get_dy_underlying`` support. Two Multicall3 rounds pinned to one block.
+    """
+    if block_identifier is None:
+        block_identifier = w3.eth.block_number
+
+    # Round 1: pool parameters and balances (both balances() index types are tried)
+    calls, keys = [], []
+    for pool in pools:
+        address = pool["id"]
+        for name, selector in {**STABLE_CALLS, **CRYPTO_CALLS}.items():
+            calls.append((address, selector))
+            keys.append((address, name))
+        for coin in pool["coins"]:
+            index = int(coin["index"])
+            calls.append((address, BALANCES_UINT256 + encode(["uint256"], [index])))
+            keys.append((address, ("balance_u", index)))
+            calls.append((address, BALANCES_INT128 + encode(["int128"], [index])))
+            keys.append((address, ("balance_i", index)))
+
+    raw: Dict[str, Dict] = {}
+    for (address, name), result in zip(keys, aggregate3(w3, calls, block_identifier)):
+        raw.setdefault(address, {})[name] = result
+
+    # Round 2: LP supply for stable pools (pool itself for factory pools, else lp_token)
+    calls, supply_keys = [], []
+    for pool in pools:
+        values = raw[pool["id"]]
+        lp_token = values["lp_token"]
+        target = pool["id"]
+        if lp_token[0] and len(lp_token[1]) >= 32:
+            target = "0x" + lp_token[1][12:32].hex()
+        calls.append((target, STABLE_CALLS["totalSupply"]))
+        supply_keys.append(pool["id"])
+    supplies = {
+        address: _word(result)
+        for address, result in zip(supply_keys, aggregate3(w3, calls, block_identifier))
+    }
+
+    block_number = block_identifier if isinstance(block_identifier, int) else None
+    engine = CurveEngine(block_number=block_number)
+    base_links = {}
+
+    for pool in pools:
+        address = pool["id"].lower()
+        values = raw[pool["id"]]
+        coins = sorted(pool["coins"], key=lambda c: int(c["index"]))
+        decimals = [int(c["decimals"]) for c in coins]
+
+        balances = []
+        for coin in coins:
+            index = int(coin["index"])
+            balance = _word(values[("balance_u", index)])
+            if balance is None:
+                balance = _word(values[("balance_i", index)])
+            balances.append(balance)
+        if any(b is None for b in balances):
+            print(f"Skipping Curve pool {address}: balances unavailable")
+            continue
+
+        if _word(values["gamma"]) is not None:
+            # Only the two-coin CryptoSwap invariant is modelled; tricrypto's A() and
+            # dynamic fee() would be misread as a StableSwap pool's
+            if len(coins) != 2:
+                print(f"Skipping Curve pool {address}: {len(coins)}-coin crypto pool")
+                continue
+            params = {name: _word(values[name]) for name in
+                      ("A", "gamma", "D", "price_scale", "mid_fee", "out_fee", "fee_gamma")}
+            if any(v is None for v in params.values()):
+                print(f"Skipping Curve pool {address}: unsupported crypto pool interface")
+                continue
+            if _word(values["future_A_gamma_time"]):
+                print(f"Skipping Curve pool {address}: A/gamma ramp in progress")
+                continue
+            engine.add_pool(CryptoSwapPool(
+                address, [c["address"] for c in coins], balances, decimals,
+                block_number=block_number, **params
+            ))
+            continue
+
+        a_precise = _word(values["A_precise"])
+        amp, a_precision = (a_precise, 100) if a_precise is not None else (_word(values["A"]), 1)
+        fee = _word(values["fee"])
+        if amp is None or fee is None:
+            print(f"Skipping Curve pool {address}: unsupported pool interface")
+            continue
+        base_pool = values["base_pool"]
+        if base_pool[0] and len(base_pool[1]) >= 32:
+            base_links[address] = "0x" + base_pool[1][12:32].hex()
+        engine.add_pool(StableSwapPool(
+            address, [c["address"] for c in coins], balances,
+            rates=[10 ** (36 - d) for d in decimals],
+            amp=amp, fee=fee, a_precision=a_precision,
+            total_supply=supplies.get(pool["id"]) or 0,
+            block_number=block_number, base_address=base_links.get(address),
+        ))
+
+    for address, base_address in base_links.items():
+        base = engine.pools.get(base_address.lower())
+        if isinstance(base, StableSwapPool):
+            engine.pools[address].base_pool = base
+
+    return engine
@@ -0,0 +1,94 @@
+from web3 import Web3
+from eth_abi import encode, decode
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+from typing import List, Optional, Tuple, Union
+
+# Multicall3 is deployed at the same address on Base, Arbitrum and most EVM chains
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+AGGREGATE3_SELECTOR = function_signature_to_4byte_selector("aggregate3((address,bool,bytes)[])")
+
+# A call is (target, calldata); a result is (success, returndata)
+Call = Tuple[str, bytes]
+Result = Tuple[bool, bytes]
+
+def encode_aggregate3(calls: List[Call]) -> bytes:
+    """Encode Multicall3.aggregate3 calldata with allowFailure set on every call."""
+    return AGGREGATE3_SELECTOR + encode(
+        ["(address,bool,bytes)[]"],
+        [[(to_checksum_address(target), True, data) for target, data in calls]]
+    )
+
+def aggregate3(w3: Web3, calls: List[Call],
+               block_identifier: Optional[Union[int, str]] = None,
+               batch_size: int = 200, multicall: str = MULTICALL3) -> List[Result]:
+    """Execute many view calls through Multicall3, pinned to a single block.
+
+    Calls are split into ``batch_size`` chunks, and every chunk is pinned to the
+    same block. Each call may fail on its own: a reverting call gives
+    (False, revert data) and does not affect the others. If a whole chunk
+    fails (e.g. it hits the node's eth_call gas cap), it is split in half and
+    retried. A single call that still fails is reported as (False, b"").
+    With a batching provider (chains.PooledHTTPProvider) all chunks go out
+    in one JSON-RPC batch request.
+    """
+    if not calls:
+        return []
+    if block_identifier is None:
+        block_identifier = w3.eth.block_number
+
+    chunks = [calls[start:start + batch_size] for start in range(0, len(calls), batch_size)]
+    batch = getattr(w3.provider, "batch", None)
+    if batch is not None and len(chunks) > 1:
+        return _aggregate_batch(w3, batch, chunks, block_identifier, multicall)
+    results: List[Result] = []
+    for chunk in chunks:
+        results.extend(_aggregate_chunk(w3, chunk, block_identifier, multicall))
+    return results
+
+def _decode_results(raw: bytes) -> List[Result]:
+    return [(bool(ok), bytes(data)) for ok, data in decode(["(bool,bytes)[]"], raw)[0]]
+
+def _aggregate_batch(w3: Web3, batch, chunks: List[List[Call]], block_identifier: Union[int, str],
+                     multicall: str) -> List[Result]:
+    """Every chunk's eth_call in one batch; chunks that fail take the splitting path."""
+    block = hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+    target = to_checksum_address(multicall)
+    try:
+        responses = batch([
+            ("eth_call", [{"to": target, "data": "0x" + encode_aggregate3(chunk).hex()}, block])
+            for chunk in chunks
+        ])
+    except Exception as e:
+        print(f"Multicall batch of {len(chunks)} chunks failed, sending one by one: {e}")
+        responses = [{} for _ in chunks]
+    results: List[Result] = []
+    for chunk, response in zip(chunks, responses):
+        try:
+            results.extend(_decode_results(bytes.fromhex(response["result"][2:])))
+        except Exception:
+            results.extend(_aggregate_chunk(w3, chunk, block_identifier, multicall))
+    return results
+
+def _aggregate_chunk(w3: Web3, calls: List[Call], block_identifier: Union[int, str],
+                     multicall: str) -> List[Result]:
+    try:
+        raw = w3.eth.call(
+            {"to": to_checksum_address(multicall), "data": encode_aggregate3(calls)},
+            block_identifier
+        )
+        return _decode_results(raw)
+    except Exception as e:
+        if len(calls) == 1:
+            return [(False, b"")]
+        print(f"Multicall chunk of {len(calls)} failed, splitting: {e}")
+        mid = len(calls) // 2
+        return (_aggregate_chunk(w3, calls[:mid], block_identifier, multicall) +
+                _aggregate_chunk(w3, calls[mid:], block_identifier, multicall))
+
+def decode_uint(result: Result) -> Tuple[bool, int]:
+    """Decode the leading uint256 of a call result; (False, 0) on failure."""
+    success, data = result
+    if not success or len(data) < 32:
+        return False, 0
+    return True, int.from_bytes(data[:32], "big")
@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional, Tuple
+from pybot.quotes.uni_v3_local import V3Simulator
+from pybot.quotes.curve_local import CurveEngine
+from pybot.state.cache import QuoteCache
+
+def quote_leg(leg: Dict, amount_in: int, v3_sim: Optional[V3Simulator] = None,
+              curve_engine: Optional[CurveEngine] = None,
+              cache: Optional[QuoteCache] = None, versions: Optional[Dict[str, int]] = None) -> int:
+    """Quote one leg against local pool state, memoized in ``cache`` if given.
+
+    ``versions`` are the pool versions of the PoolStateStore snapshot that
+    ``v3_sim``/``curve_engine`` came from; without them the cache's current
+    version is read before quoting.
+    """
+    if cache is None:
+        return _quote_leg(leg, amount_in, v3_sim, curve_engine)
+    
+    direction = (leg["token_in"], leg["token_out"], leg.get("underlying", False))
+    version = cache.version(leg["pool"]) if versions is None else versions.get(leg["pool"].lower(), 0)
+    amount_out = cache.get(leg["pool"], direction, amount_in, version)
+    if amount_out is None:
+        amount_out = _quote_leg(leg, amount_in, v3_sim, curve_engine)
+        cache.put(leg["pool"], direction, amount_in, amount_out, version)
+    return amount_out
+
+def _quote_leg(leg: Dict, amount_in: int, v3_sim: Optional[V3Simulator],
+               curve_engine: Optional[CurveEngine]) -> int:
+    if leg["dex"] == "uni_v3":
+        if v3_sim is None:
+            raise KeyError("No local Uni v3 state")
+        pool = v3_sim.by_address.get(leg["pool"].lower())
+        if pool is None:
+            raise KeyError(f"No local Uni v3 pool {leg['pool']}")
+        return pool.quote_exact_input_single(leg["token_in"], amount_in)
+
+    if leg["dex"] == "curve":
+        if curve_engine is None:
+            raise KeyError("No local Curve state")
+        return curve_engine.get_dy(leg["pool"], leg["i"], leg["j"], amount_in,
+                                   leg.get("underlying", False))
+
+    raise ValueError(f"Unsupported dex {leg['dex']}")
+
+def quote_route(route: List[Dict], amount_in: int, v3_sim: Optional[V3Simulator] = None,
+                curve_engine: Optional[CurveEngine] = None,
+                cache: Optional[QuoteCache] = None, versions: Optional[Dict[str, int]] = None) -> int:
+    """Chain leg quotes through a route; returns the final output amount."""
+    return quote_route_amounts(route, amount_in, v3_sim, curve_engine, cache, versions)[-1]
+
+def quote_route_amounts(route: List[Dict], amount_in: int, v3_sim: Optional[V3Simulator] = None,
+                        curve_engine: Optional[CurveEngine] = None,
+                        cache: Optional[QuoteCache] = None,
+                        versions: Optional[Dict[str, int]] = None) -> List[int]:
+    """Chain leg quotes through a route; returns every leg's output amount."""
+    amounts = []
+    amount = amount_in
+    for leg in route:
+        amount = quote_leg(leg, amount, v3_sim, curve_engine, cache, versions)
+        amounts.append(amount)
+    return amounts
+
+def quote_routes_batch(items: List[Tuple[List[Dict], int]], v3_sim: Optional[V3Simulator] = None,
+                       curve_engine: Optional[CurveEngine] = None,
+                       cache: Optional[QuoteCache] = None,
+                       versions: Optional[Dict[str, int]] = None) -> List[Tuple[bool, int]]:
+    """Quote (route, amount_in) pairs locally; (success, amount_out) per item."""
+    results = []
+    for route, amount_in in items:
+        try:
+            results.append((True, quote_route(route, amount_in, v3_sim, curve_engine, cache, versions)))
+        except Exception:
+            results.append((False, 0))
+    return results
@@ -1,6 +1,8 @@
 from web3 import Web3
 from eth_abi import encode
-from typing import List
+from eth_utils import function_signature_to_4byte_selector
+from typing import Dict, List, Optional, Tuple, Union
+from pybot.quotes.multicall import aggregate3, decode_uint
 
 # QuoterV2 ABI for quoteExactInput
 QUOTER_ABI = [{
@@ -18,11 +20,9 @@ def encode_path(tokens: List[str], fees_bps: List[int]) -> bytes:
     """Encode token path with fees for Uniswap v3 routing."""
     # Format: address (20) + uint24 fee + address ... (same as Solidity)
     assert len(tokens) == len(fees_bps) + 1
-    path_bytes = b""
+    path_bytes = Web3.to_bytes(hexstr=tokens[0])
     
     for i, fee in enumerate(fees_bps):
-        # Add token address (20 bytes)
-        path_bytes += Web3.to_bytes(hexstr=tokens[i])
         # Add fee (3 bytes, big endian)
         path_bytes += int(fee * 100).to_bytes(3, "big")
         # Add next token address (20 bytes)
@@ -30,6 +30,12 @@ def encode_path(tokens: List[str], fees_bps: List[int]) -> bytes:
     
     return path_bytes
 
+def route_path(route: List[Dict]) -> bytes:
+    """Encode a Uni v3-only route of legs as a multi-hop path."""
+    tokens = [route[0]["token_in"]] + [leg["token_out"] for leg in route]
+    fees = [leg["fee_tier"] / 100 for leg in route]  # feeTier is in 1/100 bps
+    return encode_path(tokens, fees)
+
 def quote_exact_in(w3: Web3, quoter: str, path: bytes, amount_in_wei: int) -> int:
     """Get exact input quote from Uniswap v3 QuoterV2."""
     contract = w3.eth.contract(
@@ -37,3 +43,19 @@ def quote_exact_in(w3: Web3, quoter: str, path: bytes, amount_in_wei: int) -> in
         abi=QUOTER_ABI
     )
     return contract.functions.quoteExactInput(path, amount_in_wei).call()
+
+QUOTE_EXACT_INPUT_SELECTOR = function_signature_to_4byte_selector("quoteExactInput(bytes,uint256)")
+
+def quote_exact_in_batch(w3: Web3, quoter: str, items: List[Tuple[bytes, int]],
+                         block_identifier: Optional[Union[int, str]] = None) -> List[Tuple[bool, int]]:
+    """Quote many (path, amount_in) pairs through Multicall3 at one block.
+
+    Returns (success, amount_out) per item, in input order. A reverting quote only
+    marks its own item as failed.
+    """
+    calls = [
+        (quoter, QUOTE_EXACT_INPUT_SELECTOR + encode(["bytes", "uint256"], [path, amount_in]))
+        for path, amount_in in items
+    ]
+    # QuoterV2 returns (amountOut, ...) - the first word is amountOut either way
+    return [decode_uint(result) for result in aggregate3(w3, calls, block_identifier)]
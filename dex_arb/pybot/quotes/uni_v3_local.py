@@ -0,0 +1,263 @@
+from web3 import Web3
+from eth_abi import encode, decode
+from eth_utils import function_signature_to_4byte_selector
+from typing import Dict, List, Optional, Tuple, Union
+from pybot.quotes import v3math
+from pybot.quotes.multicall import aggregate3
+from pybot.quotes.uni_v3 import quote_exact_in_batch
+
+SLOT0_SELECTOR = function_signature_to_4byte_selector("slot0()")
+LIQUIDITY_SELECTOR = function_signature_to_4byte_selector("liquidity()")
+TICK_BITMAP_SELECTOR = function_signature_to_4byte_selector("tickBitmap(int16)")
+TICKS_SELECTOR = function_signature_to_4byte_selector("ticks(int24)")
+
+class V3Pool:
+    """Local copy of the swap-relevant state of one Uniswap v3 pool."""
+
+    def __init__(self, address: str, token0: str, token1: str, fee: int, tick_spacing: int,
+                 sqrt_price_x96: int, tick: int, liquidity: int,
+                 bitmap: Dict[int, int], liquidity_net: Dict[int, int],
+                 block_number: Optional[int] = None,
+                 liquidity_gross: Optional[Dict[int, int]] = None):
+        self.address = address.lower()
+        self.token0 = token0.lower()
+        self.token1 = token1.lower()
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = tick
+        self.liquidity = liquidity
+        self.bitmap = bitmap              # word_pos -> 256-bit word (loaded words only)
+        self.liquidity_net = liquidity_net  # initialized tick -> liquidityNet
+        self.liquidity_gross = liquidity_gross if liquidity_gross is not None else {}  # for Mint/Burn
+        self.block_number = block_number
+
+    def swap(self, zero_for_one: bool, amount_specified: int,
+             sqrt_price_limit_x96: Optional[int] = None) -> Tuple[int, int]:
+        """Simulate UniswapV3Pool.swap without mutating state.
+
+        Returns (amount0, amount1) pool deltas: positive is paid into the pool,
+        negative is paid out. A positive ``amount_specified`` is exact input.
+        """
+        if amount_specified == 0:
+            raise ValueError("amount_specified must be non-zero")
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = (v3math.MIN_SQRT_RATIO + 1 if zero_for_one
+                                    else v3math.MAX_SQRT_RATIO - 1)
+
+        exact_input = amount_specified > 0
+        remaining = amount_specified
+        calculated = 0
+        sqrt_price = self.sqrt_price_x96
+        tick = self.tick
+        liquidity = self.liquidity
+
+        while remaining != 0 and sqrt_price != sqrt_price_limit_x96:
+            sqrt_start = sqrt_price
+            try:
+                tick_next, initialized = v3math.next_initialized_tick_within_one_word(
+                    self.bitmap, tick, self.tick_spacing, zero_for_one
+                )
+            except KeyError:
+                raise RuntimeError(f"Swap on {self.address} left the loaded tick range")
+            tick_next = max(v3math.MIN_TICK, min(v3math.MAX_TICK, tick_next))
+            sqrt_next = v3math.get_sqrt_ratio_at_tick(tick_next)
+
+            if zero_for_one:
+                target = sqrt_price_limit_x96 if sqrt_next < sqrt_price_limit_x96 else sqrt_next
+            else:
+                target = sqrt_price_limit_x96 if sqrt_next > sqrt_price_limit_x96 else sqrt_next
+
+            sqrt_price, amount_in, amount_out, fee_amount = v3math.compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+
+            if exact_input:
+                remaining -= amount_in + fee_amount
+                calculated -= amount_out
+            else:
+                remaining += amount_out
+                calculated += amount_in + fee_amount
+
+            if sqrt_price == sqrt_next:
+                if initialized:
+                    net = self.liquidity_net.get(tick_next, 0)
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != sqrt_start:
+                tick = v3math.get_tick_at_sqrt_ratio(sqrt_price)
+
+        if zero_for_one == exact_input:
+            return amount_specified - remaining, calculated
+        return calculated, amount_specified - remaining
+
+    def quote_exact_input_single(self, token_in: str, amount_in: int) -> int:
+        """Amount of the other token received for ``amount_in`` of ``token_in``."""
+        zero_for_one = token_in.lower() == self.token0
+        amount0, amount1 = self.swap(zero_for_one, amount_in)
+        return -(amount1 if zero_for_one else amount0)
+
+def decode_path(path: bytes) -> List[Tuple[str, int, str]]:
+    """Split an encoded v3 path into (token_in, fee, token_out) hops."""
+    hops = []
+    offset = 0
+    while offset + 43 <= len(path):
+        token_in = "0x" + path[offset:offset + 20].hex()
+        fee = int.from_bytes(path[offset + 20:offset + 23], "big")
+        token_out = "0x" + path[offset + 23:offset + 43].hex()
+        hops.append((token_in, fee, token_out))
+        offset += 23
+    return hops
+
+class V3Simulator:
+    """In-process replacement for QuoterV2 over a set of locally loaded pools."""
+
+    def __init__(self, pools: List[V3Pool], block_number: Optional[int] = None):
+        self.block_number = block_number
+        self.pools: Dict[Tuple[str, str, int], V3Pool] = {}
+        self.by_address: Dict[str, V3Pool] = {}
+        for pool in pools:
+            self.add_pool(pool)
+
+    def add_pool(self, pool: V3Pool):
+        self.pools[(pool.token0, pool.token1, pool.fee)] = pool
+        self.by_address[pool.address] = pool
+
+    def get_pool(self, token_a: str, token_b: str, fee: int) -> Optional[V3Pool]:
+        token_a, token_b = token_a.lower(), token_b.lower()
+        if token_a > token_b:
+            token_a, token_b = token_b, token_a
+        return self.pools.get((token_a, token_b, fee))
+
+    def quote_exact_input(self, path: bytes, amount_in: int) -> int:
+        """Local equivalent of QuoterV2.quoteExactInput."""
+        amount = amount_in
+        for token_in, fee, token_out in decode_path(path):
+            pool = self.get_pool(token_in, token_out, fee)
+            if pool is None:
+                raise KeyError(f"No local pool for {token_in}/{token_out}/{fee}")
+            amount = pool.quote_exact_input_single(token_in, amount)
+        return amount
+
+    def quote_exact_in_batch(self, items: List[Tuple[bytes, int]]) -> List[Tuple[bool, int]]:
+        """Same contract as quotes.uni_v3.quote_exact_in_batch, answered locally."""
+        results = []
+        for path, amount_in in items:
+            try:
+                results.append((True, self.quote_exact_input(path, amount_in)))
+            except Exception:
+                results.append((False, 0))
+        return results
+
+def load_pools(w3: Web3, pools: List[Dict], block_identifier: Optional[Union[int, str]] = None,
+               word_radius: int = 2) -> V3Simulator:
+    """Load slot0, liquidity and initialized ticks for subgraph pools at one block.
+
+    ``pools`` are entries as returned by discovery.uni_v3.top_pools. Only the
+    bitmap words within ``word_radius`` of the current tick are loaded, which
+    covers any swap that fits in the pool's active liquidity. Swaps that move
+    further than that fail loudly instead of returning a wrong amount.
+    Three Multicall3 rounds are made, all pinned to the same block.
+    """
+    if block_identifier is None:
+        block_identifier = w3.eth.block_number
+
+    # Round 1: price and in-range liquidity
+    calls = []
+    for pool in pools:
+        calls.append((pool["id"], SLOT0_SELECTOR))
+        calls.append((pool["id"], LIQUIDITY_SELECTOR))
+    results = aggregate3(w3, calls, block_identifier)
+
+    states = []
+    for n, pool in enumerate(pools):
+        (ok_slot0, slot0), (ok_liq, liq) = results[2 * n], results[2 * n + 1]
+        fee = int(pool["feeTier"])
+        if not (ok_slot0 and ok_liq) or fee not in v3math.TICK_SPACINGS:
+            continue
+        sqrt_price, tick = decode(["uint160", "int24"], slot0[:64])
+        states.append({
+            "pool": pool,
+            "fee": fee,
+            "tick_spacing": v3math.TICK_SPACINGS[fee],
+            "sqrt_price_x96": sqrt_price,
+            "tick": tick,
+            "liquidity": decode(["uint128"], liq)[0],
+            "bitmap": {},
+            "liquidity_net": {},
+            "liquidity_gross": {},
+        })
+
+    # Round 2: tick bitmap words around the current tick
+    calls, keys = [], []
+    for state in states:
+        center = (state["tick"] // state["tick_spacing"]) >> 8
+        for word_pos in range(center - word_radius, center + word_radius + 1):
+            calls.append((state["pool"]["id"], TICK_BITMAP_SELECTOR + encode(["int16"], [word_pos])))
+            keys.append((state, word_pos))
+    for (state, word_pos), (ok, data) in zip(keys, aggregate3(w3, calls, block_identifier)):
+        if ok:
+            state["bitmap"][word_pos] = int.from_bytes(data[:32], "big")
+
+    # Round 3: liquidityNet of every initialized tick in the loaded words
+    calls, keys = [], []
+    for state in states:
+        for word_pos, word in state["bitmap"].items():
+            while word:
+                bit = v3math.least_significant_bit(word)
+                word &= word - 1
+                tick = ((word_pos << 8) + bit) * state["tick_spacing"]
+                calls.append((state["pool"]["id"], TICKS_SELECTOR + encode(["int24"], [tick])))
+                keys.append((state, tick))
+    for (state, tick), (ok, data) in zip(keys, aggregate3(w3, calls, block_identifier)):
+        if ok:
+            gross, net = decode(["uint128", "int128"], data[:64])
+            state["liquidity_net"][tick] = net
+            state["liquidity_gross"][tick] = gross
+        else:
+            # Without this tick's liquidityNet the crossing would be wrong
+            state["bitmap"].pop((tick // state["tick_spacing"]) >> 8, None)
+
+    block_number = block_identifier if isinstance(block_identifier, int) else None
+    return V3Simulator([
+        V3Pool(
+            address=state["pool"]["id"],
+            token0=state["pool"]["token0"]["id"],
+            token1=state["pool"]["token1"]["id"],
+            fee=state["fee"],
+            tick_spacing=state["tick_spacing"],
+            sqrt_price_x96=state["sqrt_price_x96"],
+            tick=state["tick"],
+            liquidity=state["liquidity"],
+            bitmap=state["bitmap"],
+            liquidity_net=state["liquidity_net"],
+            block_number=block_number,
+            liquidity_gross=state["liquidity_gross"],
+        )
+        for state in states
+    ], block_number)
+
+def verify_against_quoter(w3: Web3, quoter: str, sim: V3Simulator,
+                          items: List[Tuple[bytes, int]]) -> List[Dict]:
+    """Check local quotes against QuoterV2 at the block the simulator was loaded at.
+
+    Returns one record per item where both sides succeeded but disagree by even
+    one wei. An empty list means the simulator matched exactly.
+    """
+    if sim.block_number is None:
+        raise ValueError("Simulator must be loaded at a pinned block number to verify")
+
+    local = sim.quote_exact_in_batch(items)
+    remote = quote_exact_in_batch(w3, quoter, items, block_identifier=sim.block_number)
+
+    mismatches = []
+    for (path, amount_in), (ok_local, out_local), (ok_remote, out_remote) in zip(items, local, remote):
+        if ok_local and ok_remote and out_local != out_remote:
+            mismatches.append({
+                "path": "0x" + path.hex(),
+                "amount_in": amount_in,
+                "local": out_local,
+                "quoter": out_remote,
+                "diff": out_local - out_remote,
+            })
+    return mismatches
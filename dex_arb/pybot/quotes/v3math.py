@@ -0,0 +1,249 @@
+# Exact-integer port of the Uniswap v3 core math libraries (TickMath, SqrtPriceMath,
+# SwapMath, TickBitmap). Python ints never overflow, so the uint256 overflow
+# branches in SqrtPriceMath are emulated explicitly where they change rounding.
+import math
+from typing import Tuple
+
+Q96 = 1 << 96
+MAX_UINT160 = (1 << 160) - 1
+MAX_UINT256 = (1 << 256) - 1
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+FEE_DENOMINATOR = 1_000_000
+
+_LOG_1_0001 = math.log(1.0001)
+
+# Fee tier (hundredths of a bip) -> tick spacing, as enabled on the v3 factory
+TICK_SPACINGS = {100: 1, 500: 10, 3000: 60, 10000: 200}
+
+# --- FullMath / UnsafeMath ---
+
+def mul_div(a: int, b: int, denominator: int) -> int:
+    """floor(a * b / denominator)."""
+    return a * b // denominator
+
+def mul_div_rounding_up(a: int, b: int, denominator: int) -> int:
+    """ceil(a * b / denominator)."""
+    return -(-(a * b) // denominator)
+
+def div_rounding_up(x: int, y: int) -> int:
+    """ceil(x / y)."""
+    return -(-x // y)
+
+# --- TickMath ---
+
+_TICK_RATIOS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    """sqrt(1.0001^tick) as a Q64.96, rounded up like TickMath.getSqrtRatioAtTick."""
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"tick {tick} out of range")
+
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, factor in _TICK_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * factor) >> 128
+
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    """Greatest tick whose sqrt ratio is <= sqrt_price_x96 (TickMath.getTickAtSqrtRatio)."""
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError("sqrt price out of range")
+
+    # Float log gives the tick to within one or two; step to the exact answer
+    # using getSqrtRatioAtTick, which is the contract's own definition of the result.
+    tick = math.floor(2 * math.log(sqrt_price_x96 / Q96) / _LOG_1_0001)
+    tick = max(MIN_TICK, min(MAX_TICK, tick))
+    while tick > MIN_TICK and get_sqrt_ratio_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while tick < MAX_TICK and get_sqrt_ratio_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+# --- SqrtPriceMath ---
+
+def get_next_sqrt_price_from_amount0_rounding_up(sqrt_p: int, liquidity: int,
+                                                 amount: int, add: bool) -> int:
+    if amount == 0:
+        return sqrt_p
+    numerator1 = liquidity << 96
+    product = amount * sqrt_p
+
+    if add:
+        if product <= MAX_UINT256:
+            denominator = numerator1 + product
+            if denominator <= MAX_UINT256:
+                return mul_div_rounding_up(numerator1, sqrt_p, denominator)
+        return div_rounding_up(numerator1, numerator1 // sqrt_p + amount)
+
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError("insufficient liquidity for amount0 output")
+    result = mul_div_rounding_up(numerator1, sqrt_p, numerator1 - product)
+    if result > MAX_UINT160:
+        raise ValueError("sqrt price overflow")
+    return result
+
+def get_next_sqrt_price_from_amount1_rounding_down(sqrt_p: int, liquidity: int,
+                                                   amount: int, add: bool) -> int:
+    if add:
+        result = sqrt_p + (amount << 96) // liquidity
+        if result > MAX_UINT160:
+            raise ValueError("sqrt price overflow")
+        return result
+
+    quotient = div_rounding_up(amount << 96, liquidity)
+    if sqrt_p <= quotient:
+        raise ValueError("insufficient liquidity for amount1 output")
+    return sqrt_p - quotient
+
+def get_next_sqrt_price_from_input(sqrt_p: int, liquidity: int, amount_in: int,
+                                   zero_for_one: bool) -> int:
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount0_rounding_up(sqrt_p, liquidity, amount_in, True)
+    return get_next_sqrt_price_from_amount1_rounding_down(sqrt_p, liquidity, amount_in, True)
+
+def get_next_sqrt_price_from_output(sqrt_p: int, liquidity: int, amount_out: int,
+                                    zero_for_one: bool) -> int:
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount1_rounding_down(sqrt_p, liquidity, amount_out, False)
+    return get_next_sqrt_price_from_amount0_rounding_up(sqrt_p, liquidity, amount_out, False)
+
+def get_amount0_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_b - sqrt_a
+    if round_up:
+        return div_rounding_up(mul_div_rounding_up(numerator1, numerator2, sqrt_b), sqrt_a)
+    return mul_div(numerator1, numerator2, sqrt_b) // sqrt_a
+
+def get_amount1_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return mul_div(liquidity, sqrt_b - sqrt_a, Q96)
+
+# --- SwapMath ---
+
+def compute_swap_step(sqrt_current: int, sqrt_target: int, liquidity: int,
+                      amount_remaining: int, fee_pips: int) -> Tuple[int, int, int, int]:
+    """One swap step within a tick range.
+
+    Returns (sqrt_next, amount_in, amount_out, fee_amount). A positive
+    ``amount_remaining`` is exact input, a negative one exact output.
+    """
+    zero_for_one = sqrt_current >= sqrt_target
+    exact_in = amount_remaining >= 0
+    amount_in = amount_out = 0
+
+    if exact_in:
+        remaining_less_fee = mul_div(amount_remaining, FEE_DENOMINATOR - fee_pips, FEE_DENOMINATOR)
+        amount_in = (get_amount0_delta(sqrt_target, sqrt_current, liquidity, True) if zero_for_one
+                     else get_amount1_delta(sqrt_current, sqrt_target, liquidity, True))
+        if remaining_less_fee >= amount_in:
+            sqrt_next = sqrt_target
+        else:
+            sqrt_next = get_next_sqrt_price_from_input(sqrt_current, liquidity,
+                                                       remaining_less_fee, zero_for_one)
+    else:
+        amount_out = (get_amount1_delta(sqrt_target, sqrt_current, liquidity, False) if zero_for_one
+                      else get_amount0_delta(sqrt_current, sqrt_target, liquidity, False))
+        if -amount_remaining >= amount_out:
+            sqrt_next = sqrt_target
+        else:
+            sqrt_next = get_next_sqrt_price_from_output(sqrt_current, liquidity,
+                                                        -amount_remaining, zero_for_one)
+
+    reached_target = sqrt_target == sqrt_next
+
+    if zero_for_one:
+        if not (reached_target and exact_in):
+            amount_in = get_amount0_delta(sqrt_next, sqrt_current, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount1_delta(sqrt_next, sqrt_current, liquidity, False)
+    else:
+        if not (reached_target and exact_in):
+            amount_in = get_amount1_delta(sqrt_current, sqrt_next, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount0_delta(sqrt_current, sqrt_next, liquidity, False)
+
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+
+    if exact_in and sqrt_next != sqrt_target:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, FEE_DENOMINATOR - fee_pips)
+
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+# --- TickBitmap ---
+
+def position(compressed: int) -> Tuple[int, int]:
+    """(word_pos, bit_pos) of a compressed tick in the bitmap."""
+    return compressed >> 8, compressed % 256
+
+def most_significant_bit(x: int) -> int:
+    return x.bit_length() - 1
+
+def least_significant_bit(x: int) -> int:
+    return (x & -x).bit_length() - 1
+
+def next_initialized_tick_within_one_word(bitmap: dict, tick: int, tick_spacing: int,
+                                          lte: bool) -> Tuple[int, bool]:
+    """Mirror of TickBitmap.nextInitializedTickWithinOneWord over a {word_pos: word} dict.
+
+    Raises KeyError when the needed bitmap word has not been loaded.
+    """
+    compressed = tick // tick_spacing  # floor division == Solidity's round-toward-negative fix
+
+    if lte:
+        word_pos, bit_pos = position(compressed)
+        mask = (1 << bit_pos) - 1 + (1 << bit_pos)
+        masked = bitmap[word_pos] & mask
+        initialized = masked != 0
+        if initialized:
+            nxt = (compressed - (bit_pos - most_significant_bit(masked))) * tick_spacing
+        else:
+            nxt = (compressed - bit_pos) * tick_spacing
+    else:
+        word_pos, bit_pos = position(compressed + 1)
+        mask = MAX_UINT256 ^ ((1 << bit_pos) - 1)
+        masked = bitmap[word_pos] & mask
+        initialized = masked != 0
+        if initialized:
+            nxt = (compressed + 1 + (least_significant_bit(masked) - bit_pos)) * tick_spacing
+        else:
+            nxt = (compressed + 1 + (255 - bit_pos)) * tick_spacing
+
+    return nxt, initialized
@@ -0,0 +1,271 @@
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from pybot.routing.generate import Leg, pool_key
+
+# One row per leg; strings are interned to ids (see LegTable)
+LEG_DTYPE = np.dtype([
+    ("chain", np.int32),
+    ("dex", np.int32),
+    ("addr", np.int32),
+    ("pool", np.int32),
+    ("token_in", np.int32),
+    ("token_out", np.int32),
+    ("tvl_usd", np.float64),
+    ("fee_tier", np.int32),
+    ("exotic", np.bool_),
+])
+_COLUMN_KEYS = {"chain", "dex", "addr", "pool", "token_in", "token_out", "tvl_usd", "fee_tier", "exotic"}
+
+# Upper bound on rows materialized at once while expanding routes
+_EXPAND_BUDGET = 1 << 22
+
+class Interner:
+    """Bidirectional str <-> dense int id map."""
+
+    __slots__ = ("ids", "values")
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, value_id: int) -> str:
+        return self.values[value_id]
+
+    def intern(self, value: str) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def get(self, value: str) -> Optional[int]:
+        return self.ids.get(value)
+
+class LegTable:
+    """Legs as one NumPy structured array with interned tokens, pools and routers.
+
+    Row ``n`` is leg id ``n``. Fields route generation and filtering need are
+    columns; everything else a leg dict carries (sqrt_price_x96, Curve coin
+    indices, calldata, ...) stays in a per-leg ``extras`` dict so ``to_dict``
+    rebuilds the original leg. A table built with ``from_dicts`` keeps the
+    source dicts and hands those out, so routes materialized from it share
+    leg objects with the rest of the pipeline.
+    """
+
+    def __init__(self):
+        self.chains = Interner()
+        self.dexes = Interner()
+        self.addresses = Interner()  # routers and pools
+        self.tokens = Interner()
+        self.array = np.zeros(0, dtype=LEG_DTYPE)
+        self.extras: List[Dict] = []
+        self.source: Optional[List[Leg]] = None
+        self.by_object: Dict[int, int] = {}  # id(source dict) -> leg id
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    @classmethod
+    def from_dicts(cls, legs: Iterable[Leg]) -> "LegTable":
+        table = cls()
+        legs = list(legs)
+        rows = []
+        for leg in legs:
+            rows.append((
+                table.chains.intern(leg.get("chain", "")),
+                table.dexes.intern(leg["dex"]),
+                table.addresses.intern(leg["addr"]),
+                table.addresses.intern(pool_key(leg)),
+                table.tokens.intern(leg["token_in"]),
+                table.tokens.intern(leg["token_out"]),
+                leg["tvl_usd"],
+                leg.get("fee_tier", 0),
+                leg.get("exotic", False),
+            ))
+            table.extras.append({k: v for k, v in leg.items() if k not in _COLUMN_KEYS})
+        table.array = np.array(rows, dtype=LEG_DTYPE)
+        table.source = legs
+        table.by_object = {id(leg): n for n, leg in enumerate(legs)}
+        return table
+
+    def to_dict(self, leg_id: int) -> Leg:
+        """The leg in its dict form (the source dict when the table has one)."""
+        if self.source is not None:
+            return self.source[leg_id]
+        row = self.array[leg_id]
+        leg = {
+            "chain": self.chains[row["chain"]],
+            "dex": self.dexes[row["dex"]],
+            "addr": self.addresses[row["addr"]],
+            "pool": self.addresses[row["pool"]],
+            "token_in": self.tokens[row["token_in"]],
+            "token_out": self.tokens[row["token_out"]],
+            "tvl_usd": float(row["tvl_usd"]),
+            "fee_tier": int(row["fee_tier"]),
+        }
+        if row["exotic"]:
+            leg["exotic"] = True
+        leg.update(self.extras[leg_id])
+        return leg
+
+    def route_ids(self, route: Sequence[Leg]) -> Tuple[int, ...]:
+        """Leg ids of a dict route whose legs came from this table's source."""
+        return tuple(self.by_object[id(leg)] for leg in route)
+
+    def to_route(self, route: Sequence[int]) -> List[Leg]:
+        return [self.to_dict(leg_id) for leg_id in route]
+
+class RouteTable:
+    """Routes as rows of leg ids in one int32 matrix, padded with -1.
+
+    Iterating or indexing yields plain tuples of leg ids. At 4 bytes per hop
+    a three-hop route takes 12 bytes instead of a list of three dict refs.
+    """
+
+    def __init__(self, legs: np.ndarray):
+        self.legs = legs.astype(np.int32, copy=False)
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def __getitem__(self, route_id: int) -> Tuple[int, ...]:
+        return tuple(int(leg_id) for leg_id in self.legs[route_id] if leg_id >= 0)
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        for row in self.legs.tolist():
+            yield tuple(leg_id for leg_id in row if leg_id >= 0)
+
+    @property
+    def hops(self) -> np.ndarray:
+        return (self.legs >= 0).sum(axis=1)
+
+    @classmethod
+    def from_tuples(cls, routes: Iterable[Sequence[int]], max_hops: int = 3) -> "RouteTable":
+        routes = list(routes)
+        width = max([max_hops] + [len(route) for route in routes])
+        legs = np.full((len(routes), width), -1, dtype=np.int32)
+        for n, route in enumerate(routes):
+            legs[n, :len(route)] = route
+        return cls(legs)
+
+    @classmethod
+    def concat(cls, tables: Sequence["RouteTable"]) -> "RouteTable":
+        width = max([t.legs.shape[1] for t in tables] + [1])
+        padded = [np.pad(t.legs, ((0, 0), (0, width - t.legs.shape[1])), constant_values=-1)
+                  for t in tables]
+        return cls(np.concatenate(padded) if padded else np.zeros((0, width), dtype=np.int32))
+
+    def select(self, mask_or_index: np.ndarray) -> "RouteTable":
+        return RouteTable(self.legs[mask_or_index])
+
+    def unique(self) -> "RouteTable":
+        """Drop repeated routes, keeping the first occurrence and the original order."""
+        if not len(self.legs):
+            return self
+        width = self.legs.shape[1]
+        bits = 63 // width
+        if int(self.legs.max()) + 1 < (1 << bits):
+            # Pack each row into one int64 so the 1-D unique applies
+            keys = np.zeros(len(self.legs), dtype=np.int64)
+            for column in range(width):
+                keys = (keys << bits) | (self.legs[:, column].astype(np.int64) + 1)
+            _, first = np.unique(keys, return_index=True)
+        else:
+            _, first = np.unique(self.legs, axis=0, return_index=True)
+        return self.select(np.sort(first))
+
+    def to_dicts(self, table: LegTable) -> List[List[Leg]]:
+        """Routes in the dict form quoting and calldata encoding take."""
+        if table.source is not None:
+            source = table.source
+            return [[source[leg_id] for leg_id in row if leg_id >= 0] for row in self.legs.tolist()]
+        return [table.to_route(route) for route in self]
+
+def _adjacency(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Legs grouped by ``keys``: returns (leg ids ordered by key, their sorted keys).
+
+    The sort is stable, so legs sharing a key keep their insertion order.
+    """
+    order = np.argsort(keys, kind="stable")
+    return order, keys[order]
+
+def _expand(queries: np.ndarray, order: np.ndarray, sorted_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For every query key, every leg with that key.
+
+    Returns (query position, leg id) pairs in query order.
+    """
+    starts = np.searchsorted(sorted_keys, queries, side="left")
+    counts = np.searchsorted(sorted_keys, queries, side="right") - starts
+    total = int(counts.sum())
+    source = np.repeat(np.arange(len(queries)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return source, order[np.repeat(starts, counts) + within]
+
+def _degree(queries: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    return np.searchsorted(sorted_keys, queries, side="right") - np.searchsorted(sorted_keys, queries, side="left")
+
+def _blocks(counts: np.ndarray, budget: int = _EXPAND_BUDGET) -> Iterator[slice]:
+    """Consecutive slices whose ``counts`` sum to about ``budget`` (at least one item each)."""
+    start, n = 0, len(counts)
+    cumulative = np.cumsum(counts)
+    while start < n:
+        base = cumulative[start - 1] if start else 0
+        stop = int(np.searchsorted(cumulative, base + budget, side="right"))
+        stop = min(n, max(stop, start + 1))
+        yield slice(start, stop)
+        start = stop
+
+def two_leg_routes(table: LegTable) -> RouteTable:
+    """Chained leg pairs A -> B where B does not return to A's input (LegGraph order)."""
+    token_in = table.array["token_in"].astype(np.int64)
+    token_out = table.array["token_out"].astype(np.int64)
+    order, sorted_in = _adjacency(token_in)
+    parts = []
+    for block in _blocks(_degree(token_out, sorted_in)):
+        first = np.arange(block.start, block.stop)
+        source, second = _expand(token_out[first], order, sorted_in)
+        first = first[source]
+        keep = token_in[first] != token_out[second]
+        parts.append(np.stack([first[keep], second[keep]], axis=1))
+    return RouteTable(np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.int32))
+
+def three_leg_routes(table: LegTable) -> RouteTable:
+    """Triangles A -> B -> C -> A (LegGraph order).
+
+    C is looked up by its (token_in, token_out) pair, so only legs that
+    actually close the triangle are ever materialized.
+    """
+    token_in = table.array["token_in"].astype(np.int64)
+    token_out = table.array["token_out"].astype(np.int64)
+    n_tokens = max(len(table.tokens), 1)
+    order, sorted_in = _adjacency(token_in)
+    pair_order, sorted_pairs = _adjacency(token_in * n_tokens + token_out)
+    parts = []
+    for block in _blocks(_degree(token_out, sorted_in)):
+        first = np.arange(block.start, block.stop)
+        source, second = _expand(token_out[first], order, sorted_in)
+        first = first[source]
+        closing = token_out[second] * n_tokens + token_in[first]
+        source, third = _expand(closing, pair_order, sorted_pairs)
+        parts.append(np.stack([first[source], second[source], third], axis=1))
+    return RouteTable(np.concatenate(parts) if parts else np.zeros((0, 3), dtype=np.int32))
+
+def gen_two_three_routes(table: LegTable) -> RouteTable:
+    """Array counterpart of gen_two_three_legs: 2-leg then 3-leg routes, same order."""
+    return RouteTable.concat([two_leg_routes(table), three_leg_routes(table)])
+
+def allowed_mask(table: LegTable, routes: RouteTable, min_tvl_usd: float = 100_000,
+                 max_hops: int = 3, deny_exotic: bool = True) -> np.ndarray:
+    """routing.score.allowed for every route at once."""
+    legs = routes.legs
+    present = legs >= 0
+    leg_ids = np.where(present, legs, 0)
+    mask = present.sum(axis=1) <= max_hops
+    tvl = np.where(present, table.array["tvl_usd"][leg_ids], np.inf)
+    mask &= tvl.min(axis=1, initial=np.inf) >= min_tvl_usd
+    if deny_exotic:
+        mask &= ~(table.array["exotic"][leg_ids] & present).any(axis=1)
+    return mask
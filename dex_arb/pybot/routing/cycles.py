@@ -0,0 +1,111 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pybot.routing.generate import Leg, LegGraph, pool_key
+
+Q96 = 2 ** 96
+
+def leg_rate(leg: Leg) -> Optional[float]:
+    """Spot exchange rate of a leg (raw token_out units per raw token_in unit) after fee.
+
+    Uses cached pool state only: an explicit ``rate`` on the leg, or the Uni v3
+    ``sqrt_price_x96`` captured at discovery. Returns None when no state is cached.
+    """
+    if leg.get("rate") is not None:
+        spot = float(leg["rate"])
+    elif leg["dex"] == "uni_v3" and leg.get("sqrt_price_x96"):
+        price = (int(leg["sqrt_price_x96"]) / Q96) ** 2  # token1 per token0
+        spot = price if leg["zero_for_one"] else 1 / price
+    else:
+        return None
+
+    # fee_tier is in hundredths of a bip (500 = 0.05%)
+    return spot * (1 - leg.get("fee_tier", 0) / 1_000_000)
+
+def leg_weight(leg: Leg) -> Optional[float]:
+    """Edge weight -log(rate); a cycle is profitable when its weights sum below zero."""
+    rate = leg_rate(leg)
+    if rate is None or rate <= 0:
+        return None
+    return -math.log(rate)
+
+def cycle_log_profit(route: List[Leg]) -> float:
+    """Log of the gross return of a cycle at spot prices (> 0 means profitable)."""
+    return -sum(leg_weight(leg) for leg in route)
+
+# Path entry: (distance, incoming leg, previous entry)
+_Entry = Tuple[float, Optional[Leg], Optional[tuple]]
+
+def _walk(entry: _Entry) -> List[Leg]:
+    path = []
+    while entry[1] is not None:
+        path.append(entry[1])
+        entry = entry[2]
+    path.reverse()
+    return path
+
+def _visits(entry: _Entry, token: str) -> bool:
+    while entry[1] is not None:
+        if entry[1]["token_in"] == token:
+            return True
+        entry = entry[2]
+    return False
+
+def find_negative_cycles(legs: Union[LegGraph, Iterable[Leg]], base_tokens: Iterable[str],
+                         max_hops: int = 3, min_log_profit: float = 0.0) -> List[List[Leg]]:
+    """Find profitable cycles of up to ``max_hops`` legs through the base tokens.
+
+    Runs a hop-bounded Bellman-Ford from each base token over -log(rate) weights.
+    Like SPFA, each round only relaxes tokens whose distance improved in the
+    previous round. A cycle is reported when an edge back into the source
+    closes a path whose total weight is below ``-min_log_profit``. Cycles never
+    repeat a token or a pool. Results are ordered by descending spot profit.
+    """
+    graph = legs if isinstance(legs, LegGraph) else LegGraph(legs)
+
+    weights: Dict[int, float] = {}
+    for leg in graph.legs:
+        weight = leg_weight(leg)
+        if weight is not None:
+            weights[id(leg)] = weight
+
+    found: Dict[tuple, Tuple[float, List[Leg]]] = {}
+
+    for source in base_tokens:
+        best: Dict[str, float] = {source: 0.0}
+        frontier: Dict[str, _Entry] = {source: (0.0, None, None)}
+
+        for hop in range(1, max_hops + 1):
+            next_frontier: Dict[str, _Entry] = {}
+
+            for token, entry in frontier.items():
+                for leg in graph.next_legs(token):
+                    weight = weights.get(id(leg))
+                    if weight is None:
+                        continue
+                    dist = entry[0] + weight
+                    token_out = leg["token_out"]
+
+                    if token_out == source:
+                        if hop >= 2 and dist < -min_log_profit:
+                            route = _walk(entry) + [leg]
+                            pools = [pool_key(l) for l in route]
+                            if len(set(pools)) == len(pools):
+                                key = tuple(id(l) for l in route)
+                                if key not in found:
+                                    found[key] = (dist, route)
+                        continue
+
+                    # Only the last hop may return to the source
+                    if hop == max_hops or _visits(entry, token_out):
+                        continue
+                    if dist < best.get(token_out, math.inf) - 1e-12:
+                        best[token_out] = dist
+                        next_frontier[token_out] = (dist, leg, entry)
+
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+    ranked = sorted(found.values(), key=lambda item: item[0])
+    return [route for _, route in ranked]
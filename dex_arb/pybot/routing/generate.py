@@ -1,28 +1,71 @@
-from typing import Iterable, Dict, Generator, List
+from typing import Iterable, Dict, Generator, List, Optional
 
 # A leg represents a single swap operation
-# Format: {"dex": "uni_v3"/"curve", "addr": pool_address, "data": bytes, 
-#          "token_in": address, "token_out": address, "tvl_usd": float}
+# Format: {"dex": "uni_v3"/"curve", "addr": pool_address,
+#          "token_in": address, "token_out": address, "tvl_usd": float,
+#          "pool": pool_address (when "addr" is a shared router)}
+# plus what the swap call needs (see exec.calldata.encode_swap): "fee_tier"
+# and "router_deadline" for Uni v3, "i"/"j"/"underlying" for Curve
 Leg = Dict
 
+def pool_key(leg: Leg) -> str:
+    """Identify the pool a leg trades through (falls back to the router address)."""
+    return leg.get("pool") or leg["addr"]
+
+class LegGraph:
+    """Token-indexed adjacency graph of legs.
+
+    Legs are indexed by ``token_in`` so route enumeration only follows real
+    adjacency instead of scanning every leg pair. Insertion order is preserved
+    everywhere, which keeps route enumeration deterministic and identical to
+    the brute-force scan over the same leg list.
+    """
+
+    def __init__(self, legs: Optional[Iterable[Leg]] = None):
+        self.legs: List[Leg] = []
+        self.by_token_in: Dict[str, List[Leg]] = {}
+        if legs is not None:
+            self.add_legs(legs)
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def add_leg(self, leg: Leg):
+        """Add a single directed leg to the graph."""
+        self.legs.append(leg)
+        self.by_token_in.setdefault(leg["token_in"], []).append(leg)
+
+    def add_legs(self, legs: Iterable[Leg]):
+        """Add several legs, keeping their order."""
+        for leg in legs:
+            self.add_leg(leg)
+
+    def next_legs(self, token: str) -> List[Leg]:
+        """Legs that can follow a leg ending in ``token``."""
+        return self.by_token_in.get(token, [])
+
+    def two_leg_routes(self) -> Generator[List[Leg], None, None]:
+        """Yield chained leg pairs A -> B where B does not return to A's input."""
+        for leg_a in self.legs:
+            for leg_b in self.next_legs(leg_a["token_out"]):
+                if leg_a["token_in"] != leg_b["token_out"]:
+                    yield [leg_a, leg_b]
+
+    def three_leg_routes(self) -> Generator[List[Leg], None, None]:
+        """Yield triangles A -> B -> C -> A."""
+        for leg_a in self.legs:
+            start = leg_a["token_in"]
+            for leg_b in self.next_legs(leg_a["token_out"]):
+                for leg_c in self.next_legs(leg_b["token_out"]):
+                    if leg_c["token_out"] == start:
+                        yield [leg_a, leg_b, leg_c]
+
+    def routes(self) -> Generator[List[Leg], None, None]:
+        """Yield 2-leg then 3-leg routes, in the same order as the brute-force scan."""
+        yield from self.two_leg_routes()
+        yield from self.three_leg_routes()
+
 def gen_two_three_legs(legs: Iterable[Leg]) -> Generator[List[Leg], None, None]:
     """Generate 2-leg and 3-leg arbitrage routes from available legs."""
-    legs_list = list(legs)
-    
-    # Generate 2-leg routes
-    for leg_a in legs_list:
-        for leg_b in legs_list:
-            # Check if legs can be chained: A output -> B input
-            if (leg_a["token_out"] == leg_b["token_in"] and 
-                leg_a["token_in"] != leg_b["token_out"]):
-                yield [leg_a, leg_b]
-    
-    # Generate 3-leg routes (triangular arbitrage)
-    for leg_a in legs_list:
-        for leg_b in legs_list:
-            for leg_c in legs_list:
-                # Check if legs form a triangle: A -> B -> C -> A
-                if (leg_a["token_out"] == leg_b["token_in"] and 
-                    leg_b["token_out"] == leg_c["token_in"] and 
-                    leg_c["token_out"] == leg_a["token_in"]):
-                    yield [leg_a, leg_b, leg_c]
+    # Walk the token_in index instead of scanning every leg pair/triple
+    yield from LegGraph(legs).routes()
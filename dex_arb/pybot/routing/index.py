@@ -0,0 +1,111 @@
+import heapq
+import itertools
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+class RouteIndex:
+    """Candidate routes indexed by the pools they touch, with their last quotes.
+
+    Built once per candidate generation. ``routes_for(changed_pools)`` names
+    the only routes whose quotes a block can have moved, so a quiet block
+    re-quotes a handful of routes instead of all of them. ``update`` records
+    the new quotes (one entry per quoted size) and ``top`` reads the running
+    best opportunities off a heap.
+
+    The heap is keyed on a route's gross edge (output minus input minus
+    flash fee, in USD), which does not depend on gas, so a new gas price
+    never forces a re-sort. Routes pay different gas (their learned
+    ``GasModel`` estimate), so edge order is not profit order: ``top``
+    bounds each route's profit by its edge minus the cheapest gas any route
+    pays (``GasModel.min_estimate()`` at the current price) and scores
+    routes until no unvisited one can beat that bound. Superseded heap
+    entries are skipped lazily.
+    """
+
+    def __init__(self, routes: List[List[Dict]]):
+        self.routes = routes
+        self.by_pool: Dict[str, List[int]] = {}
+        for route_id, route in enumerate(routes):
+            for pool in {leg["pool"].lower() for leg in route}:
+                self.by_pool.setdefault(pool, []).append(route_id)
+        self.entries: Dict[int, List[Dict]] = {}
+        self.heap: List[Tuple[float, int, int]] = []  # (-edge, seq, route_id)
+        self.heap_seq: Dict[int, int] = {}  # route_id -> seq of its live heap entry
+        self.seq = itertools.count()
+        self.last_requoted = 0
+        self.total_requoted = 0
+
+    def routes_for(self, pools: Iterable[str]) -> Set[int]:
+        """Ids of the routes with at least one leg in ``pools``."""
+        route_ids: Set[int] = set()
+        for pool in pools:
+            route_ids.update(self.by_pool.get(pool.lower(), ()))
+        return route_ids
+
+    def update(self, route_ids: Iterable[int], entries: Iterable[Dict]):
+        """Replace the quotes of ``route_ids`` with ``entries`` (each has a ``route_id``).
+
+        A route in ``route_ids`` without entries (every quote failed) drops
+        out of the ranking.
+        """
+        route_ids = set(route_ids)
+        fresh: Dict[int, List[Dict]] = {}
+        for entry in entries:
+            fresh.setdefault(entry["route_id"], []).append(entry)
+        for route_id in route_ids:
+            self.heap_seq.pop(route_id, None)
+            self.entries.pop(route_id, None)
+        for route_id, route_entries in fresh.items():
+            self.entries[route_id] = route_entries
+            seq = next(self.seq)
+            self.heap_seq[route_id] = seq
+            heapq.heappush(self.heap, (-max(self._edge(e) for e in route_entries), seq, route_id))
+        self.last_requoted = len(route_ids)
+        self.total_requoted += len(route_ids)
+
+        if len(self.heap) > 2 * len(self.heap_seq) + 1024:
+            # Too many superseded entries; rebuild from the live ones
+            self.heap = [item for item in self.heap if self.heap_seq.get(item[2]) == item[1]]
+            heapq.heapify(self.heap)
+
+    def top(self, n: int, score: Callable[[List[Dict]], List[Dict]], gas_usd: float,
+            min_profit_usd: float) -> List[Dict]:
+        """The ``n`` most profitable opportunities, best first.
+
+        ``score`` turns one route's entries into its profitable opportunities
+        at current costs, best first. A route's profit is at most its edge
+        minus ``gas_usd`` (the lowest gas any route pays), so routes are
+        visited in edge order until no unvisited one can beat
+        ``min_profit_usd`` (the lowest profit any cost can require) or the
+        n-th best found.
+        """
+        found: List[Dict] = []
+        visited: List[Tuple[float, int, int]] = []
+        while self.heap and n > 0:
+            bar = min_profit_usd if len(found) < n else max(min_profit_usd, found[n - 1]["profit_usd"])
+            if -self.heap[0][0] - gas_usd <= bar:
+                break
+            item = heapq.heappop(self.heap)
+            if self.heap_seq.get(item[2]) != item[1]:
+                continue  # superseded
+            visited.append(item)
+            best = score(self.entries[item[2]])
+            if best:
+                found.append(best[0])
+                found.sort(key=lambda r: r["profit_usd"], reverse=True)
+        for item in visited:
+            heapq.heappush(self.heap, item)
+        return found[:n]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "routes": len(self.routes),
+            "pools": len(self.by_pool),
+            "quoted": len(self.entries),
+            "last_requoted": self.last_requoted,
+            "total_requoted": self.total_requoted,
+            "heap": len(self.heap),
+        }
+
+    @staticmethod
+    def _edge(entry: Dict) -> float:
+        return entry["amount_out_usd"] - entry["amount_in_usd"] - entry["flash_fee_usd"]
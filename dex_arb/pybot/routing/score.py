@@ -1,3 +1,4 @@
+import numpy as np
 from typing import List, Dict
 
 def allowed(route: List[Dict], min_tvl_usd: float = 100_000, 
@@ -25,3 +26,32 @@ def calculate_profit_usd(amount_in_usd: float, amount_out_usd: float,
     gross_profit = amount_out_usd - amount_in_usd
     total_costs = gas_usd + flash_fee_usd
     return gross_profit - total_costs
+
+def score_batch(route_ids: np.ndarray, amount_in_usd: np.ndarray, amount_out_usd: np.ndarray,
+                gas_usd, flash_fee_usd: np.ndarray, floor_usd: float = 0.01,
+                best_per_route: bool = False) -> Dict[str, np.ndarray]:
+    """calculate_profit_usd and required_profit_usd over every (route, size) quote at once.
+
+    Inputs are parallel arrays with one element per quote (``gas_usd`` may be
+    a scalar). The arithmetic runs in the same order as the scalar functions,
+    so every profit and mask value is bit-identical to them. ``ranked``
+    indexes the profitable quotes by profit, best first; equal profits keep
+    their input order, like a stable sort. With ``best_per_route`` only each
+    route's most profitable size is ranked.
+    """
+    amount_in_usd = np.asarray(amount_in_usd, dtype=np.float64)
+    amount_out_usd = np.asarray(amount_out_usd, dtype=np.float64)
+    flash_fee_usd = np.asarray(flash_fee_usd, dtype=np.float64)
+    costs = np.asarray(gas_usd, dtype=np.float64) + flash_fee_usd
+
+    profit = (amount_out_usd - amount_in_usd) - costs
+    required = np.maximum(floor_usd, costs)
+    profitable = profit > required
+
+    candidates = np.flatnonzero(profitable)
+    ranked = candidates[np.argsort(-profit[candidates], kind="stable")]
+    if best_per_route and len(ranked):
+        # First (= most profitable) appearance of each route in the ranking
+        _, first = np.unique(np.asarray(route_ids)[ranked], return_index=True)
+        ranked = ranked[np.sort(first)]
+    return {"profit_usd": profit, "required_usd": required, "profitable": profitable, "ranked": ranked}
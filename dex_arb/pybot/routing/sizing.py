@@ -0,0 +1,154 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+from pybot.quotes.uni_v3_local import V3Simulator
+from pybot.routing.score import calculate_profit_usd
+
+Q96 = 2 ** 96
+INV_PHI = (math.sqrt(5) - 1) / 2
+
+# out(x) = a * x / (b + c * x): constant-product swap, closed under composition
+Mobius = Tuple[float, float, float]
+
+def v3_leg_mobius(leg: Dict, v3_sim: V3Simulator) -> Optional[Mobius]:
+    """Constant-product form of a Uni v3 leg within its current tick range."""
+    pool = v3_sim.by_address.get(leg["pool"].lower())
+    if pool is None or pool.liquidity == 0:
+        return None
+
+    sqrt_p = pool.sqrt_price_x96 / Q96
+    reserve0 = pool.liquidity / sqrt_p  # virtual reserves in raw units
+    reserve1 = pool.liquidity * sqrt_p
+    if leg["token_in"].lower() == pool.token0:
+        reserve_in, reserve_out = reserve0, reserve1
+    else:
+        reserve_in, reserve_out = reserve1, reserve0
+
+    gamma = 1 - pool.fee / 1_000_000
+    return reserve_out * gamma, reserve_in, gamma
+
+def compose_mobius(first: Mobius, second: Mobius) -> Mobius:
+    """Coefficients of second(first(x))."""
+    a1, b1, c1 = first
+    a2, b2, c2 = second
+    return a1 * a2, b1 * b2, b2 * c1 + c2 * a1
+
+def is_cyclic(route: List[Dict]) -> bool:
+    """Whether the route ends in the token it starts with (only those can be sized)."""
+    return route[0]["token_in"].lower() == route[-1]["token_out"].lower()
+
+def closed_form_size(route: List[Dict], v3_sim: V3Simulator,
+                     cost_per_unit: float) -> Optional[Tuple[float, Mobius]]:
+    """Input maximizing out(x) - cost_per_unit * x, assuming no tick is crossed.
+
+    Solves a*b / (b + c*x)^2 = cost_per_unit for the composed route. Returns
+    None for routes with non-v3 legs or no profitable interior optimum.
+    """
+    if not all(leg["dex"] == "uni_v3" for leg in route):
+        return None
+
+    mobius = None
+    for leg in route:
+        leg_mobius = v3_leg_mobius(leg, v3_sim)
+        if leg_mobius is None:
+            return None
+        mobius = leg_mobius if mobius is None else compose_mobius(mobius, leg_mobius)
+
+    a, b, c = mobius
+    if a <= cost_per_unit * b:
+        return None  # marginal rate at zero size already below cost
+    return (math.sqrt(a * b / cost_per_unit) - b) / c, mobius
+
+def golden_section_max(f: Callable[[int], float], lo: int, hi: int,
+                       rel_tol: float = 1e-3, max_evals: int = 40) -> Tuple[int, float]:
+    """Maximize a unimodal function over integers in [lo, hi] by golden-section search.
+
+    The search runs on log(amount), so a bracket spanning several orders of
+    magnitude costs about as much as a narrow one. Stops once the bracket is
+    within ``rel_tol``.
+    """
+    def at(u: float) -> int:
+        return min(hi, max(lo, int(round(math.exp(u)))))
+
+    u_lo, u_hi = math.log(lo), math.log(hi)
+    u1 = u_hi - (u_hi - u_lo) * INV_PHI
+    u2 = u_lo + (u_hi - u_lo) * INV_PHI
+    f1, f2 = f(at(u1)), f(at(u2))
+    evals = 2
+
+    while u_hi - u_lo > rel_tol and evals < max_evals:
+        if f1 < f2:
+            u_lo, u1, f1 = u1, u2, f2
+            u2 = u_lo + (u_hi - u_lo) * INV_PHI
+            f2 = f(at(u2))
+        else:
+            u_hi, u2, f2 = u2, u1, f1
+            u1 = u_hi - (u_hi - u_lo) * INV_PHI
+            f1 = f(at(u1))
+        evals += 1
+
+    return (at(u1), f1) if f1 >= f2 else (at(u2), f2)
+
+def optimize_size(route: List[Dict], quote_fn: Callable[[int], int], decimals: int,
+                  price_usd: float, gas_usd: float, flash_fee_pct: float,
+                  min_usd: float, max_usd: float, v3_sim: Optional[V3Simulator] = None,
+                  rel_tol: float = 1e-3, max_evals: int = 40) -> Optional[Dict]:
+    """Find the profit-maximizing input amount for a cyclic route.
+
+    Profit is calculate_profit_usd net of gas and the flash fee. Route output is
+    concave in input, so profit is unimodal over [min_usd, max_usd]. max_usd
+    is normally risk.max_position_size_usd. Uni v3-only routes first try the
+    closed-form optimum of the no-tick-crossing approximation. It is accepted
+    after one exact quote when that quote matches the approximation. Otherwise
+    a golden-section search runs over the bracket. Quotes are memoized, and
+    failed quotes count as a total loss. Returns None for routes that are not
+    cyclic: their output is in another token, so it cannot be priced with the
+    input token's ``decimals`` and ``price_usd``.
+    """
+    if not is_cyclic(route):
+        return None
+    unit = 10 ** decimals / price_usd  # raw input units per USD
+    lo, hi = max(1, int(min_usd * unit)), int(max_usd * unit)
+    if hi <= lo:
+        return None
+
+    outputs: Dict[int, int] = {}
+
+    def output(amount_in: int) -> int:
+        if amount_in not in outputs:
+            try:
+                outputs[amount_in] = quote_fn(amount_in)
+            except Exception:
+                outputs[amount_in] = 0
+        return outputs[amount_in]
+
+    def profit(amount_in: int) -> float:
+        amount_in_usd = amount_in / unit
+        return calculate_profit_usd(amount_in_usd, output(amount_in) / unit,
+                                    gas_usd, amount_in_usd * flash_fee_pct)
+
+    best = None
+    if v3_sim is not None:
+        solved = closed_form_size(route, v3_sim, 1 + flash_fee_pct)
+        if solved is not None:
+            x, (a, b, c) = solved
+            seed = min(hi, max(lo, int(x)))
+            approx = a * seed / (b + c * seed)
+            exact = output(seed)
+            if exact and abs(exact - approx) <= 1e-6 * exact:
+                best = (seed, profit(seed))
+            else:
+                # Ticks get crossed near the optimum; search around the seed
+                lo, hi = max(lo, seed // 2), min(hi, seed * 2)
+
+    if best is None:
+        best = golden_section_max(profit, lo, hi, rel_tol=rel_tol, max_evals=max_evals)
+
+    amount_in, profit_usd = best
+    return {
+        "amount_in": amount_in,
+        "amount_out": output(amount_in),
+        "amount_in_usd": amount_in / unit,
+        "amount_out_usd": output(amount_in) / unit,
+        "profit_usd": profit_usd,
+        "evaluations": len(outputs),
+    }
@@ -1,35 +1,102 @@
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
 from threading import Lock
 
-class PoolCache:
-    """In-memory cache for pool data with periodic refresh."""
+class QuoteCache:
+    """LRU memo of leg quotes keyed by (pool, direction, amount_in, state version).
+
+    Entries stay valid across blocks until the pool's state changes. Call
+    ``invalidate`` (or route a LogStream to ``on_logs``) when a Swap/Mint/Burn
+    is seen for a pool; that bumps the pool's version and drops
+    its entries. Quotes computed against an older version are never stored.
+
+    When the cache is subscribed to a PoolStateStore, its versions count the
+    same changes as the store's, so a reader quoting a store snapshot passes
+    that snapshot's version to ``get``/``put``: a pool invalidated mid-pass
+    then misses, and its quote from the old state is not stored.
+    """
     
-    def __init__(self, refresh_interval: int = 300):  # 5 minutes
-        self.refresh_interval = refresh_interval
-        self.last_refresh = 0
-        self.pools: Dict[str, List[Dict]] = {}
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, int]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.keys_by_pool: Dict[str, Set[Tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
         self.lock = Lock()
     
-    def get_pools(self, chain: str, dex: str) -> List[Dict]:
-        """Get cached pools for chain/dex combination."""
+    def version(self, pool: str) -> int:
+        """Current state version of a pool."""
+        return self.versions.get(pool.lower(), 0)
+    
+    def get(self, pool: str, direction: Hashable, amount_in: int,
+            version: Optional[int] = None) -> Optional[int]:
+        """Cached amount_out at ``version`` (default: the current one), or None on a miss."""
+        pool = pool.lower()
+        key = (pool, direction, amount_in, self.versions.get(pool, 0) if version is None else version)
+        with self.lock:
+            amount_out = self.entries.get(key)
+            if amount_out is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return amount_out
+    
+    def put(self, pool: str, direction: Hashable, amount_in: int, amount_out: int,
+            version: Optional[int] = None):
+        """Store a quote. ``version`` is the pool version quoted against (read before quoting)."""
+        pool = pool.lower()
         with self.lock:
-            key = f"{chain}_{dex}"
-            return self.pools.get(key, [])
+            current = self.versions.get(pool, 0)
+            if version is not None and version != current:
+                return  # state changed while quoting
+            key = (pool, direction, amount_in, current)
+            self.entries[key] = amount_out
+            self.entries.move_to_end(key)
+            self.keys_by_pool.setdefault(pool, set()).add(key)
+            
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self.keys_by_pool.get(old_key[0], set()).discard(old_key)
+                self.evictions += 1
     
-    def update_pools(self, chain: str, dex: str, pools: List[Dict]):
-        """Update cached pools."""
+    def invalidate(self, pool: str):
+        """Mark a pool's state as changed and drop its cached quotes."""
+        pool = pool.lower()
         with self.lock:
-            key = f"{chain}_{dex}"
-            self.pools[key] = pools
-            self.last_refresh = time.time()
+            self.versions[pool] = self.versions.get(pool, 0) + 1
+            for key in self.keys_by_pool.pop(pool, ()):
+                self.entries.pop(key, None)
+            self.invalidations += 1
+    
+    def invalidate_pools(self, pools: Iterable[str]):
+        """PoolStateStore listener: invalidate every pool whose state changed."""
+        for pool in pools:
+            self.invalidate(pool)
     
-    def needs_refresh(self) -> bool:
-        """Check if cache needs refresh."""
-        return time.time() - self.last_refresh > self.refresh_interval
+    def on_logs(self, logs: List[Dict]):
+        """LogStream handler: invalidate every pool that emitted one of ``logs``."""
+        self.invalidate_pools({log["address"] for log in logs})
+    
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for monitoring."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
     
     def clear(self):
-        """Clear all cached data."""
+        """Clear all cached quotes (versions are kept)."""
         with self.lock:
-            self.pools.clear()
-            self.last_refresh = 0
+            self.entries.clear()
+            self.keys_by_pool.clear()
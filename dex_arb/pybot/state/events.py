@@ -1,62 +1,187 @@
 import asyncio
+import itertools
 import json
-from typing import Callable, Dict, Any
-from web3 import Web3
-
-class EventListener:
-    """WebSocket event listener for pool updates."""
-    
-    def __init__(self, w3: Web3):
-        self.w3 = w3
-        self.subscriptions: Dict[str, Any] = {}
-    
-    async def listen_to_swaps(self, pool_address: str, callback: Callable):
-        """Listen to Swap events from a pool."""
-        # Uniswap v3 Swap event signature
-        swap_topic = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
-        
-        try:
-            # Subscribe to logs
-            subscription = self.w3.eth.subscribe('logs', {
-                'address': pool_address,
-                'topics': [swap_topic]
-            })
-            
-            self.subscriptions[pool_address] = subscription
-            
-            async for log in subscription:
-                await callback(log)
-                
-        except Exception as e:
-            print(f"Error listening to swaps for {pool_address}: {e}")
-    
-    async def listen_to_sync(self, pool_address: str, callback: Callable):
-        """Listen to Sync events from a pool (Uniswap v2 style)."""
-        # Sync event signature
-        sync_topic = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
-        
+import aiohttp
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+LogHandler = Callable[[List[Dict]], None]
+
+def decode_log(raw: Dict) -> Dict:
+    """Normalize a JSON-RPC log: ints for block/index, bytes data, lowercase hex address/topics."""
+    def to_int(value):
+        return int(value, 16) if isinstance(value, str) else value
+    return {
+        "address": raw["address"].lower(),
+        "topics": [t.lower() for t in raw.get("topics", [])],
+        "data": bytes.fromhex(raw.get("data", "0x")[2:]),
+        "blockNumber": to_int(raw.get("blockNumber")),
+        "blockHash": raw.get("blockHash"),
+        "transactionHash": raw.get("transactionHash"),
+        "logIndex": to_int(raw.get("logIndex")),
+        "removed": bool(raw.get("removed", False)),
+    }
+
+class LogStream:
+    """One eth_subscribe('logs') per chain, multiplexed over every tracked pool.
+
+    The subscription filters on the union of all routed addresses and topics.
+    Incoming logs are dispatched by emitting address through a dict index.
+    Logs that arrive together are handed to each handler as one ordered batch.
+    Reorged-out logs (``removed: true``) are delivered like any other log; the
+    handler (see PoolStateStore.apply_logs) is responsible for rolling back.
+    Changing the routes resubscribes; a dropped connection reconnects with
+    backoff and calls ``on_connect`` so the consumer can backfill the gap.
+    """
+
+    def __init__(self, ws_url: str, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        self.ws_url = ws_url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.routes: Dict[str, LogHandler] = {}
+        self.topics: Set[str] = set()
+        self.connected = asyncio.Event()
+        self.resubscribe = asyncio.Event()
+        self.ids = itertools.count(1)
+        self.received = 0
+        self.removed = 0
+        self.unrouted = 0
+        self.reconnects = 0
+
+    def route(self, addresses: Iterable[str], topics: Iterable[str], handler: LogHandler):
+        """Send logs of ``addresses`` (filtered to ``topics``) to ``handler``."""
+        for address in addresses:
+            self.routes[address.lower()] = handler
+        self.topics.update(t.lower() for t in topics)
+        self.resubscribe.set()
+
+    def unroute(self, addresses: Iterable[str]):
+        for address in addresses:
+            self.routes.pop(address.lower(), None)
+        self.resubscribe.set()
+
+    def log_filter(self) -> Dict:
+        return {"address": sorted(self.routes), "topics": [sorted(self.topics)]}
+
+    async def run(self, on_connect: Optional[Callable[[], Awaitable[None]]] = None):
+        """Stay subscribed until cancelled."""
+        delay = self.reconnect_delay
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with session.ws_connect(self.ws_url, heartbeat=30) as ws:
+                        await self._session(ws, on_connect)
+                        delay = self.reconnect_delay
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Log stream {self.ws_url} dropped: {e}")
+                self.connected.clear()
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _request(self, ws, inbox: asyncio.Queue, method: str, params: List, pending: List[Dict]):
+        """Send a JSON-RPC request; notifications read while waiting are kept in ``pending``."""
+        request_id = next(self.ids)
+        await ws.send_str(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+        while True:
+            body = self._parse(await inbox.get())
+            if body.get("id") == request_id:
+                if "error" in body:
+                    raise RuntimeError(f"{method} failed: {body['error']}")
+                return body.get("result")
+            pending.append(body)
+
+    @staticmethod
+    def _parse(message) -> Dict:
+        if message.type != aiohttp.WSMsgType.TEXT:
+            raise ConnectionError(f"websocket closed ({message.type})")
+        return json.loads(message.data)
+
+    async def _session(self, ws, on_connect):
+        # One reader owns the socket; everything else consumes its inbox
+        inbox: asyncio.Queue = asyncio.Queue()
+
+        async def read():
+            while True:
+                message = await ws.receive()
+                inbox.put_nowait(message)
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    return
+
+        reader = asyncio.ensure_future(read())
         try:
-            subscription = self.w3.eth.subscribe('logs', {
-                'address': pool_address,
-                'topics': [sync_topic]
-            })
-            
-            self.subscriptions[f"{pool_address}_sync"] = subscription
-            
-            async for log in subscription:
-                await callback(log)
-                
-        except Exception as e:
-            print(f"Error listening to sync for {pool_address}: {e}")
-    
-    def stop_listening(self, pool_address: str):
-        """Stop listening to events for a pool."""
-        if pool_address in self.subscriptions:
-            self.subscriptions[pool_address].unsubscribe()
-            del self.subscriptions[pool_address]
-    
-    def stop_all(self):
-        """Stop all event listeners."""
-        for subscription in self.subscriptions.values():
-            subscription.unsubscribe()
-        self.subscriptions.clear()
+            await self._subscribed(ws, inbox, on_connect)
+        finally:
+            reader.cancel()
+
+    async def _subscribed(self, ws, inbox: asyncio.Queue, on_connect):
+        pending: List[Dict] = []
+        self.resubscribe.clear()
+        subscription = await self._request(ws, inbox, "eth_subscribe", ["logs", self.log_filter()], pending)
+        if on_connect is not None:
+            # Backfill while new logs queue up in the inbox; overlaps are deduplicated downstream
+            await on_connect()
+        self.connected.set()
+        self._dispatch(pending, {subscription})
+
+        while True:
+            if self.resubscribe.is_set():
+                # Subscribe the new filter before dropping the old one so no block falls in between
+                self.resubscribe.clear()
+                pending = []
+                previous = subscription
+                subscription = await self._request(ws, inbox, "eth_subscribe",
+                                                   ["logs", self.log_filter()], pending)
+                await self._request(ws, inbox, "eth_unsubscribe", [previous], pending)
+                self._dispatch(pending, {previous, subscription})
+
+            get = asyncio.ensure_future(inbox.get())
+            resubscribe = asyncio.ensure_future(self.resubscribe.wait())
+            done, _ = await asyncio.wait({get, resubscribe}, return_when=asyncio.FIRST_COMPLETED)
+            resubscribe.cancel()
+            if get not in done:
+                get.cancel()
+                continue
+
+            # Take whatever else already arrived so handlers get one batch per burst
+            messages = [get.result()]
+            while not inbox.empty():
+                messages.append(inbox.get_nowait())
+            batch = []
+            try:
+                for message in messages:
+                    batch.append(self._parse(message))
+            finally:
+                self._dispatch(batch, {subscription})
+
+    def _dispatch(self, notifications: List[Dict], subscriptions: Set[str]):
+        batches: Dict[int, List[Dict]] = {}
+        handlers: Dict[int, LogHandler] = {}
+        for body in notifications:
+            params = body.get("params") or {}
+            if body.get("method") != "eth_subscription" or params.get("subscription") not in subscriptions:
+                continue
+            log = decode_log(params["result"])
+            self.received += 1
+            self.removed += log["removed"]
+            handler = self.routes.get(log["address"])
+            if handler is None:
+                self.unrouted += 1
+                continue
+            batches.setdefault(id(handler), []).append(log)
+            handlers[id(handler)] = handler
+        for key, logs in batches.items():
+            try:
+                handlers[key](logs)
+            except Exception as e:
+                print(f"Log handler failed on {len(logs)} logs: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "routes": len(self.routes),
+            "received": self.received,
+            "removed": self.removed,
+            "unrouted": self.unrouted,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,319 @@
+import copy
+from collections import OrderedDict
+from eth_abi import decode
+from eth_utils import keccak, to_checksum_address
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from web3 import Web3
+from pybot.quotes import v3math
+from pybot.quotes.uni_v3_local import V3Pool, V3Simulator, load_pools as load_v3_pools
+from pybot.quotes.curve_local import CurveEngine, StableSwapPool, load_pools as load_curve_pools
+
+def _topic(signature: str) -> str:
+    return "0x" + keccak(text=signature).hex()
+
+# Uniswap v3 pool events that change swap state
+V3_SWAP = _topic("Swap(address,address,int256,int256,uint160,uint128,int24)")
+V3_MINT = _topic("Mint(address,address,int24,int24,uint128,uint256,uint256)")
+V3_BURN = _topic("Burn(address,int24,int24,uint128,uint256,uint256)")
+V3_TOPICS = [V3_SWAP, V3_MINT, V3_BURN]
+
+# Curve events that move balances (stable int128 ids, crypto uint256 ids, 2-4 coin variants)
+CURVE_TOPICS = [
+    _topic("TokenExchange(address,int128,uint256,int128,uint256)"),
+    _topic("TokenExchange(address,uint256,uint256,uint256,uint256)"),
+    _topic("TokenExchangeUnderlying(address,int128,uint256,int128,uint256)"),
+    _topic("RemoveLiquidityOne(address,uint256,uint256)"),
+    _topic("RemoveLiquidityOne(address,uint256,uint256,uint256)"),
+] + [
+    _topic(signature.format(n=n)) for n in (2, 3, 4) for signature in (
+        "AddLiquidity(address,uint256[{n}],uint256[{n}],uint256,uint256)",
+        "AddLiquidity(address,uint256[{n}],uint256,uint256)",
+        "RemoveLiquidity(address,uint256[{n}],uint256[{n}],uint256)",
+        "RemoveLiquidity(address,uint256[{n}],uint256)",
+        "RemoveLiquidityImbalance(address,uint256[{n}],uint256[{n}],uint256,uint256)",
+    )
+]
+
+def _hex(value) -> str:
+    """Normalize a topic/address (str, bytes or HexBytes) to lowercase 0x-hex."""
+    if isinstance(value, str):
+        return value.lower() if value.startswith("0x") else "0x" + value.lower()
+    return "0x" + bytes(value).hex()
+
+def _int24_topic(topic) -> int:
+    return decode(["int24"], bytes.fromhex(_hex(topic)[2:]))[0]
+
+class PoolStateStore:
+    """Live pool state for one chain, keyed by pool address.
+
+    Uni v3 pools are updated in place from their own events: Swap carries the
+    new slot0 and liquidity, Mint/Burn adjust tick liquidity. Curve pools
+    (whose balances depend on admin fees and, for CryptoSwap, on internal
+    repegging) are marked stale by their events and re-read at the block of
+    the next ``refresh_stale``. Every applied change bumps the pool's version.
+
+    Writers never mutate a pool object that a reader might hold: a changed
+    pool is copied, and the pool maps are republished as new objects. Readers
+    take ``snapshot()`` (v3_sim, curve_engine and versions) once and then
+    quote against that consistent view without any lock. Only writers take the lock.
+
+    The previous object of every pool changed in a block is kept for the last
+    ``journal_blocks`` blocks, which is what makes reorg rollback cheap.
+    """
+
+    def __init__(self, journal_blocks: int = 64):
+        self.v3_sim = V3Simulator([])
+        self.curve_engine = CurveEngine()
+        self.versions: Dict[str, int] = {}
+        self.view = (self.v3_sim, self.curve_engine, self.versions)
+        self.block_number: Optional[int] = None
+        self.sources: Dict[str, Dict] = {}  # pool address -> discovery entry (for reloads)
+        self.stale: Set[str] = set()
+        self.listeners: List[Callable[[Set[str]], None]] = []
+        self.write_lock = Lock()
+        # block -> pool objects as they were before the block, for reorg rollback
+        self.journal: "OrderedDict[int, Dict]" = OrderedDict()
+        self.journal_blocks = journal_blocks
+        self.journal_horizon = -1  # blocks at or below this can no longer be undone
+
+    def addresses(self) -> List[str]:
+        return list(self.v3_sim.by_address) + list(self.curve_engine.pools)
+
+    def topics(self) -> List[str]:
+        return V3_TOPICS + CURVE_TOPICS
+
+    def version(self, pool: str) -> int:
+        return self.versions.get(pool.lower(), 0)
+
+    def snapshot(self) -> Tuple[V3Simulator, CurveEngine, Dict[str, int]]:
+        """(v3_sim, curve_engine, versions) as published together by one writer."""
+        return self.view
+
+    def subscribe(self, listener: Callable[[Set[str]], None]):
+        """Call ``listener(changed_pools)`` after every batch of applied changes."""
+        self.listeners.append(listener)
+
+    def load(self, w3: Web3, chain_pools: Dict[str, List[Dict]], block_identifier=None):
+        """Replace the store contents with a fresh read of the discovered pools at one block."""
+        if block_identifier is None:
+            block_identifier = w3.eth.block_number
+        uni_pools, curve_pools = chain_pools.get("uni_v3", []), chain_pools.get("curve", [])
+        v3_sim = load_v3_pools(w3, uni_pools, block_identifier)
+        curve_engine = load_curve_pools(w3, curve_pools, block_identifier) if curve_pools else CurveEngine()
+
+        with self.write_lock:
+            self.sources = {p["id"].lower(): p for p in uni_pools + curve_pools}
+            changed = set(v3_sim.by_address) | set(curve_engine.pools)
+            self._publish(v3_sim, curve_engine, changed, block_identifier)
+            self.stale.clear()
+            # Fresh state supersedes anything the journal could restore
+            self.journal.clear()
+            if isinstance(block_identifier, int):
+                self.journal_horizon = block_identifier
+        self._notify(changed)
+
+    def apply_logs(self, logs: Iterable[Dict]) -> Set[str]:
+        """Apply decoded pool events in order; returns the pools whose state changed.
+
+        A log with ``removed: true`` (its block was reorged out) first rolls
+        the store back to the state before that block. Logs already applied,
+        recognized by (blockNumber, logIndex), are skipped, so overlapping
+        eth_getLogs and subscription deliveries are harmless.
+        """
+        with self.write_lock:
+            v3_pools = dict(self.v3_sim.by_address)
+            copied: Set[tuple] = set()  # (pool, block) already copied in this batch
+            changed: Set[str] = set()
+            block_number = self.block_number
+
+            for log in logs:
+                address = _hex(log["address"])
+                topics = log["topics"]
+                block = log.get("blockNumber")
+                if log.get("removed"):
+                    if block is not None:
+                        changed |= self._rollback(v3_pools, block, address)
+                        copied = {key for key in copied if key[1] < block}
+                        block_number = min(block - 1, block_number or block - 1)
+                    continue
+                if not topics:
+                    continue
+
+                entry = None
+                if block is not None:
+                    if block <= self.journal_horizon:
+                        continue  # older than the journal, so already applied
+                    entry = self.journal.setdefault(block, {"pools": {}, "curve": set(), "applied": set()})
+                    if log.get("logIndex") in entry["applied"]:
+                        continue
+                    entry["applied"].add(log.get("logIndex"))
+                    block_number = max(block_number or 0, block)
+
+                topic0 = _hex(topics[0])
+                if address in v3_pools and topic0 in V3_TOPICS:
+                    if (address, block) not in copied:
+                        if entry is not None:
+                            # State before this block, restored if the block is reorged out
+                            entry["pools"].setdefault(address, v3_pools[address])
+                        v3_pools[address] = self._copy_v3(v3_pools[address])
+                        copied.add((address, block))
+                    if self._apply_v3(v3_pools[address], topic0, topics, bytes(log["data"])):
+                        changed.add(address)
+                elif address in self.curve_engine.pools and topic0 in CURVE_TOPICS:
+                    self.stale.add(address)
+                    if entry is not None:
+                        entry["curve"].add(address)
+
+            while len(self.journal) > self.journal_blocks:
+                oldest, _ = self.journal.popitem(last=False)
+                self.journal_horizon = max(self.journal_horizon, oldest)
+
+            if changed:
+                self._publish(V3Simulator(list(v3_pools.values()), block_number),
+                              self.curve_engine, changed, None)
+            self.block_number = block_number
+        self._notify(changed)
+        return changed
+
+    def _rollback(self, v3_pools: Dict[str, V3Pool], block: int, address: str) -> Set[str]:
+        """Restore every pool changed at ``block`` or later to its state before ``block``."""
+        if block <= self.journal_horizon:
+            # Too deep to undo from the journal; re-read the pool from chain instead
+            print(f"Reorg at block {block} is older than the undo journal; reloading {address}")
+            self.stale.add(address)
+            return set()
+
+        restored = set()
+        for undone in sorted((b for b in self.journal if b >= block), reverse=True):
+            entry = self.journal.pop(undone)
+            for pool, previous in entry["pools"].items():
+                v3_pools[pool] = previous
+                restored.add(pool)
+            # Curve pools are re-read at the next refresh, which sees the new fork
+            self.stale |= entry["curve"]
+        return restored
+
+    def refresh_stale(self, w3: Web3, block_identifier=None) -> Set[str]:
+        """Re-read every stale pool in one batched load at ``block_identifier``."""
+        with self.write_lock:
+            stale, self.stale = self.stale, set()
+        if not stale:
+            return set()
+        if block_identifier is None:
+            block_identifier = w3.eth.block_number
+
+        uni_sources = [self.sources[a] for a in stale if a in self.v3_sim.by_address and a in self.sources]
+        curve_sources = [self.sources[a] for a in stale if a in self.curve_engine.pools and a in self.sources]
+        fresh_v3 = load_v3_pools(w3, uni_sources, block_identifier).by_address if uni_sources else {}
+        fresh_curve = load_curve_pools(w3, curve_sources, block_identifier).pools if curve_sources else {}
+
+        with self.write_lock:
+            v3_pools = dict(self.v3_sim.by_address)
+            v3_pools.update(fresh_v3)
+            curve_pools = dict(self.curve_engine.pools)
+            curve_pools.update(fresh_curve)
+            changed = set(fresh_v3) | set(fresh_curve)
+            changed |= self._relink_metapools(curve_pools, set(fresh_curve))
+            block_number = block_identifier if isinstance(block_identifier, int) else self.block_number
+            self._publish(V3Simulator(list(v3_pools.values()), block_number),
+                          CurveEngine(list(curve_pools.values()), block_number), changed, block_number)
+        self._notify(changed)
+        return changed
+
+    # --- internals (callers hold write_lock) ---
+
+    def _publish(self, v3_sim: V3Simulator, curve_engine: CurveEngine, changed: Set[str], block_number):
+        versions = dict(self.versions)
+        for address in changed:
+            versions[address] = versions.get(address, 0) + 1
+        self.v3_sim, self.curve_engine, self.versions = v3_sim, curve_engine, versions
+        # One attribute assignment: snapshot() readers see the old or the new view, never a mix
+        self.view = (v3_sim, curve_engine, versions)
+        if isinstance(block_number, int):
+            self.block_number = block_number
+
+    def _notify(self, changed: Set[str]):
+        if changed:
+            for listener in self.listeners:
+                listener(changed)
+
+    @staticmethod
+    def _copy_v3(pool: V3Pool) -> V3Pool:
+        fresh = copy.copy(pool)
+        fresh.bitmap = dict(pool.bitmap)
+        fresh.liquidity_net = dict(pool.liquidity_net)
+        fresh.liquidity_gross = dict(pool.liquidity_gross)
+        return fresh
+
+    def _apply_v3(self, pool: V3Pool, topic0: str, topics: List, data: bytes) -> bool:
+        if topic0 == V3_SWAP:
+            _, _, sqrt_price, liquidity, tick = decode(
+                ["int256", "int256", "uint160", "uint128", "int24"], data)
+            pool.sqrt_price_x96, pool.liquidity, pool.tick = sqrt_price, liquidity, tick
+            # A swap that left the loaded bitmap words needs a reload around the new tick
+            if ((tick // pool.tick_spacing) >> 8) not in pool.bitmap:
+                self.stale.add(pool.address)
+            return True
+
+        tick_lower, tick_upper = _int24_topic(topics[2]), _int24_topic(topics[3])
+        if topic0 == V3_MINT:
+            amount = decode(["address", "uint128", "uint256", "uint256"], data)[1]
+        else:
+            amount = -decode(["uint128", "uint256", "uint256"], data)[0]
+        if amount == 0:
+            return False
+
+        self._update_tick(pool, tick_lower, amount, upper=False)
+        self._update_tick(pool, tick_upper, amount, upper=True)
+        if tick_lower <= pool.tick < tick_upper:
+            pool.liquidity += amount
+        return True
+
+    @staticmethod
+    def _update_tick(pool: V3Pool, tick: int, delta: int, upper: bool):
+        """Tick.update + TickBitmap.flipTick for a tick in a loaded bitmap word."""
+        word_pos, bit_pos = v3math.position(tick // pool.tick_spacing)
+        if word_pos not in pool.bitmap:
+            return  # outside the loaded range; swaps never read it
+        gross_before = pool.liquidity_gross.get(tick, 0)
+        gross_after = gross_before + delta
+        net = pool.liquidity_net.get(tick, 0) + (-delta if upper else delta)
+
+        if gross_after == 0:
+            pool.liquidity_gross.pop(tick, None)
+            pool.liquidity_net.pop(tick, None)
+        else:
+            pool.liquidity_gross[tick] = gross_after
+            pool.liquidity_net[tick] = net
+        if (gross_before == 0) != (gross_after == 0):
+            pool.bitmap[word_pos] ^= 1 << bit_pos
+
+    @staticmethod
+    def _relink_metapools(curve_pools: Dict[str, object], refreshed: Set[str]) -> Set[str]:
+        """Point metapools at the current base pool objects; returns metapools that changed."""
+        relinked = set()
+        for address, pool in list(curve_pools.items()):
+            if not isinstance(pool, StableSwapPool) or pool.base_address is None:
+                continue
+            base = curve_pools.get(pool.base_address)
+            if isinstance(base, StableSwapPool) and pool.base_pool is not base:
+                pool = copy.copy(pool) if address not in refreshed else pool
+                pool.base_pool = base
+                curve_pools[address] = pool
+                relinked.add(address)
+        return relinked
+
+def fetch_pool_logs(w3: Web3, addresses: List[str], topics: List[str], from_block: int, to_block: int,
+                    addresses_per_request: int = 500) -> List[Dict]:
+    """eth_getLogs for many pools and topics, in block/log order."""
+    logs = []
+    for start in range(0, len(addresses), addresses_per_request):
+        logs.extend(w3.eth.get_logs({
+            "address": [to_checksum_address(a) for a in addresses[start:start + addresses_per_request]],
+            "topics": [topics],
+            "fromBlock": from_block,
+            "toBlock": to_block,
+        }))
+    logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+    return logs
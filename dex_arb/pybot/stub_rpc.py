@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from aiohttp import web
+from eth_utils import keccak
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+class MockRpcNode:
+    """Local JSON-RPC HTTP endpoint with adjustable latency and failures.
+
+    Answers single and batch requests for a handful of read methods
+    (web3_clientVersion, eth_chainId, eth_blockNumber, eth_gasPrice,
+    eth_feeHistory of the latest block at ``base_fee``,
+    eth_call echoing its calldata, eth_estimateGas charging the intrinsic
+    calldata gas); anything else gets a JSON-RPC error. Calldata listed
+    in ``revert_calls`` (0x hex) reverts in both.
+    ``delay_ms`` slows every answer, ``fail_rate`` is the share of requests
+    answered with HTTP 503, so two or three nodes are enough to exercise
+    the failover and hedging of chains.PooledHTTPProvider.
+
+    It also plays a relay: eth_sendRawTransaction / eth_sendPrivateTransaction
+    return the tx hash and, with ``include_after_ms`` set, schedule its
+    inclusion in ``ledger`` (hash -> inclusion time). Nodes sharing one
+    ledger answer eth_getTransactionReceipt for each other's transactions,
+    which is enough to exercise exec.relays.RelaySubmitter.
+    """
+
+    def __init__(self, name: str = "mock", delay_ms: float = 0.0, fail_rate: float = 0.0,
+                 chain_id: int = 8453, block_number: int = 1, include_after_ms: Optional[float] = None,
+                 ledger: Optional[Dict[str, float]] = None, revert_calls: Optional[Set[str]] = None,
+                 base_fee: int = 10 ** 7):
+        self.name = name
+        self.delay_ms = delay_ms
+        self.fail_rate = fail_rate
+        self.chain_id = chain_id
+        self.block_number = block_number
+        self.include_after_ms = include_after_ms
+        self.ledger = ledger if ledger is not None else {}
+        self.revert_calls = revert_calls if revert_calls is not None else set()
+        self.base_fee = base_fee
+        self.received: List[str] = []   # tx hashes submitted here
+        self.cancelled: List[str] = []
+        self.calls: List[Tuple[str, list]] = []  # (method, params) of every answered request
+        self.requests = 0
+        self.failures = 0
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on ``host:port`` (0 picks a free port) and return the http:// URL."""
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def _answer(self, request: Dict) -> Dict:
+        method, params = request.get("method"), request.get("params") or []
+        self.calls.append((method, params))
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "web3_clientVersion":
+            response["result"] = f"MockRpcNode/{self.name}"
+        elif method == "eth_chainId":
+            response["result"] = hex(self.chain_id)
+        elif method == "eth_blockNumber":
+            response["result"] = hex(self.block_number)
+        elif method == "eth_gasPrice":
+            response["result"] = hex(10 ** 8)
+        elif method == "eth_feeHistory":
+            count = min(int(params[0], 16) if isinstance(params[0], str) else int(params[0]), self.block_number)
+            response["result"] = {
+                "oldestBlock": hex(self.block_number - count + 1),
+                "baseFeePerGas": [hex(self.base_fee)] * (count + 1),
+                "gasUsedRatio": [0.5] * count,
+                "reward": [[hex(10 ** 6) for _ in params[2]] for _ in range(count)] if len(params) > 2 else [],
+            }
+        elif method in ("eth_call", "eth_estimateGas"):
+            data = params[0].get("data") or params[0].get("input") or "0x"
+            if data in self.revert_calls:
+                response["error"] = {"code": 3, "message": "execution reverted", "data": "0x"}
+            elif method == "eth_call":
+                response["result"] = data
+            else:
+                raw = bytes.fromhex(data[2:])
+                response["result"] = hex(21000 + sum(16 if byte else 4 for byte in raw))
+        elif method in ("eth_sendRawTransaction", "eth_sendPrivateTransaction"):
+            raw = params[0]["tx"] if method == "eth_sendPrivateTransaction" else params[0]
+            tx_hash = "0x" + keccak(hexstr=raw).hex()
+            self.received.append(tx_hash)
+            if self.include_after_ms is not None:
+                included_at = time.monotonic() + self.include_after_ms / 1000
+                self.ledger[tx_hash] = min(self.ledger.get(tx_hash, included_at), included_at)
+            response["result"] = tx_hash
+        elif method == "eth_cancelPrivateTransaction":
+            self.cancelled.append(params[0]["txHash"])
+            response["result"] = True
+        elif method == "eth_getTransactionReceipt":
+            included_at = self.ledger.get(params[0])
+            response["result"] = None if included_at is None or included_at > time.monotonic() else {
+                "transactionHash": params[0], "blockNumber": hex(self.block_number),
+                "status": "0x1", "gasUsed": hex(21000), "logs": [],
+            }
+        else:
+            response["error"] = {"code": -32601, "message": f"method {method} not supported"}
+        return response
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        if self.delay_ms:
+            await asyncio.sleep(self.delay_ms / 1000)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self.failures += 1
+            return web.Response(status=503, text="unavailable")
+        answer = [self._answer(r) for r in body] if isinstance(body, list) else self._answer(body)
+        return web.json_response(answer)
+
+async def _serve(host: str, port: int, delay_ms: float, fail_rate: float):
+    node = MockRpcNode(delay_ms=delay_ms, fail_rate=fail_rate)
+    url = await node.start(host, port)
+    print(f"Mock JSON-RPC node listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await node.stop()
+
+def main():
+    """Serve a mock JSON-RPC endpoint for offline failover/hedging tests."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="latency added to every answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.delay_ms, args.fail_rate))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 from decimal import Decimal
 from typing import Union
+from pybot.utils import fixed
 
-def normalize_amount(amount: Union[int, str], decimals: int) -> Decimal:
-    """Normalize token amount to decimal representation."""
-    return Decimal(amount) / Decimal(10 ** decimals)
+def normalize_amount(amount: Union[int, str], decimals: int) -> float:
+    """Normalize token amount to a (correctly rounded) float number of tokens."""
+    return fixed.to_units(int(amount), decimals)
 
 def denormalize_amount(amount: Union[float, Decimal], decimals: int) -> int:
     """Convert decimal amount to wei/smallest unit."""
@@ -11,5 +12,19 @@ def denormalize_amount(amount: Union[float, Decimal], decimals: int) -> int:
 
 def format_amount(amount: Union[int, str], decimals: int, precision: int = 6) -> str:
     """Format amount for display."""
-    normalized = normalize_amount(amount, decimals)
+    return fixed.format_units(int(amount), decimals, precision)
+
+# Decimal reference implementations (checked against pybot.utils.fixed in tests/test_fixed.py)
+
+def normalize_amount_decimal(amount: Union[int, str], decimals: int) -> Decimal:
+    """Normalize token amount to decimal representation."""
+    return Decimal(amount) / Decimal(10 ** decimals)
+
+def format_amount_decimal(amount: Union[int, str], decimals: int, precision: int = 6) -> str:
+    """Format amount for display."""
+    normalized = normalize_amount_decimal(amount, decimals)
     return f"{normalized:.{precision}f}"
+
+def usd_to_amount_decimal(decimals: int, usd: float, price_usd: float = 1.0) -> int:
+    """Convert USD amount to token amount."""
+    return int(Decimal(usd) / Decimal(price_usd) * (10 ** decimals))
@@ -0,0 +1,141 @@
+import numpy as np
+from decimal import ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_EVEN, ROUND_UP
+from typing import Union
+
+# Integer fixed-point helpers for token amounts (raw units / wei) and basis points.
+#
+# Every function is exact on Python ints and rounds once, in an explicit mode.
+# The mode names are the decimal module's, so a Decimal expression and its
+# integer counterpart can be compared directly:
+#   ROUND_DOWN       toward zero (Solidity `/`, int() of a Decimal)
+#   ROUND_FLOOR      toward -inf (FullMath.mulDiv on non-negative values)
+#   ROUND_CEILING    toward +inf (FullMath.mulDivRoundingUp)
+#   ROUND_UP         away from zero
+#   ROUND_HALF_EVEN  nearest, ties to even (Decimal's default context)
+
+BPS = 10_000
+Array = np.ndarray
+
+def div_round(numerator: int, denominator: int, rounding: str = ROUND_DOWN) -> int:
+    """numerator / denominator as an int, rounded in ``rounding`` mode."""
+    if denominator == 0:
+        raise ZeroDivisionError("fixed-point division by zero")
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)  # floor division
+    if remainder == 0 or rounding == ROUND_FLOOR:
+        return quotient
+    if rounding == ROUND_CEILING:
+        return quotient + 1
+    if rounding == ROUND_DOWN:
+        return quotient + 1 if numerator < 0 else quotient
+    if rounding == ROUND_UP:
+        return quotient if numerator < 0 else quotient + 1
+    if rounding == ROUND_HALF_EVEN:
+        twice = 2 * remainder
+        if twice > denominator or (twice == denominator and quotient % 2):
+            return quotient + 1
+        return quotient
+    raise ValueError(f"Unsupported rounding mode {rounding}")
+
+def mul_div(a: int, b: int, denominator: int, rounding: str = ROUND_DOWN) -> int:
+    """a * b / denominator with a single rounding (no intermediate overflow in Python)."""
+    return div_round(a * b, denominator, rounding)
+
+def apply_slippage(amount: int, slippage_bps: int, rounding: str = ROUND_DOWN) -> int:
+    """amount * (1 - slippage_bps / 10000)."""
+    return mul_div(int(amount), BPS - slippage_bps, BPS, rounding)
+
+def profit_margin_pct(amount_in: int, amount_out: int, costs: int) -> float:
+    """(amount_out - amount_in - costs) / amount_in in percent, correctly rounded to a float."""
+    if amount_in == 0:
+        return 0.0
+    # int / int is the correctly rounded float of the exact quotient
+    return (int(amount_out) - int(amount_in) - int(costs)) * 100 / int(amount_in)
+
+def to_units(amount: int, decimals: int) -> float:
+    """Raw amount as a float number of tokens, correctly rounded."""
+    return int(amount) / 10 ** decimals
+
+def rescale(amount: int, from_decimals: int, to_decimals: int, rounding: str = ROUND_DOWN) -> int:
+    """Re-express a raw amount with another number of decimals (e.g. to an 18-decimal wad)."""
+    if to_decimals >= from_decimals:
+        return int(amount) * 10 ** (to_decimals - from_decimals)
+    return div_round(int(amount), 10 ** (from_decimals - to_decimals), rounding)
+
+def format_units(amount: int, decimals: int, precision: int = 6) -> str:
+    """Raw amount as a fixed-point string with ``precision`` digits, ties to even."""
+    scaled = rescale(amount, decimals, precision, ROUND_HALF_EVEN)
+    sign = "-" if int(amount) < 0 else ""
+    whole, fraction = divmod(abs(scaled), 10 ** precision)
+    return f"{sign}{whole}.{fraction:0{precision}d}" if precision else f"{sign}{whole}"
+
+def usd_to_units(decimals: int, usd: float, price_usd: float = 1.0, rounding: str = ROUND_DOWN) -> int:
+    """Raw token amount worth ``usd`` at ``price_usd``, from the floats' exact binary values."""
+    usd_num, usd_den = float(usd).as_integer_ratio()
+    price_num, price_den = float(price_usd).as_integer_ratio()
+    return div_round(usd_num * price_den * 10 ** decimals, usd_den * price_num, rounding)
+
+# --- batch variants: elementwise over arrays, same results as the scalar functions ---
+
+def _fits_int64(*bounds: int) -> bool:
+    return all(abs(bound) < 2 ** 63 for bound in bounds)
+
+def _as_exact(values) -> Array:
+    """Array of exact integers: int64 when given int64, otherwise Python ints (object)."""
+    array = np.asarray(values)
+    if array.dtype.kind in "iu":
+        return array.astype(np.int64) if array.dtype != np.uint64 else array.astype(object)
+    return np.array([int(v) for v in array.ravel()], dtype=object).reshape(array.shape)
+
+def div_round_batch(numerator: Array, denominator: Union[int, Array], rounding: str = ROUND_DOWN) -> Array:
+    """div_round elementwise. int64 inputs stay int64; anything else uses exact Python ints."""
+    numerator = _as_exact(numerator)
+    denominator = _as_exact(denominator)
+    if np.any(denominator == 0):
+        raise ZeroDivisionError("fixed-point division by zero")
+    negative_denominator = denominator < 0
+    numerator = np.where(negative_denominator, -numerator, numerator)
+    denominator = np.where(negative_denominator, -denominator, denominator)
+    quotient, remainder = numerator // denominator, numerator % denominator
+    inexact = remainder != 0
+    if rounding == ROUND_FLOOR:
+        bump = np.zeros(quotient.shape, dtype=bool)
+    elif rounding == ROUND_CEILING:
+        bump = inexact
+    elif rounding == ROUND_DOWN:
+        bump = inexact & (numerator < 0)
+    elif rounding == ROUND_UP:
+        bump = inexact & (numerator >= 0)
+    elif rounding == ROUND_HALF_EVEN:
+        twice = 2 * remainder
+        bump = (twice > denominator) | ((twice == denominator) & (quotient % 2 != 0))
+    else:
+        raise ValueError(f"Unsupported rounding mode {rounding}")
+    return quotient + bump.astype(quotient.dtype if quotient.dtype != object else np.int64)
+
+def mul_div_batch(a: Array, b: Union[int, Array], denominator: Union[int, Array],
+                  rounding: str = ROUND_DOWN) -> Array:
+    """mul_div elementwise; switches to exact Python ints when a * b could overflow int64."""
+    a, b = _as_exact(a), _as_exact(b)
+    if a.dtype != object and b.dtype != object:
+        a_max = int(np.abs(a).max()) if a.size else 0
+        b_max = int(np.abs(b).max()) if b.size else 0
+        if not _fits_int64(a_max * b_max, 2 * a_max * b_max):
+            a, b = a.astype(object), b.astype(object)
+    return div_round_batch(a * b, denominator, rounding)
+
+def apply_slippage_batch(amounts: Array, slippage_bps: Union[int, Array], rounding: str = ROUND_DOWN) -> Array:
+    """apply_slippage elementwise."""
+    return mul_div_batch(amounts, BPS - _as_exact(slippage_bps), BPS, rounding)
+
+def to_units_batch(amounts: Array, decimals: Union[int, Array]) -> Array:
+    """to_units elementwise (float64), correctly rounded per element."""
+    amounts, decimals = np.broadcast_arrays(_as_exact(amounts), np.asarray(decimals))
+    return np.array([int(a) / 10 ** int(d) for a, d in zip(amounts.ravel(), decimals.ravel())],
+                    dtype=np.float64).reshape(amounts.shape)
+
+def usd_to_units_batch(decimals: int, usd: Array, price_usd: float = 1.0, rounding: str = ROUND_DOWN) -> Array:
+    """usd_to_units for many USD sizes at one price; exact Python ints (object array)."""
+    return np.array([usd_to_units(decimals, float(value), price_usd, rounding) for value in np.ravel(usd)],
+                    dtype=object).reshape(np.shape(usd))
@@ -1,5 +1,6 @@
 from decimal import Decimal, ROUND_DOWN
 from typing import Union
+from pybot.utils import fixed
 
 def calculate_slippage(amount_in: Union[int, Decimal], 
                       amount_out: Union[int, Decimal],
@@ -12,17 +13,38 @@ def calculate_slippage(amount_in: Union[int, Decimal],
     return float(slippage * 100)
 
 def apply_slippage(amount: Union[int, Decimal], slippage_bps: int) -> int:
+    """Apply slippage to amount (in basis points), rounding toward zero."""
+    if isinstance(amount, Decimal):
+        return apply_slippage_decimal(amount, slippage_bps)
+    return fixed.apply_slippage(amount, slippage_bps)
+
+def calculate_min_return(amount_out: Union[int, Decimal], 
+                        slippage_bps: int) -> int:
+    """Calculate minimum return with slippage."""
+    return apply_slippage(amount_out, slippage_bps)
+
+def calculate_profit_margin(amount_in: Union[int, Decimal],
+                           amount_out: Union[int, Decimal],
+                           costs: Union[int, Decimal]) -> float:
+    """Calculate profit margin percentage."""
+    if any(isinstance(v, Decimal) for v in (amount_in, amount_out, costs)):
+        return calculate_profit_margin_decimal(amount_in, amount_out, costs)
+    return fixed.profit_margin_pct(amount_in, amount_out, costs)
+
+# Decimal reference implementations (checked against pybot.utils.fixed in tests/test_fixed.py)
+
+def apply_slippage_decimal(amount: Union[int, Decimal], slippage_bps: int) -> int:
     """Apply slippage to amount (in basis points)."""
     slippage_decimal = Decimal(slippage_bps) / Decimal(10000)
     adjusted = Decimal(amount) * (Decimal(1) - slippage_decimal)
     return int(adjusted)
 
-def calculate_min_return(amount_out: Union[int, Decimal], 
+def calculate_min_return_decimal(amount_out: Union[int, Decimal], 
                         slippage_bps: int) -> int:
     """Calculate minimum return with slippage."""
-    return apply_slippage(amount_out, slippage_bps)
+    return apply_slippage_decimal(amount_out, slippage_bps)
 
-def calculate_profit_margin(amount_in: Union[int, Decimal],
+def calculate_profit_margin_decimal(amount_in: Union[int, Decimal],
                            amount_out: Union[int, Decimal],
                            costs: Union[int, Decimal]) -> float:
     """Calculate profit margin percentage."""
@@ -0,0 +1,250 @@
+import json
+import os
+from collections import OrderedDict
+from eth_abi import decode
+from eth_utils import function_signature_to_4byte_selector
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from web3 import Web3
+from pybot.quotes.multicall import aggregate3, decode_uint
+from pybot.utils.fixed import to_units, usd_to_units
+from pybot.utils.tokens import TOKEN_ADDRESSES, get_token_decimals, is_stablecoin
+
+Q96 = 2 ** 96
+
+SYMBOL = function_signature_to_4byte_selector("symbol()")
+DECIMALS = function_signature_to_4byte_selector("decimals()")
+
+# (token0, token1, reserve0, reserve1) with reserves in whole tokens
+PriceEdge = Tuple[str, str, float, float]
+
+def _decode_symbol(result) -> str:
+    ok, data = result
+    if not ok or not data:
+        return ""
+    if len(data) == 32:  # bytes32 symbol (e.g. MKR)
+        return data.rstrip(b"\0").decode(errors="ignore")
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        return ""
+
+def fetch_tokens(w3: Web3, addresses: List[str], block_identifier) -> Dict[str, Dict]:
+    """symbol() and decimals() for tokens; tokens without decimals() are left out."""
+    calls = [(address, selector) for address in addresses for selector in (SYMBOL, DECIMALS)]
+    results = aggregate3(w3, calls, block_identifier, batch_size=500)
+    tokens = {}
+    for n, address in enumerate(addresses):
+        ok, decimals = decode_uint(results[2 * n + 1])
+        if ok and decimals <= 255:
+            tokens[address] = {"id": address, "symbol": _decode_symbol(results[2 * n]),
+                               "decimals": str(decimals)}
+    return tokens
+
+def stablecoin_prices(chain: str) -> Dict[str, float]:
+    """The chain's known stablecoins at $1, the anchor every other price hangs off."""
+    return {address.lower(): 1.0 for symbol, address in TOKEN_ADDRESSES.get(chain, {}).items()
+            if is_stablecoin(symbol)}
+
+def propagate_prices(edges: Iterable[PriceEdge], seeds: Dict[str, float], passes: int = 3) -> Dict[str, float]:
+    """USD prices spread from ``seeds`` across pool spot prices.
+
+    Each pass prices tokens paired with an already priced token, using the
+    pool with the most depth (USD on the priced side) for each new token.
+    """
+    edges = list(edges)
+    prices = dict(seeds)
+    for _ in range(passes):
+        best: Dict[str, Tuple[float, float]] = {}  # token -> (depth_usd, price)
+        for t0, t1, reserve0, reserve1 in edges:
+            if reserve0 <= 0 or reserve1 <= 0:
+                continue
+            if t0 in prices and t1 not in prices:
+                depth, token, price = reserve0 * prices[t0], t1, prices[t0] * reserve0 / reserve1
+            elif t1 in prices and t0 not in prices:
+                depth, token, price = reserve1 * prices[t1], t0, prices[t1] * reserve1 / reserve0
+            else:
+                continue
+            if depth > best.get(token, (0.0, 0.0))[0]:
+                best[token] = (depth, price)
+        if not best:
+            break
+        prices.update({token: price for token, (_, price) in best.items()})
+    return prices
+
+def v3_price_edge(token0: str, token1: str, sqrt_price_x96: int, liquidity: int,
+                  decimals0: int, decimals1: int) -> PriceEdge:
+    """Virtual reserves of a v3 pool's current range, in whole tokens."""
+    sqrt_p = sqrt_price_x96 / Q96
+    if not sqrt_p or not liquidity:
+        return token0, token1, 0.0, 0.0
+    return (token0, token1, liquidity / sqrt_p / 10 ** decimals0, liquidity * sqrt_p / 10 ** decimals1)
+
+def pool_price_edges(uni_pools: Iterable[Dict]) -> List[PriceEdge]:
+    """Price edges from discovered Uni v3 pool dicts (their sqrtPrice/liquidity snapshot)."""
+    return [
+        v3_price_edge(pool["token0"]["id"], pool["token1"]["id"], int(pool.get("sqrtPrice") or 0),
+                      int(pool.get("liquidity") or 0), int(pool["token0"]["decimals"]),
+                      int(pool["token1"]["decimals"]))
+        for pool in uni_pools
+    ]
+
+class TokenService:
+    """Token metadata and per-block USD prices for one chain.
+
+    Metadata (symbol, decimals) never changes, so it is resolved once and
+    kept in a JSON file forever. The static table in utils.tokens only seeds
+    it: metadata returned with discovered pools replaces a seed, and one
+    batched symbol()/decimals() multicall fetches whatever is still unknown
+    and checks every seed not confirmed otherwise.
+
+    Prices come from our own pool state only: the chain's stablecoins anchor
+    at $1 and propagate through Uni v3 spot prices (see propagate_prices).
+    Prices of the last ``price_blocks`` blocks are kept, so scoring a block
+    makes no RPC calls at all.
+    """
+
+    def __init__(self, chain: str, cache_path: Optional[str] = None, price_blocks: int = 16):
+        self.chain = chain
+        self.cache_path = cache_path
+        self.price_blocks = price_blocks
+        self.tokens: Dict[str, Dict] = {}
+        self.seeded: Set[str] = set()  # metadata only from the static table, not confirmed yet
+        for symbol, address in TOKEN_ADDRESSES.get(chain, {}).items():
+            if address.lower() not in self.tokens:
+                self.tokens[address.lower()] = {"symbol": symbol, "decimals": get_token_decimals(symbol)}
+                self.seeded.add(address.lower())
+        self.prices_by_block: "OrderedDict[int, Dict[str, float]]" = OrderedDict()
+        self.prices: Dict[str, float] = stablecoin_prices(chain)
+        self.price_block: Optional[int] = None
+        self.lock = Lock()
+        self.dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def decimals(self, token: str) -> Optional[int]:
+        meta = self.tokens.get(token.lower())
+        return None if meta is None else meta["decimals"]
+
+    def symbol(self, token: str) -> Optional[str]:
+        meta = self.tokens.get(token.lower())
+        return None if meta is None else meta["symbol"]
+
+    def native_token(self) -> Optional[str]:
+        """Wrapped native token (gas is paid in its unwrapped form)."""
+        address = TOKEN_ADDRESSES.get(self.chain, {}).get("WETH")
+        return address.lower() if address else None
+
+    def add(self, token: str, symbol: str, decimals) -> bool:
+        """Record a token's metadata; True if it was not known yet or only seeded."""
+        token = token.lower()
+        if token in self.tokens and token not in self.seeded:
+            return False
+        with self.lock:
+            self.tokens[token] = {"symbol": symbol, "decimals": int(decimals)}
+            self.seeded.discard(token)
+            self.dirty = True
+        return True
+
+    def learn_pools(self, chain_pools: Dict[str, List[Dict]]) -> int:
+        """Take token metadata discovery already returned with the pools; returns how many were new."""
+        added = 0
+        for pool in chain_pools.get("uni_v3", []):
+            for token in (pool["token0"], pool["token1"]):
+                if token.get("decimals") not in (None, ""):
+                    added += self.add(token["id"], token.get("symbol", ""), token["decimals"])
+        for pool in chain_pools.get("curve", []):
+            for coin in pool.get("coins", []):
+                if coin.get("decimals") not in (None, ""):
+                    added += self.add(coin["address"], coin.get("symbol", ""), coin["decimals"])
+        return added
+
+    def resolve(self, w3: Web3, tokens: Iterable[str], block_identifier="latest") -> int:
+        """Fetch metadata of every unknown or only seeded token in one batched multicall and persist it."""
+        wanted = {t.lower() for t in tokens}
+        unknown = sorted(wanted - (set(self.tokens) - self.seeded))
+        if unknown:
+            for address, meta in fetch_tokens(w3, unknown, block_identifier).items():
+                self.add(address, meta["symbol"], meta["decimals"])
+        if self.dirty:
+            self.save()
+        return len(unknown)
+
+    def update_prices(self, block_number: Optional[int], edges: Iterable[PriceEdge]) -> Dict[str, float]:
+        """Prices at ``block_number`` from pool edges (computed once per block)."""
+        if block_number is not None and block_number in self.prices_by_block:
+            return self.prices_by_block[block_number]
+        prices = propagate_prices(edges, stablecoin_prices(self.chain))
+        with self.lock:
+            if block_number is not None:
+                self.prices_by_block[block_number] = prices
+                while len(self.prices_by_block) > self.price_blocks:
+                    self.prices_by_block.popitem(last=False)
+            if block_number is None or self.price_block is None or block_number >= self.price_block:
+                self.prices, self.price_block = prices, block_number
+        return prices
+
+    def v3_edges(self, pools: Iterable) -> List[PriceEdge]:
+        """Price edges from live V3Pool state (tokens with unknown decimals are skipped)."""
+        edges = []
+        for pool in pools:
+            d0, d1 = self.decimals(pool.token0), self.decimals(pool.token1)
+            if d0 is not None and d1 is not None:
+                edges.append(v3_price_edge(pool.token0, pool.token1, pool.sqrt_price_x96,
+                                           pool.liquidity, d0, d1))
+        return edges
+
+    def price_usd(self, token: str, block_number: Optional[int] = None) -> Optional[float]:
+        prices = self.prices if block_number is None else self.prices_by_block.get(block_number, self.prices)
+        return prices.get(token.lower())
+
+    def native_price_usd(self, block_number: Optional[int] = None) -> Optional[float]:
+        native = self.native_token()
+        return None if native is None else self.price_usd(native, block_number)
+
+    def usd_to_amount(self, token: str, usd: float, block_number: Optional[int] = None) -> Optional[int]:
+        decimals, price = self.decimals(token), self.price_usd(token, block_number)
+        if decimals is None or not price:
+            return None
+        return usd_to_units(decimals, usd, price)
+
+    def amount_to_usd(self, token: str, amount: int, block_number: Optional[int] = None) -> Optional[float]:
+        decimals, price = self.decimals(token), self.price_usd(token, block_number)
+        if decimals is None or price is None:
+            return None
+        return to_units(amount, decimals) * price
+
+    def save(self):
+        """Write the metadata cache atomically."""
+        if not self.cache_path:
+            return
+        with self.lock:
+            # Seeds are re-read from the static table at startup
+            tokens = {address: meta for address, meta in self.tokens.items() if address not in self.seeded}
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"chain": self.chain, "tokens": tokens}, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def _load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("chain") == self.chain:
+            for address, meta in data.get("tokens", {}).items():
+                meta = {"symbol": meta["symbol"], "decimals": int(meta["decimals"])}
+                if address in self.seeded and meta == self.tokens[address]:
+                    continue  # a copy of the seed (older caches saved seeds too), still to be confirmed
+                self.tokens[address] = meta
+                self.seeded.discard(address)
+
+def token_cache_path(directory: str, chain: str) -> str:
+    return os.path.join(directory, f"{chain}_tokens.json")
@@ -5,7 +5,6 @@ from web3 import Web3
 TOKEN_ADDRESSES = {
     'base': {
         'USDC': '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',
-        'USDT': '0x50c5725949A6F0c72E6C4a641F24049A917DB0Cb',
         'DAI': '0x50c5725949A6F0c72E6C4a641F24049A917DB0Cb',
         'WETH': '0x4200000000000000000000000000000000000006',
     },
@@ -1,24 +1,38 @@
--- Additional indexes for performance optimization
+-- Indexes for optimal query performance
 -- Run after schema.sql
+-- Indexes on a partitioned table are created on every partition, current and future.
+-- Partitions already prune by ts, so standalone ts indexes are BRIN (tiny, append order).
 
--- Composite indexes for complex queries
-CREATE INDEX IF NOT EXISTS idx_quotes_chain_profit_ts ON quotes(chain, profit_usd DESC, ts DESC);
-CREATE INDEX IF NOT EXISTS idx_transactions_chain_profit ON transactions(chain, profit_usd DESC);
-CREATE INDEX IF NOT EXISTS idx_pools_chain_tvl_dex ON pools(chain, tvl_usd DESC, dex);
+-- Pools table indexes
+CREATE INDEX idx_pools_chain_dex ON pools(chain, dex);
+CREATE INDEX idx_pools_tvl_usd ON pools(tvl_usd DESC);
+CREATE INDEX idx_pools_updated_at ON pools(updated_at);
 
--- Partial indexes for active records
-CREATE INDEX IF NOT EXISTS idx_transactions_pending ON transactions(chain, ts) WHERE status = 'pending';
-CREATE INDEX IF NOT EXISTS idx_quotes_recent ON quotes(chain, profit_usd DESC) WHERE ts > NOW() - INTERVAL '1 hour';
+-- Quotes table indexes
+CREATE INDEX idx_quotes_ts ON quotes USING BRIN (ts);
+CREATE INDEX idx_quotes_chain_ts ON quotes(chain, ts);
 
--- GIN indexes for JSONB columns
-CREATE INDEX IF NOT EXISTS idx_quotes_legs_gin ON quotes USING GIN (legs);
-CREATE INDEX IF NOT EXISTS idx_transactions_legs_gin ON transactions USING GIN (legs);
-CREATE INDEX IF NOT EXISTS idx_metrics_metadata_gin ON metrics USING GIN (metadata);
+-- Executions table indexes
+CREATE INDEX idx_executions_ts ON executions USING BRIN (ts);
+CREATE INDEX idx_executions_chain_ts ON executions(chain, ts);
+CREATE INDEX idx_executions_tx_hash ON executions(tx_hash);
 
--- Indexes for time-based queries
-CREATE INDEX IF NOT EXISTS idx_quotes_hourly ON quotes(DATE_TRUNC('hour', ts), chain);
-CREATE INDEX IF NOT EXISTS idx_transactions_daily ON transactions(DATE_TRUNC('day', ts), chain);
+-- Gas prices table indexes
+CREATE INDEX idx_gas_prices_ts ON gas_prices USING BRIN (ts);
+CREATE INDEX idx_gas_prices_chain_ts ON gas_prices(chain, ts);
+
+-- Metrics table indexes
+CREATE INDEX idx_metrics_ts ON metrics USING BRIN (ts);
+CREATE INDEX idx_metrics_chain_name_ts ON metrics(chain, metric_name, ts);
+
+-- Rollup indexes (dashboards read per chain over a time range)
+CREATE INDEX idx_quotes_1m_chain_ts ON quotes_1m(chain, ts);
+CREATE INDEX idx_executions_1m_chain_ts ON executions_1m(chain, ts);
+
+-- Composite indexes for common queries
+CREATE INDEX idx_quotes_profitable ON quotes(profit_usd DESC, ts DESC) WHERE profit_usd > 0;
+CREATE INDEX idx_executions_successful ON executions(status, ts DESC) WHERE status = 'success';
+CREATE INDEX idx_pools_active ON pools(chain, dex, tvl_usd DESC) WHERE tvl_usd > 100000;
 
 -- Indexes for risk management queries
-CREATE INDEX IF NOT EXISTS idx_risk_limits_chain_type ON risk_limits(chain, limit_type);
-CREATE INDEX IF NOT EXISTS idx_risk_limits_reset ON risk_limits(last_reset, reset_period);
+CREATE INDEX idx_risk_limits_reset ON risk_limits(last_reset, reset_period);
@@ -1,85 +1,231 @@
--- Database schema for arbitrage bot
+-- Database schema for arbitrage bot (same tables as ../../sql/schema.sql, plus risk_limits)
 -- Run this once to create the database structure
 
--- Enable UUID extension
-CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
-
--- Quotes table - stores arbitrage opportunities
-CREATE TABLE IF NOT EXISTS quotes (
-    id BIGSERIAL PRIMARY KEY,
-    chain VARCHAR(50) NOT NULL,
-    amount_in_usd DECIMAL(20, 8) NOT NULL,
-    amount_out_usd DECIMAL(20, 8) NOT NULL,
-    gas_estimate_usd DECIMAL(20, 8) NOT NULL,
-    flash_fee_usd DECIMAL(20, 8) NOT NULL,
-    profit_usd DECIMAL(20, 8) NOT NULL,
-    legs JSONB NOT NULL,
-    ts TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+-- Pools table for storing discovered DEX pools
+CREATE TABLE pools (
+  id SERIAL PRIMARY KEY,
+  chain TEXT NOT NULL,
+  dex TEXT NOT NULL,
+  address BYTEA NOT NULL,
+  token0 BYTEA NOT NULL,
+  token1 BYTEA NOT NULL,
+  fee_bps INTEGER,
+  tvl_usd NUMERIC,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  UNIQUE(chain, dex, address)
 );
 
--- Transactions table - stores execution records
-CREATE TABLE IF NOT EXISTS transactions (
-    id BIGSERIAL PRIMARY KEY,
-    chain VARCHAR(50) NOT NULL,
-    tx_hash VARCHAR(66) UNIQUE NOT NULL,
-    status VARCHAR(20) NOT NULL DEFAULT 'pending',
-    gas_used BIGINT,
-    gas_price BIGINT,
-    profit_usd DECIMAL(20, 8),
-    legs JSONB,
-    ts TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+-- Time-series tables below are range-partitioned by ts: partitions are created
+-- ahead of time and dropped after their retention (see partition_config and
+-- run_partition_maintenance), and a DEFAULT partition catches anything else.
+-- The primary key of a partitioned table has to include ts.
 
--- Pools table - stores pool information cache
-CREATE TABLE IF NOT EXISTS pools (
-    id BIGSERIAL PRIMARY KEY,
-    chain VARCHAR(50) NOT NULL,
-    dex VARCHAR(50) NOT NULL,
-    address VARCHAR(42) NOT NULL,
-    token0 VARCHAR(42),
-    token1 VARCHAR(42),
-    tvl_usd DECIMAL(20, 8),
-    fee_tier BIGINT,
-    last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    UNIQUE(chain, dex, address)
-);
+-- Quotes table for storing route quotes and profitability analysis
+CREATE TABLE quotes (
+  id BIGSERIAL,
+  ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  chain TEXT NOT NULL,
+  route_hash BYTEA NOT NULL,
+  amount_in_usd NUMERIC NOT NULL,
+  amount_out_usd NUMERIC NOT NULL,
+  gas_estimate_usd NUMERIC NOT NULL,
+  flash_fee_usd NUMERIC NOT NULL,
+  profit_usd NUMERIC NOT NULL,
+  legs JSONB NOT NULL,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Executions table for tracking transaction execution
+CREATE TABLE executions (
+  id BIGSERIAL,
+  ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  chain TEXT NOT NULL,
+  tx_hash BYTEA,
+  private_sent BOOLEAN,
+  status TEXT,
+  gas_used NUMERIC,
+  gas_price_gwei NUMERIC,
+  profit_usd NUMERIC,
+  reason TEXT,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Gas prices table for tracking gas price history
+CREATE TABLE gas_prices (
+  id BIGSERIAL,
+  ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  chain TEXT NOT NULL,
+  base_fee_gwei NUMERIC NOT NULL,
+  priority_fee_gwei NUMERIC NOT NULL,
+  gas_price_gwei NUMERIC NOT NULL,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
 
 -- Performance metrics table
-CREATE TABLE IF NOT EXISTS metrics (
-    id BIGSERIAL PRIMARY KEY,
-    chain VARCHAR(50) NOT NULL,
-    metric_name VARCHAR(100) NOT NULL,
-    metric_value DECIMAL(20, 8) NOT NULL,
-    metadata JSONB,
-    ts TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+CREATE TABLE metrics (
+  id BIGSERIAL,
+  ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  chain TEXT NOT NULL,
+  metric_name TEXT NOT NULL,
+  metric_value NUMERIC NOT NULL,
+  labels JSONB,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Per-minute rollups, kept up to date by statement-level insert triggers
+-- (one aggregate upsert per INSERT/COPY batch) so dashboards never scan raw rows.
+-- ts is the minute bucket.
+
+-- Best quote per route and minute
+CREATE TABLE quotes_1m (
+  ts TIMESTAMPTZ NOT NULL,
+  chain TEXT NOT NULL,
+  route_hash BYTEA NOT NULL,
+  best_profit_usd NUMERIC NOT NULL,
+  quotes BIGINT NOT NULL,
+  PRIMARY KEY (ts, chain, route_hash)
+) PARTITION BY RANGE (ts);
+
+-- Execution outcomes per chain and minute (anything but 'success' counts as failed)
+CREATE TABLE executions_1m (
+  ts TIMESTAMPTZ NOT NULL,
+  chain TEXT NOT NULL,
+  executions BIGINT NOT NULL,
+  failed BIGINT NOT NULL,
+  fail_rate NUMERIC NOT NULL,
+  PRIMARY KEY (ts, chain)
+) PARTITION BY RANGE (ts);
+
+CREATE TABLE quotes_default PARTITION OF quotes DEFAULT;
+CREATE TABLE executions_default PARTITION OF executions DEFAULT;
+CREATE TABLE gas_prices_default PARTITION OF gas_prices DEFAULT;
+CREATE TABLE metrics_default PARTITION OF metrics DEFAULT;
+CREATE TABLE quotes_1m_default PARTITION OF quotes_1m DEFAULT;
+CREATE TABLE executions_1m_default PARTITION OF executions_1m DEFAULT;
+
+-- Partition layout and retention per partitioned table
+CREATE TABLE partition_config (
+  parent TEXT PRIMARY KEY,
+  period TEXT NOT NULL CHECK (period IN ('day', 'week', 'month')),
+  premake INTEGER NOT NULL DEFAULT 3,  -- future partitions kept ready
+  retention INTERVAL                   -- partitions wholly older than this are dropped (NULL keeps all)
 );
 
+INSERT INTO partition_config (parent, period, premake, retention) VALUES
+  ('quotes', 'day', 3, '14 days'),
+  ('executions', 'month', 2, NULL),
+  ('gas_prices', 'day', 3, '90 days'),
+  ('metrics', 'day', 3, '30 days'),
+  ('quotes_1m', 'month', 2, '365 days'),
+  ('executions_1m', 'month', 2, NULL);
+
+-- Create the partition of parent for [lo, hi), named <parent>_pYYYYMMDD (UTC).
+-- Rows already sitting in the default partition for that range are moved in.
+CREATE OR REPLACE FUNCTION create_partition(parent TEXT, lo TIMESTAMPTZ, hi TIMESTAMPTZ)
+RETURNS BOOLEAN LANGUAGE plpgsql AS $$
+DECLARE
+  part TEXT := parent || '_p' || to_char(lo AT TIME ZONE 'UTC', 'YYYYMMDD');
+BEGIN
+  IF to_regclass(part) IS NOT NULL THEN
+    RETURN FALSE;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part, parent);
+  IF to_regclass(parent || '_default') IS NOT NULL THEN
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE ts >= $1 AND ts < $2 RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved', parent || '_default', part) USING lo, hi;
+  END IF;
+  EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, part, lo, hi);
+  RETURN TRUE;
+END $$;
+
+-- Create the current and next premake partitions of every configured table and
+-- drop the ones past retention. Idempotent; the bot's DatabaseWriter calls it every
+-- database.maintenance_interval_s (pg_cron can schedule it as well).
+CREATE OR REPLACE FUNCTION run_partition_maintenance()
+RETURNS TABLE (partition_name TEXT, action TEXT) LANGUAGE plpgsql AS $$
+DECLARE
+  cfg partition_config%ROWTYPE;
+  step INTERVAL;
+  lo TIMESTAMPTZ;
+  part RECORD;
+BEGIN
+  FOR cfg IN SELECT * FROM partition_config LOOP
+    step := ('1 ' || cfg.period)::INTERVAL;
+    lo := date_trunc(cfg.period, NOW(), 'UTC');
+    FOR n IN 0..cfg.premake LOOP
+      IF create_partition(cfg.parent, lo + step * n, lo + step * (n + 1)) THEN
+        partition_name := cfg.parent || '_p' || to_char((lo + step * n) AT TIME ZONE 'UTC', 'YYYYMMDD');
+        action := 'created';
+        RETURN NEXT;
+      END IF;
+    END LOOP;
+    IF cfg.retention IS NOT NULL THEN
+      FOR part IN
+        SELECT c.relname,
+               to_date(right(c.relname, 8), 'YYYYMMDD')::TIMESTAMP AT TIME ZONE 'UTC' AS lower_bound
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = cfg.parent::REGCLASS AND c.relname ~ ('^' || cfg.parent || '_p[0-9]{8}$')
+      LOOP
+        IF part.lower_bound + step <= NOW() - cfg.retention THEN
+          EXECUTE format('DROP TABLE %I', part.relname);
+          partition_name := part.relname;
+          action := 'dropped';
+          RETURN NEXT;
+        END IF;
+      END LOOP;
+    END IF;
+  END LOOP;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_quotes() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO quotes_1m AS r (ts, chain, route_hash, best_profit_usd, quotes)
+  SELECT date_trunc('minute', ts), chain, route_hash, MAX(profit_usd), COUNT(*)
+  FROM new_rows
+  GROUP BY 1, 2, 3
+  ON CONFLICT (ts, chain, route_hash) DO UPDATE
+    SET best_profit_usd = GREATEST(r.best_profit_usd, EXCLUDED.best_profit_usd),
+        quotes = r.quotes + EXCLUDED.quotes;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_executions() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO executions_1m AS r (ts, chain, executions, failed, fail_rate)
+  SELECT minute, chain, n, failed, failed::NUMERIC / n
+  FROM (SELECT date_trunc('minute', ts) AS minute, chain, COUNT(*) AS n,
+               COUNT(*) FILTER (WHERE status IS DISTINCT FROM 'success') AS failed
+        FROM new_rows GROUP BY 1, 2) batch
+  ON CONFLICT (ts, chain) DO UPDATE
+    SET executions = r.executions + EXCLUDED.executions,
+        failed = r.failed + EXCLUDED.failed,
+        fail_rate = (r.failed + EXCLUDED.failed)::NUMERIC / (r.executions + EXCLUDED.executions);
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER quotes_rollup AFTER INSERT ON quotes
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_quotes();
+CREATE TRIGGER executions_rollup AFTER INSERT ON executions
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_executions();
+
 -- Risk management table
-CREATE TABLE IF NOT EXISTS risk_limits (
-    id BIGSERIAL PRIMARY KEY,
-    chain VARCHAR(50) NOT NULL,
-    limit_type VARCHAR(50) NOT NULL,
-    limit_value DECIMAL(20, 8) NOT NULL,
-    current_value DECIMAL(20, 8) NOT NULL DEFAULT 0,
-    reset_period VARCHAR(20) DEFAULT 'daily',
-    last_reset TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    UNIQUE(chain, limit_type)
+CREATE TABLE risk_limits (
+  id BIGSERIAL PRIMARY KEY,
+  chain TEXT NOT NULL,
+  limit_type TEXT NOT NULL,
+  limit_value NUMERIC NOT NULL,
+  current_value NUMERIC NOT NULL DEFAULT 0,
+  reset_period TEXT DEFAULT 'daily',
+  last_reset TIMESTAMPTZ DEFAULT NOW(),
+  UNIQUE(chain, limit_type)
 );
 
--- Create indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_quotes_chain_ts ON quotes(chain, ts DESC);
-CREATE INDEX IF NOT EXISTS idx_quotes_profit ON quotes(profit_usd DESC);
-CREATE INDEX IF NOT EXISTS idx_transactions_chain_status ON transactions(chain, status);
-CREATE INDEX IF NOT EXISTS idx_transactions_ts ON transactions(ts DESC);
-CREATE INDEX IF NOT EXISTS idx_pools_chain_dex ON pools(chain, dex);
-CREATE INDEX IF NOT EXISTS idx_pools_tvl ON pools(tvl_usd DESC);
-CREATE INDEX IF NOT EXISTS idx_metrics_chain_name ON metrics(chain, metric_name);
-CREATE INDEX IF NOT EXISTS idx_metrics_ts ON metrics(ts DESC);
-
 -- Insert default risk limits
 INSERT INTO risk_limits (chain, limit_type, limit_value, current_value) VALUES
-('base', 'max_position_size_usd', 50000, 0),
-('base', 'max_daily_loss_usd', 1000, 0),
-('arbitrum', 'max_position_size_usd', 50000, 0),
-('arbitrum', 'max_daily_loss_usd', 1000, 0)
+  ('base', 'max_position_size_usd', 50000, 0),
+  ('base', 'max_daily_loss_usd', 1000, 0),
+  ('arbitrum', 'max_position_size_usd', 50000, 0),
+  ('arbitrum', 'max_daily_loss_usd', 1000, 0)
 ON CONFLICT (chain, limit_type) DO NOTHING;
+
+SELECT * FROM run_partition_maintenance();
@@ -0,0 +1,61 @@
+import asyncio
+import math
+import threading
+
+import pytest
+
+from pybot.quotes import v3math
+from pybot.quotes.uni_v3_local import V3Pool
+from pybot.stub_rpc import MockRpcNode
+
+def v3_pool(address, token0, token1, fee, price, liquidity, positions=()):
+    """A V3Pool at raw price ``price`` (token1 per token0) with every bitmap word loaded.
+
+    ``liquidity`` spans the full tick range; ``positions`` add (tick_lower,
+    tick_upper, liquidity) ranges on top (ticks must be multiples of the
+    fee's spacing).
+    """
+    spacing = v3math.TICK_SPACINGS[fee]
+    sqrt_price_x96 = int(math.isqrt(int(price * 2 ** 192)))
+    tick = v3math.get_tick_at_sqrt_ratio(sqrt_price_x96)
+    ranges = [(v3math.MIN_TICK // spacing * spacing + spacing, v3math.MAX_TICK // spacing * spacing, liquidity)]
+    ranges += list(positions)
+    liquidity_net, active = {}, 0
+    for lower, upper, amount in ranges:
+        liquidity_net[lower] = liquidity_net.get(lower, 0) + amount
+        liquidity_net[upper] = liquidity_net.get(upper, 0) - amount
+        if lower <= tick < upper:
+            active += amount
+    bitmap = {word: 0 for word in range(v3math.position(v3math.MIN_TICK // spacing)[0],
+                                        v3math.position(v3math.MAX_TICK // spacing)[0] + 1)}
+    for initialized in liquidity_net:
+        word, bit = v3math.position(initialized // spacing)
+        bitmap[word] |= 1 << bit
+    return V3Pool(address, token0, token1, fee, spacing, sqrt_price_x96, tick, active, bitmap, liquidity_net)
+
+@pytest.fixture
+def make_v3_pool():
+    return v3_pool
+
+@pytest.fixture
+def serve():
+    """Start MockRpcNodes on a background event loop; returns (node, url) pairs."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    nodes = []
+
+    def start(*configs):
+        started = []
+        for config in configs:
+            node = MockRpcNode(**config)
+            url = asyncio.run_coroutine_threadsafe(node.start(), loop).result(5)
+            nodes.append(node)
+            started.append((node, url))
+        return started
+
+    yield start
+    for node in nodes:
+        asyncio.run_coroutine_threadsafe(node.stop(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import itertools
+import json
+from aiohttp import web
+from typing import Dict, List, Optional
+
+class ScriptedLogNode:
+    """Local stand-in for a node's websocket endpoint, replaying scripted pool logs.
+
+    Speaks just enough JSON-RPC for LogStream and the catch-up path:
+    eth_subscribe("logs", filter), eth_unsubscribe, eth_blockNumber and
+    eth_getLogs over the logs emitted so far. The script is a list of steps:
+    a log (JSON-RPC shape, ``removed: true`` allowed) is pushed to every
+    matching subscription, ``{"sleep": seconds}`` pauses, and
+    ``{"disconnect": true}`` drops every client to exercise reconnects.
+    Playback starts when ``play()`` is called, or at the first subscription;
+    ``emit()`` pushes a single log directly.
+    """
+
+    def __init__(self, script: List[Dict], autoplay: bool = True):
+        self.script = script
+        self.autoplay = autoplay
+        self.history: List[Dict] = []
+        self.head = 0
+        self.sockets: Dict[web.WebSocketResponse, Dict[str, Dict]] = {}
+        self.ids = itertools.count(1)
+        self.playing: Optional[asyncio.Task] = None
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on ``host:port`` (0 picks a free port) and return the ws:// URL."""
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"ws://{host}:{port}/"
+
+    async def stop(self):
+        if self.playing is not None:
+            self.playing.cancel()
+        for ws in list(self.sockets):
+            await ws.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def play(self) -> asyncio.Task:
+        if self.playing is None:
+            self.playing = asyncio.ensure_future(self._play())
+        return self.playing
+
+    async def _play(self):
+        for step in self.script:
+            if "sleep" in step:
+                await asyncio.sleep(step["sleep"])
+            elif step.get("disconnect"):
+                for ws in list(self.sockets):
+                    await ws.close()
+            else:
+                await self.emit(step)
+
+    async def emit(self, log: Dict):
+        self.history.append(log)
+        self.head = max(self.head, int(log["blockNumber"], 16))
+        for ws, subscriptions in list(self.sockets.items()):
+            for subscription, log_filter in list(subscriptions.items()):
+                if self._matches(log, log_filter):
+                    await ws.send_str(json.dumps({
+                        "jsonrpc": "2.0", "method": "eth_subscription",
+                        "params": {"subscription": subscription, "result": log},
+                    }))
+
+    @staticmethod
+    def _matches(log: Dict, log_filter: Dict) -> bool:
+        addresses = log_filter.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        if addresses and log["address"].lower() not in {a.lower() for a in addresses}:
+            return False
+        for position, wanted in enumerate(log_filter.get("topics") or []):
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            topics = log.get("topics", [])
+            if position >= len(topics) or topics[position].lower() not in {t.lower() for t in wanted}:
+                return False
+        return True
+
+    def _get_logs(self, log_filter: Dict) -> List[Dict]:
+        def block(value, default):
+            return default if value in (None, "latest") else int(value, 16) if isinstance(value, str) else value
+        from_block, to_block = block(log_filter.get("fromBlock"), 0), block(log_filter.get("toBlock"), self.head)
+        # Only logs still canonical: a removed log cancels the earlier delivery
+        canonical: Dict[tuple, Dict] = {}
+        for log in self.history:
+            key = (log["blockNumber"], log["logIndex"])
+            if log.get("removed"):
+                canonical.pop(key, None)
+            else:
+                canonical[key] = log
+        return [log for log in canonical.values()
+                if from_block <= int(log["blockNumber"], 16) <= to_block and self._matches(log, log_filter)]
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets[ws] = {}
+        try:
+            async for message in ws:
+                if message.type != web.WSMsgType.TEXT:
+                    break
+                body = json.loads(message.data)
+                method, params = body.get("method"), body.get("params", [])
+                response = {"jsonrpc": "2.0", "id": body.get("id")}
+                if method == "eth_subscribe" and params[:1] == ["logs"]:
+                    subscription = hex(next(self.ids))
+                    self.sockets[ws][subscription] = params[1] if len(params) > 1 else {}
+                    response["result"] = subscription
+                elif method == "eth_unsubscribe":
+                    response["result"] = self.sockets[ws].pop(params[0], None) is not None
+                elif method == "eth_blockNumber":
+                    response["result"] = hex(self.head)
+                elif method == "eth_getLogs":
+                    response["result"] = self._get_logs(params[0])
+                else:
+                    response["error"] = {"code": -32601, "message": f"method {method} not supported"}
+                await ws.send_str(json.dumps(response))
+                if method == "eth_subscribe" and self.autoplay:
+                    self.play()
+        finally:
+            self.sockets.pop(ws, None)
+        return ws
+
+async def _serve(script_path: str, host: str, port: int):
+    with open(script_path) as f:
+        node = ScriptedLogNode(json.load(f))
+    url = await node.start(host, port)
+    print(f"Scripted log node listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await node.stop()
+
+def main():
+    """Serve a JSON script of pool logs for offline LogStream testing."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("script", help="JSON list of logs / {'sleep': s} / {'disconnect': true} steps")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8546)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.script, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
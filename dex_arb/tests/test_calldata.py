@@ -0,0 +1,96 @@
+import random
+
+import pytest
+from eth_abi import encode
+
+from pybot.exec.calldata import (EXECUTE_SELECTOR, FLASHLOAN_SELECTOR, ROUTE_TYPE, CalldataBuilder,
+                                 encode_hop, encode_route, encode_swap)
+
+EXECUTOR = "0x" + "ee" * 20
+ROUTER = "0x2626664c2603336E57B271c5C0b26F421741e481"
+ROUTER_V1 = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
+CURVE_POOL = "0x" + "cc" * 20
+WETH, USDC, DAI = "0x" + "11" * 20, "0x" + "22" * 20, "0x" + "33" * 20
+
+def v3_leg(token_in, token_out, fee_tier, router=ROUTER, router_deadline=False):
+    return {"dex": "uni_v3", "addr": router, "pool": "0x" + "aa" * 20, "token_in": token_in,
+            "token_out": token_out, "fee_tier": fee_tier, "router_deadline": router_deadline}
+
+def curve_leg(token_in, token_out, i, j, underlying=False):
+    return {"dex": "curve", "addr": CURVE_POOL, "pool": CURVE_POOL, "token_in": token_in,
+            "token_out": token_out, "i": i, "j": j, "underlying": underlying}
+
+ROUTES = [
+    [v3_leg(WETH, USDC, 500)],
+    [v3_leg(WETH, USDC, 500, ROUTER_V1, True)],
+    [curve_leg(USDC, DAI, 1, 0)],
+    [v3_leg(WETH, USDC, 500), curve_leg(USDC, DAI, 1, 0, True), v3_leg(DAI, WETH, 3000, ROUTER_V1, True)],
+    [curve_leg(DAI, USDC, 0, 1), v3_leg(USDC, WETH, 100), v3_leg(WETH, DAI, 10000)],
+]
+
+AMOUNTS = [1, 10 ** 18, 2 ** 256 - 1]
+
+def expected_route(route, amount_in, hop_min_outs, deadline):
+    amounts = [amount_in] + list(hop_min_outs)
+    hops = [encode_hop(leg, encode_swap(leg, EXECUTOR, amounts[k], amounts[k + 1], deadline))
+            for k, leg in enumerate(route)]
+    return hops, route[0]["token_in"], route[-1]["token_out"]
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("amount", AMOUNTS)
+def test_calls_match_eth_abi(route, amount):
+    template = CalldataBuilder(EXECUTOR).template(route)
+    hop_min_outs = [amount // (k + 2) for k in range(len(route))]
+    route_value = expected_route(route, amount, hop_min_outs, 2 ** 32)
+
+    expected = EXECUTE_SELECTOR + encode([ROUTE_TYPE, "uint256", "uint256", "uint256"],
+                                         [route_value, amount, hop_min_outs[-1], 2 ** 32])
+    assert template.execute_call(amount, hop_min_outs[-1], 2 ** 32, hop_min_outs) == expected
+
+    expected = FLASHLOAN_SELECTOR + encode([ROUTE_TYPE, "uint256", "uint256", "uint256", "uint256"],
+                                           [route_value, amount, hop_min_outs[-1], 2 ** 32, amount])
+    assert template.flashloan_call(amount, hop_min_outs[-1], 2 ** 32, amount, hop_min_outs) == expected
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_matches_encode_route(route):
+    rng = random.Random(len(route))
+    template = CalldataBuilder(EXECUTOR).template(route)
+    for _ in range(20):
+        amount_in = rng.randrange(2 ** 128)
+        hop_min_outs = [rng.randrange(2 ** 128) for _ in route]
+        deadline = rng.randrange(2 ** 40)
+        amounts = [amount_in] + hop_min_outs
+        datas = [encode_swap(leg, EXECUTOR, amounts[k], amounts[k + 1], deadline) for k, leg in enumerate(route)]
+        assert template.route(amount_in, hop_min_outs, deadline) == \
+            encode_route(route, route[0]["token_in"], route[-1]["token_out"], datas)
+
+def test_shared_hops_and_zero_recipient():
+    builder = CalldataBuilder()
+    first, second = ROUTES[3], [ROUTES[3][1], ROUTES[3][2], ROUTES[4][0]]
+    builder.prepare([first, second])
+    assert len(builder) == 2 and len(builder.hops) == 4
+    # The dry-run builder sends swap outputs to the zero address
+    datas = [encode_swap(leg, "0x" + "00" * 20, amount, min_out, 9)
+             for leg, amount, min_out in zip(second, [7, 6, 5], [6, 5, 4])]
+    assert builder.template(second).route(7, [6, 5, 4], 9) == \
+        encode_route(second, second[0]["token_in"], second[-1]["token_out"], datas)
+
+def test_hop_amount_count_is_checked():
+    template = CalldataBuilder(EXECUTOR).template(ROUTES[3])
+    with pytest.raises(ValueError):
+        template.execute_call(10, 5, 0, [9, 8])
+
+def test_build_calldata_spends_previous_min_out():
+    from types import SimpleNamespace
+    from pybot.main import build_calldata
+
+    cfg = SimpleNamespace(strategy={"profit": {"slippage_bps_per_leg": 10}, "flashloan": {"enabled": False}})
+    route = ROUTES[3]
+    route_data = {"route": route, "amount_in": 10 ** 18, "amount_out": 3 * 10 ** 18,
+                  "hop_amounts": [2000 * 10 ** 6, 1999 * 10 ** 18, 3 * 10 ** 18]}
+    data = build_calldata(cfg, route_data, CalldataBuilder(EXECUTOR))
+    hop_min_outs = [1998 * 10 ** 6, 1995002 * 10 ** 15, 2991 * 10 ** 15]  # 10, 20 and 30 bps off
+    deadline = int.from_bytes(data[4 + 3 * 32:4 + 4 * 32], "big")
+    route_value = expected_route(route, 10 ** 18, hop_min_outs, deadline)
+    assert data == EXECUTE_SELECTOR + encode([ROUTE_TYPE, "uint256", "uint256", "uint256"],
+                                             [route_value, 10 ** 18, hop_min_outs[-1], deadline])
@@ -0,0 +1,160 @@
+import random
+from decimal import Decimal, getcontext
+
+import pytest
+from eth_abi import decode, encode
+
+from pybot.quotes import curve_local
+from pybot.quotes.curve_local import (A_MULTIPLIER, CRYPTO_CALLS, CryptoSwapPool, StableSwapPool, get_D, get_y_D,
+                                      newton_y_crypto)
+
+getcontext().prec = 80
+
+# The Vyper pools' integer Newton iterations are checked against the invariants
+# they solve, evaluated in 80-digit Decimal and solved by bisection.
+
+def stable_residual(xp, D, amp, a_precision):
+    """Ann*S + D - Ann*D - D**(n+1) / (n**n * prod(xp)), Ann = amp * n / a_precision."""
+    n = len(xp)
+    Ann = Decimal(amp * n) / a_precision
+    prod = Decimal(1)
+    for x in xp:
+        prod *= x
+    D = Decimal(D)
+    return Ann * sum(xp) + D - Ann * D - D ** (n + 1) / (n ** n * prod)
+
+def crypto_residual(ANN, gamma, x0, x1, D):
+    """Two-coin CryptoSwap invariant F; ANN = A * n**n * A_MULTIPLIER."""
+    x0, x1, D = Decimal(x0), Decimal(x1), Decimal(D)
+    g = Decimal(gamma) / 10 ** 18
+    K0 = 4 * x0 * x1 / D ** 2
+    K = Decimal(ANN) / (4 * A_MULTIPLIER) * K0 * g ** 2 / (g + 1 - K0) ** 2
+    return K * D * (x0 + x1) + x0 * x1 - K * D ** 2 - (D / 2) ** 2
+
+def bisect(f, lo, hi):
+    """Root of a monotone f on [lo, hi] to within one unit."""
+    f_lo = f(lo)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if (f(mid) > 0) == (f_lo > 0):
+            lo, f_lo = mid, f(mid)
+        else:
+            hi = mid
+    return lo
+
+def stable_cases():
+    rng = random.Random(5)
+    cases = [([10 ** 24] * 3, 2000, 100), ([10 ** 24, 10 ** 24], 100, 1)]
+    for _ in range(20):
+        n = rng.choice([2, 3, 4])
+        xp = [rng.randrange(10 ** 20, 10 ** 26) for _ in range(n)]
+        a_precision = rng.choice([1, 100])
+        cases.append((xp, rng.randrange(1, 5000) * a_precision, a_precision))
+    return cases
+
+@pytest.mark.parametrize("xp,amp,a_precision", stable_cases())
+def test_get_D_solves_invariant(xp, amp, a_precision):
+    D = get_D(xp, amp, a_precision)
+    exact = bisect(lambda d: stable_residual(xp, d, amp, a_precision), min(xp), sum(xp) + 1)
+    assert abs(D - exact) <= 2
+
+def test_get_D_balanced_pool_is_sum():
+    assert get_D([10 ** 24] * 3, 2000 * 100, 100) == 3 * 10 ** 24
+    assert get_D([0, 0], 100) == 0
+
+@pytest.mark.parametrize("xp,amp,a_precision", stable_cases())
+def test_get_y_solves_invariant(xp, amp, a_precision):
+    D = get_D(xp, amp, a_precision)
+    x = xp[0] + xp[0] // 7
+    y = get_y_D(amp, 0, xp, D, a_precision, j=1, x=x)
+
+    def residual(candidate):
+        return stable_residual([x, candidate] + xp[2:], D, amp, a_precision)
+
+    exact = bisect(residual, 1, xp[1] + 1)
+    assert abs(y - exact) <= 2
+    # get_y_D for the coin itself recovers its balance
+    assert abs(get_y_D(amp, 1, xp, D, a_precision) - xp[1]) <= 2
+
+def crypto_cases():
+    rng = random.Random(7)
+    cases = []
+    for _ in range(20):
+        D = rng.randrange(10 ** 21, 10 ** 27)
+        # 2-coin pools store A * n**n * A_MULTIPLIER, gamma in 1e18 units
+        ANN = rng.randrange(4000, 4 * 10 ** 6) * A_MULTIPLIER
+        gamma = rng.randrange(10 ** 13, 10 ** 16)
+        x = D // 2 * rng.randrange(60, 160) // 100
+        cases.append((ANN, gamma, x, D, rng.choice([0, 1])))
+    return cases
+
+@pytest.mark.parametrize("ANN,gamma,x,D,i", crypto_cases())
+def test_newton_y_crypto_solves_invariant(ANN, gamma, x, D, i):
+    balances = [x, x]
+    y = newton_y_crypto(ANN, gamma, balances, D, i)
+
+    def residual(candidate):
+        return crypto_residual(ANN, gamma, x, candidate, D)
+
+    exact = bisect(residual, D // 10 ** 3, D)
+    # The Vyper loop stops once a step is below 1e-14 of the result
+    assert abs(y - exact) <= max(y // 10 ** 13, 100)
+
+def test_newton_y_crypto_balanced_pool():
+    D = 2 * 10 ** 24
+    y = newton_y_crypto(400000 * 4 * A_MULTIPLIER, 145 * 10 ** 12, [D // 2, D // 2], D, 0)
+    assert abs(y - D // 2) <= D // 10 ** 14
+
+def test_pool_get_dy_is_monotone_and_below_balance():
+    stable = StableSwapPool("0x" + "01" * 20, ["0x" + "a1" * 20, "0x" + "a2" * 20],
+                            [10 ** 24, 10 ** 12], [10 ** 18, 10 ** 30], amp=2000 * 100, fee=4 * 10 ** 6,
+                            a_precision=100)
+    crypto = CryptoSwapPool("0x" + "02" * 20, ["0x" + "b1" * 20, "0x" + "b2" * 20],
+                            [3 * 10 ** 24, 10 ** 21], [18, 18], A=40 * 4 * A_MULTIPLIER,
+                            gamma=145 * 10 ** 12, D=6 * 10 ** 24, price_scale=3000 * 10 ** 18,
+                            mid_fee=26 * 10 ** 6, out_fee=45 * 10 ** 6, fee_gamma=23 * 10 ** 16)
+    for pool, dx in ((stable, 10 ** 21), (crypto, 10 ** 21)):
+        outs = [pool.get_dy(0, 1, dx * k) for k in (1, 2, 4)]
+        assert 0 < outs[0] < outs[1] < outs[2] < pool.balances[1]
+
+# --- load_pools ---
+
+class FakeMulticall:
+    """Answers aggregate3 calls from per-(pool, selector) words; anything else fails."""
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    def __call__(self, w3, calls, block_identifier=None):
+        results = []
+        for target, data in calls:
+            value = self.answers.get((target, bytes(data[:4])))
+            if value is None and data[:4] in (curve_local.BALANCES_UINT256, curve_local.BALANCES_INT128):
+                (index,) = decode(["uint256"], bytes(data[4:]))
+                value = self.answers.get((target, "balance", index))
+            results.append((value is not None, b"" if value is None else encode(["uint256"], [value])))
+        return results
+
+def crypto_pool(address, n_coins):
+    return {"id": address, "coins": [{"index": str(k), "address": "0x" + f"{k + 1:02x}" * 20, "decimals": "18"}
+                                     for k in range(n_coins)]}
+
+def crypto_answers(address, n_coins):
+    answers = {(address, CRYPTO_CALLS[name]): value for name, value in (
+        ("A", 1707629), ("gamma", 11809167828997), ("D", 3 * 10 ** 24), ("price_scale", 10 ** 18),
+        ("mid_fee", 3 * 10 ** 6), ("out_fee", 3 * 10 ** 7), ("fee_gamma", 5 * 10 ** 14),
+        ("future_A_gamma_time", 0))}
+    # What tricrypto also answers: A() and a dynamic fee() that must not be read as StableSwap
+    answers[(address, curve_local.STABLE_CALLS["fee"])] = 10 ** 7
+    for k in range(n_coins):
+        answers[(address, "balance", k)] = 10 ** 24
+    return answers
+
+def test_load_pools_skips_multi_coin_crypto_pools(monkeypatch, capsys):
+    two, three = "0x" + "c2" * 20, "0x" + "c3" * 20
+    monkeypatch.setattr(curve_local, "aggregate3", FakeMulticall({**crypto_answers(two, 2),
+                                                                 **crypto_answers(three, 3)}))
+    engine = curve_local.load_pools(None, [crypto_pool(two, 2), crypto_pool(three, 3)], block_identifier=1)
+    assert isinstance(engine.pools[two], CryptoSwapPool)
+    assert three not in engine.pools
+    assert f"Skipping Curve pool {three}: 3-coin crypto pool" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+"""sql/schema.sql, sql/indexes.sql and DatabaseWriter's COPY path against a real PostgreSQL.
+
+Skipped unless DATABASE_URL (postgresql+asyncpg://...) is set. Everything
+runs in a scratch schema that is dropped afterwards, so any database the
+role can create schemas in will do.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, text
+
+from pybot.db.write import DatabaseWriter, execution_row
+
+pytestmark = pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL not set")
+
+SQL = Path(__file__).resolve().parent.parent / "sql"
+ROUTE_A, ROUTE_B = b"\xaa" * 32, b"\xbb" * 32
+
+def db_scenario(scenario):
+    """Run ``scenario(db, query)`` with a DatabaseWriter on a fresh copy of the schema."""
+    pytest.importorskip("asyncpg")
+    schema = f"arb_test_{uuid.uuid4().hex[:8]}"
+    db = DatabaseWriter(os.environ["DATABASE_URL"], maintenance_interval_s=None)
+
+    @event.listens_for(db.engine.sync_engine, "connect", insert=True)
+    def set_search_path(dbapi_connection, connection_record):
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION search_path TO {schema}")
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
+
+    async def query(sql, **params):
+        async with db.engine.connect() as conn:
+            return (await conn.execute(text(sql), params)).all()
+
+    async def run():
+        async with db.engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        try:
+            async with db.engine.connect() as conn:
+                driver = (await conn.get_raw_connection()).driver_connection
+                # Multi-statement scripts with $$ bodies: asyncpg's simple query protocol takes them whole
+                await driver.execute((SQL / "schema.sql").read_text())
+                await driver.execute((SQL / "indexes.sql").read_text())
+                assert hasattr(driver, "copy_records_to_table")  # the writer takes the COPY path
+            await scenario(db, query)
+        finally:
+            async with db.engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            await db.engine.dispose()
+
+    asyncio.run(run())
+
+def quote(ts, route_hash, profit):
+    return {"ts": ts, "chain": "base", "route_hash": route_hash, "amount_in_usd": 1000, "amount_out_usd": 1000 + profit,
+            "gas_estimate_usd": 0.1, "flash_fee_usd": 0, "profit_usd": profit, "legs": [{"dex": "uni_v3"}]}
+
+def test_rollups_follow_copy_batches():
+    async def scenario(db, query):
+        minute = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        for n, profit in enumerate([1.5, 4.25, 2.0]):
+            db.write_quote(quote(minute + timedelta(seconds=n), ROUTE_A, profit))
+        await db.flush()
+        # A second batch adds to the same minute rather than replacing it
+        db.write_quote(quote(minute + timedelta(seconds=10), ROUTE_A, 3.0))
+        db.write_quote(quote(minute + timedelta(seconds=11), ROUTE_B, -0.5))
+        for n, status in enumerate(["success", "success", "reverted", "success", None]):
+            db.write_execution({**execution_row("base", "0x" + f"{n:064x}", status, 150_000, 10 ** 7, 0.5),
+                                "ts": minute + timedelta(seconds=n)})
+        await db.flush()
+        assert db.stats()["tables"]["quotes"] == {"queued": 0, "written": 5, "dropped": 0, "errors": 0}
+
+        assert await query("SELECT count(*) FROM quotes") == [(5,)]
+        assert await query("SELECT route_hash, best_profit_usd, quotes FROM quotes_1m WHERE ts = :minute "
+                           "ORDER BY route_hash", minute=minute) == [
+            (ROUTE_A, Decimal("4.25"), 4), (ROUTE_B, Decimal("-0.5"), 1)]
+        assert await query("SELECT executions, failed, fail_rate FROM executions_1m WHERE ts = :minute",
+                           minute=minute) == [(5, 2, Decimal("0.4"))]
+        # Current rows land in the partitions schema.sql premade, not the default
+        assert await query("SELECT count(*) FROM quotes_default") == [(0,)]
+        assert await query("SELECT DISTINCT legs->0->>'dex' FROM quotes") == [("uni_v3",)]
+        assert await query("SELECT tx_hash FROM executions WHERE status IS NULL") == [(bytes.fromhex(f"{4:064x}"),)]
+
+    db_scenario(scenario)
+
+def test_rows_move_out_of_default_partition():
+    async def scenario(db, query):
+        # Beyond every premade partition (3 days of quotes, 3 months of rollups and executions)
+        later = (datetime.now(timezone.utc) + timedelta(days=120)).replace(hour=12, minute=0, second=0,
+                                                                             microsecond=0)
+        for n in range(4):
+            db.write_quote(quote(later + timedelta(seconds=n), ROUTE_A, n))
+        db.write_execution({**execution_row("base", None, "missed"), "ts": later})
+        await db.flush()
+        assert await query("SELECT count(*) FROM quotes_default") == [(4,)]
+        assert await query("SELECT count(*) FROM quotes_1m_default") == [(1,)]
+        assert await query("SELECT count(*) FROM executions_1m_default") == [(1,)]
+
+        day = later.replace(hour=0)
+        month = day.replace(day=1)
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        for parent, lo, hi in [("quotes", day, day + timedelta(days=1)), ("quotes_1m", month, next_month),
+                               ("executions_1m", month, next_month), ("executions", month, next_month)]:
+            assert await query("SELECT create_partition(:parent, :lo, :hi)", parent=parent, lo=lo, hi=hi) == [
+                (True,)]
+
+        suffix = day.strftime("%Y%m%d")
+        month_suffix = month.strftime("%Y%m%d")
+        for default, partition, rows in [("quotes_default", f"quotes_p{suffix}", 4),
+                                         ("quotes_1m_default", f"quotes_1m_p{month_suffix}", 1),
+                                         ("executions_1m_default", f"executions_1m_p{month_suffix}", 1),
+                                         ("executions_default", f"executions_p{month_suffix}", 1)]:
+            assert await query(f"SELECT count(*) FROM {default}") == [(0,)]
+            assert await query(f"SELECT count(*) FROM {partition}") == [(rows,)]
+        # The rollup moved intact and keeps accumulating in its new partition
+        db.write_quote(quote(later + timedelta(seconds=30), ROUTE_A, 10))
+        await db.flush()
+        assert await query("SELECT best_profit_usd, quotes FROM quotes_1m WHERE ts = :ts", ts=later) == [
+            (Decimal("10"), 5)]
+        # Maintenance is idempotent once the current partitions exist
+        await db.maintain_partitions()
+        assert db.partitions == {"created": 0, "dropped": 0}
+
+    db_scenario(scenario)
+
+def test_pool_upsert_updates_in_place():
+    async def scenario(db, query):
+        pool = {"chain": "base", "dex": "uni_v3", "address": b"\x01" * 20, "token0": b"\x0a" * 20,
+                "token1": b"\x0b" * 20, "fee_bps": 5, "tvl_usd": 1.0}
+        db.write_pools([pool])
+        await db.flush()
+        db.write_pools([dict(pool, tvl_usd=2.0), dict(pool, address=b"\x02" * 20)])
+        db.update_pool_tvl("0x" + "02" * 20, "base", 7.5)
+        await db.flush()
+        assert await query("SELECT address, tvl_usd FROM pools ORDER BY address") == [
+            (b"\x01" * 20, Decimal("2.0")), (b"\x02" * 20, Decimal("7.5"))]
+
+    db_scenario(scenario)
@@ -0,0 +1,247 @@
+"""DatabaseWriter buffering and statement building, against a recording stand-in engine (no database).
+
+The COPY path is exercised through a fake asyncpg connection that records
+copy_records_to_table calls; the real round trip against PostgreSQL is
+tests/test_db_integration.py (needs DATABASE_URL).
+"""
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from pybot.db import write
+from pybot.db.models import Execution, Metric, Pool, Quote
+from pybot.db.write import MAX_BIND_PARAMS, DatabaseWriter, TableBuffer, _chunks, _copy_value
+
+class FakeAsyncpg:
+    """Records what asyncpg's copy_records_to_table would have sent."""
+
+    def __init__(self, fail=False):
+        self.copies = []
+        self.fail = fail
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        if self.fail:
+            raise OSError("connection reset")
+        self.copies.append((table_name, columns, records))
+
+class FakeEngine:
+    """connect()/begin() yield one recording connection whose raw driver is ``driver``."""
+
+    def __init__(self, driver=None):
+        self.driver = driver
+        self.statements = []
+        self.commits = 0
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self
+
+    begin = connect
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self.driver)
+
+    async def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+
+    async def commit(self):
+        self.commits += 1
+
+    async def dispose(self):
+        pass
+
+@pytest.fixture
+def writer(monkeypatch):
+    def make(driver=None, **kwargs):
+        monkeypatch.setattr(write, "create_async_engine", lambda url: FakeEngine(driver))
+        return DatabaseWriter("postgresql+asyncpg://test/arb", maintenance_interval_s=None, **kwargs)
+    return make
+
+def compiled(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+# --- TableBuffer ---
+
+def test_drop_policy_keeps_the_first_rows():
+    buffer = TableBuffer(3, "drop")
+    assert [buffer.add({"n": n}) for n in range(5)] == [True, True, True, False, False]
+    assert [row["n"] for row in buffer.rows] == [0, 1, 2]
+    assert buffer.stats() == {"queued": 3, "written": 0, "dropped": 2, "errors": 0}
+    assert [row["n"] for row in buffer.take()] == [0, 1, 2]
+    assert len(buffer) == 0 and buffer.offered == 0
+    assert buffer.add({"n": 5})  # room again after a flush
+
+def test_sample_policy_is_uniform_over_the_burst():
+    random.seed(7)
+    kept = [0] * 100
+    for _ in range(2000):
+        buffer = TableBuffer(10, "sample")
+        for n in range(100):
+            buffer.add({"n": n})
+        assert len(buffer) == 10 and buffer.dropped == 90
+        for row in buffer.take():
+            kept[row["n"]] += 1
+    # Every row of the burst survives with probability 10/100, the tail included
+    expected = 2000 * 10 / 100
+    assert all(abs(count - expected) < 0.35 * expected for count in kept)
+    assert sum(kept[:10]) == pytest.approx(sum(kept[-10:]), rel=0.15)
+
+def test_sample_policy_restarts_after_take():
+    buffer = TableBuffer(2, "sample")
+    for n in range(50):
+        buffer.add({"n": n})
+    buffer.take()
+    assert buffer.add({"n": 50}) and buffer.add({"n": 51})
+    assert [row["n"] for row in buffer.rows] == [50, 51]
+
+# --- helpers ---
+
+def test_chunks_respect_bind_parameter_limit():
+    rows = [{"n": n} for n in range(10_001)]
+    chunks = _chunks(rows, 7)
+    assert all(len(chunk) * 7 <= MAX_BIND_PARAMS for chunk in chunks)
+    assert [row for chunk in chunks for row in chunk] == rows
+    assert len(chunks) == -(-10_001 // (MAX_BIND_PARAMS // 7))
+    assert _chunks(rows[:3], 0) == [rows[:3]]
+    assert _chunks([], 5) == []
+    assert len(_chunks(rows, MAX_BIND_PARAMS * 2)) == len(rows)  # at least one row per statement
+
+def test_copy_value_conversions():
+    columns = Quote.__table__.c
+    assert _copy_value(columns.legs, [{"dex": "curve"}]) == '[{"dex": "curve"}]'
+    assert _copy_value(columns.profit_usd, 1.25) == Decimal("1.25")
+    assert _copy_value(columns.profit_usd, 0.1) == Decimal("0.1")  # via str, not the binary float
+    assert _copy_value(columns.profit_usd, Decimal("3.5")) == Decimal("3.5")
+    assert _copy_value(columns.route_hash, "0xAbCd") == b"\xab\xcd"
+    assert _copy_value(columns.route_hash, b"\x01") == b"\x01"
+    assert _copy_value(columns.chain, "base") == "base"
+    assert _copy_value(columns.profit_usd, None) is None
+    assert _copy_value(Metric.__table__.c.labels, {"k": 1}) == json.dumps({"k": 1})
+
+# --- DatabaseWriter ---
+
+def test_write_stamps_event_time_and_applies_overflow_policy(writer):
+    db = writer(max_rows=2, batch_rows=100, overflow={"quotes": "sample"})
+    ts = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert db.write_execution({"chain": "base", "status": "missed", "ts": ts})
+    db.write_execution({"chain": "base", "status": "missed"})
+    assert not db.write_execution({"chain": "base", "status": "missed"})
+    rows = db.buffers["executions"].rows
+    assert rows[0]["ts"] == ts and rows[1]["ts"].tzinfo is not None
+    db.write_quote({"chain": "base"})
+    assert db.buffers["quotes"].policy == "sample" and db.buffers["executions"].policy == "drop"
+    # Pools have no ts column and are not stamped
+    db.write_pools([{"chain": "base", "dex": "uni_v3", "address": b"\x01"}])
+    assert "ts" not in db.pools[("base", "uni_v3", b"\x01")]
+
+def test_pool_upsert_dedups_by_key(writer):
+    db = writer(max_rows=2)
+    first = {"chain": "base", "dex": "uni_v3", "address": b"\x01", "token0": b"\x0a", "token1": b"\x0b",
+             "fee_bps": 5, "tvl_usd": 1.0}
+    assert db.write_pools([first, dict(first, tvl_usd=2.0), dict(first, dex="curve", fee_bps=None)]) == 3
+    # Full: a new key is dropped, an update of a queued key is still taken
+    assert db.write_pools([dict(first, address=b"\x02"), dict(first, tvl_usd=3.0)]) == 1
+    assert db.stats()["tables"]["pools"] == {"queued": 2, "written": 0, "dropped": 1, "errors": 0}
+    assert db.pools[("base", "uni_v3", b"\x01")]["tvl_usd"] == 3.0
+
+    asyncio.run(db.flush())
+    (statement, _), = db.engine.statements
+    sql = str(compiled(statement))
+    assert sql.count("VALUES") == 1 and "ON CONFLICT (chain, dex, address) DO UPDATE SET" in sql
+    assert "updated_at = now()" in sql and "chain = excluded.chain" not in sql
+    params = compiled(statement).params
+    assert sorted(v for k, v in params.items() if k.startswith("tvl_usd")) == [1.0, 3.0]
+    assert db.stats()["tables"]["pools"]["written"] == 2 and db.pools == {}
+
+def test_copy_groups_rows_by_column_set(writer):
+    driver = FakeAsyncpg()
+    db = writer(driver)
+    db.write("metrics", {"chain": "base", "metric_name": "quote_ms", "metric_value": 1.5})  # no labels key
+    db.write_metric("base", "quote_ms", 2.5, {"dex": "curve"})
+    db.write_metric("base", "routes", 7, {"dex": "uni_v3"})
+    db.write_execution(write.execution_row("base", "0x" + "ab" * 32, "success", 150_000, 10 ** 7, 0.5))
+    asyncio.run(db.flush())
+
+    copies = {(table, tuple(columns)): records for table, columns, records in driver.copies}
+    assert set(copies) == {
+        ("metrics", ("ts", "chain", "metric_name", "metric_value", "labels")),
+        ("metrics", ("ts", "chain", "metric_name", "metric_value")),
+        ("executions", ("ts", "chain", "tx_hash", "private_sent", "status", "gas_used", "gas_price_gwei",
+                        "profit_usd", "reason")),
+    }
+    labelled = copies[("metrics", ("ts", "chain", "metric_name", "metric_value", "labels"))]
+    (unlabelled,) = copies[("metrics", ("ts", "chain", "metric_name", "metric_value"))]
+    assert unlabelled[1:] == ("base", "quote_ms", Decimal("1.5")) and unlabelled[0].tzinfo is not None
+    assert [record[1:] for record in labelled] == [("base", "quote_ms", Decimal("2.5"), '{"dex": "curve"}'),
+                                                   ("base", "routes", Decimal("7"), '{"dex": "uni_v3"}')]
+    (execution,) = copies[("executions", ("ts", "chain", "tx_hash", "private_sent", "status", "gas_used",
+                                          "gas_price_gwei", "profit_usd", "reason"))]
+    assert execution[2] == bytes.fromhex("ab" * 32) and execution[5:8] == (Decimal("150000"), Decimal("0.01"),
+                                                                           Decimal("0.5"))
+    assert db.stats()["tables"]["metrics"]["written"] == 3 and db.engine.statements == []
+
+def test_insert_fallback_without_asyncpg(writer):
+    db = writer(driver=object())
+    rows = 10_000
+    for n in range(rows):
+        db.write_quote({"chain": "base", "route_hash": b"\x01", "amount_in_usd": n, "amount_out_usd": n,
+                        "gas_estimate_usd": 0, "flash_fee_usd": 0, "profit_usd": 0, "legs": []})
+    asyncio.run(db.flush())
+    statements = [statement for statement, _ in db.engine.statements]
+    assert len(statements) > 1 and db.engine.commits == 1
+    assert all(len(compiled(statement).params) <= MAX_BIND_PARAMS for statement in statements)
+    assert sum(len(compiled(s).params) for s in statements) == rows * 9
+    assert db.stats()["tables"]["quotes"]["written"] == rows
+
+def test_failed_write_is_counted_not_retried(writer, capsys):
+    db = writer(FakeAsyncpg(fail=True))
+    db.write_quote({"chain": "base"})
+    db.write_quote({"chain": "base"})
+    asyncio.run(db.flush())
+    assert db.stats()["tables"]["quotes"] == {"queued": 0, "written": 0, "dropped": 0, "errors": 2}
+    assert "Writing 2 rows to quotes failed" in capsys.readouterr().out
+
+def test_full_buffer_wakes_the_flusher(writer):
+    async def run():
+        db = writer(FakeAsyncpg(), batch_rows=3, flush_interval_s=60)
+        db.start()
+        for _ in range(3):
+            db.write_quote({"chain": "base"})
+        for _ in range(100):
+            if db.flushes:
+                break
+            await asyncio.sleep(0.01)
+        await db.close()
+        return db
+
+    db = asyncio.run(run())
+    assert db.flushes >= 1 and db.stats()["tables"]["quotes"]["written"] == 3
+
+def test_tvl_updates_keep_latest(writer):
+    db = writer()
+    db.update_pool_tvl("0x01", "base", 1.0)
+    db.update_pool_tvl("0x01", "base", 2.0)
+    db.update_pool_tvl("0x02", "base", 5.0)
+    asyncio.run(db.flush())
+    (statement, params), = db.engine.statements
+    assert params == [{"b_chain": "base", "b_address": b"\x01", "b_tvl": 2.0},
+                      {"b_chain": "base", "b_address": b"\x02", "b_tvl": 5.0}]
+    assert str(compiled(statement)).startswith("UPDATE pools SET tvl_usd=")
+
+def test_pool_rows_shape():
+    rows = write.pool_rows("base", {
+        "uni_v3": [{"id": "0x01", "token0": {"id": "0x0a"}, "token1": {"id": "0x0b"},
+                    "totalValueLockedUSD": "12.5", "feeTier": "500"}],
+        "curve": [{"id": "0x02", "totalValueLockedUSD": "3", "coins": [{"address": "0x0c"}, {"address": "0x0d"}]},
+                  {"id": "0x03", "totalValueLockedUSD": "3", "coins": [{"address": "0x0c"}]}],
+    })
+    assert [(r["dex"], r["address"], r["fee_bps"]) for r in rows] == [("uni_v3", b"\x01", 5), ("curve", b"\x02", None)]
+    assert set(rows[0]) == set(Pool.__table__.c.keys()) - {"id", "updated_at"}
+    assert set(write.execution_row("base", None, "missed")) == set(Execution.__table__.c.keys()) - {"id", "ts"}
@@ -0,0 +1,123 @@
+import math
+import random
+import statistics
+import time
+
+import pytest
+
+from pybot.exec.fees import FeeOracle, RollingRate, StreamingQuantile
+
+GWEI = 10 ** 9
+
+def estimates(pct, draw, n, seed):
+    rng = random.Random(seed)
+    quantile = StreamingQuantile(pct)
+    return [quantile.update(draw(rng)) for _ in range(n)]
+
+@pytest.mark.parametrize("pct, draw, true", [
+    (0.5, lambda rng: rng.uniform(1, 2), 1.5),
+    (0.9, lambda rng: rng.uniform(1, 2), 1.9),
+    (0.5, lambda rng: rng.expovariate(1.0), math.log(2)),
+    (0.9, lambda rng: rng.expovariate(1.0), math.log(10)),
+    (0.9, lambda rng: rng.lognormvariate(0, 1.0), math.exp(1.2815515655446004)),
+])
+def test_quantile_settles_on_known_distributions(pct, draw, true):
+    # Averaged over time and seeds the running estimate sits on the true quantile
+    settled = [statistics.mean(estimates(pct, draw, 4000, seed)[2000:]) for seed in range(10)]
+    assert statistics.mean(settled) == pytest.approx(true, rel=0.04)
+
+@pytest.mark.parametrize("n", [20, 50, 200])
+def test_tail_quantile_is_not_low_while_warming_up(n):
+    # Seeded from the first samples' exact quantile, p90 is usable from the 20th head
+    values = [estimates(0.9, lambda rng: rng.expovariate(1.0), n, seed)[-1] for seed in range(200)]
+    assert statistics.mean(values) == pytest.approx(math.log(10), rel=0.08)
+
+def test_quantile_follows_level_shift():
+    rng = random.Random(3)
+    quantile = StreamingQuantile(0.5)
+    for _ in range(500):
+        quantile.update(rng.uniform(0.9, 1.1) * 10 ** 7)
+    for _ in range(300):
+        quantile.update(rng.uniform(0.9, 1.1) * 10 ** 9)
+    assert quantile.value == pytest.approx(10 ** 9, rel=0.05)
+
+def test_quantile_seed_is_exact():
+    quantile = StreamingQuantile(0.9, alpha=0.1)
+    for x in range(1, 11):
+        quantile.update(x)
+    assert quantile.value == pytest.approx(9.1) and quantile.count == 10
+    assert quantile.seed is None  # streaming from here on
+
+# --- FeeOracle ---
+
+def test_basefee_pause_waits_for_warmup():
+    oracle = FeeOracle({"basefee_p90_pause": True}, warmup_heads=20)
+    rng = random.Random(1)
+    for block in range(1, 19):
+        oracle.on_head(block, int(rng.uniform(0.9, 1.1) * 10 ** 7))
+    oracle.on_head(19, 10 ** 9)
+    assert oracle.pause_reason() is None  # 19 heads: p90 not trusted yet
+
+    for block in range(20, 60):
+        oracle.on_head(block, int(rng.uniform(0.9, 1.1) * 10 ** 7))
+    assert oracle.pause_reason() is None
+    oracle.on_head(60, 5 * 10 ** 7)
+    assert oracle.pause_reason().startswith("base fee 0.0500 gwei above p90")
+    assert oracle.pause_reason() is not None and oracle.pauses == 1  # still the same pause
+    oracle.on_head(61, 10 ** 7)
+    assert oracle.pause_reason() is None and oracle.stats()["paused"] is None
+    oracle.on_head(62, 5 * 10 ** 7)
+    oracle.pause_reason()
+    assert oracle.pauses == 2
+
+def test_basefee_pause_not_false_on_steady_skewed_fees():
+    # Right after warmup the p90 must not sit so low that ordinary heads trip it
+    rng = random.Random(2)
+    tripped = 0
+    for trial in range(50):
+        oracle = FeeOracle({"basefee_p90_pause": True}, warmup_heads=20)
+        for block in range(1, 41):
+            oracle.on_head(block, int(10 ** 7 * (1 + rng.expovariate(3.0))))
+            if block > 20:
+                tripped += oracle.pause_reason() is not None
+    assert tripped / (50 * 20) < 0.2
+
+def test_failrate_pause_needs_min_samples_and_window():
+    oracle = FeeOracle({"failrate_pct_pause": 50, "failrate_min_samples": 4, "failrate_window_s": 60})
+    for _ in range(3):
+        oracle.record_execution(False)
+    assert oracle.pause_reason() is None  # 3 sends are not enough to judge
+    oracle.record_execution(True)
+    assert oracle.pause_reason() == "execution fail rate 75% over 4 sends"
+    oracle.record_simulation(False)  # simulations never pause on their own
+    assert oracle.stats()["fail_rates"] == {"execution": 0.75, "simulation": 1.0}
+
+    fresh = FeeOracle({"failrate_pct_pause": 50, "failrate_min_samples": 4, "failrate_window_s": 60})
+    executions = fresh.fail_rates["execution"]
+    for _ in range(4):
+        executions.record(False, now=time.monotonic() - 120)  # outside the window
+    executions.record(True)
+    assert fresh.pause_reason() is None and len(executions) == 1
+
+def test_rolling_rate_window():
+    rate = RollingRate(window_s=10)
+    rate.record(False, now=0)
+    rate.record(True, now=5)
+    assert rate.rate(now=5) == 0.5
+    rate.record(True, now=11)
+    assert rate.rate(now=11) == 0.0 and rate.failed == 0
+    assert rate.rate(now=100) == 0.0
+
+def test_fee_history_and_gas_price():
+    oracle = FeeOracle()
+    assert oracle.gas_price() is None
+    head = oracle.on_fee_history({"oldestBlock": 100, "baseFeePerGas": [10 ** 7, 11 * 10 ** 6],
+                                  "reward": [[2 * 10 ** 6]]})
+    assert head == 100
+    assert oracle.gas_price() == 11 * 10 ** 6 + 2 * 10 ** 6
+    # Old and repeated heads are ignored
+    oracle.on_head(100, GWEI)
+    oracle.on_head(99, GWEI)
+    assert oracle.base_fee == 10 ** 7 and oracle.base_fee_p50.count == 1
+    oracle.on_fee_history({"oldestBlock": 101, "baseFeePerGas": [12 * 10 ** 6, 13 * 10 ** 6], "reward": []})
+    assert oracle.tip == 2 * 10 ** 6 and oracle.next_base_fee == 13 * 10 ** 6
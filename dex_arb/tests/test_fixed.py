@@ -0,0 +1,84 @@
+"""Randomized equivalence of pybot.utils.fixed with the Decimal reference implementations.
+
+The Decimal reference works at 28 significant digits. Inputs are drawn where
+that context is exact (amounts below 10**24), and there the integer results
+must match exactly. For usd_to_units the reference rounds its 28-digit
+quotient before truncating, so a result one unit off is accepted when the
+exact quotient is within that rounding error of an integer.
+"""
+import random
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from pybot.utils import decimals as ref_decimals, math as ref_math
+from pybot.utils.fixed import (BPS, ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_EVEN, ROUND_UP,
+                               apply_slippage, apply_slippage_batch, div_round, div_round_batch, format_units,
+                               mul_div_batch, profit_margin_pct, to_units, to_units_batch, usd_to_units)
+
+SEEDS = range(8)
+TRIALS = 1_000
+ROUNDINGS = (ROUND_DOWN, ROUND_FLOOR, ROUND_CEILING, ROUND_UP, ROUND_HALF_EVEN)
+
+def amount(rng: random.Random) -> int:
+    return rng.choice([0, 1, rng.randrange(10 ** 6), rng.randrange(10 ** 18), rng.randrange(10 ** 24)])
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_scalar_matches_decimal(seed):
+    rng = random.Random(seed)
+    for _ in range(TRIALS):
+        a, b, c = amount(rng), amount(rng), amount(rng) // 1000
+        bps = rng.randrange(0, BPS + 1)
+        decimals = rng.choice([0, 6, 8, 18])
+        assert apply_slippage(a, bps) == ref_math.apply_slippage_decimal(a, bps)
+        assert profit_margin_pct(a, b, c) == ref_math.calculate_profit_margin_decimal(a, b, c)
+        assert to_units(a, decimals) == float(ref_decimals.normalize_amount_decimal(a, decimals))
+        assert format_units(a, decimals) == ref_decimals.format_amount_decimal(a, decimals)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_usd_to_units_matches_decimal(seed):
+    rng = random.Random(seed)
+    for _ in range(TRIALS):
+        decimals = rng.choice([0, 6, 8, 18])
+        usd = rng.choice([float(rng.randrange(1, 10 ** 6)), rng.uniform(0.01, 1e6)])
+        price = rng.choice([1.0, rng.uniform(1e-4, 1e5)])
+        exact = usd_to_units(decimals, usd, price)
+        reference = ref_decimals.usd_to_amount_decimal(decimals, usd, price)
+        if exact == reference:
+            continue
+        usd_num, usd_den = usd.as_integer_ratio()
+        price_num, price_den = price.as_integer_ratio()
+        numerator, denominator = usd_num * price_den * 10 ** decimals, usd_den * price_num
+        # Within the reference's own rounding error (1e-27 relative) of the integer between them
+        boundary = max(exact, reference)
+        assert abs(exact - reference) == 1
+        assert abs(numerator - boundary * denominator) * 10 ** 27 <= numerator
+
+@pytest.mark.parametrize("rounding", ROUNDINGS)
+def test_div_round_matches_decimal_quantize(rounding):
+    rng = random.Random(rounding)
+    for _ in range(TRIALS):
+        numerator = rng.randrange(-10 ** 20, 10 ** 20)
+        denominator = rng.choice([1, 2, 3, 7, 10 ** 6, rng.randrange(1, 10 ** 12)]) * rng.choice([1, -1])
+        expected = int((Decimal(numerator) / Decimal(denominator)).quantize(Decimal(1), rounding=rounding))
+        assert div_round(numerator, denominator, rounding) == expected
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_batch_matches_scalar(seed):
+    rng = random.Random(seed)
+    for _ in range(TRIALS // 10):
+        values = [amount(rng) for _ in range(5)]
+        bps = rng.randrange(0, BPS + 1)
+        assert apply_slippage_batch(np.array(values, dtype=object), bps).tolist() == \
+            [apply_slippage(v, bps) for v in values]
+        small = np.array([v % 2 ** 40 * rng.choice([1, -1]) for v in values], dtype=np.int64)
+        for rounding in ROUNDINGS:
+            assert div_round_batch(small, 7 + bps, rounding).tolist() == \
+                [div_round(int(v), 7 + bps, rounding) for v in small]
+        # int64 inputs whose product overflows int64 switch to exact ints
+        big = np.array([2 ** 62 - 1 - v % 1000 for v in values], dtype=np.int64)
+        assert mul_div_batch(big, 3, 5).tolist() == [int(v) * 3 // 5 for v in big]
+        decimals = rng.choice([0, 6, 18])
+        assert to_units_batch(np.array(values, dtype=object), decimals).tolist() == \
+            [to_units(v, decimals) for v in values]
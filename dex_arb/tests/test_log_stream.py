@@ -0,0 +1,217 @@
+import asyncio
+
+from eth_abi import encode
+
+from pybot.quotes import v3math
+from pybot.quotes.uni_v3_local import V3Simulator
+from pybot.state import store as store_module
+from pybot.state.events import LogStream, decode_log
+from pybot.state.store import V3_MINT, V3_SWAP, PoolStateStore
+from tests.conftest import v3_pool
+from tests.stub_node import ScriptedLogNode
+
+POOL_A, POOL_B = "0x" + "aa" * 20, "0x" + "bb" * 20
+TOKEN0, TOKEN1 = "0x" + "11" * 20, "0x" + "22" * 20
+
+def rpc_log(address, block, index, topics=(V3_SWAP,), data=b"", removed=False):
+    """A log in eth_subscription / eth_getLogs JSON shape."""
+    return {"address": address, "topics": list(topics), "data": "0x" + data.hex(), "blockNumber": hex(block),
+            "blockHash": "0x" + f"{block:064x}", "transactionHash": "0x" + f"{block * 1000 + index:064x}",
+            "logIndex": hex(index), "removed": removed}
+
+def swap_data(tick, liquidity=10 ** 20):
+    return encode(["int256", "int256", "uint160", "uint128", "int24"],
+                  [1, -1, v3math.get_sqrt_ratio_at_tick(tick), liquidity, tick])
+
+def swap_log(block, index, tick, removed=False):
+    return decode_log(rpc_log(POOL_A, block, index, data=swap_data(tick), removed=removed))
+
+def mint_log(block, index, tick_lower, tick_upper, amount, removed=False):
+    topics = [V3_MINT, "0x" + "00" * 32] + ["0x" + encode(["int24"], [t]).hex() for t in (tick_lower, tick_upper)]
+    data = encode(["address", "uint128", "uint256", "uint256"], [POOL_B, amount, 0, 0])
+    return decode_log(rpc_log(POOL_A, block, index, topics, data, removed))
+
+async def until(predicate, timeout=3.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+def flatten(batches):
+    return [(log["address"], log["blockNumber"], log["logIndex"], log["removed"]) for batch in batches for log in batch]
+
+def stream_scenario(scenario, script=()):
+    """Run ``scenario(node, stream, on_connect_calls)`` against a ScriptedLogNode."""
+    async def run():
+        node = ScriptedLogNode(list(script), autoplay=False)
+        stream = LogStream(await node.start(), reconnect_delay=0.01)
+        connects = []
+
+        async def on_connect():
+            connects.append(stream.connected.is_set())
+
+        task = asyncio.ensure_future(stream.run(on_connect=on_connect))
+        try:
+            await scenario(node, stream, connects)
+        finally:
+            task.cancel()
+            await node.stop()
+
+    asyncio.run(run())
+
+def test_stream_subscribes_and_dispatches_by_address():
+    got_a, got_b = [], []
+
+    async def scenario(node, stream, connects):
+        # Addresses and topics are matched case-insensitively
+        stream.route([POOL_A.replace("aa", "AA")], [V3_SWAP], got_a.append)
+        stream.route([POOL_B], [V3_SWAP.replace("a", "A")], got_b.append)
+        await until(stream.connected.is_set)
+        (subscriptions,) = node.sockets.values()
+        assert list(subscriptions.values()) == [{"address": [POOL_A, POOL_B], "topics": [[V3_SWAP]]}]
+        # Backfill ran once, before the stream reported itself connected
+        assert connects == [False]
+        for index, address in enumerate([POOL_A, POOL_B, POOL_A]):
+            await node.emit(rpc_log(address, 10, index))
+        await until(lambda: len(flatten(got_a)) == 2 and got_b)
+        assert stream.stats()["received"] == 3 and stream.stats()["routes"] == 2
+
+    stream_scenario(scenario)
+    assert flatten(got_a) == [(POOL_A, 10, 0, False), (POOL_A, 10, 2, False)]
+    assert flatten(got_b) == [(POOL_B, 10, 1, False)]
+
+def test_stream_resubscribes_when_routes_change():
+    got_a, got_b = [], []
+
+    async def scenario(node, stream, connects):
+        stream.route([POOL_A], [V3_SWAP], got_a.append)
+        await until(stream.connected.is_set)
+        (subscriptions,) = node.sockets.values()
+        (first,) = subscriptions
+
+        stream.route([POOL_B], [V3_SWAP], got_b.append)
+        stream.unroute([POOL_A])
+        await until(lambda: first not in subscriptions and len(subscriptions) == 1)
+        (log_filter,) = subscriptions.values()
+        assert log_filter["address"] == [POOL_B]
+
+        await node.emit(rpc_log(POOL_A, 11, 0))  # no longer subscribed
+        await node.emit(rpc_log(POOL_B, 11, 1))
+        await until(lambda: got_b)
+        # One connection throughout: a route change never reconnects
+        assert stream.reconnects == 0 and connects == [False]
+
+    stream_scenario(scenario)
+    assert got_a == [] and flatten(got_b) == [(POOL_B, 11, 1, False)]
+
+def test_stream_reconnects_and_backfills_after_drop():
+    got = []
+
+    async def scenario(node, stream, connects):
+        stream.route([POOL_A], [V3_SWAP], got.append)
+        await until(stream.connected.is_set)
+        await node.emit(rpc_log(POOL_A, 12, 0))
+        await until(lambda: got)
+
+        await node.play()  # {"disconnect": true}
+        await until(lambda: stream.reconnects == 1 and stream.connected.is_set())
+        # on_connect runs again on the new connection so the consumer can fill the gap
+        assert connects == [False, False]
+        await node.emit(rpc_log(POOL_A, 13, 0))
+        await until(lambda: len(flatten(got)) == 2)
+
+    stream_scenario(scenario, script=[{"disconnect": True}])
+    assert flatten(got) == [(POOL_A, 12, 0, False), (POOL_A, 13, 0, False)]
+
+def test_stream_delivers_removed_logs():
+    got = []
+
+    async def scenario(node, stream, connects):
+        stream.route([POOL_A], [V3_SWAP], got.append)
+        await until(stream.connected.is_set)
+        await node.emit(rpc_log(POOL_A, 14, 3))
+        await node.emit(rpc_log(POOL_A, 14, 3, removed=True))
+        await until(lambda: len(flatten(got)) == 2)
+        assert stream.stats()["removed"] == 1
+        # The node's own eth_getLogs view has dropped the reorged-out log
+        assert node._get_logs({"address": [POOL_A], "fromBlock": hex(14)}) == []
+
+    stream_scenario(scenario)
+    assert flatten(got) == [(POOL_A, 14, 3, False), (POOL_A, 14, 3, True)]
+
+# --- PoolStateStore reorg rollback ---
+
+def loaded_store(monkeypatch, journal_blocks=64):
+    pool = v3_pool(POOL_A, TOKEN0, TOKEN1, 3000, 1.0, 10 ** 20)
+    monkeypatch.setattr(store_module, "load_v3_pools", lambda w3, pools, block: V3Simulator([pool], block))
+    store = PoolStateStore(journal_blocks=journal_blocks)
+    store.load(None, {"uni_v3": [{"id": POOL_A}]}, 100)
+    return store, pool
+
+def state(store):
+    pool = store.snapshot()[0].by_address[POOL_A]
+    return pool.tick, pool.liquidity, dict(pool.liquidity_net), dict(pool.bitmap)
+
+def test_store_rolls_back_removed_block(monkeypatch):
+    store, loaded = loaded_store(monkeypatch)
+    assert store.apply_logs([swap_log(101, 0, -60)]) == {POOL_A}
+    after_101 = state(store)
+    view_101 = store.snapshot()
+    assert store.apply_logs([swap_log(102, 0, -120), mint_log(102, 1, -600, 600, 10 ** 19)]) == {POOL_A}
+    assert state(store)[:2] == (-120, 11 * 10 ** 19)
+    assert store.version(POOL_A) == 3 and store.block_number == 102
+    # Readers holding the old view never see a later write
+    assert view_101[0].by_address[POOL_A].tick == -60
+    assert loaded.tick == 0 and -600 not in loaded.liquidity_net
+
+    # Redelivery of an applied log is a no-op
+    assert store.apply_logs([swap_log(102, 0, -120)]) == set()
+
+    assert store.apply_logs([swap_log(102, 0, -120, removed=True)]) == {POOL_A}
+    assert state(store) == after_101
+    assert store.block_number == 101
+
+    # The new fork's block 102 applies even though it reuses the log indexes
+    assert store.apply_logs([swap_log(102, 0, -180)]) == {POOL_A}
+    assert state(store)[0] == -180
+
+def test_store_rollback_undoes_every_later_block(monkeypatch):
+    store, loaded = loaded_store(monkeypatch)
+    before = state(store)
+    store.apply_logs([mint_log(101, 0, -600, 600, 10 ** 19)])
+    store.apply_logs([swap_log(103, 0, -60)])
+    store.apply_logs([mint_log(101, 0, -600, 600, 10 ** 19, removed=True)])
+    assert state(store) == before
+    assert not store.stale
+
+def test_store_reorg_deeper_than_journal_reloads(monkeypatch):
+    store, _ = loaded_store(monkeypatch, journal_blocks=2)
+    for block in (101, 102, 103, 104):
+        store.apply_logs([swap_log(block, 0, -60 * (block - 100))])
+    assert store.journal_horizon == 102
+    current = state(store)
+    # Block 101 can no longer be undone: the pool is re-read at the next refresh instead
+    assert store.apply_logs([swap_log(101, 0, -60, removed=True)]) == set()
+    assert state(store) == current and store.stale == {POOL_A}
+    # and logs at or below the horizon are treated as already applied
+    assert store.apply_logs([swap_log(102, 5, 600)]) == set()
+
+def test_stream_into_store_rolls_back(monkeypatch):
+    store, _ = loaded_store(monkeypatch)
+    changes = []
+    store.subscribe(changes.append)
+
+    async def scenario(node, stream, connects):
+        stream.route(store.addresses(), store.topics(), store.apply_logs)
+        await until(stream.connected.is_set)
+        for log in (rpc_log(POOL_A, 101, 0, data=swap_data(-60)), rpc_log(POOL_A, 102, 0, data=swap_data(-120))):
+            await node.emit(log)
+        await until(lambda: store.block_number == 102)
+        await node.emit(rpc_log(POOL_A, 102, 0, data=swap_data(-120), removed=True))
+        await until(lambda: store.block_number == 101)
+
+    stream_scenario(scenario)
+    assert state(store)[0] == -60
+    # One notification per applied batch, the rollback included
+    assert len(changes) >= 2 and all(changed == {POOL_A} for changed in changes)
@@ -0,0 +1,146 @@
+"""On-chain discovery against recorded eth_getLogs / registry fixtures (tests/fixtures/onchain_scan.json)."""
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from eth_abi import decode, encode
+from hexbytes import HexBytes
+
+from pybot.discovery import onchain
+from pybot.discovery.snapshot import PoolSnapshot
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "onchain_scan.json")) as f:
+    FIXTURE = json.load(f)
+
+class ScriptedChain:
+    """eth_getLogs over the fixture logs, plus Multicall3 and token reads answered from the fixture.
+
+    Anything in ``flaky`` (token or pool addresses, or ("pool_list", n))
+    fails once, like a transient RPC error.
+    """
+
+    def __init__(self, flaky=()):
+        self.flaky = set(flaky)
+        self.log_queries = []
+        self.eth = SimpleNamespace(get_logs=self.get_logs)
+        self.curve = {pool["address"]: pool for pool in FIXTURE["curve"]["pools"]}
+
+    def fails(self, key) -> bool:
+        if key in self.flaky:
+            self.flaky.discard(key)
+            return True
+        return False
+
+    def get_logs(self, params):
+        self.log_queries.append((params["fromBlock"], params["toBlock"]))
+        return [
+            {"blockNumber": log["blockNumber"], "topics": [HexBytes(t) for t in log["topics"]],
+             "data": HexBytes(log["data"])}
+            for log in FIXTURE["uni_v3"]["logs"] if params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]
+        ]
+
+    def fetch_tokens(self, w3, addresses, block_identifier):
+        return {
+            address: {"id": address, "symbol": FIXTURE["tokens"][address]["symbol"],
+                      "decimals": str(FIXTURE["tokens"][address]["decimals"])}
+            for address in addresses if address in FIXTURE["tokens"] and not self.fails(address)
+        }
+
+    def aggregate3(self, w3, calls, block_identifier=None, batch_size=None):
+        return [self.answer(bytes(data[:4]), bytes(data[4:])) for _, data in calls]
+
+    def answer(self, selector, args):
+        pools = FIXTURE["curve"]["pools"]
+        if selector == onchain.POOL_COUNT:
+            return True, encode(["uint256"], [len(pools)])
+        if selector == onchain.POOL_LIST:
+            (n,) = decode(["uint256"], args)
+            if self.fails(("pool_list", n)):
+                return False, b""
+            return True, encode(["address"], [pools[n]["address"]])
+        if selector in (onchain.GET_COINS, onchain.GET_DECIMALS, onchain.GET_BALANCES):
+            (address,) = decode(["address"], args)
+            pool = self.curve[address.lower()]
+            if selector == onchain.GET_COINS:
+                if self.fails(pool["address"]):
+                    return False, b""
+                coins = pool["coins"] + [onchain.ZERO_ADDRESS] * (8 - len(pool["coins"]))
+                return True, encode(["address[8]"], [coins])
+            values = pool["decimals"] if selector == onchain.GET_DECIMALS else [10 ** 24] * len(pool["coins"])
+            return True, encode(["uint256[8]"], [values + [0] * (8 - len(values))])
+        return False, b""  # max_id, slot0, liquidity, balanceOf: not scripted
+
+@pytest.fixture
+def chain(monkeypatch):
+    def make(flaky=()):
+        scripted = ScriptedChain(flaky)
+        monkeypatch.setattr(onchain, "aggregate3", scripted.aggregate3)
+        monkeypatch.setattr(onchain, "fetch_tokens", scripted.fetch_tokens)
+        return scripted
+    return make
+
+def test_pool_created_decoding(chain, tmp_path):
+    w3 = chain()
+    snapshot = PoolSnapshot(str(tmp_path / "uni.json.gz"), "uni_v3")
+    assert onchain.scan_uni_v3(w3, "base", FIXTURE["uni_v3"]["factory"], snapshot, 1_400_000, 1_371_000) == 3
+    pool = snapshot.pools["0xd0b53d9277642d899df5c87a3966a349a798f224"]
+    assert pool["feeTier"] == "500"
+    assert pool["token0"]["id"] == "0x4200000000000000000000000000000000000006"
+    assert pool["token1"]["symbol"] == "USDC" and pool["token1"]["decimals"] == "6"
+    assert snapshot.pools["0x0b1c2dcbbfa744ebd3fc17ff1a96a1e1eb4b2d69"]["feeTier"] == "100"
+    assert w3.log_queries == [(1_371_000, 1_400_000)]
+
+def test_uni_v3_unresolved_pool_is_retried_after_checkpoint(chain, tmp_path):
+    cbeth = "0x2ae3f1ec7f1f5012cfeab0185bfc7aa3cf0dec22"
+    w3 = chain(flaky={cbeth})
+    path = str(tmp_path / "uni.json.gz")
+    snapshot = PoolSnapshot(path, "uni_v3")
+    assert onchain.scan_uni_v3(w3, "base", FIXTURE["uni_v3"]["factory"], snapshot, 1_400_000, 1_371_000) == 2
+    assert snapshot.meta["last_block"] == 1_400_000
+    assert [entry[0] for entry in snapshot.meta["unresolved"]] == ["0x257fcbae4ac6b26a02e4fc5e1a11e4174b5ce395"]
+    snapshot.save()
+
+    # The next run resumes past the checkpoint and picks the pool up from the retry list
+    resumed = PoolSnapshot(path, "uni_v3")
+    assert resumed.load()
+    scanned = len(w3.log_queries)
+    assert onchain.scan_uni_v3(w3, "base", FIXTURE["uni_v3"]["factory"], resumed, 1_500_000, 1_371_000) == 1
+    assert min(w3.log_queries[scanned:]) == (1_400_001, 1_450_000)
+    assert len(resumed.pools) == 3 and resumed.meta["unresolved"] == []
+
+def test_uni_v3_gives_up_after_retries(chain, tmp_path):
+    w3 = chain()
+    snapshot = PoolSnapshot(str(tmp_path / "uni.json.gz"), "uni_v3")
+    # An unknown token never resolves; this is the pool's last allowed retry
+    snapshot.meta = {"last_block": 1_400_000,
+                     "unresolved": [["0x" + "ab" * 20, "0x" + "cd" * 20,
+                                     "0x4200000000000000000000000000000000000006", 3000,
+                                     onchain.UNRESOLVED_RETRIES - 1]]}
+    assert onchain.scan_uni_v3(w3, "base", FIXTURE["uni_v3"]["factory"], snapshot, 1_400_100) == 0
+    assert snapshot.meta["unresolved"] == []
+
+def test_curve_pool_list_decoding_and_resume(chain, tmp_path):
+    registry = FIXTURE["curve"]["registry"]
+    pools = [pool["address"] for pool in FIXTURE["curve"]["pools"]]
+    w3 = chain(flaky={("pool_list", 1), pools[2]})
+    path = str(tmp_path / "curve.json.gz")
+    snapshot = PoolSnapshot(path, "curve")
+    assert onchain.scan_curve(w3, "base", registry, snapshot, 1_400_000, {}) == 1
+    pool = snapshot.pools[pools[0]]
+    assert [(c["address"], c["decimals"], c["index"]) for c in pool["coins"]] == [
+        ("0x833589fcd6edb6e08f4c7c32d4f71b54bda02913", "6", "0"),
+        ("0x50c5725949a6f0c72e6c4a641f24049a917db0cb", "18", "1"),
+    ]
+    # pool_list(1) failed: the checkpoint stops there; pool 2's coins failed: retried
+    assert snapshot.meta["pool_counts"] == {registry: 1}
+    assert snapshot.meta["unresolved"] == {pools[2]: [registry, 1]}
+    snapshot.save()
+
+    resumed = PoolSnapshot(path, "curve")
+    assert resumed.load()
+    assert onchain.scan_curve(w3, "base", registry, resumed, 1_400_100, {}) == 2
+    assert set(resumed.pools) == set(pools)
+    assert len(resumed.pools[pools[2]]["coins"]) == 3
+    assert resumed.meta["pool_counts"] == {registry: 3} and resumed.meta["unresolved"] == {}
+    assert onchain.scan_curve(w3, "base", registry, resumed, 1_400_200, {}) == 0
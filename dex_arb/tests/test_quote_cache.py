@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from pybot.quotes.route import quote_leg
+from pybot.state.cache import QuoteCache
+
+POOL = "0xPool"
+LEG = {"dex": "uni_v3", "pool": POOL, "token_in": "a", "token_out": "b"}
+
+def simulator(rate: int, on_quote=None):
+    def quote_exact_input_single(token_in, amount_in):
+        if on_quote is not None:
+            on_quote()
+        return amount_in * rate
+    return SimpleNamespace(by_address={POOL.lower(): SimpleNamespace(quote_exact_input_single=quote_exact_input_single)})
+
+def test_hit_at_snapshot_version():
+    cache = QuoteCache()
+    assert quote_leg(LEG, 10, simulator(2), cache=cache, versions={}) == 20
+    assert quote_leg(LEG, 10, simulator(3), cache=cache, versions={}) == 20
+    assert cache.hits == 1
+
+def test_invalidation_mid_pass_is_not_stored_under_new_version():
+    cache = QuoteCache()
+    old = simulator(2, on_quote=lambda: cache.invalidate(POOL))  # the store changes the pool while quoting
+    assert quote_leg(LEG, 10, old, cache=cache, versions={}) == 20
+    # The next pass quotes the new snapshot (version 1) and must not see the old state's result
+    assert quote_leg(LEG, 10, simulator(3), cache=cache, versions={POOL.lower(): 1}) == 30
+
+def test_snapshot_ahead_of_cache_is_not_stored():
+    cache = QuoteCache()
+    # Published by the store, listeners not yet notified
+    assert quote_leg(LEG, 10, simulator(3), cache=cache, versions={POOL.lower(): 1}) == 30
+    assert cache.stats()["entries"] == 0
+
+def test_old_snapshot_misses_after_invalidation():
+    cache = QuoteCache()
+    quote_leg(LEG, 10, simulator(2), cache=cache, versions={})
+    cache.invalidate(POOL)
+    assert cache.get(POOL, ("a", "b", False), 10, 0) is None
@@ -0,0 +1,141 @@
+"""RelaySubmitter against local MockRpcNode relays sharing one inclusion ledger."""
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+
+from pybot.exec.relays import Relay, RelaySubmitter, chain_relays
+from pybot.exec.signer import GWEI, SearcherSigner
+from pybot.stub_rpc import MockRpcNode
+
+KEY = "0x" + "42" * 32
+PRIVATE = "eth_sendPrivateTransaction"
+
+def ladder(rungs=1, replace_every_ms=30):
+    node = SimpleNamespace(eth=SimpleNamespace(get_transaction_count=lambda address, tag: 0,
+                                               get_block=lambda tag: {"baseFeePerGas": GWEI}))
+    signer = SearcherSigner(KEY, 8453, {"min_gwei": 0.01, "max_gwei": 0.05, "max_bumps": rungs - 1,
+                                        "replace_every_ms": replace_every_ms})
+    return signer.prepare(node, "0x" + "ee" * 20, b"\x01", 100_000)
+
+def relay_scenario(scenario, *configs):
+    """Run ``scenario(submitter, included, nodes)``; configs are (MockRpcNode kwargs, Relay kwargs)."""
+    async def run():
+        ledger = {}
+        nodes, relays = [], []
+        for node_kwargs, relay_kwargs in configs:
+            node = MockRpcNode(ledger=ledger, **node_kwargs)
+            relays.append(Relay(await node.start(), **relay_kwargs))
+            nodes.append(node)
+        submitter = RelaySubmitter(relays)
+        # The chain itself: answers receipts from the ledger the relays fill
+        chain = MockRpcNode("chain", ledger=ledger)
+        chain_url = await chain.start()
+
+        async def included(hashes):
+            async with aiohttp.ClientSession() as session:
+                for tx_hash in hashes:
+                    async with session.post(chain_url, json={"jsonrpc": "2.0", "id": 1, "params": [tx_hash],
+                                                                 "method": "eth_getTransactionReceipt"}) as r:
+                        if (await r.json())["result"] is not None:
+                            return tx_hash
+            return None
+
+        try:
+            await scenario(submitter, included, nodes)
+        finally:
+            await submitter.close()
+            for node in nodes + [chain]:
+                await node.stop()
+
+    asyncio.run(run())
+
+def test_fans_out_to_every_private_relay():
+    async def scenario(submitter, included, nodes):
+        rungs = ladder()
+        landed = await submitter.submit_ladder(rungs, included, timeout_s=2.0)
+        assert landed == rungs.rungs[0]["hash"]
+        assert [node.received for node in nodes] == [[landed], [landed], [landed], []]
+        assert submitter.landed == 1 and submitter.missed == 0
+        assert all(relay.accepted == 1 for relay in submitter.relays[:3])
+
+    relay_scenario(scenario,
+                   ({"name": "flashbots", "include_after_ms": 50}, {"method": PRIVATE}),
+                   ({"name": "builder-a"}, {}),
+                   ({"name": "builder-b"}, {}),
+                   ({"name": "public"}, {"public": True}))
+
+def test_inclusion_credited_to_first_ack():
+    async def scenario(submitter, included, nodes):
+        await submitter.submit_ladder(ladder(), included, timeout_s=2.0)
+        slow, fast = submitter.relays
+        # The slow relay had not even answered when the rung landed
+        assert (fast.included, slow.included) == (1, 0)
+        assert slow.sent == 0
+
+    relay_scenario(scenario,
+                   ({"name": "slow", "delay_ms": 150, "include_after_ms": 0}, {}),
+                   ({"name": "fast", "include_after_ms": 0}, {}))
+
+def test_inclusion_credited_to_block_builder():
+    async def scenario(submitter, included, nodes):
+        async def builder_of(tx_hash):
+            return "0x" + "B0" * 20
+
+        await submitter.submit_ladder(ladder(), included, timeout_s=2.0, builder_of=builder_of)
+        slow, fast = submitter.relays
+        # The slower relay built the block, so it gets the credit despite acking last
+        assert (fast.included, slow.included) == (0, 1)
+
+    relay_scenario(scenario,
+                   ({"name": "slow", "delay_ms": 10, "include_after_ms": 0}, {"coinbase": "0x" + "b0" * 20}),
+                   ({"name": "fast", "include_after_ms": 0}, {"coinbase": "0x" + "f0" * 20}))
+
+def test_cancels_superseded_rungs():
+    async def scenario(submitter, included, nodes):
+        rungs = ladder(rungs=4, replace_every_ms=30)
+        landed = await submitter.submit_ladder(rungs, included, timeout_s=3.0)
+        private, builder = nodes
+        assert landed is not None and len(rungs.hashes) > 1
+        # The private relay drops every other rung it holds; a raw-tx builder has no cancel method
+        assert sorted(private.cancelled) == sorted(h for h in private.received if h != landed)
+        assert landed not in private.cancelled and builder.cancelled == []
+
+    relay_scenario(scenario,
+                   ({"name": "flashbots", "include_after_ms": 120}, {"method": PRIVATE}),
+                   ({"name": "builder"}, {}))
+
+def test_miss_cancels_every_accepted_rung():
+    async def scenario(submitter, included, nodes):
+        rungs = ladder(rungs=3, replace_every_ms=30)
+        assert await submitter.submit_ladder(rungs, included, timeout_s=0.3) is None
+        private, builder = nodes
+        assert submitter.missed == 1 and submitter.landed == 0
+        assert private.received and sorted(private.cancelled) == sorted(private.received)
+        assert builder.cancelled == []
+
+    relay_scenario(scenario,
+                   ({"name": "flashbots"}, {"method": PRIVATE}),
+                   ({"name": "builder"}, {}))
+
+def test_public_fallback_only_when_no_private_relay_accepts():
+    async def scenario(submitter, included, nodes):
+        landed = await submitter.submit_ladder(ladder(), included, timeout_s=2.0)
+        down, public = nodes
+        assert down.failures == 1 and public.received == [landed]
+        assert submitter.relays[0].errors == 1
+
+    relay_scenario(scenario,
+                   ({"name": "down", "fail_rate": 1.0}, {"method": PRIVATE}),
+                   ({"name": "public", "include_after_ms": 0}, {"public": True}))
+
+def test_chain_relays_order():
+    relays = chain_relays({"private_tx_rpc": "https://rpc.flashbots.net",
+                           "relays": ["https://builder.a", {"url": "https://builder.b", "coinbase": "0xAB"}]},
+                          ["https://public"])
+    assert [(r.url, r.method, r.public, r.coinbase) for r in relays] == [
+        ("https://rpc.flashbots.net", PRIVATE, False, None),
+        ("https://builder.a", "eth_sendRawTransaction", False, None),
+        ("https://builder.b", "eth_sendRawTransaction", False, "0xab"),
+        ("https://public", "eth_sendRawTransaction", True, None),
+    ]
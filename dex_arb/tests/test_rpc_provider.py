@@ -0,0 +1,83 @@
+"""PooledHTTPProvider / AsyncPooledHTTPProvider against local MockRpcNode endpoints."""
+import asyncio
+import time
+
+import pytest
+
+from pybot.chains import AsyncPooledHTTPProvider, EndpointSet, PooledHTTPProvider
+
+def provider(urls, **kwargs) -> PooledHTTPProvider:
+    return PooledHTTPProvider(EndpointSet(urls, cooldown_s=60), timeout=5, **kwargs)
+
+def test_failover_to_healthy_endpoint(serve):
+    (down, down_url), (up, up_url) = serve({"name": "down", "fail_rate": 1.0}, {"name": "up", "block_number": 7})
+    rpc = provider([down_url, up_url])
+    try:
+        assert rpc.make_request("eth_blockNumber", [])["result"] == hex(7)
+        stats = rpc.stats()
+        assert stats[down_url]["errors"] == 1 and stats[down_url]["cooling"]
+        assert stats[up_url]["wins"] == 1
+        # The failed endpoint now ranks last and is not tried again while cooling
+        rpc.make_request("eth_chainId", [])
+        assert down.requests == 1 and up.requests == 2
+    finally:
+        rpc.close()
+
+def test_all_endpoints_down_raises(serve):
+    (_, url), = serve({"fail_rate": 1.0})
+    rpc = provider([url])
+    try:
+        with pytest.raises(Exception):
+            rpc.make_request("eth_blockNumber", [])
+    finally:
+        rpc.close()
+
+def test_hedge_to_next_endpoint(serve):
+    (slow, slow_url), (fast, fast_url) = serve({"name": "slow", "delay_ms": 800}, {"name": "fast"})
+    rpc = provider([slow_url, fast_url], hedge_after_ms=50)
+    try:
+        start = time.perf_counter()
+        assert rpc.make_request("web3_clientVersion", [])["result"] == "MockRpcNode/fast"
+        assert time.perf_counter() - start < 0.6
+        stats = rpc.stats()
+        assert stats[fast_url]["hedges"] == 1 and stats[fast_url]["wins"] == 1
+        assert stats[slow_url]["wins"] == 0
+    finally:
+        rpc.close()
+    assert rpc.hedger is None
+
+def test_batch_chunks_and_keeps_order(serve):
+    (node, url), = serve({})
+    rpc = provider([url], batch_size=100)
+    try:
+        calls = [("eth_call", [{"to": "0x" + "00" * 20, "data": hex(n)}, "latest"]) for n in range(250)]
+        calls.append(("eth_unknownMethod", []))
+        responses = rpc.batch(calls)
+        assert node.requests == 3
+        assert [r["result"] for r in responses[:-1]] == [hex(n) for n in range(250)]
+        assert "error" in responses[-1]
+    finally:
+        rpc.close()
+
+def test_async_failover_and_hedge(serve):
+    (_, down_url), (_, slow_url), (_, fast_url) = serve(
+        {"name": "down", "fail_rate": 1.0}, {"name": "slow", "delay_ms": 800}, {"name": "fast"})
+
+    async def run():
+        failover = AsyncPooledHTTPProvider(EndpointSet([down_url, fast_url], cooldown_s=60), timeout=5)
+        hedged = AsyncPooledHTTPProvider(EndpointSet([slow_url, fast_url]), timeout=5, hedge_after_ms=50)
+        try:
+            assert (await failover.make_request("web3_clientVersion", []))["result"] == "MockRpcNode/fast"
+            start = time.perf_counter()
+            assert (await hedged.make_request("web3_clientVersion", []))["result"] == "MockRpcNode/fast"
+            assert time.perf_counter() - start < 0.6
+            batch = await hedged.batch([("eth_chainId", [])] * 3)
+            assert [r["result"] for r in batch] == [hex(8453)] * 3
+        finally:
+            await failover.close()
+            await hedged.close()
+        return failover.stats(), hedged.stats()
+
+    failover_stats, hedged_stats = asyncio.run(run())
+    assert failover_stats[down_url]["errors"] == 1
+    assert hedged_stats[fast_url]["hedges"] >= 1
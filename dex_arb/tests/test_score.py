@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+import pytest
+
+from pybot.routing.score import calculate_profit_usd, required_profit_usd, score_batch
+
+def quotes(seed, n):
+    rng = random.Random(seed)
+    route_ids = [rng.randrange(n // 3 + 1) for _ in range(n)]
+    amount_in = [rng.choice([100.0, 1000.0, 10000.0]) * rng.uniform(0.5, 2) for _ in range(n)]
+    amount_out = [a * rng.uniform(0.98, 1.03) for a in amount_in]
+    gas = [rng.uniform(0, 5) for _ in range(n)]
+    flash = [a * 0.0005 for a in amount_in]
+    # Ties: duplicate some quotes exactly
+    for k in range(0, n - 1, 7):
+        amount_in[k + 1], amount_out[k + 1], gas[k + 1], flash[k + 1] = amount_in[k], amount_out[k], gas[k], flash[k]
+    return route_ids, amount_in, amount_out, gas, flash
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("floor", [0.0, 0.01, 3.0])
+def test_score_batch_matches_scalar(seed, floor):
+    route_ids, amount_in, amount_out, gas, flash = quotes(seed, 200)
+    scored = score_batch(np.array(route_ids), np.array(amount_in), np.array(amount_out), np.array(gas),
+                         np.array(flash), floor)
+
+    profit = [calculate_profit_usd(*q) for q in zip(amount_in, amount_out, gas, flash)]
+    required = [required_profit_usd(g, f, floor) for g, f in zip(gas, flash)]
+    # Bit-identical, not just close
+    assert scored["profit_usd"].tolist() == profit
+    assert scored["required_usd"].tolist() == required
+    assert scored["profitable"].tolist() == [p > r for p, r in zip(profit, required)]
+    expected = sorted((n for n in range(len(profit)) if profit[n] > required[n]), key=lambda n: -profit[n])
+    assert scored["ranked"].tolist() == expected
+
+    best = score_batch(np.array(route_ids), np.array(amount_in), np.array(amount_out), np.array(gas),
+                       np.array(flash), floor, best_per_route=True)
+    seen, expected_best = set(), []
+    for n in expected:
+        if route_ids[n] not in seen:
+            seen.add(route_ids[n])
+            expected_best.append(n)
+    assert best["ranked"].tolist() == expected_best
+
+def test_score_batch_scalar_gas():
+    route_ids, amount_in, amount_out, _, flash = quotes(9, 50)
+    scored = score_batch(np.array(route_ids), amount_in, amount_out, 1.25, flash)
+    assert scored["profit_usd"].tolist() == [
+        calculate_profit_usd(a, b, 1.25, f) for a, b, f in zip(amount_in, amount_out, flash)
+    ]
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from pybot.exec.signer import GWEI, NonceManager, SearcherSigner, min_replacement, tip_ladder
+from pybot.main import submit_executions
+
+KEY = "0x" + "42" * 32
+
+class FakeNode:
+    """A web3 stand-in answering the pending transaction count."""
+
+    def __init__(self, pending=0):
+        self.pending = pending
+        self.eth = SimpleNamespace(get_transaction_count=lambda address, tag: self.pending,
+                                   get_block=lambda tag: {"baseFeePerGas": 10 * GWEI})
+
+def test_min_replacement_rounds_up():
+    assert min_replacement(100) == 110
+    assert min_replacement(101) == 112
+    assert min_replacement(1) == 2
+    assert min_replacement(0) == 0
+
+def test_tip_ladder_is_valid_replacement_chain():
+    tips = tip_ladder(0.01, 0.05, 4)
+    assert tips[0] == int(0.01 * GWEI) and tips[-1] == int(0.05 * GWEI)
+    assert len(tips) == 5
+    assert all(b >= min_replacement(a) for a, b in zip(tips, tips[1:]))
+
+def test_tip_ladder_drops_rungs_past_max():
+    # 10% bumps from 1 gwei can't fit 5 rungs under 1.2 gwei
+    tips = tip_ladder(1.0, 1.2, 5)
+    assert tips == [GWEI, min_replacement(GWEI)]
+    assert tip_ladder(0.0, 0.0, 3) == [0]
+
+def test_nonce_manager_reserve_release_resync():
+    node = FakeNode(pending=7)
+    nonces = NonceManager("0xabc")
+    with pytest.raises(RuntimeError):
+        nonces.reserve()
+    assert nonces.reserve(node) == 7
+    assert nonces.reserve() == 8
+    # Only the latest reservation can be given back
+    assert not nonces.release(7)
+    assert nonces.release(8)
+    assert nonces.reserve() == 8
+    # resync never moves back past nonces handed out; reset does
+    node.pending = 5
+    assert nonces.resync(node) == 9
+    node.pending = 12
+    assert nonces.resync(node) == 12
+    node.pending = 3
+    assert nonces.reset(node) == 3
+    assert nonces.reserve() == 3
+
+def test_prepare_signs_replacement_ladder():
+    signer = SearcherSigner(KEY, 8453, {"min_gwei": 0.01, "max_gwei": 0.05, "max_bumps": 2})
+    node = FakeNode(pending=4)
+    ladder = signer.prepare(node, "0x" + "ee" * 20, b"\x01", 300_000)
+    assert ladder.nonce == 4 and len(ladder) == 3
+    assert all(b["max_fee"] >= min_replacement(a["max_fee"]) and b["tip"] >= min_replacement(a["tip"])
+               for a, b in zip(ladder.rungs, ladder.rungs[1:]))
+    assert len({rung["hash"] for rung in ladder.rungs}) == 3
+    assert signer.prepare(node, "0x" + "ee" * 20, b"\x01", 300_000).nonce == 5
+
+class ScriptedSubmitter:
+    """Lands the ladders whose nonce is in ``lands``; records what was sent."""
+
+    def __init__(self, lands):
+        self.lands = lands
+        self.sent = []
+
+    async def submit_ladder(self, ladder, included, timeout_s, builder_of=None):
+        self.sent.append(ladder.nonce)
+        ladder.next_raw()
+        return ladder.rungs[0]["hash"] if ladder.nonce in self.lands else None
+
+def test_submit_stops_after_a_miss():
+    signer = SearcherSigner(KEY, 8453, {"max_bumps": 1})
+    node = FakeNode(pending=10)
+    prepared = [({"route": [], "profit_usd": 1.0}, signer.prepare(node, "0x" + "ee" * 20, b"", 100_000))
+                for _ in range(3)]
+    submitter = ScriptedSubmitter(lands={10})
+    resets, outcomes = [], []
+
+    async def reset_nonce():
+        resets.append(signer.nonces.reset(node))
+
+    landed = asyncio.run(submit_executions(
+        "base", [prepared[0], (prepared[0][0], None)] + prepared[1:], submitter,
+        included=None, reset_nonce=reset_nonce, timeout_s=0.0,
+        on_outcome=lambda route_data, ladder, hash_, status, used: outcomes.append((ladder.nonce, status))
+    ))
+    # Nonce 10 lands, 11 misses; 12 was signed past the miss and is never sent
+    assert submitter.sent == [10, 11]
+    assert landed == [prepared[0][1].rungs[0]["hash"], None, None]
+    assert outcomes == [(10, "success"), (11, "missed")]
+    assert resets == [10]
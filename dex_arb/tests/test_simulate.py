@@ -0,0 +1,129 @@
+"""simulate_calls against a local MockRpcNode, and GasModel learning/persistence."""
+import json
+from types import SimpleNamespace
+
+from pybot.chains import EndpointSet, PooledHTTPProvider
+from pybot.exec.simulate import DEFAULT_ROUTE_GAS, GasModel, simulate_calls
+
+EXECUTOR = "0x" + "ee" * 20
+SEARCHER = "0x" + "5e" * 20
+
+def tx(data: bytes):
+    return {"from": SEARCHER, "to": EXECUTOR, "data": data, "value": 0}
+
+def intrinsic(data: bytes) -> int:
+    return 21000 + sum(16 if byte else 4 for byte in data)
+
+def test_simulate_calls_batch_with_one_revert(serve):
+    reverting = b"\xde\xad" + bytes(30)
+    (node, url), = serve({"revert_calls": {"0x" + reverting.hex()}, "block_number": 500})
+    rpc = PooledHTTPProvider(EndpointSet([url]), timeout=5)
+    try:
+        datas = [b"\x01\x02", reverting, bytes(4) + b"\x07"]
+        results = simulate_calls(SimpleNamespace(provider=rpc), [tx(d) for d in datas], 480)
+    finally:
+        rpc.close()
+
+    assert results == [
+        {"ok": True, "gas": intrinsic(datas[0]), "error": ""},
+        {"ok": False, "gas": None, "error": "execution reverted"},
+        {"ok": True, "gas": intrinsic(datas[2]), "error": ""},
+    ]
+    # One batch, every call pinned to the requested block rather than latest
+    assert node.requests == 1
+    assert [method for method, _ in node.calls] == ["eth_call", "eth_estimateGas"] * 3
+    assert {params[1] for _, params in node.calls} == {hex(480)}
+    assert node.calls[0][1][0] == {"from": SEARCHER, "to": EXECUTOR, "data": "0x0102", "value": "0x0"}
+
+def test_simulate_calls_state_overrides(serve):
+    (node, url), = serve({})
+    rpc = PooledHTTPProvider(EndpointSet([url]), timeout=5)
+    overrides = {SEARCHER: {"balance": hex(10 ** 18)}}
+    try:
+        simulate_calls(SimpleNamespace(provider=rpc), [tx(b"\x01")], "latest", overrides)
+        simulate_calls(SimpleNamespace(provider=rpc), [tx(b"\x01")], "latest", overrides, estimate_overrides=True)
+    finally:
+        rpc.close()
+    # Overrides go with eth_call always, with eth_estimateGas only when asked
+    assert [len(params) for _, params in node.calls] == [3, 2, 3, 3]
+    assert node.calls[0][1][2] == overrides
+
+def test_simulate_calls_without_batching_provider(serve):
+    reverting = b"\xff"
+    (node, url), = serve({"revert_calls": {"0xff"}})
+    rpc = PooledHTTPProvider(EndpointSet([url]), timeout=5)
+    try:
+        # make_request only: the calls go one by one
+        unbatched = SimpleNamespace(make_request=rpc.make_request)
+        results = simulate_calls(SimpleNamespace(provider=unbatched), [tx(reverting), tx(b"\x01")], 7)
+    finally:
+        rpc.close()
+    assert [r["ok"] for r in results] == [False, True]
+    assert node.requests == 4
+
+def test_simulate_calls_transport_failure():
+    def batch(calls):
+        raise ConnectionError("all endpoints down")
+
+    results = simulate_calls(SimpleNamespace(provider=SimpleNamespace(batch=batch)), [tx(b"\x01")] * 2, 1)
+    assert results == [{"ok": False, "gas": None, "error": "ConnectionError: all endpoints down"}] * 2
+    assert simulate_calls(None, [], 1) == []
+
+# --- GasModel ---
+
+def route(*dexes):
+    return [{"dex": dex} for dex in dexes]
+
+def test_gas_model_ewma_per_shape():
+    model = GasModel(alpha=0.3)
+    model.observe(route("uni_v3", "curve"), 100_000)
+    model.observe(route("uni_v3", "curve"), 200_000)
+    model.observe(route("curve", "uni_v3"), 150_000)
+    assert model.estimate(route("uni_v3", "curve")) == 130_000
+    assert model.estimate(route("curve", "uni_v3")) == 150_000
+    assert model.stats() == {"2:curve,uni_v3": {"gas": 150_000, "samples": 1},
+                             "2:uni_v3,curve": {"gas": 130_000, "samples": 2}}
+    # Missing or zero gas is not an observation
+    model.observe(route("uni_v3", "curve"), 0)
+    model.observe(route("uni_v3", "curve"), None)
+    assert model.estimate(route("uni_v3", "curve")) == 130_000
+
+def test_gas_model_fallbacks():
+    model = GasModel(default=250_000)
+    assert model.estimate(route("uni_v3", "uni_v3")) == 250_000
+    assert model.min_estimate() == 250_000
+    model.observe(route("uni_v3", "curve"), 120_000)
+    model.observe(route("curve", "curve"), 180_000)
+    # Unseen shape with a learned hop count: mean of that hop count
+    assert model.estimate(route("uni_v3", "uni_v3")) == 150_000
+    # Unseen hop count: the prior
+    assert model.estimate(route("uni_v3", "curve", "uni_v3")) == 250_000
+    assert model.estimates([route("uni_v3", "curve"), route("uni_v3")]) == [120_000, 250_000]
+    assert model.min_estimate() == 120_000
+
+def test_gas_model_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "models" / "base_gas.json")
+    model = GasModel(path)
+    model.save()
+    assert not (tmp_path / "models").exists()  # nothing learned, nothing written
+
+    model.observe(route("uni_v3", "curve"), 100_000)
+    model.observe(route("uni_v3", "curve"), 110_000)
+    model.observe(route("curve", "curve", "uni_v3"), 300_000)
+    model.save()
+    assert not model.dirty
+
+    loaded = GasModel(path)
+    assert loaded.stats() == model.stats()
+    assert loaded.gas == model.gas and loaded.samples == model.samples
+    assert loaded.estimate(route("curve", "uni_v3")) == model.estimate(route("curve", "uni_v3")) == 103_000
+    assert len(loaded) == 2
+
+def test_gas_model_ignores_unreadable_file(tmp_path):
+    path = tmp_path / "base_gas.json"
+    path.write_text("{not json")
+    assert len(GasModel(str(path))) == 0
+    path.write_text(json.dumps({"shapes": [[1, ["uni_v3"], 90_000.5, 4]]}))
+    model = GasModel(str(path))
+    assert model.estimate(route("uni_v3")) == 90_000 and model.stats()["1:uni_v3"]["samples"] == 4
+    assert model.estimate(route("curve", "curve")) == DEFAULT_ROUTE_GAS
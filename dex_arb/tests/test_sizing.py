@@ -0,0 +1,90 @@
+import math
+
+import pytest
+
+from pybot.quotes.uni_v3_local import V3Simulator
+from pybot.routing.sizing import closed_form_size, golden_section_max, is_cyclic, optimize_size
+
+WETH, USDC = "0x" + "11" * 20, "0x" + "22" * 20  # WETH < USDC, so WETH is token0
+
+@pytest.mark.parametrize("peak", [3, 1_000, 10 ** 6, 10 ** 12])
+def test_golden_section_finds_interior_peak(peak):
+    evaluated = []
+
+    def f(x):
+        evaluated.append(x)
+        return -(math.log(x) - math.log(peak)) ** 2
+
+    x, value = golden_section_max(f, 1, 10 ** 15, rel_tol=1e-4, max_evals=80)
+    assert abs(x - peak) <= max(1, peak * 1e-3)
+    assert value == f(x)
+    assert len(evaluated) <= 80
+
+def test_golden_section_monotone_ends_at_bound():
+    assert golden_section_max(lambda x: x, 10, 10 ** 9)[0] >= 10 ** 9 * 0.999
+    assert golden_section_max(lambda x: -x, 10, 10 ** 9)[0] <= 10 * 1.001
+
+def test_golden_section_respects_eval_budget():
+    calls = []
+    golden_section_max(lambda x: calls.append(x) or -abs(x - 500), 1, 10 ** 30, rel_tol=1e-12, max_evals=10)
+    assert len(calls) == 10
+
+@pytest.fixture
+def mispriced(make_v3_pool):
+    """Two WETH/USDC pools 1.5% apart, deep enough that sizes stay inside one tick range."""
+    cheap = make_v3_pool("0x" + "a1" * 20, WETH, USDC, 3000, 2000e6 / 1e18, 4 * 10 ** 16)
+    rich = make_v3_pool("0x" + "a2" * 20, WETH, USDC, 3000, 2030e6 / 1e18, 4 * 10 ** 16)
+    sim = V3Simulator([cheap, rich])
+    route = [
+        {"dex": "uni_v3", "pool": rich.address, "token_in": WETH, "token_out": USDC},
+        {"dex": "uni_v3", "pool": cheap.address, "token_in": USDC, "token_out": WETH},
+    ]
+
+    def quote(amount_in):
+        amount = amount_in
+        for leg in route:
+            amount = sim.by_address[leg["pool"]].quote_exact_input_single(leg["token_in"], amount)
+        return amount
+
+    return sim, route, quote
+
+def test_closed_form_seed_matches_quotes(mispriced):
+    sim, route, quote = mispriced
+    cost = 1.0005
+    x, (a, b, c) = closed_form_size(route, sim, cost)
+    seed = int(x)
+    # The composed constant-product form reproduces the exact quote inside the tick range
+    exact = quote(seed)
+    assert abs(exact - a * seed / (b + c * seed)) <= 1e-6 * exact
+    # and its optimum is the quoted optimum of out(x) - cost * x
+    edge = lambda amount: quote(amount) - cost * amount
+    assert edge(seed) > 0
+    assert edge(seed) >= edge(int(seed * 0.98)) and edge(seed) >= edge(int(seed * 1.02))
+
+def test_closed_form_rejects_unprofitable(mispriced):
+    sim, route, _ = mispriced
+    assert closed_form_size(route, sim, 1.05) is None  # 5% cost beats a 1.5% spread
+    assert closed_form_size([dict(route[0], dex="curve")], sim, 1.0) is None
+
+def test_optimize_size_accepts_closed_form(mispriced):
+    sim, route, quote = mispriced
+    sized = optimize_size(route, quote, 18, 2000.0, gas_usd=1.0, flash_fee_pct=0.0005,
+                          min_usd=100, max_usd=10 ** 7, v3_sim=sim)
+    seed, _ = closed_form_size(route, sim, 1.0005)
+    assert sized["evaluations"] == 1 and sized["amount_in"] == int(seed)
+    assert sized["amount_out"] == quote(sized["amount_in"]) and sized["profit_usd"] > 0
+
+def test_optimize_size_search_matches_closed_form(mispriced):
+    sim, route, quote = mispriced
+    # Without the simulator only the golden-section search runs
+    sized = optimize_size(route, quote, 18, 2000.0, gas_usd=1.0, flash_fee_pct=0.0005,
+                          min_usd=100, max_usd=10 ** 7, rel_tol=1e-5, max_evals=80)
+    seed, _ = closed_form_size(route, sim, 1.0005)
+    assert abs(sized["amount_in"] - seed) <= 0.01 * seed
+
+def test_optimize_size_skips_non_cyclic_routes(mispriced):
+    sim, route, quote = mispriced
+    assert is_cyclic(route)
+    one_way = route[:1]
+    assert not is_cyclic(one_way)
+    assert optimize_size(one_way, quote, 18, 2000.0, 1.0, 0.0005, 100, 10 ** 7, v3_sim=sim) is None
@@ -0,0 +1,45 @@
+import json
+
+from pybot.utils import token_service
+from pybot.utils.token_service import TokenService
+
+DAI = "0x50c5725949a6f0c72e6c4a641f24049a917db0cb"
+USDC = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+
+def test_discovered_metadata_replaces_seed():
+    tokens = TokenService("base")
+    assert tokens.add(USDC, "USDC", 6)  # seeded only, so the discovered copy is taken
+    assert not tokens.add(USDC, "USDC", 6)
+    assert tokens.add("0x" + "11" * 20, "NEW", 8)
+    assert tokens.add(DAI, "DAI", "18") and tokens.decimals(DAI) == 18
+
+def test_resolve_confirms_seeds_on_chain(monkeypatch):
+    fetched = []
+
+    def fetch_tokens(w3, addresses, block_identifier):
+        fetched.extend(addresses)
+        return {address: {"symbol": "TKN", "decimals": "9"} for address in addresses}
+
+    monkeypatch.setattr(token_service, "fetch_tokens", fetch_tokens)
+    tokens = TokenService("base")
+    tokens.resolve(None, [DAI.upper().replace("0X", "0x")])
+    assert fetched == [DAI] and tokens.decimals(DAI) == 9
+    fetched.clear()
+    tokens.resolve(None, [DAI])
+    assert fetched == []
+
+def test_cache_keeps_confirmed_metadata_only(tmp_path):
+    path = str(tmp_path / "base_tokens.json")
+    other = "0x" + "22" * 20
+    tokens = TokenService("base", path)
+    tokens.add(USDC, "USDC", 8)
+    tokens.add(other, "OTHER", 6)
+    tokens.save()
+    saved = json.load(open(path))["tokens"]
+    assert set(saved) == {USDC, other}
+    # An older cache that saved a seed verbatim does not confirm it
+    saved[DAI] = {"symbol": "DAI", "decimals": 18}
+    json.dump({"chain": "base", "tokens": saved}, open(path, "w"))
+    reloaded = TokenService("base", path)
+    assert reloaded.decimals(USDC) == 8 and USDC not in reloaded.seeded
+    assert DAI in reloaded.seeded
@@ -0,0 +1,212 @@
+import random
+from fractions import Fraction
+from math import isqrt
+
+import pytest
+from eth_abi import decode, encode
+
+from pybot.quotes import uni_v3_local, v3math
+from pybot.quotes.uni_v3_local import V3Simulator, load_pools, verify_against_quoter
+from pybot.quotes.v3math import (MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK, compute_swap_step,
+                                 get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio)
+from tests.conftest import v3_pool
+
+E18 = 10 ** 18
+TOKEN0, TOKEN1 = "0x" + "11" * 20, "0x" + "22" * 20
+
+def encode_price_sqrt(reserve1, reserve0):
+    """encodePriceSqrt from the Uniswap v3 core tests."""
+    return isqrt(reserve1 * 2 ** 192 // reserve0)
+
+# --- TickMath (values from TickMath.spec.ts) ---
+
+@pytest.mark.parametrize("tick, ratio", [
+    (MIN_TICK, MIN_SQRT_RATIO),
+    (MIN_TICK + 1, 4295343490),
+    (0, 2 ** 96),
+    (MAX_TICK - 1, 1461373636630004318706518188784493106690254656249),
+    (MAX_TICK, MAX_SQRT_RATIO),
+])
+def test_get_sqrt_ratio_at_tick(tick, ratio):
+    assert get_sqrt_ratio_at_tick(tick) == ratio
+
+def test_get_sqrt_ratio_at_tick_bounds():
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MIN_TICK - 1)
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(MAX_TICK + 1)
+    with pytest.raises(ValueError):
+        get_tick_at_sqrt_ratio(MIN_SQRT_RATIO - 1)
+    with pytest.raises(ValueError):
+        get_tick_at_sqrt_ratio(MAX_SQRT_RATIO)
+
+def test_get_tick_at_sqrt_ratio_extremes():
+    assert get_tick_at_sqrt_ratio(MIN_SQRT_RATIO) == MIN_TICK
+    assert get_tick_at_sqrt_ratio(4295343490) == MIN_TICK + 1
+    assert get_tick_at_sqrt_ratio(1461373636630004318706518188784493106690254656248) == MAX_TICK - 2
+    assert get_tick_at_sqrt_ratio(1461373636630004318706518188784493106690254656249) == MAX_TICK - 1
+    assert get_tick_at_sqrt_ratio(MAX_SQRT_RATIO - 1) == MAX_TICK - 1
+
+def test_tick_round_trip():
+    rng = random.Random(4)
+    ticks = [MIN_TICK + 1, -1, 1, MAX_TICK - 1] + [rng.randint(MIN_TICK + 1, MAX_TICK - 1) for _ in range(500)]
+    for tick in ticks:
+        ratio = get_sqrt_ratio_at_tick(tick)
+        # getTickAtSqrtRatio is the greatest tick whose ratio is <= the price
+        assert get_tick_at_sqrt_ratio(ratio) == tick
+        assert get_tick_at_sqrt_ratio(ratio - 1) == tick - 1
+        assert get_tick_at_sqrt_ratio((ratio + get_sqrt_ratio_at_tick(tick + 1)) // 2) == tick
+
+# --- SwapMath (cases from SwapMath.spec.ts) ---
+
+def test_swap_step_exact_in_capped_at_target():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(101, 100)
+    assert compute_swap_step(price, target, 2 * E18, E18, 600) == (
+        target, 9975124224178055, 9925619580021728, 5988667735148)
+
+def test_swap_step_exact_out_capped_at_target():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(101, 100)
+    assert compute_swap_step(price, target, 2 * E18, -E18, 600) == (
+        target, 9975124224178055, 9925619580021728, 5988667735148)
+
+def test_swap_step_exact_in_fully_spent():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(1000, 100)
+    sqrt_next, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, E18, 600)
+    assert (amount_in, amount_out, fee) == (999400000000000000, 666399946655997866, 600000000000000)
+    assert amount_in + fee == E18
+    assert sqrt_next == v3math.get_next_sqrt_price_from_input(price, 2 * E18, E18 - fee, False)
+
+def test_swap_step_exact_out_fully_received():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(10000, 100)
+    sqrt_next, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, -E18, 600)
+    assert (amount_in, amount_out, fee) == (2 * E18, E18, 1200720432259356)
+    assert sqrt_next == v3math.get_next_sqrt_price_from_output(price, 2 * E18, E18, False)
+
+@pytest.mark.parametrize("args, expected", [
+    # amount out is capped at the desired amount out
+    ((417332158212080721273783715441582, 1452870262520218020823638996, 159344665391607089467575320103, -1, 1),
+     (417332158212080721273783715441581, 1, 1, 1)),
+    # target price of 1 uses partial input amount
+    ((2, 1, 1, 3915081100057732413702495386755767, 1),
+     (1, 39614081257132168796771975168, 0, 39614120871253040049813)),
+    # entire input amount taken as fee
+    ((2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872), (2413, 0, 0, 10)),
+    # intermediate insufficient liquidity, zero for one exact output
+    ((20282409603651670423947251286016, 20282409603651670423947251286016 * 11 // 10, 1024, -4, 3000),
+     (20282409603651670423947251286016 * 11 // 10, 26215, 0, 79)),
+    # intermediate insufficient liquidity, one for zero exact output
+    ((20282409603651670423947251286016, 20282409603651670423947251286016 * 9 // 10, 1024, -263000, 3000),
+     (20282409603651670423947251286016 * 9 // 10, 1, 26214, 1)),
+])
+def test_swap_step_edge_cases(args, expected):
+    assert compute_swap_step(*args) == expected
+
+# --- Multi-tick swaps ---
+
+def reference_zero_for_one(pool, amount_in):
+    """Exact-rational swap of token0 in, walking the pool's initialized ticks downwards.
+
+    The whitepaper formulas per range (dx = L * (1/sqrt_b - 1/sqrt_a),
+    dy = L * (sqrt_a - sqrt_b)) without the contract's per-step rounding.
+    """
+    fee = Fraction(pool.fee, v3math.FEE_DENOMINATOR)
+    sqrt_p = Fraction(pool.sqrt_price_x96, v3math.Q96)
+    liquidity, remaining, out = pool.liquidity, Fraction(amount_in), Fraction(0)
+    for tick in sorted((t for t in pool.liquidity_net if t <= pool.tick), reverse=True):
+        sqrt_t = Fraction(get_sqrt_ratio_at_tick(tick), v3math.Q96)
+        needed = liquidity * (1 / sqrt_t - 1 / sqrt_p) / (1 - fee)
+        if remaining < needed:
+            break
+        out += liquidity * (sqrt_p - sqrt_t)
+        remaining -= needed
+        liquidity -= pool.liquidity_net[tick]
+        sqrt_p = sqrt_t
+    sqrt_next = 1 / (1 / sqrt_p + remaining * (1 - fee) / liquidity)
+    return out + liquidity * (sqrt_p - sqrt_next)
+
+@pytest.fixture
+def layered_pool():
+    """Price 1, fee 0.3%: full-range liquidity plus three stacked positions below the price."""
+    return v3_pool("0x" + "aa" * 20, TOKEN0, TOKEN1, 3000, 1.0, 10 ** 20,
+                   positions=[(-600, 600, 5 * 10 ** 20), (-1200, -300, 3 * 10 ** 20), (-3000, -60, 10 ** 21)])
+
+@pytest.mark.parametrize("amount_in", [10 ** 15, 10 ** 19, 4 * 10 ** 19, 10 ** 20, 3 * 10 ** 20])
+def test_multi_tick_swap_matches_reference(layered_pool, amount_in):
+    amount0, amount1 = layered_pool.swap(True, amount_in)
+    assert amount0 == amount_in
+    expected = reference_zero_for_one(layered_pool, amount_in)
+    # Only the contract's per-step rounding separates the two, always against the trader
+    assert -amount1 <= expected
+    assert expected - -amount1 <= max(10, expected * Fraction(1, 10 ** 15))
+
+def test_multi_tick_swap_crosses_ticks(layered_pool):
+    big = 3 * 10 ** 20
+    # Crossing -60 and -300 on the way down adds the positions below the price
+    crossed = -layered_pool.swap(True, big)[1]
+    in_range_only = v3_pool("0x" + "ab" * 20, TOKEN0, TOKEN1, 3000, 1.0, layered_pool.liquidity)
+    assert crossed > -in_range_only.swap(True, big)[1]
+    assert layered_pool.swap(True, big) == layered_pool.swap(True, big)  # state is not mutated
+
+def test_exact_output_inverts_exact_input(layered_pool):
+    for amount_in in (10 ** 18, 10 ** 20):
+        out = -layered_pool.swap(True, amount_in)[1]
+        amount0, amount1 = layered_pool.swap(True, -out)
+        assert amount1 == -out
+        assert amount_in - 2 <= amount0 <= amount_in
+
+def test_swap_outside_loaded_words_fails(layered_pool):
+    layered_pool.bitmap = {w: word for w, word in layered_pool.bitmap.items() if w >= -1}
+    with pytest.raises(RuntimeError):
+        layered_pool.swap(True, 10 ** 24)
+
+# --- Loading and verification ---
+
+class PoolMulticall:
+    """aggregate3 answered from V3Pool objects, as the pool contracts would."""
+
+    def __init__(self, pools):
+        self.pools = {pool.address: pool for pool in pools}
+
+    def __call__(self, w3, calls, block_identifier=None):
+        results = []
+        for target, data in calls:
+            pool, selector, args = self.pools[target], bytes(data[:4]), bytes(data[4:])
+            if selector == uni_v3_local.SLOT0_SELECTOR:
+                words = encode(["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"],
+                               [pool.sqrt_price_x96, pool.tick, 0, 1, 1, 0, True])
+            elif selector == uni_v3_local.LIQUIDITY_SELECTOR:
+                words = encode(["uint128"], [pool.liquidity])
+            elif selector == uni_v3_local.TICK_BITMAP_SELECTOR:
+                words = encode(["uint256"], [pool.bitmap.get(decode(["int16"], args)[0], 0)])
+            else:
+                net = pool.liquidity_net[decode(["int24"], args)[0]]
+                words = encode(["uint128", "int128"], [abs(net), net])
+            results.append((True, words))
+        return results
+
+def subgraph_entry(pool):
+    return {"id": pool.address, "feeTier": str(pool.fee), "token0": {"id": pool.token0},
+            "token1": {"id": pool.token1}}
+
+def test_load_pools_reproduces_swaps(monkeypatch, layered_pool):
+    monkeypatch.setattr(uni_v3_local, "aggregate3", PoolMulticall([layered_pool]))
+    sim = load_pools(None, [subgraph_entry(layered_pool)], block_identifier=100)
+    loaded = sim.by_address[layered_pool.address]
+    assert sim.block_number == 100 and loaded.block_number == 100
+    assert (loaded.sqrt_price_x96, loaded.tick, loaded.liquidity) == (
+        layered_pool.sqrt_price_x96, layered_pool.tick, layered_pool.liquidity)
+    for amount_in in (10 ** 18, 10 ** 20):
+        assert loaded.swap(True, amount_in) == layered_pool.swap(True, amount_in)
+        assert loaded.swap(False, amount_in) == layered_pool.swap(False, amount_in)
+
+def test_quote_exact_input_path_and_verify(monkeypatch, layered_pool):
+    path = bytes.fromhex(TOKEN0[2:]) + (3000).to_bytes(3, "big") + bytes.fromhex(TOKEN1[2:])
+    sim = V3Simulator([layered_pool], block_number=100)
+    local = sim.quote_exact_input(path, 10 ** 19)
+    assert local == layered_pool.quote_exact_input_single(TOKEN0, 10 ** 19)
+
+    recorded = {10 ** 19: local, 10 ** 20: sim.quote_exact_input(path, 10 ** 20) + 1}
+    monkeypatch.setattr(uni_v3_local, "quote_exact_in_batch", lambda w3, quoter, items, block_identifier: [
+        (True, recorded[amount]) for _, amount in items])
+    mismatches = verify_against_quoter(None, "0xquoter", sim, [(path, 10 ** 19), (path, 10 ** 20)])
+    assert [(m["amount_in"], m["diff"]) for m in mismatches] == [(10 ** 20, -1)]
@@ -12,9 +12,14 @@ CREATE TABLE pools (
   UNIQUE(chain, dex, address)
 );
 
+-- Time-series tables below are range-partitioned by ts: partitions are created
+-- ahead of time and dropped after their retention (see partition_config and
+-- run_partition_maintenance), and a DEFAULT partition catches anything else.
+-- The primary key of a partitioned table has to include ts.
+
 -- Quotes table for storing route quotes and profitability analysis
 CREATE TABLE quotes (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGSERIAL,
   ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   chain TEXT NOT NULL,
   route_hash BYTEA NOT NULL,
@@ -23,12 +28,13 @@ CREATE TABLE quotes (
   gas_estimate_usd NUMERIC NOT NULL,
   flash_fee_usd NUMERIC NOT NULL,
   profit_usd NUMERIC NOT NULL,
-  legs JSONB NOT NULL
-);
+  legs JSONB NOT NULL,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
 
 -- Executions table for tracking transaction execution
 CREATE TABLE executions (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGSERIAL,
   ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   chain TEXT NOT NULL,
   tx_hash BYTEA,
@@ -37,25 +43,166 @@ CREATE TABLE executions (
   gas_used NUMERIC,
   gas_price_gwei NUMERIC,
   profit_usd NUMERIC,
-  reason TEXT
-);
+  reason TEXT,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
 
 -- Gas prices table for tracking gas price history
 CREATE TABLE gas_prices (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGSERIAL,
   ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   chain TEXT NOT NULL,
   base_fee_gwei NUMERIC NOT NULL,
   priority_fee_gwei NUMERIC NOT NULL,
-  gas_price_gwei NUMERIC NOT NULL
-);
+  gas_price_gwei NUMERIC NOT NULL,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
 
 -- Performance metrics table
 CREATE TABLE metrics (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGSERIAL,
   ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   chain TEXT NOT NULL,
   metric_name TEXT NOT NULL,
   metric_value NUMERIC NOT NULL,
-  labels JSONB
+  labels JSONB,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Per-minute rollups, kept up to date by statement-level insert triggers
+-- (one aggregate upsert per INSERT/COPY batch) so dashboards never scan raw rows.
+-- ts is the minute bucket.
+
+-- Best quote per route and minute
+CREATE TABLE quotes_1m (
+  ts TIMESTAMPTZ NOT NULL,
+  chain TEXT NOT NULL,
+  route_hash BYTEA NOT NULL,
+  best_profit_usd NUMERIC NOT NULL,
+  quotes BIGINT NOT NULL,
+  PRIMARY KEY (ts, chain, route_hash)
+) PARTITION BY RANGE (ts);
+
+-- Execution outcomes per chain and minute (anything but 'success' counts as failed)
+CREATE TABLE executions_1m (
+  ts TIMESTAMPTZ NOT NULL,
+  chain TEXT NOT NULL,
+  executions BIGINT NOT NULL,
+  failed BIGINT NOT NULL,
+  fail_rate NUMERIC NOT NULL,
+  PRIMARY KEY (ts, chain)
+) PARTITION BY RANGE (ts);
+
+CREATE TABLE quotes_default PARTITION OF quotes DEFAULT;
+CREATE TABLE executions_default PARTITION OF executions DEFAULT;
+CREATE TABLE gas_prices_default PARTITION OF gas_prices DEFAULT;
+CREATE TABLE metrics_default PARTITION OF metrics DEFAULT;
+CREATE TABLE quotes_1m_default PARTITION OF quotes_1m DEFAULT;
+CREATE TABLE executions_1m_default PARTITION OF executions_1m DEFAULT;
+
+-- Partition layout and retention per partitioned table
+CREATE TABLE partition_config (
+  parent TEXT PRIMARY KEY,
+  period TEXT NOT NULL CHECK (period IN ('day', 'week', 'month')),
+  premake INTEGER NOT NULL DEFAULT 3,  -- future partitions kept ready
+  retention INTERVAL                   -- partitions wholly older than this are dropped (NULL keeps all)
 );
+
+INSERT INTO partition_config (parent, period, premake, retention) VALUES
+  ('quotes', 'day', 3, '14 days'),
+  ('executions', 'month', 2, NULL),
+  ('gas_prices', 'day', 3, '90 days'),
+  ('metrics', 'day', 3, '30 days'),
+  ('quotes_1m', 'month', 2, '365 days'),
+  ('executions_1m', 'month', 2, NULL);
+
+-- Create the partition of parent for [lo, hi), named <parent>_pYYYYMMDD (UTC).
+-- Rows already sitting in the default partition for that range are moved in.
+CREATE OR REPLACE FUNCTION create_partition(parent TEXT, lo TIMESTAMPTZ, hi TIMESTAMPTZ)
+RETURNS BOOLEAN LANGUAGE plpgsql AS $$
+DECLARE
+  part TEXT := parent || '_p' || to_char(lo AT TIME ZONE 'UTC', 'YYYYMMDD');
+BEGIN
+  IF to_regclass(part) IS NOT NULL THEN
+    RETURN FALSE;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part, parent);
+  IF to_regclass(parent || '_default') IS NOT NULL THEN
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE ts >= $1 AND ts < $2 RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved', parent || '_default', part) USING lo, hi;
+  END IF;
+  EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, part, lo, hi);
+  RETURN TRUE;
+END $$;
+
+-- Create the current and next premake partitions of every configured table and
+-- drop the ones past retention. Idempotent; the bot's DatabaseWriter calls it every
+-- database.maintenance_interval_s (pg_cron can schedule it as well).
+CREATE OR REPLACE FUNCTION run_partition_maintenance()
+RETURNS TABLE (partition_name TEXT, action TEXT) LANGUAGE plpgsql AS $$
+DECLARE
+  cfg partition_config%ROWTYPE;
+  step INTERVAL;
+  lo TIMESTAMPTZ;
+  part RECORD;
+BEGIN
+  FOR cfg IN SELECT * FROM partition_config LOOP
+    step := ('1 ' || cfg.period)::INTERVAL;
+    lo := date_trunc(cfg.period, NOW(), 'UTC');
+    FOR n IN 0..cfg.premake LOOP
+      IF create_partition(cfg.parent, lo + step * n, lo + step * (n + 1)) THEN
+        partition_name := cfg.parent || '_p' || to_char((lo + step * n) AT TIME ZONE 'UTC', 'YYYYMMDD');
+        action := 'created';
+        RETURN NEXT;
+      END IF;
+    END LOOP;
+    IF cfg.retention IS NOT NULL THEN
+      FOR part IN
+        SELECT c.relname,
+               to_date(right(c.relname, 8), 'YYYYMMDD')::TIMESTAMP AT TIME ZONE 'UTC' AS lower_bound
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = cfg.parent::REGCLASS AND c.relname ~ ('^' || cfg.parent || '_p[0-9]{8}$')
+      LOOP
+        IF part.lower_bound + step <= NOW() - cfg.retention THEN
+          EXECUTE format('DROP TABLE %I', part.relname);
+          partition_name := part.relname;
+          action := 'dropped';
+          RETURN NEXT;
+        END IF;
+      END LOOP;
+    END IF;
+  END LOOP;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_quotes() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO quotes_1m AS r (ts, chain, route_hash, best_profit_usd, quotes)
+  SELECT date_trunc('minute', ts), chain, route_hash, MAX(profit_usd), COUNT(*)
+  FROM new_rows
+  GROUP BY 1, 2, 3
+  ON CONFLICT (ts, chain, route_hash) DO UPDATE
+    SET best_profit_usd = GREATEST(r.best_profit_usd, EXCLUDED.best_profit_usd),
+        quotes = r.quotes + EXCLUDED.quotes;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_executions() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO executions_1m AS r (ts, chain, executions, failed, fail_rate)
+  SELECT minute, chain, n, failed, failed::NUMERIC / n
+  FROM (SELECT date_trunc('minute', ts) AS minute, chain, COUNT(*) AS n,
+               COUNT(*) FILTER (WHERE status IS DISTINCT FROM 'success') AS failed
+        FROM new_rows GROUP BY 1, 2) batch
+  ON CONFLICT (ts, chain) DO UPDATE
+    SET executions = r.executions + EXCLUDED.executions,
+        failed = r.failed + EXCLUDED.failed,
+        fail_rate = (r.failed + EXCLUDED.failed)::NUMERIC / (r.executions + EXCLUDED.executions);
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER quotes_rollup AFTER INSERT ON quotes
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_quotes();
+CREATE TRIGGER executions_rollup AFTER INSERT ON executions
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_executions();
+
+SELECT * FROM run_partition_maintenance();